@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import bisect
+import fcntl
+import json
+import os
+from pathlib import Path
+import threading
+from typing import Any
+
+
+def parse_bucket_edges(raw: str) -> tuple[int, ...]:
+    """`"256,512,1024"` -> (256, 512, 1024); empty string disables bucketing."""
+    edges = sorted({int(x) for x in raw.split(",") if x.strip()})
+    if any(e <= 0 for e in edges):
+        raise ValueError(f"Length bucket edges must be positive: {raw!r}")
+    return tuple(edges)
+
+
+def bucket_for_length(total_length: int, edges: tuple[int, ...]) -> int | None:
+    """Smallest bucket edge >= total_length, or None when it is larger than every edge."""
+    i = bisect.bisect_left(edges, total_length)
+    return edges[i] if i < len(edges) else None
+
+
+class LengthBucketStats:
+    """
+    Per-bucket tallies persisted as JSON next to the job data.
+
+    A job counts as a "hit" when its bucket was already compiled by an earlier
+    job (so the persistent JAX compilation cache should serve it). Together
+    with the padding overhead this is what the bucket edges get tuned on.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, Any]:
+        if not self._path.exists():
+            return {"buckets": {}, "overflow": 0}
+        return json.loads(self._path.read_text(encoding="utf-8"))
+
+    def record(self, *, total_length: int, bucket: int | None) -> bool:
+        """Records one run; returns whether the bucket was already warm."""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        # The file lock serializes the read-modify-write with worker processes sharing the data dir.
+        with self._lock, self._path.with_suffix(".lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            obj = self._load()
+            if bucket is None:
+                obj["overflow"] = int(obj.get("overflow", 0)) + 1
+                hit = False
+            else:
+                row = obj["buckets"].setdefault(
+                    str(bucket), {"jobs": 0, "hits": 0, "residues": 0, "padding_residues": 0}
+                )
+                hit = row["jobs"] > 0
+                row["jobs"] += 1
+                row["hits"] += int(hit)
+                row["residues"] += total_length
+                row["padding_residues"] += bucket - total_length
+            tmp = self._path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(obj, indent=2) + "\n", encoding="utf-8")
+            os.replace(tmp, self._path)
+            return hit
+
+    def snapshot(self, edges: tuple[int, ...]) -> dict[str, Any]:
+        with self._lock:
+            obj = self._load()
+        rows = []
+        for edge in sorted(set(edges) | {int(k) for k in obj["buckets"]}):
+            row = obj["buckets"].get(str(edge), {"jobs": 0, "hits": 0, "residues": 0, "padding_residues": 0})
+            jobs = row["jobs"]
+            rows.append(
+                {
+                    "edge": edge,
+                    "configured": edge in edges,
+                    "jobs": jobs,
+                    "hits": row["hits"],
+                    "hit_rate": (row["hits"] / jobs) if jobs else None,
+                    "padding_fraction": (row["padding_residues"] / (jobs * edge)) if jobs else None,
+                }
+            )
+        return {"edges": list(edges), "buckets": rows, "overflow": int(obj.get("overflow", 0))}
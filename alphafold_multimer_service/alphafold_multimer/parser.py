@@ -6,6 +6,11 @@ import re
 from pathlib import Path
 from typing import Iterable
 
+try:
+    import numpy
+except ImportError:  # optional; the pure-Python reduction gives the same numbers, slower
+    numpy = None
+
 
 _RANK_LINE_RE = re.compile(
     # ColabFold log lines look like:
@@ -39,7 +44,27 @@ def parse_rank1_from_log(log_text: str) -> ParsedRank1:
     raise ValueError("Could not find rank_001 metrics in log.txt")
 
 
+def parse_scores_json(scores_path: Path) -> ParsedRank1:
+    """
+    Per-model metrics from a ColabFold `*_scores_*.json` (keys `plddt` as a
+    per-residue list, `ptm`, `iptm`); used when a model was not ranked in the
+    log of the run that produced the final outputs.
+    """
+    obj = json.loads(scores_path.read_text(encoding="utf-8"))
+    plddt = obj.get("plddt")
+    if isinstance(plddt, list):
+        plddt = sum(plddt) / len(plddt) if plddt else 0.0
+    try:
+        return ParsedRank1(iptm=float(obj["iptm"]), ptm=float(obj["ptm"]), plddt=round(float(plddt), 2))
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Scores JSON missing ptm/iptm/plddt: {scores_path}") from e
+
+
 def count_residues_per_chain_pdb(pdb_path: Path) -> dict[str, int]:
+    """
+    Line-by-line reference for `structure.read_structure(path).residue_counts()`,
+    which the pipeline uses (it also reads mmCIF); kept for the benchmark.
+    """
     residues: set[tuple[str, str, str]] = set()
     with pdb_path.open("r", encoding="utf-8", errors="replace") as f:
         for line in f:
@@ -55,11 +80,15 @@ def count_residues_per_chain_pdb(pdb_path: Path) -> dict[str, int]:
     return out
 
 
-def parse_a3m_chain_lengths(a3m_path: Path) -> tuple[int, int]:
+def parse_a3m_chain_lengths(a3m_path: Path) -> list[int]:
     """
     ColabFold writes an a3m header like:
-      #833,211
-    for two-chain inputs.
+      #833,211\t1,1
+    i.e. lengths of the unique query sequences, a tab, and their copy numbers
+    (a homodimer is `#120\t2`, A2B1 is `#300,150\t2,1`). The cardinality
+    part may be missing in older outputs (`#833,211`).
+
+    Returns one length per chain, copies expanded in order.
     """
     with a3m_path.open("r", encoding="utf-8", errors="replace") as f:
         for line in f:
@@ -67,13 +96,22 @@ def parse_a3m_chain_lengths(a3m_path: Path) -> tuple[int, int]:
             if not line:
                 continue
             if line.startswith("#"):
-                parts = line[1:].split(",")
-                if len(parts) < 2:
+                lens_part, _, card_part = line[1:].partition("\t")
+                lengths = [int(x) for x in lens_part.split(",") if x.strip()]
+                if not lengths:
                     break
-                return int(parts[0]), int(parts[1])
+                if not card_part.strip():
+                    return lengths
+                cards = [int(x) for x in card_part.split(",") if x.strip()]
+                if len(cards) != len(lengths):
+                    raise ValueError(f"a3m header has {len(lengths)} lengths but {len(cards)} cardinalities: {a3m_path}")
+                out: list[int] = []
+                for length, n in zip(lengths, cards):
+                    out.extend([length] * n)
+                return out
             # header must be first non-empty line; if it isn't there, stop
             break
-    raise ValueError(f"Missing #lenA,lenB header in a3m: {a3m_path}")
+    raise ValueError(f"Missing #len1,len2,... header in a3m: {a3m_path}")
 
 
 def find_first(globs: Iterable[Path]) -> Path:
@@ -83,38 +121,132 @@ def find_first(globs: Iterable[Path]) -> Path:
     raise FileNotFoundError("No matching file found")
 
 
-def compute_interface_pae_means(
-    pae_json_path: Path, *, chain_a_len: int, chain_b_len: int
-) -> tuple[float, float, float]:
+def load_pae(pae_json_path: Path) -> list[list[float]]:
     obj = json.loads(pae_json_path.read_text(encoding="utf-8"))
-    pae = obj.get("predicted_aligned_error")
+    if isinstance(obj, list) and obj and isinstance(obj[0], dict):
+        # AlphaFold DB style: [{"predicted_aligned_error": ...}]
+        obj = obj[0]
+    pae = None
+    if isinstance(obj, dict):
+        # ColabFold scores JSONs carry the same matrix under "pae".
+        pae = obj.get("predicted_aligned_error", obj.get("pae"))
     if pae is None:
         raise ValueError("PAE JSON missing predicted_aligned_error")
+    return pae
+
+
+def _ptm_d0(n_res: int) -> float:
+    # TM-score normalization used by pTM/ipTM, floored like AlphaFold (L >= 19).
+    return max(1.0, 1.24 * (max(n_res, 19) - 15) ** (1.0 / 3.0) - 1.8)
+
 
-    # Avoid numpy dependency; compute means in pure Python.
-    # PAE is square [L][L], L = chain_a_len + chain_b_len.
+@dataclass(frozen=True)
+class ChainPairSummary:
+    chain_lengths: list[int]
+    # [i][j]: mean PAE of residues of chain i aligned on chain j (diagonal = intra-chain).
+    pae_mean: list[list[float]]
+    # [i][j]: ipTM-style score of chain j relative to chain i, estimated from
+    # expected PAE (ColabFold only reports one global ipTM). Diagonal is None.
+    iptm: list[list[float | None]]
+
+    @property
+    def interface_pae_mean(self) -> float | None:
+        n = len(self.chain_lengths)
+        vals = [self.pae_mean[i][j] for i in range(n) for j in range(n) if i != j]
+        return sum(vals) / len(vals) if vals else None
+
+
+def compute_chain_pair_summary(pae: list[list[float]], chain_lengths: list[int]) -> ChainPairSummary:
+    """
+    Chain x chain interface PAE and pairwise ipTM estimate. With numpy, each
+    chain pair is reduced as one block slice of the matrix; without it, one
+    pass over the PAE rows reduces each row per chain block.
+    """
+    if any(n <= 0 for n in chain_lengths):
+        raise ValueError("Empty PAE block")
     L = len(pae)
-    expected = chain_a_len + chain_b_len
+    expected = sum(chain_lengths)
     if L != expected:
         raise ValueError(f"PAE size mismatch: got {L}, expected {expected}")
 
-    def mean_block(rows: range, cols: range) -> float:
-        total = 0.0
-        n = 0
-        for i in rows:
-            row = pae[i]
-            for j in cols:
-                total += float(row[j])
-                n += 1
-        if n == 0:
-            raise ValueError("Empty PAE block")
-        return total / n
-
-    a_rows = range(0, chain_a_len)
-    b_rows = range(chain_a_len, expected)
-    a_cols = range(0, chain_a_len)
-    b_cols = range(chain_a_len, expected)
-
-    ab = mean_block(a_rows, b_cols)  # A -> B
-    ba = mean_block(b_rows, a_cols)  # B -> A
+    bounds: list[tuple[int, int]] = []
+    start = 0
+    for n in chain_lengths:
+        bounds.append((start, start + n))
+        start += n
+    n_chains = len(chain_lengths)
+    inv_d0_sq = [
+        [1.0 / _ptm_d0(chain_lengths[i] + chain_lengths[j]) ** 2 for j in range(n_chains)] for i in range(n_chains)
+    ]
+    reduce = _reduce_blocks_numpy if numpy is not None else _reduce_blocks
+    pae_mean, best = reduce(pae, bounds, inv_d0_sq)
+    return ChainPairSummary(chain_lengths=list(chain_lengths), pae_mean=pae_mean, iptm=best)
+
+
+def _reduce_blocks_numpy(
+    pae: list[list[float]], bounds: list[tuple[int, int]], inv_d0_sq: list[list[float]]
+) -> tuple[list[list[float]], list[list[float | None]]]:
+    m = numpy.asarray(pae, dtype=numpy.float64)
+    if m.shape != (len(pae), len(pae)):
+        raise ValueError(f"PAE matrix is not square: {m.shape}")
+    pae_mean: list[list[float]] = []
+    best: list[list[float | None]] = []
+    for ci, (r0, r1) in enumerate(bounds):
+        means_i: list[float] = []
+        best_i: list[float | None] = []
+        for cj, (c0, c1) in enumerate(bounds):
+            block = m[r0:r1, c0:c1]
+            means_i.append(float(block.mean()))
+            if ci == cj:
+                best_i.append(None)
+                continue
+            # per-residue TM-style alignment score of each residue of chain i onto chain j, 1 / (1 + x²/d0²),
+            # computed in one scratch array
+            tm = numpy.square(block)
+            tm *= inv_d0_sq[ci][cj]
+            tm += 1.0
+            numpy.reciprocal(tm, out=tm)
+            best_i.append(float(tm.mean(axis=1).max()))
+        pae_mean.append(means_i)
+        best.append(best_i)
+    return pae_mean, best
+
+
+def _reduce_blocks(
+    pae: list[list[float]], bounds: list[tuple[int, int]], inv_d0_sq: list[list[float]]
+) -> tuple[list[list[float]], list[list[float | None]]]:
+    n_chains = len(bounds)
+    sums = [[0.0] * n_chains for _ in range(n_chains)]
+    best: list[list[float | None]] = [[None] * n_chains for _ in range(n_chains)]
+    for ci, (r0, r1) in enumerate(bounds):
+        sums_i = sums[ci]
+        best_i = best[ci]
+        inv_i = inv_d0_sq[ci]
+        for r in range(r0, r1):
+            row = pae[r]
+            for cj, (c0, c1) in enumerate(bounds):
+                block = row[c0:c1]
+                sums_i[cj] += sum(block)
+                if ci == cj:
+                    continue
+                k = inv_i[cj]
+                # per-residue TM-style alignment score of residue r onto chain j
+                score = sum([1.0 / (1.0 + x * x * k) for x in block]) / (c1 - c0)
+                cur = best_i[cj]
+                if cur is None or score > cur:
+                    best_i[cj] = score
+
+    pae_mean = [
+        [sums[i][j] / ((bounds[i][1] - bounds[i][0]) * (bounds[j][1] - bounds[j][0])) for j in range(n_chains)]
+        for i in range(n_chains)
+    ]
+    return pae_mean, best
+
+
+def compute_interface_pae_means(
+    pae_json_path: Path, *, chain_a_len: int, chain_b_len: int
+) -> tuple[float, float, float]:
+    summary = compute_chain_pair_summary(load_pae(pae_json_path), [chain_a_len, chain_b_len])
+    ab = summary.pae_mean[0][1]  # A -> B
+    ba = summary.pae_mean[1][0]  # B -> A
     return (ab + ba) / 2.0, ab, ba
@@ -5,17 +5,28 @@ from datetime import datetime, timezone
 import json
 import os
 from pathlib import Path
+import re
 import shutil
 import subprocess
-from typing import Callable
+import threading
+from typing import Any, Callable
 
+import requests
+
+from alphafold_multimer_service.alphafold_multimer.buckets import LengthBucketStats, bucket_for_length
 from alphafold_multimer_service.alphafold_multimer.parser import (
-    compute_interface_pae_means,
-    count_residues_per_chain_pdb,
+    ParsedRank1,
+    compute_chain_pair_summary,
+    load_pae,
     parse_a3m_chain_lengths,
     parse_rank1_from_log,
+    parse_scores_json,
 )
-from alphafold_multimer_service.uniprot import extract_uniprot_id, fetch_fasta, fasta_to_sequence
+from alphafold_multimer_service.alphafold_multimer.structure import read_structure
+from alphafold_multimer_service.artifacts import link_or_copy
+from alphafold_multimer_service.logs import DOCKER_LOG, LogWriter
+from alphafold_multimer_service.sequences import ResolvedChain, chain_id, expand_chains
+from alphafold_multimer_service.uniprot import UniProtClient
 
 
 ProgressCb = Callable[[str, str, float | None], None]
@@ -29,26 +40,423 @@ def _wrap_fasta_seq(seq: str, width: int = 80) -> str:
     return "\n".join(seq[i : i + width] for i in range(0, len(seq), width))
 
 
+def _complex_fasta(job_id: str, chains: list[ResolvedChain]) -> str:
+    # ColabFold multimer input: one record, chains separated by ':'.
+    return f">{job_id}\n{_wrap_fasta_seq(':'.join(c.sequence for c in chains))}\n"
+
+
+def _fasta_total_length(path: Path) -> int:
+    """Residues across all chains of a (multi-chain, ':'-joined) input FASTA."""
+    return sum(
+        len(line.strip().replace(":", ""))
+        for line in path.read_text(encoding="utf-8").splitlines()
+        if line.strip() and not line.startswith(">")
+    )
+
+
+def summarize_outputs(
+    *,
+    log_text: str,
+    a3m_path: Path | None,
+    pdb_path: Path | None,
+    pae_path: Path | None,
+    padded_length: int | None = None,
+    rank1: ParsedRank1 | None = None,
+) -> tuple[dict, dict]:
+    """
+    Metrics + verification for any number of chains. Chain lengths come from
+    the a3m header; verification and interface metrics are best-effort.
+
+    `padded_length` is the length-bucket edge the run was padded to. Padding
+    residues trail the last chain, so they are cropped off the PAE matrix and
+    the last chain's PDB residue count before anything is compared.
+
+    `rank1` overrides the log's rank_001 line when the top model was ranked
+    outside that log (resumed runs).
+    """
+    parsed = rank1 or parse_rank1_from_log(log_text)
+
+    lens_a3m: list[int] | None = None
+    if a3m_path is not None:
+        try:
+            lens_a3m = parse_a3m_chain_lengths(a3m_path)
+        except Exception:
+            lens_a3m = None
+
+    chain_ids: list[str] | None = [chain_id(i) for i in range(len(lens_a3m))] if lens_a3m else None
+    lens_pdb: list[int | None] | None = None
+    if pdb_path is not None:
+        pdb_counts = read_structure(pdb_path).residue_counts()
+        if chain_ids is None:
+            chain_ids = sorted(pdb_counts)
+        lens_pdb = [pdb_counts.get(c) for c in chain_ids]
+
+    padding = 0
+    if padded_length is not None and lens_a3m:
+        padding = max(padded_length - sum(lens_a3m), 0)
+    if padding and lens_pdb and lens_a3m and lens_pdb[-1] == lens_a3m[-1] + padding:
+        lens_pdb[-1] = lens_a3m[-1]
+
+    summary = None
+    if pae_path is not None and lens_a3m:
+        pae = load_pae(pae_path)
+        n = sum(lens_a3m)
+        if padding and len(pae) == n + padding:
+            pae = [row[:n] for row in pae[:n]]
+        summary = compute_chain_pair_summary(pae, lens_a3m)
+
+    metrics = {
+        "iptm": parsed.iptm,
+        "ptm": parsed.ptm,
+        "ranking_confidence": round(parsed.ranking_confidence, 4),
+        "plddt": parsed.plddt,
+        "interface_pae_mean": summary.interface_pae_mean if summary else None,
+        # A/B pair values are kept for two-chain clients; see the matrix for N chains.
+        "interface_pae_mean_ab": summary.pae_mean[0][1] if summary else None,
+        "interface_pae_mean_ba": summary.pae_mean[1][0] if summary else None,
+        "chain_ids": chain_ids,
+        "interface_pae_matrix": summary.pae_mean if summary else None,
+        "chain_pair_iptm": summary.iptm if summary else None,
+    }
+
+    def _at(values: list | None, i: int) -> int | None:
+        return values[i] if values is not None and len(values) > i else None
+
+    verification = {
+        "chain_lengths_match": bool(lens_a3m) and lens_pdb == lens_a3m,
+        "chain_a_length_a3m": _at(lens_a3m, 0),
+        "chain_b_length_a3m": _at(lens_a3m, 1),
+        "chain_a_length_pdb": _at(lens_pdb, 0),
+        "chain_b_length_pdb": _at(lens_pdb, 1),
+        "chain_lengths_a3m": lens_a3m,
+        "chain_lengths_pdb": lens_pdb,
+        "padded_length": padded_length,
+    }
+    return metrics, verification
+
+
+@dataclass(frozen=True)
+class ColabFoldPreset:
+    num_recycles: int
+    num_models: int | None = None  # None: ColabFold default (5)
+    recycle_early_stop_tolerance: float | None = None
+
+
+COLABFOLD_PRESETS: dict[str, ColabFoldPreset] = {
+    "fast": ColabFoldPreset(num_recycles=3),
+    "full": ColabFoldPreset(num_recycles=20),
+    # first (cheap) pass of the `cascade` preset; see JobManager
+    "screen": ColabFoldPreset(num_recycles=3, num_models=2, recycle_early_stop_tolerance=0.5),
+}
+
+
+_COLABFOLD_NUM_MODELS = 5  # colabfold_batch --num-models default
+
+# Phases of a colabfold_batch run as announced by its log, in the order they occur; the
+# run is in "container" (image start, JAX init) until the first of these lines.
+COLABFOLD_PHASES: tuple[tuple[str, re.Pattern[str], float], ...] = (
+    ("msa", re.compile(r"\bQuery \d+/\d+"), 10),
+    ("compile", re.compile(r"\bSetting max_seq="), 30),
+    ("inference", re.compile(r"_model_\d+_seed_\d+ recycle="), 40),
+)
+
+
+def colabfold_phase(line: str, current: str) -> str:
+    """Phase after `line`; phases only advance, so a late MSA-looking line cannot move back."""
+    names = [name for name, _, _ in COLABFOLD_PHASES]
+    start = names.index(current) + 1 if current in names else 0
+    for name, pattern, _ in reversed(COLABFOLD_PHASES[start:]):
+        if pattern.search(line):
+            return name
+    return current
+
+# `<job>_unrelaxed_[rank_001_]alphafold2_multimer_v3_model_3_seed_000.pdb` and the
+# matching `_scores_` JSON; ColabFold adds the rank prefix once all models finish.
+_MODEL_FILE_RE = re.compile(
+    r"^.+_(?P<kind>unrelaxed|scores)_(?:rank_\d+_)?(?P<tag>.+_model_(?P<model>\d+)_seed_\d+)\.(?:pdb|json)$"
+)
+
+
+@dataclass(frozen=True)
+class FinishedModel:
+    model_num: int
+    pdb_path: Path
+    scores_path: Path
+    ranking_confidence: float
+
+
+def find_finished_models(out_dir: Path) -> dict[int, FinishedModel]:
+    """
+    Models whose PDB and scores JSON are both on disk, keyed by model number.
+    The scores JSON is written after the PDB, and one that does not parse is
+    treated as cut off mid-write.
+    """
+    if not out_dir.is_dir():
+        return {}
+    files: dict[tuple[int, str], dict[str, Path]] = {}
+    for path in out_dir.iterdir():
+        m = _MODEL_FILE_RE.match(path.name)
+        if m:
+            files.setdefault((int(m.group("model")), m.group("tag")), {})[m.group("kind")] = path
+    out: dict[int, FinishedModel] = {}
+    for (model_num, _tag), kinds in sorted(files.items()):
+        if "unrelaxed" not in kinds or "scores" not in kinds:
+            continue
+        try:
+            parsed = parse_scores_json(kinds["scores"])
+        except ValueError:
+            continue
+        out[model_num] = FinishedModel(
+            model_num=model_num,
+            pdb_path=kinds["unrelaxed"],
+            scores_path=kinds["scores"],
+            ranking_confidence=parsed.ranking_confidence,
+        )
+    return out
+
+
+def _stash_previous_attempt(*, job_id: str, out_dir: Path, resume_dir: Path) -> Path | None:
+    """
+    Moves an earlier attempt's MSA and finished models from `out_dir` into
+    `resume_dir` and clears the rest, so the next ColabFold run starts from a
+    clean output directory (a stale `.done.txt` would make it skip the job).
+    Returns the kept a3m, if any.
+    """
+    if out_dir.is_dir():
+        resume_dir.mkdir(parents=True, exist_ok=True)
+        for model in find_finished_models(out_dir).values():
+            model.pdb_path.replace(resume_dir / model.pdb_path.name)
+            model.scores_path.replace(resume_dir / model.scores_path.name)
+        a3m = out_dir / f"{job_id}.a3m"
+        if a3m.exists():
+            a3m.replace(resume_dir / a3m.name)
+        shutil.rmtree(out_dir)
+    a3m = resume_dir / f"{job_id}.a3m"
+    return a3m if a3m.exists() else None
+
+
 @dataclass(frozen=True)
 class AlphaFoldMultimerRunResult:
     metrics: dict
     verification: dict
     artifacts: list[dict]
+    # What a resumed run took over from an earlier attempt (None: fresh run).
+    resume: dict | None = None
+
+
+@dataclass(frozen=True)
+class RunOutputs:
+    """
+    What a ColabFold run left on disk, before parsing. Only paths and plain
+    values, so it pickles into the post-processing pool.
+    """
+
+    job_id: str
+    input_fasta: Path
+    out_dir: Path
+    resume_dir: Path
+    artifacts_dir: Path
+    log_path: Path | None
+    resumed_msa: Path | None
+    models_reused: tuple[int, ...]
+    models_computed: tuple[int, ...]
+    padded_length: int | None = None
+
+
+def postprocess_outputs(outputs: RunOutputs) -> AlphaFoldMultimerRunResult:
+    """
+    Parses a run's outputs (log, a3m, rank 1 PDB and PAE), verifies chain
+    lengths and promotes the stable files into `artifacts/`. CPU and I/O
+    only: JobManager runs it in a process pool while the GPU moves on.
+    """
+    out_dir = outputs.out_dir
+    artifacts_dir = outputs.artifacts_dir
+    log_text = ""
+    if outputs.log_path is not None:
+        log_text = outputs.log_path.read_text(encoding="utf-8", errors="replace")
+
+    # Promote stable artifacts into artifacts/ (hardlink where possible, no copies).
+    link_or_copy(outputs.input_fasta, artifacts_dir / "input.fasta")
+    if outputs.log_path is not None:
+        link_or_copy(outputs.log_path, artifacts_dir / "log.txt")
+
+    resumed_msa = outputs.resumed_msa
+    a3m_candidates = sorted(out_dir.glob("*.a3m")) or ([resumed_msa] if resumed_msa is not None else [])
+    a3m_path = a3m_candidates[0] if a3m_candidates else None
+
+    rank1: ParsedRank1 | None = None
+    if outputs.models_reused:
+        # The log only ranks this attempt's models; rank across all of them
+        # by the same multimer metric ColabFold uses.
+        reused = find_finished_models(outputs.resume_dir)
+        best = max({**reused, **find_finished_models(out_dir)}.values(), key=lambda m: m.ranking_confidence)
+        rank1 = parse_scores_json(best.scores_path)
+        pdb_path: Path | None = best.pdb_path
+        pae_path: Path | None = best.scores_path
+        score_json: Path | None = best.scores_path
+    else:
+        # Locate rank_001 PDB and PAE JSON.
+        # PDB unless ColabFold was told to write mmCIF only
+        pdb_candidates = sorted(out_dir.glob("*_unrelaxed_rank_001_*.pdb")) or sorted(
+            out_dir.glob("*_unrelaxed_rank_001_*.cif")
+        )
+        pae_candidates = sorted(out_dir.glob("*_predicted_aligned_error_v1.json"))
+        score_json_candidates = sorted(out_dir.glob("*_scores_rank_001_*.json"))
+        pdb_path = pdb_candidates[0] if pdb_candidates else None
+        pae_path = pae_candidates[0] if pae_candidates else None
+        score_json = score_json_candidates[0] if score_json_candidates else None
+
+    metrics, verification = summarize_outputs(
+        log_text=log_text,
+        a3m_path=a3m_path,
+        pdb_path=pdb_path,
+        pae_path=pae_path,
+        padded_length=outputs.padded_length,
+        rank1=rank1,
+    )
+
+    if a3m_path is not None:
+        link_or_copy(a3m_path, artifacts_dir / a3m_path.name)
+    if pdb_path is not None:
+        link_or_copy(pdb_path, artifacts_dir / f"rank_001{pdb_path.suffix}")
+    if pae_path is not None and pae_path != score_json:
+        link_or_copy(pae_path, artifacts_dir / "pae.json")
+    elif pae_path is not None:
+        # Best model came from an earlier attempt: its PAE only lives in the scores JSON.
+        (artifacts_dir / "pae.json").write_text(
+            json.dumps({"predicted_aligned_error": load_pae(pae_path)}), encoding="utf-8"
+        )
+    if score_json is not None:
+        link_or_copy(score_json, artifacts_dir / "scores_rank_001.json")
+
+    artifacts: list[dict] = []
+    for path in sorted(artifacts_dir.iterdir()):
+        if not path.is_file():
+            continue
+        media_type = None
+        if path.name.endswith(".pdb"):
+            media_type = "chemical/x-pdb"
+        elif path.name.endswith(".cif"):
+            media_type = "chemical/x-mmcif"
+        elif path.name.endswith(".json"):
+            media_type = "application/json"
+        else:
+            media_type = "text/plain"
+        artifacts.append(
+            {
+                "name": path.name,
+                "path": str(path),
+                "media_type": media_type,
+                "size_bytes": path.stat().st_size,
+            }
+        )
+
+    resume = None
+    if outputs.models_reused or resumed_msa is not None:
+        resume = {
+            "msa_reused": resumed_msa is not None,
+            "models_reused": list(outputs.models_reused),
+            "models_computed": list(outputs.models_computed),
+        }
+
+    return AlphaFoldMultimerRunResult(
+        metrics=metrics, verification=verification, artifacts=artifacts, resume=resume
+    )
+
+
+@dataclass(frozen=True)
+class PreparedInputs:
+    chains: list[ResolvedChain]
+    input_fasta: Path | None = None
 
 
 class AlphaFoldMultimerRunner:
+    """
+    `proteins` are normalized protein refs (see `sequences.normalize_protein_ref`),
+    each with optional `copies`; `run_pair` keeps its name from the two-chain
+    days but folds any number of chains. `msa_path` points at an a3m from an
+    earlier run of the same input to skip the MSA search.
+    """
+
+    def prepare_inputs(
+        self,
+        *,
+        job_id: str,
+        job_dir: Path,
+        proteins: list[dict[str, Any]],
+    ) -> PreparedInputs | None:
+        """
+        Resolves and validates inputs ahead of `run_pair` (called by the
+        prefetch stage). Raises ValueError for inputs that can never succeed.
+        Runners without an input stage return None.
+        """
+        return None
+
+    def run_inference(
+        self,
+        *,
+        job_id: str,
+        job_dir: Path,
+        proteins: list[dict[str, Any]],
+        preset: str,
+        num_recycles_override: int | None,
+        progress_cb: ProgressCb,
+        msa_path: Path | None = None,
+    ) -> RunOutputs | AlphaFoldMultimerRunResult:
+        """
+        The GPU part of `run_pair`. Runners that leave parsing to
+        `postprocess_outputs` return RunOutputs; the rest return the final
+        result. Subclasses override this or `run_pair`.
+        """
+        return self.run_pair(
+            job_id=job_id,
+            job_dir=job_dir,
+            proteins=proteins,
+            preset=preset,
+            num_recycles_override=num_recycles_override,
+            progress_cb=progress_cb,
+            msa_path=msa_path,
+        )
+
     def run_pair(
         self,
         *,
         job_id: str,
         job_dir: Path,
-        protein_a_ref: str,
-        protein_b_ref: str,
+        proteins: list[dict[str, Any]],
         preset: str,
         num_recycles_override: int | None,
         progress_cb: ProgressCb,
+        msa_path: Path | None = None,
     ) -> AlphaFoldMultimerRunResult:
-        raise NotImplementedError
+        outputs = self.run_inference(
+            job_id=job_id,
+            job_dir=job_dir,
+            proteins=proteins,
+            preset=preset,
+            num_recycles_override=num_recycles_override,
+            progress_cb=progress_cb,
+            msa_path=msa_path,
+        )
+        if isinstance(outputs, AlphaFoldMultimerRunResult):
+            return outputs
+        progress_cb("parse", "Parsing ColabFold outputs", 90)
+        result = postprocess_outputs(outputs)
+        progress_cb("done", "Job succeeded", 100)
+        return result
+
+
+# Tiny (not biologically meaningful) sequences so verification paths are exercised.
+_MOCK_SEQ_A = "MSEQNNTEMTFQIQRIYTKDISFEAPNAPHVFQKDW"  # 36
+_MOCK_SEQ_B = "MTPWLGLIVLLGSWSLGDWGAEAC"  # 24
+
+
+def _mock_sequence(index: int) -> str:
+    if index == 0:
+        return _MOCK_SEQ_A
+    if index == 1:
+        return _MOCK_SEQ_B
+    return (_MOCK_SEQ_A + _MOCK_SEQ_B)[: 16 + 4 * index]
 
 
 class MockAlphaFoldMultimerRunner(AlphaFoldMultimerRunner):
@@ -56,48 +464,77 @@ class MockAlphaFoldMultimerRunner(AlphaFoldMultimerRunner):
     Deterministic runner for CI/e2e. Produces small artifacts + realistic fields.
     """
 
-    def run_pair(
+    def prepare_inputs(
         self,
         *,
         job_id: str,
         job_dir: Path,
-        protein_a_ref: str,
-        protein_b_ref: str,
+        proteins: list[dict[str, Any]],
+    ) -> PreparedInputs | None:
+        # No network in mock mode: each distinct UniProt ref resolves to a fixed
+        # mock sequence, but unparseable refs are still rejected.
+        placeholders: dict[str, str] = {}
+
+        def fetch(uniprot_id: str) -> str:
+            return placeholders.setdefault(uniprot_id, _mock_sequence(len(placeholders)))
+
+        return PreparedInputs(chains=expand_chains(proteins, fetch_uniprot=fetch))
+
+    def run_inference(
+        self,
+        *,
+        job_id: str,
+        job_dir: Path,
+        proteins: list[dict[str, Any]],
         preset: str,
         num_recycles_override: int | None,
         progress_cb: ProgressCb,
-    ) -> AlphaFoldMultimerRunResult:
+        msa_path: Path | None = None,
+    ) -> RunOutputs:
+        # Writes what ColabFold would (names included), so post-processing runs for real.
         progress_cb("mock", "Generating deterministic mock result", 10)
+        work_dir = job_dir / "work"
+        out_dir = work_dir / "out"
         artifacts_dir = job_dir / "artifacts"
+        out_dir.mkdir(parents=True, exist_ok=True)
         artifacts_dir.mkdir(parents=True, exist_ok=True)
 
-        # Tiny (not biologically meaningful) sequences so verification paths are exercised.
-        seq_a = "MSEQNNTEMTFQIQRIYTKDISFEAPNAPHVFQKDW"  # 36
-        seq_b = "MTPWLGLIVLLGSWSLGDWGAEAC"  # 24
+        prepared = self.prepare_inputs(job_id=job_id, job_dir=job_dir, proteins=proteins)
+        assert prepared is not None
+        chains = prepared.chains
+        lengths = [len(c.sequence) for c in chains]
 
-        (artifacts_dir / "input.fasta").write_text(
-            f">{job_id}\n{_wrap_fasta_seq(seq_a + ':' + seq_b)}\n", encoding="utf-8"
+        input_fasta = work_dir / "input.fasta"
+        input_fasta.write_text(_complex_fasta(job_id, chains), encoding="utf-8")
+
+        # A3M header in ColabFold's format: unique lengths, tab, copy numbers.
+        unique: dict[str, list] = {}
+        for c in chains:
+            unique.setdefault(c.sha256, [len(c.sequence), 0])[1] += 1
+        header = ",".join(str(v[0]) for v in unique.values()) + "\t" + ",".join(str(v[1]) for v in unique.values())
+        (out_dir / f"{job_id}.a3m").write_text(
+            f"#{header}\n>query\n{''.join(c.sequence for c in chains)}\n", encoding="utf-8"
         )
 
-        # A3M header lengths: 36,24
-        (artifacts_dir / f"{job_id}.a3m").write_text(f"#36,24\n>query\n{seq_a}:{seq_b}\n", encoding="utf-8")
-
         # Minimal PDB with fake residues; enough to count chain residues.
         pdb_lines = []
         atom_i = 1
-        for chain, nres in [("A", 36), ("B", 24)]:
+        for i, nres in enumerate(lengths):
+            chain = chain_id(i)
             for resi in range(1, nres + 1):
                 pdb_lines.append(
-                    f"ATOM  {atom_i:5d}  CA  ALA {chain}{resi:4d}    0.000   0.000   0.000  1.00  0.00           C\n"
+                    f"ATOM  {atom_i:5d}  CA  ALA {chain}{resi:4d}    {0.0:8.3f}{0.0:8.3f}{0.0:8.3f}  1.00  0.00           C\n"
                 )
                 atom_i += 1
         pdb_lines.append("END\n")
-        (artifacts_dir / "rank_001.pdb").write_text("".join(pdb_lines), encoding="utf-8")
+        (out_dir / f"{job_id}_unrelaxed_rank_001_alphafold2_multimer_v3_model_1_seed_000.pdb").write_text(
+            "".join(pdb_lines), encoding="utf-8"
+        )
 
-        # Minimal PAE: 60x60 matrix with constant values.
-        L = 36 + 24
+        # Minimal PAE: LxL matrix with constant values.
+        L = sum(lengths)
         pae = [[10.0 for _ in range(L)] for _ in range(L)]
-        (artifacts_dir / "pae.json").write_text(
+        (out_dir / f"{job_id}_predicted_aligned_error_v1.json").write_text(
             json.dumps({"predicted_aligned_error": pae}), encoding="utf-8"
         )
 
@@ -108,42 +545,35 @@ class MockAlphaFoldMultimerRunner(AlphaFoldMultimerRunner):
             f"{_now()} rank_001_mock pLDDT=55.5 pTM=0.500 ipTM=0.250\n"
             f"{_now()} Done\n"
         )
-        (artifacts_dir / "log.txt").write_text(log_txt, encoding="utf-8")
-
-        parsed = parse_rank1_from_log(log_txt)
-        iface_mean, ab, ba = compute_interface_pae_means(
-            artifacts_dir / "pae.json", chain_a_len=36, chain_b_len=24
+        (out_dir / "log.txt").write_text(log_txt, encoding="utf-8")
+
+        progress_cb("mock", "Mock run finished", 80)
+        return RunOutputs(
+            job_id=job_id,
+            input_fasta=input_fasta,
+            out_dir=out_dir,
+            resume_dir=work_dir / "resume",
+            artifacts_dir=artifacts_dir,
+            log_path=out_dir / "log.txt",
+            resumed_msa=None,
+            models_reused=(),
+            models_computed=(1,),
         )
-        pdb_counts = count_residues_per_chain_pdb(artifacts_dir / "rank_001.pdb")
-
-        metrics = {
-            "iptm": parsed.iptm,
-            "ptm": parsed.ptm,
-            "ranking_confidence": round(parsed.ranking_confidence, 4),
-            "plddt": parsed.plddt,
-            "interface_pae_mean": iface_mean,
-            "interface_pae_mean_ab": ab,
-            "interface_pae_mean_ba": ba,
-        }
-
-        verification = {
-            "chain_a_length_a3m": 36,
-            "chain_b_length_a3m": 24,
-            "chain_a_length_pdb": pdb_counts.get("A"),
-            "chain_b_length_pdb": pdb_counts.get("B"),
-            "chain_lengths_match": (pdb_counts.get("A") == 36 and pdb_counts.get("B") == 24),
-        }
 
-        artifacts = [
-            {"name": "input.fasta", "path": str(artifacts_dir / "input.fasta"), "media_type": "text/plain"},
-            {"name": f"{job_id}.a3m", "path": str(artifacts_dir / f"{job_id}.a3m"), "media_type": "text/plain"},
-            {"name": "rank_001.pdb", "path": str(artifacts_dir / "rank_001.pdb"), "media_type": "chemical/x-pdb"},
-            {"name": "pae.json", "path": str(artifacts_dir / "pae.json"), "media_type": "application/json"},
-            {"name": "log.txt", "path": str(artifacts_dir / "log.txt"), "media_type": "text/plain"},
-        ]
 
-        progress_cb("mock", "Mock result ready", 100)
-        return AlphaFoldMultimerRunResult(metrics=metrics, verification=verification, artifacts=artifacts)
+def docker_gpus_arg(gpus: str) -> str:
+    """
+    `docker run --gpus` value for "all" or comma-separated device indices/UUIDs
+    ("1", "0,1"). A device list is quoted because docker splits the flag on
+    commas. CUDA_VISIBLE_DEVICES of the calling process does not reach the
+    container.
+    """
+    devices = [d.strip() for d in gpus.split(",") if d.strip()]
+    if not devices or devices == ["all"]:
+        return "all"
+    if len(devices) == 1:
+        return f"device={devices[0]}"
+    return f'"device={",".join(devices)}"'
 
 
 class ColabFoldDockerRunner(AlphaFoldMultimerRunner):
@@ -153,52 +583,70 @@ class ColabFoldDockerRunner(AlphaFoldMultimerRunner):
         colabfold_image: str,
         colabfold_cache_dir: Path,
         host_ptxas_path: Path | None,
+        uniprot: UniProtClient | None = None,
+        length_buckets: tuple[int, ...] = (),
+        jax_cache_dir: Path | None = None,
+        bucket_stats: LengthBucketStats | None = None,
+        gpus: str = "all",
     ) -> None:
         self._image = colabfold_image
         self._cache_dir = colabfold_cache_dir
         self._host_ptxas_path = host_ptxas_path
-
-    def run_pair(
+        self._uniprot = uniprot or UniProtClient()
+        self._length_buckets = length_buckets
+        self._jax_cache_dir = jax_cache_dir
+        self._bucket_stats = bucket_stats
+        self._gpus = gpus
+        if jax_cache_dir is not None:
+            jax_cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _fetch_sequence(self, uniprot_id: str) -> str:
+        try:
+            return self._uniprot.fetch_sequence(uniprot_id)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status is not None and 400 <= status < 500:
+                # Unknown/obsolete accession: retrying later won't help.
+                raise ValueError(f"UniProt fetch failed for {uniprot_id} (HTTP {status})") from e
+            raise
+
+    def prepare_inputs(
         self,
         *,
         job_id: str,
         job_dir: Path,
-        protein_a_ref: str,
-        protein_b_ref: str,
-        preset: str,
-        num_recycles_override: int | None,
-        progress_cb: ProgressCb,
-    ) -> AlphaFoldMultimerRunResult:
-        job_dir.mkdir(parents=True, exist_ok=True)
+        proteins: list[dict[str, Any]],
+    ) -> PreparedInputs:
         work_dir = job_dir / "work"
-        out_dir = work_dir / "out"
-        artifacts_dir = job_dir / "artifacts"
         work_dir.mkdir(parents=True, exist_ok=True)
-        artifacts_dir.mkdir(parents=True, exist_ok=True)
 
-        progress_cb("fetch", "Fetching UniProt FASTA", 1)
-        uniprot_a = extract_uniprot_id(protein_a_ref)
-        uniprot_b = extract_uniprot_id(protein_b_ref)
-        seq_a = fasta_to_sequence(fetch_fasta(uniprot_a))
-        seq_b = fasta_to_sequence(fetch_fasta(uniprot_b))
+        chains = expand_chains(proteins, fetch_uniprot=self._fetch_sequence)
 
-        progress_cb("prepare", "Writing input FASTA", 3)
+        # Write-then-rename: run_pair treats an existing input.fasta as prepared.
         input_fasta = work_dir / "input.fasta"
-        input_fasta.write_text(f">{job_id}\n{_wrap_fasta_seq(seq_a + ':' + seq_b)}\n", encoding="utf-8")
-
-        # Choose recycles
-        if num_recycles_override is not None:
-            num_recycles = int(num_recycles_override)
-        else:
-            num_recycles = 3 if preset == "fast" else 20
+        # Per-process tmp name: a prefetcher in another worker may prepare the same job.
+        tmp = work_dir / f"input.fasta.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_text(_complex_fasta(job_id, chains), encoding="utf-8")
+        os.replace(tmp, input_fasta)
+        return PreparedInputs(chains=chains, input_fasta=input_fasta)
 
-        # Build docker command
+    def _docker_command(
+        self,
+        *,
+        work_dir: Path,
+        query_name: str,
+        out_name: str,
+        cfg: ColabFoldPreset,
+        num_recycles: int,
+        padding: int,
+        model_order: list[int] | None = None,
+    ) -> list[str]:
         docker_cmd: list[str] = [
             "docker",
             "run",
             "--rm",
             "--gpus",
-            "all",
+            docker_gpus_arg(self._gpus),
             "--shm-size=16g",
             "-v",
             f"{work_dir}:/work",
@@ -212,6 +660,18 @@ class ColabFoldDockerRunner(AlphaFoldMultimerRunner):
         if self._host_ptxas_path and self._host_ptxas_path.exists() and os.access(self._host_ptxas_path, os.X_OK):
             docker_cmd += ["-v", f"{self._host_ptxas_path}:/usr/local/cuda/bin/ptxas:ro"]
 
+        # Every job gets a fresh container, so compiled XLA executables only
+        # survive via JAX's persistent cache on a host volume.
+        if self._jax_cache_dir is not None:
+            docker_cmd += [
+                "-v",
+                f"{self._jax_cache_dir}:/cache/jax",
+                "-e",
+                "JAX_COMPILATION_CACHE_DIR=/cache/jax",
+                "-e",
+                "JAX_PERSISTENT_CACHE_MIN_COMPILE_TIME_SECS=0",
+            ]
+
         docker_cmd += [
             self._image,
             "colabfold_batch",
@@ -221,130 +681,134 @@ class ColabFoldDockerRunner(AlphaFoldMultimerRunner):
             "multimer",
             "--num-recycle",
             str(num_recycles),
-            str(input_fasta.name),
-            str(out_dir.name),
         ]
+        if model_order is not None:
+            # Resumed run: only the models an earlier attempt did not finish.
+            docker_cmd += ["--num-models", str(len(model_order)), "--model-order", ",".join(map(str, model_order))]
+        elif cfg.num_models is not None:
+            docker_cmd += ["--num-models", str(cfg.num_models)]
+        if cfg.recycle_early_stop_tolerance is not None:
+            docker_cmd += ["--recycle-early-stop-tolerance", str(cfg.recycle_early_stop_tolerance)]
+        if padding > 0:
+            # Pad up to the bucket edge so every job in a bucket shares one compiled shape.
+            docker_cmd += ["--recompile-padding", str(padding)]
+        docker_cmd += [query_name, out_name]
+        return docker_cmd
+
+    def run_inference(
+        self,
+        *,
+        job_id: str,
+        job_dir: Path,
+        proteins: list[dict[str, Any]],
+        preset: str,
+        num_recycles_override: int | None,
+        progress_cb: ProgressCb,
+        msa_path: Path | None = None,
+    ) -> RunOutputs:
+        job_dir.mkdir(parents=True, exist_ok=True)
+        work_dir = job_dir / "work"
+        out_dir = work_dir / "out"
+        resume_dir = work_dir / "resume"
+        artifacts_dir = job_dir / "artifacts"
+        work_dir.mkdir(parents=True, exist_ok=True)
+        artifacts_dir.mkdir(parents=True, exist_ok=True)
 
-        progress_cb("run", f"Running ColabFold (recycles={num_recycles})", 5)
-        out_dir.mkdir(parents=True, exist_ok=True)
-
-        # Stream docker output to a log for monitoring.
-        docker_log = artifacts_dir / "docker.log.txt"
-        with docker_log.open("w", encoding="utf-8") as lf:
-            proc = subprocess.Popen(
-                docker_cmd,
-                cwd=str(work_dir),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-            )
-            assert proc.stdout is not None
-            last_line = ""
-            for line in proc.stdout:
-                lf.write(line)
-                lf.flush()
-                last_line = line.strip()
-                if last_line:
-                    progress_cb("run", last_line, None)
-            rc = proc.wait()
-        if rc != 0:
-            raise RuntimeError(f"ColabFold docker run failed (exit={rc}). See artifacts/docker.log.txt")
-
-        progress_cb("parse", "Parsing ColabFold outputs", 90)
-
-        # Discover key outputs. ColabFold prefixes files with the FASTA header (job_id).
-        log_path = out_dir / "log.txt"
-        if not log_path.exists():
-            # Sometimes log sits in work_dir
-            alt = work_dir / "log.txt"
-            if alt.exists():
-                log_path = alt
-        log_text = log_path.read_text(encoding="utf-8", errors="replace")
-        parsed = parse_rank1_from_log(log_text)
-
-        # Copy stable artifacts into artifacts/
-        (artifacts_dir / "input.fasta").write_text(input_fasta.read_text(encoding="utf-8"), encoding="utf-8")
-        (artifacts_dir / "log.txt").write_text(log_text, encoding="utf-8")
-
-        # Locate rank_001 PDB and PAE JSON.
-        pdb_candidates = sorted(out_dir.glob("*_unrelaxed_rank_001_*.pdb"))
-        pae_candidates = sorted(out_dir.glob("*_predicted_aligned_error_v1.json"))
-        a3m_candidates = sorted(out_dir.glob("*.a3m"))
-        score_json_candidates = sorted(out_dir.glob("*_scores_rank_001_*.json"))
-
-        pdb_path = pdb_candidates[0] if pdb_candidates else None
-        pae_path = pae_candidates[0] if pae_candidates else None
-        a3m_path = a3m_candidates[0] if a3m_candidates else None
-
-        # verification / interface metrics are best-effort
-        chain_a_len_a3m = chain_b_len_a3m = None
-        chain_a_len_pdb = chain_b_len_pdb = None
-        chain_lengths_match = False
-        iface_mean = iface_ab = iface_ba = None
-
-        if a3m_path is not None:
-            try:
-                chain_a_len_a3m, chain_b_len_a3m = parse_a3m_chain_lengths(a3m_path)
-                shutil.copy2(a3m_path, artifacts_dir / a3m_path.name)
-            except Exception:
-                pass
-
-        if pdb_path is not None:
-            pdb_counts = count_residues_per_chain_pdb(pdb_path)
-            chain_a_len_pdb = pdb_counts.get("A")
-            chain_b_len_pdb = pdb_counts.get("B")
-            shutil.copy2(pdb_path, artifacts_dir / "rank_001.pdb")
-
-        if chain_a_len_a3m and chain_b_len_a3m and chain_a_len_pdb and chain_b_len_pdb:
-            chain_lengths_match = (chain_a_len_a3m == chain_a_len_pdb) and (chain_b_len_a3m == chain_b_len_pdb)
-
-        if pae_path is not None and chain_a_len_a3m and chain_b_len_a3m:
-            iface_mean, iface_ab, iface_ba = compute_interface_pae_means(
-                pae_path, chain_a_len=chain_a_len_a3m, chain_b_len=chain_b_len_a3m
-            )
-            shutil.copy2(pae_path, artifacts_dir / "pae.json")
-
-        if score_json_candidates:
-            shutil.copy2(score_json_candidates[0], artifacts_dir / "scores_rank_001.json")
-
-        metrics = {
-            "iptm": parsed.iptm,
-            "ptm": parsed.ptm,
-            "ranking_confidence": round(parsed.ranking_confidence, 4),
-            "plddt": parsed.plddt,
-            "interface_pae_mean": iface_mean,
-            "interface_pae_mean_ab": iface_ab,
-            "interface_pae_mean_ba": iface_ba,
-        }
-        verification = {
-            "chain_lengths_match": bool(chain_lengths_match),
-            "chain_a_length_a3m": chain_a_len_a3m,
-            "chain_b_length_a3m": chain_b_len_a3m,
-            "chain_a_length_pdb": chain_a_len_pdb,
-            "chain_b_length_pdb": chain_b_len_pdb,
-        }
+        input_fasta = work_dir / "input.fasta"
+        if not input_fasta.exists():
+            # Not prefetched (queue was empty or prefetch disabled): prepare inline.
+            progress_cb("fetch", "Resolving input sequences", 1)
+            self.prepare_inputs(job_id=job_id, job_dir=job_dir, proteins=proteins)
 
-        artifacts: list[dict] = []
-        for path in sorted(artifacts_dir.iterdir()):
-            if not path.is_file():
-                continue
-            media_type = None
-            if path.name.endswith(".pdb"):
-                media_type = "chemical/x-pdb"
-            elif path.name.endswith(".json"):
-                media_type = "application/json"
-            else:
-                media_type = "text/plain"
-            artifacts.append(
-                {
-                    "name": path.name,
-                    "path": str(path),
-                    "media_type": media_type,
-                    "size_bytes": path.stat().st_size,
-                }
+        # Choose recycles
+        cfg = COLABFOLD_PRESETS.get(preset, COLABFOLD_PRESETS["full"])
+        if num_recycles_override is not None:
+            num_recycles = int(num_recycles_override)
+        else:
+            num_recycles = cfg.num_recycles
+
+        # An earlier attempt (restart, preemption) may have left an MSA and
+        # finished models behind: keep those, compute only the rest.
+        resumed_msa = _stash_previous_attempt(job_id=job_id, out_dir=out_dir, resume_dir=resume_dir)
+        reused = find_finished_models(resume_dir)
+        num_models = cfg.num_models or _COLABFOLD_NUM_MODELS
+        missing = [m for m in range(1, num_models + 1) if m not in reused]
+        if msa_path is None and resumed_msa is not None:
+            msa_path = resumed_msa
+
+        query = input_fasta
+        if msa_path is not None and msa_path.exists():
+            # An a3m input makes colabfold_batch skip the MSA server entirely.
+            query = work_dir / "input.a3m"
+            link_or_copy(msa_path, query)
+
+        total_length = _fasta_total_length(input_fasta)
+        bucket = bucket_for_length(total_length, self._length_buckets) if self._length_buckets else None
+        padding = bucket - total_length if bucket is not None else 0
+
+        log_path: Path | None = None
+        if missing:
+            if self._bucket_stats is not None and self._length_buckets:
+                self._bucket_stats.record(total_length=total_length, bucket=bucket)
+            docker_cmd = self._docker_command(
+                work_dir=work_dir,
+                query_name=query.name,
+                out_name=out_dir.name,
+                cfg=cfg,
+                num_recycles=num_recycles,
+                padding=padding,
+                model_order=missing if reused else None,
             )
-
-        progress_cb("done", "Job succeeded", 100)
-        return AlphaFoldMultimerRunResult(metrics=metrics, verification=verification, artifacts=artifacts)
-
+            msg = f"Running ColabFold (recycles={num_recycles})"
+            if reused:
+                msg += f"; reusing models {sorted(reused)}, computing {missing}"
+            progress_cb("container", msg, 5)
+            out_dir.mkdir(parents=True, exist_ok=True)
+
+            # Stream docker output to a log for monitoring (see `logs`: buffered, tailed via the API).
+            with LogWriter(artifacts_dir / DOCKER_LOG) as lf:
+                proc = subprocess.Popen(
+                    docker_cmd,
+                    cwd=str(work_dir),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    bufsize=1,
+                )
+                assert proc.stdout is not None
+                last_line = ""
+                phase = "container"
+                percents = {name: percent for name, _, percent in COLABFOLD_PHASES}
+                for line in proc.stdout:
+                    lf.write(line.encode("utf-8"))
+                    last_line = line.strip()
+                    if last_line:
+                        prev, phase = phase, colabfold_phase(last_line, phase)
+                        progress_cb(phase, last_line, percents[phase] if phase != prev else None)
+                rc = proc.wait()
+            if rc != 0:
+                raise RuntimeError(f"ColabFold docker run failed (exit={rc}). See artifacts/docker.log.txt")
+
+            # Discover key outputs. ColabFold prefixes files with the FASTA header (job_id).
+            log_path = out_dir / "log.txt"
+            if not log_path.exists():
+                # Sometimes log sits in work_dir
+                alt = work_dir / "log.txt"
+                if alt.exists():
+                    log_path = alt
+        else:
+            progress_cb("run", f"All {num_models} models finished in an earlier attempt; skipping ColabFold", 5)
+            out_dir.mkdir(parents=True, exist_ok=True)
+
+        return RunOutputs(
+            job_id=job_id,
+            input_fasta=input_fasta,
+            out_dir=out_dir,
+            resume_dir=resume_dir,
+            artifacts_dir=artifacts_dir,
+            log_path=log_path,
+            resumed_msa=resumed_msa,
+            models_reused=tuple(sorted(reused)),
+            models_computed=tuple(missing),
+            padded_length=bucket,
+        )
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+from array import array
+from functools import cached_property
+import math
+import mmap
+from pathlib import Path
+import re
+from typing import Callable, Sequence
+
+
+# Fixed PDB columns (0-based, end exclusive).
+_PDB_COLUMNS: dict[str, tuple[int, int]] = {
+    "chain": (21, 22),
+    "resseq": (22, 26),
+    "icode": (26, 27),
+    "x": (30, 38),
+    "y": (38, 46),
+    "z": (46, 54),
+    "b_factor": (60, 66),
+}
+# Consecutive ATOM/HETATM records, i.e. one chain up to its TER line.
+_PDB_RUN_RE = re.compile(rb"(?:^(?:ATOM  |HETATM)[^\n]*\n)+", re.MULTILINE)
+# Fallback for records of uneven width. Everything after resSeq may be cut short (some
+# writers stop after the coordinates); the bounded greedy groups then come back empty
+# instead of the record being skipped.
+_PDB_ATOM_RE = re.compile(
+    rb"^(?:ATOM  |HETATM).{15}(.)(.{4})(.?).{0,3}(.{0,8})(.{0,8})(.{0,8}).{0,6}(.{0,6})", re.MULTILINE
+)
+
+_CIF_LOOP_RE = re.compile(rb"^loop_[ \t]*\r?\n((?:_atom_site\.\S+[ \t]*\r?\n)+)", re.MULTILINE)
+# First line after the loop rows: a new category, loop, comment or data block.
+_CIF_LOOP_END_RE = re.compile(rb"^(?:#|loop_|_|data_)", re.MULTILINE)
+# A quoted token ends at a quote followed by whitespace (`"O5'"` is one token).
+_CIF_TOKEN_RE = re.compile(rb"'(?:[^']|'(?=\S))*'|\"(?:[^\"]|\"(?=\S))*\"|\S+")
+_CIF_NULLS = (b"?", b".")
+
+RawColumn = Sequence[bytes]
+
+
+class AtomSite:
+    """
+    Per-atom columns of a structure model, in file order. `chain[i]` indexes
+    `chain_ids`; `icode` holds one byte per atom (b" " when blank).
+
+    Columns are kept as raw field bytes and converted to arrays on first
+    access, so `residue_counts` never pays for the coordinates. Missing or
+    unparseable coordinates and B-factors are NaN.
+    """
+
+    def __init__(self, n_atoms: int, columns: dict[str, Callable[[], RawColumn]]) -> None:
+        self._n_atoms = n_atoms
+        self._columns = columns
+        self._raw_columns: dict[str, RawColumn] = {}
+
+    def __len__(self) -> int:
+        return self._n_atoms
+
+    def _raw(self, name: str) -> RawColumn:
+        raw = self._raw_columns.get(name)
+        if raw is None:
+            raw = self._raw_columns[name] = self._columns[name]()
+        return raw
+
+    @cached_property
+    def _chain_index(self) -> tuple[tuple[str, ...], array]:
+        chains = self._raw("chain")
+        index = {c: i for i, c in enumerate(dict.fromkeys(chains))}
+        ids = tuple(c.decode("ascii", errors="replace") for c in index)
+        return ids, array("H", map(index.__getitem__, chains))
+
+    @property
+    def chain_ids(self) -> tuple[str, ...]:
+        return self._chain_index[0]
+
+    @property
+    def chain(self) -> array:
+        return self._chain_index[1]
+
+    @cached_property
+    def resseq(self) -> array:
+        return _ints(self._raw("resseq"))
+
+    @cached_property
+    def icode(self) -> bytes:
+        icodes = self._raw("icode")
+        joined = b"".join(icodes)
+        if len(joined) == self._n_atoms and b"?" not in joined and b"." not in joined:
+            return joined
+        return b"".join(b" " if not i or i in _CIF_NULLS else i[:1] for i in icodes)
+
+    @cached_property
+    def x(self) -> array:
+        return _floats(self._raw("x"))
+
+    @cached_property
+    def y(self) -> array:
+        return _floats(self._raw("y"))
+
+    @cached_property
+    def z(self) -> array:
+        return _floats(self._raw("z"))
+
+    @cached_property
+    def b_factor(self) -> array:
+        return _floats(self._raw("b_factor"))
+
+    def residue_counts(self) -> dict[str, int]:
+        """Distinct (resseq, icode) per chain, HETATM residues included."""
+        chains = self._raw("chain")
+        counts = dict.fromkeys(chains, 0)  # file order of chains
+        # Raw resSeq fields compare like parsed ones within a file: fixed-width columns or bare tokens.
+        for chain, _resseq, _icode in set(zip(chains, self._raw("resseq"), self.icode)):
+            counts[chain] += 1
+        return {c.decode("ascii", errors="replace"): n for c, n in counts.items()}
+
+
+def _resseq(field: bytes) -> int:
+    s = field.strip().decode("ascii", errors="replace")
+    if not s:
+        return 0
+    try:
+        return int(s)
+    except ValueError:
+        pass
+    try:
+        # PDB writers switch to hybrid-36 ("A000" = 10000) once resSeq outgrows four digits.
+        if s[0].isupper():
+            return int(s, 36) - 10 * 36**3 + 10**4
+        return int(s, 36) + 16 * 36**3 + 10**4
+    except ValueError:
+        # Garbage: a negative code unique to the raw field keeps residues apart.
+        return -1 - int.from_bytes(field.strip()[:3], "big")
+
+
+def _ints(fields: RawColumn) -> array:
+    try:
+        return array("i", map(int, fields))
+    except ValueError:
+        return array("i", map(_resseq, fields))
+
+
+def _float(field: bytes) -> float:
+    try:
+        return float(field)
+    except ValueError:
+        return math.nan
+
+
+def _floats(fields: RawColumn) -> array:
+    try:
+        return array("f", map(float, fields))
+    except ValueError:
+        return array("f", map(_float, fields))
+
+
+def _strided_column(block: bytes, width: int, start: int, end: int) -> list[bytes]:
+    # One strided copy per byte offset gathers the field of every record, separated by
+    # newlines for a single split: no Python-level loop over atoms.
+    n = len(block) // width
+    w = end - start + 1
+    out = bytearray(b"\n") * (w * n)
+    for k in range(start, end):
+        out[k - start :: w] = block[k::width]
+    return bytes(out).split(b"\n")[:n]
+
+
+def _uniform_block(buf: bytes | mmap.mmap) -> tuple[bytes, int] | None:
+    # ATOM/HETATM records that all have the same width (how model writers emit them) and
+    # reach the B-factor column, joined across TER lines.
+    runs = [m.group() for m in _PDB_RUN_RE.finditer(buf)]
+    if not runs:
+        return None
+    block = b"".join(runs)
+    width = runs[0].index(b"\n") + 1
+    n = len(block) // width
+    if width <= _PDB_COLUMNS["b_factor"][1] or n * width != len(block) or block[width - 1 :: width] != b"\n" * n:
+        return None
+    return block, width
+
+
+def _no_atoms() -> AtomSite:
+    return AtomSite(0, {name: list for name in _PDB_COLUMNS})
+
+
+def scan_pdb(buf: bytes | mmap.mmap) -> AtomSite:
+    """ATOM/HETATM records of a PDB file, read by fixed column without decoding lines."""
+    uniform = _uniform_block(buf)
+    if uniform is not None:
+        block, width = uniform
+        return AtomSite(
+            len(block) // width,
+            {name: (lambda s=s, e=e: _strided_column(block, width, s, e)) for name, (s, e) in _PDB_COLUMNS.items()},
+        )
+    rows = _PDB_ATOM_RE.findall(buf)
+    if not rows:
+        return _no_atoms()
+    return AtomSite(len(rows), {name: (lambda c=c: c) for name, c in zip(_PDB_COLUMNS, zip(*rows))})
+
+
+def scan_mmcif(buf: bytes | mmap.mmap) -> AtomSite:
+    """
+    The first `_atom_site` loop of an mmCIF file. Chains and residue numbers
+    are the author ones (`auth_asym_id`, `auth_seq_id`) so they match the PDB
+    form of the same model.
+    """
+    m = _CIF_LOOP_RE.search(buf)
+    if m is None:
+        return _no_atoms()
+    names = [line.strip()[len(b"_atom_site.") :].decode("ascii") for line in m.group(1).splitlines()]
+    end = _CIF_LOOP_END_RE.search(buf, m.end())
+    body = buf[m.end() : end.start() if end else len(buf)]
+    if b"'" in body or b'"' in body:
+        tokens = [t[1:-1] if t[:1] in (b"'", b'"') else t for t in _CIF_TOKEN_RE.findall(body)]
+    else:
+        tokens = body.split()
+    ncols = len(names)
+    if len(tokens) % ncols:
+        raise ValueError(f"_atom_site loop has {len(tokens)} values for {ncols} columns")
+    n_atoms = len(tokens) // ncols
+
+    def column(*candidates: str) -> Callable[[], RawColumn] | None:
+        for name in candidates:
+            if name in names:
+                return lambda i=names.index(name): tokens[i::ncols]
+        return None
+
+    columns = {
+        "chain": column("auth_asym_id", "label_asym_id"),
+        "resseq": column("auth_seq_id", "label_seq_id"),
+        "icode": column("pdbx_PDB_ins_code") or (lambda: [b" "] * n_atoms),
+        "x": column("Cartn_x"),
+        "y": column("Cartn_y"),
+        "z": column("Cartn_z"),
+        "b_factor": column("B_iso_or_equiv") or (lambda: [b"?"] * n_atoms),
+    }
+    missing = [name for name, col in columns.items() if col is None]
+    if missing:
+        raise ValueError(f"_atom_site loop lacks {', '.join(missing)}")
+    return AtomSite(n_atoms, columns)  # type: ignore[arg-type]
+
+
+def read_structure(path: Path) -> AtomSite:
+    """
+    Memory-maps a PDB or mmCIF file (by suffix, else sniffed from a leading
+    `data_`) and returns its atoms as array-backed columns.
+    """
+    with path.open("rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return _no_atoms()  # empty file: nothing to map
+        with buf:
+            is_cif = path.suffix.lower() in {".cif", ".mmcif"} or buf[:64].lstrip().startswith(b"data_")
+            return scan_mmcif(buf) if is_cif else scan_pdb(buf)
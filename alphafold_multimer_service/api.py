@@ -1,39 +1,157 @@
 from __future__ import annotations
 
+from dataclasses import asdict
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import gzip
+import mimetypes
 import re
+import time
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Callable, Iterator
 
 from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel
 
 from alphafold_multimer_service import __version__
-from alphafold_multimer_service.alphafold_multimer.runner import ColabFoldDockerRunner, MockAlphaFoldMultimerRunner
+from alphafold_multimer_service.artifacts import ArtifactStore
+from alphafold_multimer_service.bundles import BUNDLE_FORMATS, artifact_selector, iter_archive, job_bundle_entries
+from alphafold_multimer_service.alphafold_multimer.buckets import LengthBucketStats
 from alphafold_multimer_service.config import Settings, load_settings
-from alphafold_multimer_service.jobs import JobManager, JobStore
+from alphafold_multimer_service.export import (
+    EXPORT_MEDIA_TYPES,
+    ExportFilter,
+    as_utc,
+    iter_csv,
+    iter_export_rows,
+    iter_ndjson,
+    iter_parquet,
+    parquet_available,
+)
+from alphafold_multimer_service.jobs import JobRecord, JobStore, request_proteins
+from alphafold_multimer_service.logs import DOCKER_LOG, live_buffer, read_log
+from alphafold_multimer_service.metrics import ARTIFACT_BYTES, CONTENT_TYPE, QUEUE_JOBS, REGISTRY, SnapshotExporter
+from alphafold_multimer_service.partners import PartnerIndex, protein_key
+from alphafold_multimer_service.response_cache import CachedResponse, ResponseCache, file_stamp, json_bytes
+from alphafold_multimer_service.retention import RetentionManager, RetentionPolicy
 from alphafold_multimer_service.schemas import (
     AlphaFoldMultimerJobCreateRequest,
     AlphaFoldMultimerResultResponse,
+    BundleFormat,
     ErrorResponse,
+    ExportFormat,
     HealthResponse,
     JobCreateResponse,
     JobListItem,
     JobListResponse,
+    JobStatus,
     JobStatusResponse,
+    LengthBucketStatsResponse,
+    PartnerListResponse,
+    PartnerMetric,
+    QueueStatsResponse,
+    RetentionStatsResponse,
     ServiceInfo,
     ServiceListResponse,
 )
-from alphafold_multimer_service.uniprot import extract_uniprot_id
+from alphafold_multimer_service.sequences import normalize_protein_ref
+from alphafold_multimer_service.trace import chrome_trace
+from alphafold_multimer_service.webhooks import WebhookDispatcher, blocked_reason
+from alphafold_multimer_service.work_queue import default_worker_id
+from alphafold_multimer_service.worker import build_manager, build_outbox
 
 
 def _utc_now() -> datetime:
     return datetime.now(tz=timezone.utc)
 
 
+def _negotiate_encoding(accept_encoding: str | None, available: list[str], *, prefer_identity: bool) -> str | None:
+    """
+    Picks a stored content encoding for `Accept-Encoding` (None = identity).
+    Among equally weighted codings zstd wins over gzip over identity.
+    """
+    if not accept_encoding or prefer_identity:
+        return None
+    q: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            q[coding.strip().lower()] = weight
+    best: str | None = None
+    best_q = q.get("identity", q.get("*", 1.0))
+    for coding in ("gzip", "zstd"):
+        weight = q.get(coding, q.get("*", 0.0))
+        if coding in available and weight > 0 and weight >= best_q:
+            best, best_q = coding, weight
+    return best
+
+
+def _artifact_etag(sha256: str, encoding: str | None) -> str:
+    # Each representation needs its own strong validator.
+    return f'"{sha256}"' if encoding is None else f'"{sha256}-{encoding}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _not_modified(request: Request, cached: CachedResponse) -> bool:
+    # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2).
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, cached.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return cached.stamp[0] // 1_000_000_000 <= since
+
+
+def _iter_gunzip(path: Path, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    with gzip.open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            ARTIFACT_BYTES.inc(len(chunk), encoding="identity")
+            yield chunk
+
+
+_SINGLE_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _count_served(path: Path, encoding: str | None, range_header: str | None) -> None:
+    """Counts the bytes a FileResponse for `path` is about to send (a single range, else the whole file)."""
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return
+    m = _SINGLE_RANGE_RE.match(range_header.strip()) if range_header else None
+    if m and (m.group(1) or m.group(2)):
+        if not m.group(1):
+            size = min(int(m.group(2)), size)  # suffix range: the last N bytes
+        else:
+            start = int(m.group(1))
+            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            size = max(end - start + 1, 0)
+    ARTIFACT_BYTES.inc(size, encoding=encoding or "identity")
+
+
 def _build_cors(app: FastAPI, settings: Settings) -> None:
     allow_origins: list[str] = []
     regex_parts: list[str] = []
@@ -96,25 +214,69 @@ def create_app(settings: Settings | None = None) -> FastAPI:
     def _validation_exception_handler(_req: Request, exc: RequestValidationError) -> JSONResponse:
         return JSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            content={"error": "Validation error", "details": {"errors": exc.errors()}},
+            # jsonable_encoder: model validators put the raised exception into `ctx`.
+            content={"error": "Validation error", "details": {"errors": jsonable_encoder(exc.errors())}},
         )
 
-    store = JobStore(settings.data_dir)
-    if settings.mock_mode:
-        runner = MockAlphaFoldMultimerRunner()
-    else:
-        runner = ColabFoldDockerRunner(
-            colabfold_image=settings.colabfold_image,
-            colabfold_cache_dir=settings.colabfold_cache_dir,
-            host_ptxas_path=settings.host_ptxas_path,
-        )
-    manager = JobManager(store=store, runner=runner)
+    store = JobStore(settings.data_dir, cache_entries=settings.record_cache_entries, layout=settings.job_layout)
+    artifact_store = ArtifactStore(settings.data_dir)
+    retention = RetentionManager(
+        store=store,
+        artifacts=artifact_store,
+        policy=RetentionPolicy(
+            disk_budget_bytes=int(settings.disk_budget_gb * 1024**3) if settings.disk_budget_gb is not None else None,
+            max_age_s=settings.retention_max_age_days * 86400 if settings.retention_max_age_days is not None else None,
+            compress_after_s=settings.compress_after_days * 86400 if settings.compress_after_days is not None else None,
+            prune_work=settings.prune_work,
+            io_bytes_per_s=settings.retention_io_mb_per_s * 1024**2 if settings.retention_io_mb_per_s else None,
+            interval_s=settings.retention_interval_s,
+        ),
+        report_path=settings.data_dir / "retention.json",
+    )
+    bucket_stats = LengthBucketStats(settings.data_dir / "length_buckets.json")
+    partner_index = PartnerIndex(settings.data_dir / "partner_index.jsonl")
+    response_cache = ResponseCache(max_entries=settings.response_cache_entries)
+    webhooks = build_outbox(settings)
+    manager = build_manager(
+        settings,
+        store=store,
+        artifact_store=artifact_store,
+        partner_index=partner_index,
+        bucket_stats=bucket_stats,
+        webhooks=webhooks,
+        retention=retention,
+    )
+    # Delivers the events of every process sharing the data dir (workers only write the outbox).
+    webhook_dispatcher = WebhookDispatcher(
+        webhooks,
+        secret=settings.webhook_secret,
+        batch_s=settings.webhook_batch_s,
+        concurrency=settings.webhook_concurrency,
+        max_attempts=settings.webhook_max_attempts,
+        allow_networks=settings.webhook_allow_networks,
+    )
     app.state.settings = settings
     app.state.jobs = manager
+    metrics_exporter = SnapshotExporter(
+        settings.data_dir / "metrics", f"api-{default_worker_id()}", interval_s=settings.metrics_snapshot_s
+    )
+
+    def _collect_queue() -> None:
+        q = manager.queue.stats()
+        QUEUE_JOBS.replace({("queued",): q["queued"], ("leased",): len(q["leased"])})
 
     @app.on_event("startup")
     def _startup() -> None:
-        manager.start()
+        partner_index.load(store)
+        manager.start(worker=settings.embedded_worker)
+        retention.start()
+        REGISTRY.add_collector(_collect_queue)
+        metrics_exporter.start()
+        webhook_dispatcher.start()
+
+    @app.on_event("shutdown")
+    def _shutdown() -> None:
+        REGISTRY.remove_collector(_collect_queue)
 
     @app.get("/api/v1/health", response_model=HealthResponse)
     def health() -> HealthResponse:
@@ -145,20 +307,22 @@ def create_app(settings: Settings | None = None) -> FastAPI:
         req: AlphaFoldMultimerJobCreateRequest,
         _auth: None = Depends(lambda authorization=Header(default=None): _require_bearer_if_configured(settings, authorization)),
     ) -> JobCreateResponse:
-        # FastAPI handles schema validation; we add a small guard for obviously-wrong refs.
-        protein_a = req.protein_a.uniprot.strip()
-        protein_b = req.protein_b.uniprot.strip()
+        # FastAPI handles schema validation; we add a small guard for obviously-wrong refs
+        # and canonicalize raw sequences/FASTA up front.
         try:
-            extract_uniprot_id(protein_a)
-            extract_uniprot_id(protein_b)
+            proteins = [normalize_protein_ref(p.model_dump()) for p in req.protein_refs()]
         except ValueError as e:
             raise HTTPException(status_code=422, detail=str(e))
+        blocked = blocked_reason(req.callback_url, settings.webhook_allow_networks) if req.callback_url else None
+        if blocked is not None:
+            raise HTTPException(status_code=422, detail=f"callback_url not allowed: {blocked}")
 
         rec = manager.submit_alphafold_multimer(
-            protein_a_ref=protein_a,
-            protein_b_ref=protein_b,
+            proteins=proteins,
             preset=req.preset or settings.default_preset,
             options=(req.options.model_dump() if req.options else None),
+            screen=req.screen,
+            callback={"url": req.callback_url, "batch": req.callback_batch} if req.callback_url else None,
         )
         return JobCreateResponse(
             job_id=rec.job_id,
@@ -179,8 +343,9 @@ def create_app(settings: Settings | None = None) -> FastAPI:
         items: list[JobListItem] = []
         for rec in rows:
             req = rec.request or {}
-            protein_a = (req.get("protein_a") or {}).get("uniprot")
-            protein_b = (req.get("protein_b") or {}).get("uniprot")
+            proteins = request_proteins(req)
+            protein_a = proteins[0].get("uniprot") if len(proteins) > 0 else None
+            protein_b = proteins[1].get("uniprot") if len(proteins) > 1 else None
             preset = req.get("preset")
 
             primary_score_value: float | None = None
@@ -212,58 +377,320 @@ def create_app(settings: Settings | None = None) -> FastAPI:
 
         return JobListResponse(total=store.count(), limit=limit, offset=offset, jobs=items)
 
+    def _cached_json(request: Request, job_id: str, kind: str, source: str, build: Callable[[], BaseModel]) -> Response:
+        """
+        Serves a finished job's response from pre-serialized bytes, rendering
+        (validation + encoding) only when `source` in the job dir changed.
+        """
+        job_dir = store.job_dir(job_id)
+        stamp = file_stamp(job_dir / source)
+        if stamp is None:  # or the job just moved into its shard (migrate_layout)
+            job_dir = store.job_dir(job_id)
+            stamp = file_stamp(job_dir / source)
+        if stamp is None:
+            raise HTTPException(status_code=409, detail="Result not ready")
+        cached = response_cache.get(job_dir, kind, stamp)
+        if cached is None:
+            cached = response_cache.put(job_dir, kind, stamp, json_bytes(build().model_dump(mode="json")))
+        # Finished jobs still change rarely (retention evicts artifacts): revalidate, cheaply.
+        headers = {"ETag": cached.etag, "Last-Modified": cached.last_modified, "Cache-Control": "no-cache"}
+        if _not_modified(request, cached):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
+
     @app.get(
         "/api/v1/jobs/{job_id}",
         response_model=JobStatusResponse,
         responses={404: {"model": ErrorResponse}},
     )
-    def get_job(job_id: str) -> JobStatusResponse:
+    def get_job(job_id: str, request: Request) -> Response:
         rec = store.get(job_id)
         if rec is None:
             raise HTTPException(status_code=404, detail="Job not found")
-        prog = rec.progress or {"stage": "unknown", "message": ""}
-        return JobStatusResponse(
-            job_id=rec.job_id,
-            service=rec.service,
-            status=rec.status,  # type: ignore[arg-type]
-            created_at=rec.created_at,
-            started_at=rec.started_at,
-            finished_at=rec.finished_at,
-            progress=prog,  # type: ignore[arg-type]
-            error=rec.error,
-        )
+
+        def render(rec: JobRecord) -> JobStatusResponse:
+            prog = rec.progress or {"stage": "unknown", "message": ""}
+            return JobStatusResponse(
+                job_id=rec.job_id,
+                service=rec.service,
+                status=rec.status,  # type: ignore[arg-type]
+                created_at=rec.created_at,
+                started_at=rec.started_at,
+                finished_at=rec.finished_at,
+                progress=prog,  # type: ignore[arg-type]
+                error=rec.error,
+            )
+
+        def build() -> JobStatusResponse:
+            # Reread: `_cached_json` took the job.json stamp after `rec` was read above.
+            current = store.get(job_id)
+            if current is None:
+                raise HTTPException(status_code=404, detail="Job not found")
+            return render(current)
+
+        if rec.status not in {"succeeded", "failed"}:
+            return render(rec)
+        return _cached_json(request, job_id, "status", "job.json", build)
 
     @app.get(
         "/api/v1/jobs/{job_id}/result",
         response_model=AlphaFoldMultimerResultResponse,
         responses={404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}},
     )
-    def get_result(job_id: str) -> AlphaFoldMultimerResultResponse:
+    def get_result(job_id: str, request: Request) -> Response:
         rec = store.get(job_id)
         if rec is None:
             raise HTTPException(status_code=404, detail="Job not found")
         if rec.status != "succeeded":
             raise HTTPException(status_code=409, detail=f"Job not finished (status={rec.status})")
-        obj = store.read_result(job_id)
-        if obj is None:
-            raise HTTPException(status_code=409, detail="Result not ready")
-        return AlphaFoldMultimerResultResponse.model_validate(obj)
+
+        def build() -> AlphaFoldMultimerResultResponse:
+            obj = store.read_result(job_id)
+            if obj is None:
+                raise HTTPException(status_code=409, detail="Result not ready")
+            return AlphaFoldMultimerResultResponse.model_validate(obj)
+
+        return _cached_json(request, job_id, "result", "result.json", build)
+
+    def _log_source(job_id: str) -> tuple[Path, str | None]:
+        live = store.job_dir(job_id) / "artifacts" / DOCKER_LOG
+        if live_buffer(live) is not None or live.is_file():
+            return live, None
+        # Evicted from the job dir, or compacted by retention: the blob store has it.
+        return artifact_store.locate(job_id, DOCKER_LOG) or (live, None)
+
+    @app.get("/api/v1/jobs/{job_id}/logs", responses={404: {"model": ErrorResponse}})
+    def get_job_logs(
+        job_id: str,
+        offset: int = Query(default=0, ge=0, description="Byte offset to resume from"),
+        follow: bool = Query(default=False, description="Keep streaming until the job finishes"),
+        limit: int = Query(default=1 << 20, ge=1, le=16 << 20, description="Most bytes returned without follow"),
+    ) -> Response:
+        rec = store.get(job_id)
+        if rec is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        headers = {"Cache-Control": "no-store"}
+        if not follow:
+            path, encoding = _log_source(job_id)
+            start, data = read_log(path, offset, limit, encoding=encoding)
+            done = rec.status in {"succeeded", "failed"} and len(data) < limit
+            headers.update(
+                {
+                    "X-Log-Offset": str(start),
+                    "X-Log-Next-Offset": str(start + len(data)),
+                    "X-Log-Complete": "true" if done else "false",
+                }
+            )
+            return Response(content=data, media_type="text/plain; charset=utf-8", headers=headers)
+
+        # Where the stream starts: `offset`, or 0 if the log was started over since.
+        path, encoding = _log_source(job_id)
+        first, _ = read_log(path, offset, 0, encoding=encoding)
+        headers["X-Log-Offset"] = str(first)
+
+        def stream() -> Iterator[bytes]:
+            pos = first
+            while True:
+                path, encoding = _log_source(job_id)
+                start, data = read_log(path, pos, 1 << 16, encoding=encoding)
+                if start != pos:
+                    return  # started over mid-stream (new attempt): the client reconnects from 0
+                if data:
+                    pos += len(data)
+                    yield data
+                    continue
+                buf = live_buffer(path)
+                if buf is not None:
+                    buf.wait(pos, timeout=1.0)
+                    continue
+                cur = store.get(job_id)
+                if cur is None or cur.status in {"succeeded", "failed"}:
+                    return
+                time.sleep(0.5)  # written by another process, whose writer flushes within a second of each write
+
+        return StreamingResponse(stream(), media_type="text/plain; charset=utf-8", headers=headers)
+
+    @app.get("/api/v1/jobs/{job_id}/trace", responses={404: {"model": ErrorResponse}})
+    def get_job_trace(job_id: str) -> JSONResponse:
+        rec = store.get(job_id)
+        if rec is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return JSONResponse(chrome_trace(job_id, rec.trace))
 
     @app.get(
         "/api/v1/jobs/{job_id}/artifacts/{artifact_name}",
         responses={404: {"model": ErrorResponse}},
     )
-    def get_artifact(job_id: str, artifact_name: str) -> Response:
+    def get_artifact(job_id: str, artifact_name: str, request: Request) -> Response:
         if "/" in artifact_name or "\\" in artifact_name or artifact_name.startswith("."):
             raise HTTPException(status_code=404, detail="Artifact not found")
         rec = store.get(job_id)
         if rec is None:
             raise HTTPException(status_code=404, detail="Job not found")
 
-        artifacts_dir = store.job_dir(job_id) / "artifacts"
-        path = (artifacts_dir / artifact_name).resolve()
-        if not str(path).startswith(str(artifacts_dir.resolve())) or not path.exists() or not path.is_file():
-            raise HTTPException(status_code=404, detail="Artifact not found")
-        return FileResponse(path)
+        # Blobs are named by hash: guess the content type from the artifact name.
+        media_type = mimetypes.guess_type(artifact_name)[0] or "text/plain"
+        variants = artifact_store.variants(job_id, artifact_name)
+        if variants is None:
+            # Jobs from before the artifact store: plain file, no caching metadata.
+            path = artifact_store.artifact_path(job_id, artifact_name)
+            if path is None:
+                raise HTTPException(status_code=404, detail="Artifact not found")
+            _count_served(path, None, request.headers.get("range"))
+            return FileResponse(path, media_type=media_type)
+        artifact_store.touch(job_id)
+
+        encoding = _negotiate_encoding(
+            request.headers.get("accept-encoding"),
+            [e for e in variants.paths if e is not None],
+            # Ranges of the identity bytes are what resumable downloaders expect.
+            prefer_identity=None in variants.paths and "range" in request.headers,
+        )
+        headers = {
+            # Artifacts never change once written: the content hash is a strong validator.
+            "ETag": _artifact_etag(variants.sha256, encoding),
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            _count_served(variants.paths[encoding], encoding, request.headers.get("range"))
+            return FileResponse(variants.paths[encoding], media_type=media_type, headers=headers)
+        if None in variants.paths:
+            _count_served(variants.paths[None], None, request.headers.get("range"))
+            return FileResponse(variants.paths[None], media_type=media_type, headers=headers)
+        # Only the gzip form is left (compacted by retention) and the client refuses it.
+        return StreamingResponse(_iter_gunzip(variants.paths["gzip"]), media_type=media_type, headers=headers)
+
+    def _bundle_response(entries: Iterator, *, fmt: str, basename: str) -> StreamingResponse:
+        return StreamingResponse(
+            iter_archive(entries, fmt=fmt),
+            media_type=BUNDLE_FORMATS[fmt],
+            headers={"Content-Disposition": f'attachment; filename="{basename}.{fmt}"'},
+        )
+
+    @app.get(
+        "/api/v1/jobs/{job_id}/bundle",
+        responses={404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}},
+    )
+    def get_job_bundle(
+        job_id: str,
+        format: BundleFormat = Query(default="zip"),
+        artifacts: str | None = Query(default=None, description="Comma-separated names, globs or aliases"),
+    ) -> Response:
+        rec = store.get(job_id)
+        if rec is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        result = store.read_result(job_id)
+        if result is None:
+            raise HTTPException(status_code=409, detail=f"Job has no result (status={rec.status})")
+        entries = job_bundle_entries(
+            job_id=job_id, result=result, artifacts=artifact_store, select=artifact_selector(artifacts)
+        )
+        return _bundle_response(entries, fmt=format, basename=job_id)
+
+    @app.get("/api/v1/bundle")
+    def get_bundle(
+        job_ids: str | None = Query(default=None, description="Comma-separated job ids"),
+        status_filter: JobStatus = Query(default="succeeded", alias="status"),
+        created_after: datetime | None = Query(default=None),
+        created_before: datetime | None = Query(default=None),
+        limit: int | None = Query(default=None, ge=1),
+        format: BundleFormat = Query(default="zip"),
+        artifacts: str | None = Query(default=None, description="Comma-separated names, globs or aliases"),
+    ) -> Response:
+        wanted = {j.strip() for j in job_ids.split(",") if j.strip()} if job_ids else None
+        select = artifact_selector(artifacts)
+        created_after, created_before = as_utc(created_after), as_utc(created_before)
+
+        def entries() -> Iterator:
+            recs = [
+                r
+                for r in store.iter_records()
+                if r.status == status_filter
+                and (wanted is None or r.job_id in wanted)
+                and (created_after is None or r.created_at >= created_after)
+                and (created_before is None or r.created_at < created_before)
+            ]
+            recs.sort(key=lambda r: r.created_at)
+            for rec in recs[:limit]:
+                yield from job_bundle_entries(
+                    job_id=rec.job_id, result=store.read_result(rec.job_id), artifacts=artifact_store, select=select
+                )
+
+        return _bundle_response(entries(), fmt=format, basename="jobs")
+
+    @app.get("/api/v1/export", responses={400: {"model": ErrorResponse}})
+    def export_jobs(
+        format: ExportFormat = Query(default="ndjson"),
+        status_filter: JobStatus | None = Query(default=None, alias="status"),
+        accession: str | None = Query(default=None, description="UniProt accession of any chain"),
+        screen: str | None = Query(default=None),
+        created_after: datetime | None = Query(default=None),
+        created_before: datetime | None = Query(default=None),
+        min_score: float | None = Query(default=None, description="Keep jobs whose score is >= this"),
+        score_metric: str | None = Query(default=None, description="Metric min_score applies to (default: primary score)"),
+    ) -> Response:
+        if format == "parquet" and not parquet_available():
+            raise HTTPException(status_code=400, detail="Parquet export requires pyarrow on the server")
+        rows = iter_export_rows(
+            store,
+            ExportFilter(
+                status=status_filter,
+                accession=accession,
+                screen=screen,
+                created_after=created_after,
+                created_before=created_before,
+                min_score=min_score,
+                score_metric=score_metric,
+            ),
+        )
+        writer = {"ndjson": iter_ndjson, "csv": iter_csv, "parquet": iter_parquet}[format]
+        return StreamingResponse(
+            writer(rows),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="jobs.{format}"'},
+        )
+
+    @app.get(
+        "/api/v1/proteins/{protein_ref}/partners",
+        response_model=PartnerListResponse,
+        responses={422: {"model": ErrorResponse}},
+    )
+    def get_partners(
+        protein_ref: str,
+        metric: PartnerMetric = Query(default="ranking_confidence"),
+        k: int = Query(default=10, ge=1, le=1000),
+    ) -> PartnerListResponse:
+        try:
+            key = protein_key(protein_ref)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return PartnerListResponse(
+            protein=key.split(":", 1)[1],
+            metric=metric,
+            partners=partner_index.top_partners(key, metric=metric, k=k),
+        )
+
+    @app.get("/api/v1/stats/retention", response_model=RetentionStatsResponse)
+    def retention_stats() -> RetentionStatsResponse:
+        return RetentionStatsResponse.model_validate(
+            {"policy": asdict(retention.policy), "last_report": retention.last_report()}
+        )
+
+    @app.get("/api/v1/stats/queue", response_model=QueueStatsResponse)
+    def queue_stats() -> QueueStatsResponse:
+        return QueueStatsResponse.model_validate(manager.queue.stats())
+
+    @app.get("/api/v1/stats/length-buckets", response_model=LengthBucketStatsResponse)
+    def length_bucket_stats() -> LengthBucketStatsResponse:
+        return LengthBucketStatsResponse.model_validate(bucket_stats.snapshot(settings.length_buckets))
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics() -> Response:
+        # This process' live registry plus the snapshots of workers and other API processes.
+        return Response(content=metrics_exporter.render(), media_type=CONTENT_TYPE)
 
     return app
@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import threading
+import time
+from typing import Any, Callable, Collection, Iterator
+
+from alphafold_multimer_service.layout import JobLayout
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip variants are always produced
+    zstandard = None
+
+
+_HASH_CHUNK = 1 << 20
+_FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+# Text-like artifacts worth storing precompressed (PAE JSON, PDB, a3m, logs).
+_COMPRESSIBLE_SUFFIXES = (".json", ".pdb", ".cif", ".a3m", ".txt", ".fasta")
+_MIN_COMPRESS_BYTES = 1024
+# Content-Encoding -> blob file suffix
+VARIANT_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(_HASH_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    import fcntl
+
+    with src.open("rb") as fs, dst.open("wb") as fd:
+        fcntl.ioctl(fd.fileno(), _FICLONE, fs.fileno())
+
+
+def link_or_copy(src: Path, dst: Path) -> str:
+    """
+    Makes `dst` have the contents of `src` as cheaply as the filesystem allows:
+    hardlink, then reflink (copy-on-write clone), then a plain copy.
+    Returns which one was used.
+    """
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        _reflink(src, dst)
+        return "reflink"
+    except (OSError, ImportError):
+        dst.unlink(missing_ok=True)
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+def _gzip_file(src: Path, dst: Path, on_bytes: Callable[[int], None] | None = None) -> None:
+    # mtime=0: identical input gives identical bytes, like the blob it derives from
+    with src.open("rb") as fin, dst.open("wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as fout:
+        while chunk := fin.read(_HASH_CHUNK):
+            fout.write(chunk)
+            if on_bytes is not None:
+                on_bytes(len(chunk))
+
+
+def _zstd_file(src: Path, dst: Path) -> None:
+    assert zstandard is not None
+    with src.open("rb") as fin, dst.open("wb") as fout:
+        zstandard.ZstdCompressor(level=10).copy_stream(fin, fout)
+
+
+@dataclass(frozen=True)
+class ArtifactVariants:
+    """Stored representations of one artifact, keyed by content encoding (None = identity)."""
+
+    sha256: str
+    size_bytes: int | None
+    paths: dict[str | None, Path]
+
+
+@dataclass(frozen=True)
+class GcReport:
+    blobs_removed: int
+    bytes_reclaimed: int
+
+
+class ArtifactStore:
+    """
+    Content-addressed artifact blobs under `<data_dir>/blobs/<aa>/<sha256>`,
+    with a `manifest.json` per job mapping artifact names to blobs.
+
+    Runners still write into `jobs/<id>/artifacts/`; `ingest` then renames
+    each file into the blob directory (or drops it if an identical blob is
+    already stored) and hardlinks the blob back under its artifact name, so
+    duplicate outputs across jobs occupy disk once. A blob's reference count
+    is the number of job manifests naming it; `gc` removes unreferenced ones.
+    """
+
+    def __init__(self, data_dir: Path, *, gc_min_age_s: float = 3600.0) -> None:
+        self._data_dir = data_dir
+        self._blobs_dir = data_dir / "blobs"
+        self._layout = JobLayout(data_dir / "jobs")
+        self._blobs_dir.mkdir(parents=True, exist_ok=True)
+        self._gc_min_age_s = gc_min_age_s
+        # ingest vs gc: a blob must not be collected between placement and the manifest write. Workers
+        # ingest in their own processes, so the thread lock is backed by a file lock (see `_exclusive`).
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Serializes blob placement and removal with every process sharing the data dir."""
+        with self._lock, (self._blobs_dir / ".lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    @property
+    def blobs_dir(self) -> Path:
+        return self._blobs_dir
+
+    def blob_path(self, sha256: str) -> Path:
+        return self._blobs_dir / sha256[:2] / sha256
+
+    def variant_path(self, sha256: str, encoding: str) -> Path:
+        return self._blobs_dir / sha256[:2] / f"{sha256}{VARIANT_SUFFIXES[encoding]}"
+
+    def gzip_blob_path(self, sha256: str) -> Path:
+        return self.variant_path(sha256, "gzip")
+
+    def _manifest_path(self, job_id: str) -> Path:
+        return self._layout.job_dir(job_id) / "manifest.json"
+
+    def read_manifest(self, job_id: str) -> dict[str, dict[str, Any]] | None:
+        p = self._manifest_path(job_id)
+        if not p.exists():
+            return None
+        obj = json.loads(p.read_text(encoding="utf-8"))
+        return {a["name"]: a for a in obj.get("artifacts", [])}
+
+    def ingest(self, job_id: str, artifacts: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Moves runner artifacts (dicts with `name`, `path`, `media_type`) into
+        the blob store and writes the job manifest. Returns the artifacts with
+        `sha256` and `size_bytes` filled in.
+        """
+        out: list[dict[str, Any]] = []
+        with self._exclusive():
+            for a in artifacts:
+                src = Path(a["path"])
+                sha = file_sha256(src)
+                blob = self.blob_path(sha)
+                if not blob.exists() and self.gzip_blob_path(sha).exists():
+                    # cold blob compressed by retention: bring it back
+                    self._inflate(sha)
+                if blob.exists():
+                    # Already stored by another job: keep the blob, drop our copy.
+                    src.unlink()
+                    os.utime(blob)
+                else:
+                    blob.parent.mkdir(parents=True, exist_ok=True)
+                    try:
+                        src.replace(blob)
+                    except OSError:
+                        # blobs on another filesystem than the job dir
+                        tmp = blob.with_name(blob.name + ".tmp")
+                        link_or_copy(src, tmp)
+                        tmp.replace(blob)
+                        src.unlink()
+                    blob.chmod(0o444)
+                    # rename keeps the runner's mtime, possibly hours old: the gc grace period counts from now
+                    os.utime(blob)
+                    if a["name"].endswith(_COMPRESSIBLE_SUFFIXES):
+                        self._write_variants(sha)
+                # Best effort: keep the artifact visible under its name in the job
+                # dir; the API resolves through the manifest either way.
+                try:
+                    os.link(blob, src)
+                except OSError:
+                    pass
+                out.append({**a, "path": str(blob), "sha256": sha, "size_bytes": blob.stat().st_size})
+
+            manifest = {
+                "job_id": job_id,
+                "artifacts": [
+                    {k: a.get(k) for k in ("name", "sha256", "size_bytes", "media_type")} for a in out
+                ],
+            }
+            p = self._manifest_path(job_id)
+            tmp = p.with_suffix(".tmp")
+            tmp.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+            os.replace(tmp, p)
+        return out
+
+    def variants(self, job_id: str, name: str) -> ArtifactVariants | None:
+        """Representations on disk for a job artifact (None if unknown or evicted)."""
+        manifest = self.read_manifest(job_id)
+        if manifest is None:
+            return None
+        entry = manifest.get(name)
+        if entry is None:
+            return None
+        sha = entry["sha256"]
+        paths: dict[str | None, Path] = {}
+        for encoding, path in [(None, self.blob_path(sha))] + [(e, self.variant_path(sha, e)) for e in VARIANT_SUFFIXES]:
+            if path.is_file():
+                paths[encoding] = path
+        if not paths:
+            return None
+        return ArtifactVariants(sha256=sha, size_bytes=entry.get("size_bytes"), paths=paths)
+
+    def locate(self, job_id: str, name: str) -> tuple[Path, str | None] | None:
+        """
+        (path, content encoding) backing a job artifact: the raw blob, its
+        gzip-compressed form once retention compacted it, or the plain file
+        for jobs without a manifest.
+        """
+        if self.read_manifest(job_id) is not None:
+            v = self.variants(job_id, name)
+            if v is None:
+                return None
+            if None in v.paths:
+                return v.paths[None], None
+            return (v.paths["gzip"], "gzip") if "gzip" in v.paths else None
+        artifacts_dir = (self._layout.job_dir(job_id) / "artifacts").resolve()
+        path = (artifacts_dir / name).resolve()
+        if path.parent != artifacts_dir or not path.is_file():
+            return None
+        return path, None
+
+    def artifact_path(self, job_id: str, name: str) -> Path | None:
+        """Uncompressed file backing a job artifact, if there is one."""
+        loc = self.locate(job_id, name)
+        return loc[0] if loc is not None and loc[1] is None else None
+
+    def _write_variants(self, sha256: str) -> None:
+        """Precompressed gzip (and zstd, if installed) copies kept only when smaller."""
+        blob = self.blob_path(sha256)
+        size = blob.stat().st_size
+        if size < _MIN_COMPRESS_BYTES:
+            return
+        writers: list[tuple[str, Callable[[Path, Path], None]]] = [("gzip", _gzip_file)]
+        if zstandard is not None:
+            writers.append(("zstd", _zstd_file))
+        for encoding, write in writers:
+            dst = self.variant_path(sha256, encoding)
+            if dst.exists():
+                continue
+            tmp = dst.with_name(dst.name + ".tmp")
+            write(blob, tmp)
+            if tmp.stat().st_size < size:
+                tmp.chmod(0o444)
+                tmp.replace(dst)
+            else:
+                tmp.unlink()
+
+    def compress_blob(self, sha256: str, *, on_bytes: Callable[[int], None] | None = None) -> int:
+        """
+        Leaves only the gzip form of a blob (dropping the raw bytes and any
+        other variant); returns the bytes saved (0 if the data does not
+        compress). `on_bytes` sees every chunk read, for throttling.
+        """
+        blob = self.blob_path(sha256)
+        gz = self.gzip_blob_path(sha256)
+        tmp = gz.with_name(gz.name + ".tmp")
+        if not blob.is_file():
+            return 0
+        if not gz.exists():
+            # Blobs are immutable, so compress without holding the lock
+            # (throttled compaction must not stall ingest) and only swap under it.
+            _gzip_file(blob, tmp, on_bytes)
+        with self._exclusive():
+            if not blob.is_file():
+                tmp.unlink(missing_ok=True)
+                return 0
+            if tmp.exists():
+                if tmp.stat().st_size >= blob.stat().st_size:
+                    tmp.unlink()
+                    return 0
+                tmp.replace(gz)
+            saved = blob.stat().st_size
+            blob.unlink()
+            for encoding in VARIANT_SUFFIXES:
+                if encoding != "gzip":
+                    other = self.variant_path(sha256, encoding)
+                    if other.exists():
+                        saved += other.stat().st_size
+                        other.unlink()
+            saved -= gz.stat().st_size
+        return saved
+
+    def _inflate(self, sha256: str) -> None:
+        blob = self.blob_path(sha256)
+        gz = self.gzip_blob_path(sha256)
+        tmp = blob.with_name(blob.name + ".tmp")
+        with gzip.open(gz, "rb") as src, tmp.open("wb") as dst:
+            shutil.copyfileobj(src, dst, _HASH_CHUNK)
+        tmp.replace(blob)
+
+    def refcounts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for job_dir in self._layout.iter_dirs():
+            try:
+                text = (job_dir / "manifest.json").read_text(encoding="utf-8")
+            except FileNotFoundError:
+                # No manifest, or the job moved into its shard since the listing: a reference missed
+                # here would let gc delete a blob still in use.
+                try:
+                    text = self._manifest_path(job_dir.name).read_text(encoding="utf-8")
+                except FileNotFoundError:
+                    continue
+            for a in json.loads(text).get("artifacts", []):
+                counts[a["sha256"]] = counts.get(a["sha256"], 0) + 1
+        return counts
+
+    def touch(self, job_id: str, *, min_interval_s: float = 60.0) -> None:
+        """Marks a job's artifacts as used (manifest mtime), for LRU retention."""
+        p = self._manifest_path(job_id)
+        try:
+            if time.time() - p.stat().st_mtime >= min_interval_s:
+                os.utime(p)
+        except FileNotFoundError:
+            pass
+
+    def gc(self, *, min_age_s: float | None = None, released: Collection[str] = ()) -> GcReport:
+        """
+        Deletes blobs no manifest references. Blobs younger than the grace
+        period are kept unless `min_age_s` overrides it; `released` blobs
+        (their last referencing jobs were just evicted) go regardless of age.
+        Ingest in any process sharing the data dir is serialized with gc, so
+        a blob is never seen between its placement and the manifest naming it.
+        """
+        removed = 0
+        reclaimed = 0
+        with self._exclusive():
+            counts = self.refcounts()
+            cutoff = time.time() - (self._gc_min_age_s if min_age_s is None else min_age_s)
+            for blob in self._blobs_dir.glob("*/*"):
+                sha = blob.name.split(".", 1)[0]
+                if blob.name.endswith(".tmp") or counts.get(sha, 0) > 0:
+                    continue
+                st = blob.stat()
+                if st.st_mtime > cutoff and sha not in released:
+                    continue
+                blob.unlink()
+                removed += 1
+                # space only comes back with the last link
+                if st.st_nlink <= 1:
+                    reclaimed += st.st_size
+        return GcReport(blobs_removed=removed, bytes_reclaimed=reclaimed)
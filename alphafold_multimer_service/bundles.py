@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import fnmatch
+import gzip
+import io
+import json
+from pathlib import Path
+import tarfile
+import time
+from typing import BinaryIO, Callable, Iterable, Iterator
+import zipfile
+import zlib
+
+from alphafold_multimer_service.artifacts import ArtifactStore
+
+
+_CHUNK = 1 << 16
+
+# Shorthands accepted in `artifacts=` next to exact names and globs.
+ARTIFACT_ALIASES: dict[str, tuple[str, ...]] = {
+    "pdb": ("*.pdb",),
+    "structure": ("rank_001.pdb",),
+    "pae": ("pae.json",),
+    "scores": ("scores*.json",),
+    "msa": ("*.a3m",),
+    "logs": ("*.txt",),
+    "input": ("input.fasta",),
+    "result": ("result.json",),
+}
+
+BUNDLE_FORMATS: dict[str, str] = {
+    "zip": "application/zip",
+    "tar": "application/x-tar",
+    "tar.gz": "application/gzip",
+}
+
+
+@dataclass(frozen=True)
+class BundleEntry:
+    arcname: str
+    size: int
+    mtime: float
+    open: Callable[[], BinaryIO]
+
+
+def file_entry(arcname: str, path: Path, *, gzipped: bool = False, size: int | None = None) -> BundleEntry:
+    """Entry read from disk; `gzipped` files are inflated on the fly (`size` is the inflated size)."""
+    st = path.stat()
+    if gzipped:
+        if size is None:
+            raise ValueError("Inflated size is required for gzipped entries")
+        return BundleEntry(arcname=arcname, size=size, mtime=st.st_mtime, open=lambda: gzip.open(path, "rb"))
+    return BundleEntry(arcname=arcname, size=st.st_size, mtime=st.st_mtime, open=lambda: path.open("rb"))
+
+
+def bytes_entry(arcname: str, data: bytes) -> BundleEntry:
+    return BundleEntry(arcname=arcname, size=len(data), mtime=time.time(), open=lambda: io.BytesIO(data))
+
+
+def artifact_selector(spec: str | None) -> Callable[[str], bool]:
+    """
+    `"rank_001.pdb,scores"` -> predicate over artifact names. Tokens are
+    aliases (see ARTIFACT_ALIASES), exact names or fnmatch globs; empty
+    selects everything.
+    """
+    patterns: list[str] = []
+    for token in (spec or "").split(","):
+        token = token.strip()
+        if token:
+            patterns.extend(ARTIFACT_ALIASES.get(token, (token,)))
+    if not patterns:
+        return lambda _name: True
+    return lambda name: any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only, unseekable buffer the archive writers fill and the generator drains."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:  # type: ignore[override]
+        data = bytes(b)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def _iter_tar(entries: Iterable[BundleEntry], *, gz: bool) -> Iterator[bytes]:
+    # tarfile.addfile copies a member in one call, which would buffer it whole;
+    # write headers via TarInfo.tobuf and stream the member data ourselves.
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31) if gz else None  # wbits=31: gzip container
+
+    def out(data: bytes) -> bytes:
+        return comp.compress(data) if comp is not None else data
+
+    total = 0
+    for entry in entries:
+        info = tarfile.TarInfo(entry.arcname)
+        info.size = entry.size
+        info.mtime = int(entry.mtime)
+        info.mode = 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        total += len(header)
+        if data := out(header):
+            yield data
+        copied = 0
+        with entry.open() as src:
+            while chunk := src.read(_CHUNK):
+                copied += len(chunk)
+                if data := out(chunk):
+                    yield data
+        if copied != entry.size:
+            raise OSError(f"{entry.arcname}: expected {entry.size} bytes, read {copied}")
+        pad = -copied % tarfile.BLOCKSIZE
+        total += copied + pad
+        if data := out(tarfile.NUL * pad):
+            yield data
+    # end-of-archive marker, padded to a full record like tarfile does
+    trailer = tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+    total += len(trailer)
+    trailer += tarfile.NUL * (-total % tarfile.RECORDSIZE)
+    if data := out(trailer):
+        yield data
+    if comp is not None:
+        yield comp.flush()
+
+
+def iter_archive(entries: Iterable[BundleEntry], *, fmt: str) -> Iterator[bytes]:
+    """
+    Streams a zip / tar / tar.gz of `entries` in ~64 KiB pieces. Entries are
+    read chunk by chunk and the archive is never materialized, so memory
+    stays flat however many jobs are bundled.
+    """
+    if fmt in {"tar", "tar.gz"}:
+        yield from _iter_tar(entries, gz=fmt == "tar.gz")
+        return
+    if fmt != "zip":
+        raise ValueError(f"Unknown bundle format: {fmt}")
+    sink = ChunkSink()
+    # Unseekable output: zipfile writes sizes/CRC in data descriptors after each member.
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry.arcname, date_time=time.localtime(entry.mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with entry.open() as src, zf.open(info, "w", force_zip64=entry.size >= 1 << 31) as dst:
+                while chunk := src.read(_CHUNK):
+                    dst.write(chunk)
+                    if data := sink.drain():
+                        yield data
+            if data := sink.drain():
+                yield data
+    # central directory
+    if data := sink.drain():
+        yield data
+
+
+def job_bundle_entries(
+    *,
+    job_id: str,
+    result: dict | None,
+    artifacts: ArtifactStore,
+    select: Callable[[str], bool],
+) -> Iterator[BundleEntry]:
+    """Selected artifacts of one job (plus `result.json`), under `<job_id>/`."""
+    if result is None:
+        return
+    if select("result.json"):
+        yield bytes_entry(f"{job_id}/result.json", json.dumps(result, indent=2).encode("utf-8"))
+    for a in result.get("artifacts") or []:
+        name = a["name"]
+        if not select(name):
+            continue
+        variants = artifacts.variants(job_id, name)
+        if variants is not None:
+            if None in variants.paths:
+                yield file_entry(f"{job_id}/{name}", variants.paths[None])
+            elif "gzip" in variants.paths and variants.size_bytes is not None:
+                yield file_entry(f"{job_id}/{name}", variants.paths["gzip"], gzipped=True, size=variants.size_bytes)
+            continue
+        path = artifacts.artifact_path(job_id, name)
+        if path is not None:
+            yield file_entry(f"{job_id}/{name}", path)
@@ -4,6 +4,16 @@ from dataclasses import dataclass
 import os
 from pathlib import Path
 
+from alphafold_multimer_service.alphafold_multimer.buckets import parse_bucket_edges
+from alphafold_multimer_service.webhooks import Network, parse_networks
+
+
+def _env_float(name: str, default: float | None) -> float | None:
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    return float(raw) if raw.strip() else None
+
 
 def _env_bool(name: str, default: bool) -> bool:
     raw = os.environ.get(name)
@@ -25,6 +35,55 @@ class Settings:
 
     default_preset: str
 
+    uniprot_base_url: str = "https://rest.uniprot.org"
+    uniprot_batch_size: int = 100
+    prefetch_depth: int = 8
+
+    cascade_metric: str = "ranking_confidence"
+    cascade_threshold: float = 0.5
+
+    # Empty tuple / None disable length bucketing / the JAX compilation cache.
+    length_buckets: tuple[int, ...] = ()
+    jax_cache_dir: Path | None = None
+
+    # Retention (see retention.RetentionPolicy); None disables the respective step.
+    disk_budget_gb: float | None = None
+    retention_max_age_days: float | None = None
+    compress_after_days: float | None = 7.0
+    prune_work: bool = True
+    retention_io_mb_per_s: float | None = 50.0
+    retention_interval_s: float = 3600.0
+
+    # Serialized status/result responses of finished jobs / parsed job records kept in memory.
+    response_cache_entries: int = 2048
+    record_cache_entries: int = 4096
+    # Where new job dirs go: "sharded" (jobs/YYYYMMDD/<id>) or "flat" (jobs/<id>, what older versions
+    # read). Existing jobs are found in either; see layout.py and `python -m ...migrate_layout`.
+    job_layout: str = "sharded"
+
+    # Whether the API process also runs jobs; set False when separate workers (`python -m
+    # alphafold_multimer_service.worker`) share the data dir. worker_id None means host:pid.
+    embedded_worker: bool = True
+    worker_id: str | None = None
+    worker_lease_s: float = 300.0
+    worker_poll_s: float = 2.0
+    # GPUs handed to this worker's ColabFold containers: "all" or device indices/UUIDs ("0", "0,1").
+    worker_gpus: str = "all"
+    # Processes parsing finished runs while the worker starts the next one (0: a thread instead).
+    postprocess_workers: int = 2
+    # SQLite journal of the work queue: auto, wal (one host) or delete (workers on several hosts).
+    queue_journal_mode: str = "auto"
+    # Seconds between metrics snapshots each process writes under data/metrics for `/metrics` (0: off).
+    metrics_snapshot_s: float = 15.0
+    # Completion webhooks: HMAC-SHA256 signing key (None: unsigned), seconds batched events wait for
+    # company, concurrent deliveries per endpoint, attempts before an event is given up.
+    webhook_secret: str | None = None
+    webhook_batch_s: float = 30.0
+    webhook_concurrency: int = 2
+    webhook_max_attempts: int = 12
+    # Non-public networks callback URLs may still resolve to (e.g. an internal LIMS); others are refused.
+    webhook_allow_networks: tuple[Network, ...] = ()
+
 
 def load_settings() -> Settings:
     data_dir = Path(os.environ.get("SHENLAB_DATA_DIR", "data")).resolve()
@@ -45,6 +104,42 @@ def load_settings() -> Settings:
 
     default_preset = os.environ.get("SHENLAB_AF_MULTIMER_PRESET", "fast").strip().lower() or "fast"
 
+    uniprot_base_url = os.environ.get("SHENLAB_UNIPROT_BASE_URL", "https://rest.uniprot.org").strip()
+    uniprot_batch_size = int(os.environ.get("SHENLAB_UNIPROT_BATCH_SIZE", "100"))
+    prefetch_depth = int(os.environ.get("SHENLAB_PREFETCH_DEPTH", "8"))
+
+    cascade_metric = os.environ.get("SHENLAB_CASCADE_METRIC", "ranking_confidence").strip().lower() or "ranking_confidence"
+    cascade_threshold = float(os.environ.get("SHENLAB_CASCADE_THRESHOLD", "0.5"))
+
+    length_buckets = parse_bucket_edges(
+        os.environ.get("SHENLAB_LENGTH_BUCKETS", "256,384,512,768,1024,1280,1536,2048,2560,3072")
+    )
+    jax_cache_dir_raw = os.environ.get("SHENLAB_JAX_CACHE_DIR", str(data_dir / "jax_cache"))
+    jax_cache_dir = Path(jax_cache_dir_raw).resolve() if jax_cache_dir_raw else None
+
+    disk_budget_gb = _env_float("SHENLAB_DISK_BUDGET_GB", None)
+    retention_max_age_days = _env_float("SHENLAB_RETENTION_MAX_AGE_DAYS", None)
+    compress_after_days = _env_float("SHENLAB_COMPRESS_AFTER_DAYS", 7.0)
+    prune_work = _env_bool("SHENLAB_PRUNE_WORK", True)
+    retention_io_mb_per_s = _env_float("SHENLAB_RETENTION_IO_MBPS", 50.0)
+    retention_interval_s = float(os.environ.get("SHENLAB_RETENTION_INTERVAL_S", "3600"))
+    response_cache_entries = int(os.environ.get("SHENLAB_RESPONSE_CACHE_ENTRIES", "2048"))
+    record_cache_entries = int(os.environ.get("SHENLAB_RECORD_CACHE_ENTRIES", "4096"))
+    job_layout = os.environ.get("SHENLAB_JOB_LAYOUT", "sharded").strip().lower() or "sharded"
+    embedded_worker = _env_bool("SHENLAB_EMBEDDED_WORKER", True)
+    worker_id = os.environ.get("SHENLAB_WORKER_ID", "").strip() or None
+    worker_lease_s = float(os.environ.get("SHENLAB_WORKER_LEASE_S", "300"))
+    worker_poll_s = float(os.environ.get("SHENLAB_WORKER_POLL_S", "2"))
+    worker_gpus = os.environ.get("SHENLAB_WORKER_GPUS", "all").strip() or "all"
+    postprocess_workers = int(os.environ.get("SHENLAB_POSTPROCESS_WORKERS", "2"))
+    queue_journal_mode = os.environ.get("SHENLAB_QUEUE_JOURNAL_MODE", "auto").strip().lower() or "auto"
+    metrics_snapshot_s = float(os.environ.get("SHENLAB_METRICS_SNAPSHOT_S", "15"))
+    webhook_secret = os.environ.get("SHENLAB_WEBHOOK_SECRET") or None
+    webhook_batch_s = float(os.environ.get("SHENLAB_WEBHOOK_BATCH_S", "30"))
+    webhook_concurrency = int(os.environ.get("SHENLAB_WEBHOOK_CONCURRENCY", "2"))
+    webhook_max_attempts = int(os.environ.get("SHENLAB_WEBHOOK_MAX_ATTEMPTS", "12"))
+    webhook_allow_networks = parse_networks(os.environ.get("SHENLAB_WEBHOOK_ALLOW_NETWORKS", ""))
+
     return Settings(
         data_dir=data_dir,
         api_token=api_token,
@@ -54,5 +149,34 @@ def load_settings() -> Settings:
         colabfold_cache_dir=colabfold_cache_dir,
         host_ptxas_path=host_ptxas_path,
         default_preset=default_preset,
+        uniprot_base_url=uniprot_base_url,
+        uniprot_batch_size=uniprot_batch_size,
+        prefetch_depth=prefetch_depth,
+        cascade_metric=cascade_metric,
+        cascade_threshold=cascade_threshold,
+        length_buckets=length_buckets,
+        jax_cache_dir=jax_cache_dir,
+        disk_budget_gb=disk_budget_gb,
+        retention_max_age_days=retention_max_age_days,
+        compress_after_days=compress_after_days,
+        prune_work=prune_work,
+        retention_io_mb_per_s=retention_io_mb_per_s,
+        retention_interval_s=retention_interval_s,
+        response_cache_entries=response_cache_entries,
+        record_cache_entries=record_cache_entries,
+        job_layout=job_layout,
+        embedded_worker=embedded_worker,
+        worker_id=worker_id,
+        worker_lease_s=worker_lease_s,
+        worker_poll_s=worker_poll_s,
+        worker_gpus=worker_gpus,
+        postprocess_workers=postprocess_workers,
+        queue_journal_mode=queue_journal_mode,
+        metrics_snapshot_s=metrics_snapshot_s,
+        webhook_secret=webhook_secret,
+        webhook_batch_s=webhook_batch_s,
+        webhook_concurrency=webhook_concurrency,
+        webhook_max_attempts=webhook_max_attempts,
+        webhook_allow_networks=webhook_allow_networks,
     )
 
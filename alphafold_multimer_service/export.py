@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import io
+import json
+from typing import Any, Iterable, Iterator
+
+from alphafold_multimer_service.bundles import ChunkSink
+from alphafold_multimer_service.jobs import JobStore, request_proteins
+from alphafold_multimer_service.uniprot import extract_uniprot_id
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional; only the Parquet export needs it
+    pyarrow = None
+
+
+_FLUSH_BYTES = 1 << 16
+_PARQUET_BATCH_ROWS = 10_000
+
+EXPORT_MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Flat columns of the CSV / Parquet exports, with their Parquet types. List
+# values (chain ids, PAE matrix, ...) are JSON-encoded strings there.
+FLAT_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("job_id", "string"),
+    ("status", "string"),
+    ("created_at", "string"),
+    ("finished_at", "string"),
+    ("preset", "string"),
+    ("screen", "string"),
+    ("accessions", "string"),
+    ("input_sha256", "string"),
+    ("primary_score", "float64"),
+    ("iptm", "float64"),
+    ("ptm", "float64"),
+    ("ranking_confidence", "float64"),
+    ("plddt", "float64"),
+    ("interface_pae_mean", "float64"),
+    ("interface_pae_mean_ab", "float64"),
+    ("interface_pae_mean_ba", "float64"),
+    ("chain_ids", "string"),
+    ("interface_pae_matrix", "string"),
+    ("chain_pair_iptm", "string"),
+    ("chain_lengths_match", "bool_"),
+    ("chain_lengths_a3m", "string"),
+    ("chain_lengths_pdb", "string"),
+    ("padded_length", "int64"),
+    ("error", "string"),
+)
+
+
+def parquet_available() -> bool:
+    return pyarrow is not None
+
+
+def as_utc(dt: datetime | None) -> datetime | None:
+    """Query datetimes without an offset are taken as UTC (stored times are aware)."""
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+@dataclass(frozen=True)
+class ExportFilter:
+    status: str | None = None
+    accession: str | None = None
+    screen: str | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    # Threshold on `score_metric` (default: the primary score); implies a result.
+    min_score: float | None = None
+    score_metric: str | None = None
+
+
+def _accessions(job: dict[str, Any]) -> list[str]:
+    out = []
+    for p in request_proteins(job.get("request") or {}):
+        if p.get("uniprot"):
+            try:
+                out.append(extract_uniprot_id(p["uniprot"]))
+            except ValueError:
+                continue
+    return out
+
+
+def iter_export_rows(store: JobStore, flt: ExportFilter) -> Iterator[dict[str, Any]]:
+    """
+    One plain dict per matching job, in job id order. Works on the raw JSON files
+    (no model validation) and applies the job.json filters before touching
+    result.json, so memory is constant and unmatched jobs cost one small read.
+    """
+    created_after, created_before = as_utc(flt.created_after), as_utc(flt.created_before)
+    accession = flt.accession.strip().upper() if flt.accession else None
+    for job in store.iter_raw():
+        if flt.status is not None and job.get("status") != flt.status:
+            continue
+        request = job.get("request") or {}
+        if flt.screen is not None and request.get("screen") != flt.screen:
+            continue
+        if created_after is not None or created_before is not None:
+            created = datetime.fromisoformat(job["created_at"])
+            if (created_after is not None and created < created_after) or (
+                created_before is not None and created >= created_before
+            ):
+                continue
+        accessions = _accessions(job)
+        if accession is not None and accession not in {a.upper() for a in accessions}:
+            continue
+
+        result = store.read_result(job["job_id"]) if job.get("status") == "succeeded" else None
+        result = result or {}
+        metrics = result.get("metrics") or {}
+        primary = (result.get("primary_score") or {}).get("value")
+        if flt.min_score is not None:
+            score = metrics.get(flt.score_metric) if flt.score_metric else primary
+            if not isinstance(score, (int, float)) or score < flt.min_score:
+                continue
+
+        yield {
+            "job_id": job["job_id"],
+            "status": job.get("status"),
+            "created_at": job.get("created_at"),
+            "finished_at": job.get("finished_at"),
+            "preset": request.get("preset"),
+            "screen": request.get("screen"),
+            "accessions": accessions,
+            "input_sha256": job.get("input_sha256"),
+            "primary_score": primary,
+            "metrics": metrics,
+            "verification": result.get("verification") or {},
+            "error": job.get("error"),
+        }
+
+
+def flatten_row(row: dict[str, Any]) -> dict[str, Any]:
+    flat = {**row, **row["metrics"], **row["verification"]}
+    flat["accessions"] = ";".join(row["accessions"])
+    out = {}
+    for name, _type in FLAT_COLUMNS:
+        value = flat.get(name)
+        out[name] = json.dumps(value, separators=(",", ":")) if isinstance(value, (list, dict)) else value
+    return out
+
+
+def _batched(pieces: Iterable[bytes]) -> Iterator[bytes]:
+    buf: list[bytes] = []
+    size = 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= _FLUSH_BYTES:
+            yield b"".join(buf)
+            buf.clear()
+            size = 0
+    if buf:
+        yield b"".join(buf)
+
+
+def iter_ndjson(rows: Iterable[dict[str, Any]]) -> Iterator[bytes]:
+    return _batched(json.dumps(row, separators=(",", ":")).encode("utf-8") + b"\n" for row in rows)
+
+
+def iter_csv(rows: Iterable[dict[str, Any]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _type in FLAT_COLUMNS])
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in flatten_row(row).values()])
+        if buf.tell() >= _FLUSH_BYTES:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def iter_parquet(rows: Iterable[dict[str, Any]]) -> Iterator[bytes]:
+    """Parquet in row groups of _PARQUET_BATCH_ROWS; requires `pyarrow`."""
+    if pyarrow is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+    schema = pyarrow.schema([(name, getattr(pyarrow, type_)()) for name, type_ in FLAT_COLUMNS])
+    sink = ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    columns: dict[str, list[Any]] = {name: [] for name, _type in FLAT_COLUMNS}
+
+    def flush() -> bytes:
+        writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+        return sink.drain()
+
+    n = 0
+    for row in rows:
+        for name, value in flatten_row(row).items():
+            columns[name].append(value)
+        n += 1
+        if n % _PARQUET_BATCH_ROWS == 0 and (data := flush()):
+            yield data
+    if n % _PARQUET_BATCH_ROWS and (data := flush()):
+        yield data
+    writer.close()
+    if data := sink.drain():
+        yield data
@@ -1,16 +1,53 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime, timezone
+import errno
+import fcntl
 import json
+import multiprocessing
+import os
 from pathlib import Path
 import queue
 import threading
-from typing import Any, Callable
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator, TypeVar
 import uuid
 
 from pydantic import BaseModel, Field
 
-from alphafold_multimer_service.alphafold_multimer.runner import AlphaFoldMultimerRunner
+from alphafold_multimer_service.artifacts import ArtifactStore
+from alphafold_multimer_service.alphafold_multimer.runner import (
+    AlphaFoldMultimerRunner,
+    AlphaFoldMultimerRunResult,
+    PreparedInputs,
+    RunOutputs,
+    postprocess_outputs,
+)
+from alphafold_multimer_service.layout import LAYOUTS, JobLayout
+from alphafold_multimer_service.metrics import (
+    CACHE_LOOKUPS,
+    JOB_WRITE_SECONDS,
+    JOBS_FINISHED,
+    JOBS_IN_STAGE,
+    JOBS_SUBMITTED,
+    STAGE_SECONDS,
+    WORKER_BUSY_SECONDS,
+    WORKER_IDLE_SECONDS,
+)
+from alphafold_multimer_service.sequences import chain_id, complex_sha256
+from alphafold_multimer_service.trace import close_spans, open_span, stage_seconds
+from alphafold_multimer_service.uniprot import UniProtClient, extract_uniprot_id
+from alphafold_multimer_service.webhooks import WebhookOutbox, job_event
+from alphafold_multimer_service.work_queue import Lease, SqliteWorkQueue, default_worker_id
+
+if TYPE_CHECKING:
+    from alphafold_multimer_service.partners import PartnerIndex
+    from alphafold_multimer_service.retention import RetentionManager
 
 
 def utc_now() -> datetime:
@@ -27,187 +64,843 @@ class JobRecord(BaseModel):
     progress: dict = Field(default_factory=lambda: {"stage": "queued", "message": "Queued", "percent": 0})
     error: str | None = None
     request: dict[str, Any]
+    # Per-chain content identity (source, length, sha256), filled in once the
+    # inputs are resolved; input_sha256 identifies the whole complex.
+    chains: list[dict[str, Any]] = Field(default_factory=list)
+    input_sha256: str | None = None
+    # `cascade` preset bookkeeping: current stage, screen-stage outcome.
+    cascade: dict[str, Any] | None = None
+    # Number of times the worker picked the job up (>1 after a restart), and
+    # what the last run took over from earlier attempts (see runner `resume`).
+    attempts: int = 0
+    resume: dict[str, Any] | None = None
+    # Set once retention dropped the job's artifacts; result.json and metrics remain.
+    artifacts_evicted_at: datetime | None = None
+    # Worker (see work_queue) that ran the latest attempt.
+    worker: str | None = None
+    # Timed spans of every stage and attempt (see `trace`), served as a Chrome trace.
+    trace: list[dict[str, Any]] = Field(default_factory=list)
 
     class Config:
         arbitrary_types_allowed = True
 
 
+def request_proteins(request: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Protein refs of a stored job request. Pair jobs keep the historic
+    protein_a/protein_b shape; complexes store a `proteins` list.
+    """
+    if request.get("proteins"):
+        return list(request["proteins"])
+    return [p for p in (request.get("protein_a"), request.get("protein_b")) if p]
+
+
+_T = TypeVar("_T")
+
+# (inode, mtime_ns, size) of a job.json; every atomic rewrite gets a new inode.
+_Stamp = tuple[int, int, int]
+
+
+def _stamp(st: os.stat_result) -> _Stamp:
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _read_bytes(path: Path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_text_atomic(path: Path, text: str) -> _Stamp:
+    """Writes via rename; returns the stamp of the file written."""
+    # Readers scanning the store (exports, bundles) must never see a half-written file.
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    stamp = _stamp(tmp.stat())  # rename keeps inode and mtime
+    os.replace(tmp, path)
+    return stamp
+
+
+class _RecordCache:
+    """Bounded LRU of parsed records, each valid only while its job.json stamp is unchanged."""
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[_Stamp, JobRecord]] = OrderedDict()
+
+    def get(self, job_id: str, stamp: _Stamp) -> JobRecord | None:
+        with self._lock:
+            hit = self._entries.get(job_id)
+            if hit is None or hit[0] != stamp:
+                CACHE_LOOKUPS.inc(cache="record", result="miss")
+                return None
+            self._entries.move_to_end(job_id)
+        CACHE_LOOKUPS.inc(cache="record", result="hit")
+        return hit[1]
+
+    def put(self, job_id: str, stamp: _Stamp, rec: JobRecord) -> None:
+        with self._lock:
+            self._entries[job_id] = (stamp, rec)
+            self._entries.move_to_end(job_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class JobStore:
-    def __init__(self, data_dir: Path) -> None:
+    """
+    One directory per job (see `layout` for where). job.json is the source of
+    truth: cached records are revalidated against its stamp on every read, so
+    several processes sharing the data dir (e.g. multiple uvicorn workers) see
+    each other's updates.
+    """
+
+    def __init__(self, data_dir: Path, *, cache_entries: int = 4096, layout: str = "sharded") -> None:
         self._data_dir = data_dir
         self._jobs_dir = data_dir / "jobs"
         self._jobs_dir.mkdir(parents=True, exist_ok=True)
-        self._mem: dict[str, JobRecord] = {}
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout must be sharded or flat, not {layout!r}")
+        self._layout = JobLayout(self._jobs_dir, sharded=layout == "sharded")
+        self._cache = _RecordCache(cache_entries)
+
+    @property
+    def data_dir(self) -> Path:
+        return self._data_dir
 
     @property
     def jobs_dir(self) -> Path:
         return self._jobs_dir
 
-    def job_dir(self, job_id: str) -> Path:
-        return self._jobs_dir / job_id
-
-    def _job_json_path(self, job_id: str) -> Path:
-        return self.job_dir(job_id) / "job.json"
+    @property
+    def layout(self) -> JobLayout:
+        return self._layout
 
-    def _result_json_path(self, job_id: str) -> Path:
-        return self.job_dir(job_id) / "result.json"
+    def job_dir(self, job_id: str) -> Path:
+        return self._layout.job_dir(job_id)
+
+    def _in_job_dir(self, job_id: str, name: str, fn: Callable[[Path], _T]) -> _T:
+        """`fn(<job dir>/name)`, once more if the job moved into its shard meanwhile (see `move_to_shard`)."""
+        d = self.job_dir(job_id)
+        try:
+            return fn(d / name)
+        except FileNotFoundError:
+            moved = self.job_dir(job_id)
+            if moved == d:
+                raise
+            return fn(moved / name)
 
     def create_job(self, *, service: str, request: dict[str, Any]) -> JobRecord:
-        job_id = f"job_{utc_now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-        job_dir = self.job_dir(job_id)
+        # The id carries the creation time: `list` relies on the day in it (see layout.iter_days).
+        created_at = utc_now()
+        job_id = f"job_{created_at.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        job_dir = self._layout.new_dir(job_id)
         job_dir.mkdir(parents=True, exist_ok=False)
         rec = JobRecord(
             job_id=job_id,
             service=service,
             status="queued",
-            created_at=utc_now(),
+            created_at=created_at,
             request=request,
+            trace=open_span([], "queued", cat="stage", attempt=1, start=created_at.timestamp()),
         )
-        self._mem[job_id] = rec
         self._write_job(rec)
         return rec
 
     def get(self, job_id: str) -> JobRecord | None:
-        if job_id in self._mem:
-            return self._mem[job_id]
-        p = self._job_json_path(job_id)
-        if not p.exists():
+        # Twice over both places: the job may move into its shard between a miss there and the read.
+        for p in [d / "job.json" for d in self._layout.candidates(job_id)] * 2:
+            try:
+                stamp = _stamp(os.stat(p))
+                rec = self._cache.get(job_id, stamp)
+                if rec is not None:
+                    return rec
+                data = p.read_bytes()
+                break
+            except FileNotFoundError:
+                continue
+        else:
             return None
-        obj = json.loads(p.read_text(encoding="utf-8"))
-        rec = JobRecord.model_validate(obj)
-        self._mem[job_id] = rec
+        # Replaced between stat and read: cached under the older stamp, so the next get rereads.
+        rec = JobRecord.model_validate(json.loads(data))
+        self._cache.put(job_id, stamp, rec)
         return rec
 
     def update(self, rec: JobRecord) -> None:
-        self._mem[rec.job_id] = rec
         self._write_job(rec)
 
-    def list(self, *, limit: int, offset: int) -> list[JobRecord]:
-        recs: list[JobRecord] = []
-        for p in self._jobs_dir.iterdir():
-            if not p.is_dir():
-                continue
+    def update_if(
+        self, job_id: str, statuses: set[str], change: Callable[[JobRecord], JobRecord]
+    ) -> JobRecord | None:
+        """
+        Applies `change` to the current record if its status is one of
+        `statuses`, as one step against other processes doing the same (file
+        lock on the job dir). Returns the record written, or None.
+        """
+        with self._locked(job_id) as job_dir:
+            if job_dir is None:
+                return None
+            rec = self.get(job_id)
+            if rec is None or rec.status not in statuses:
+                return None
+            rec = change(rec)
+            self._write_job(rec)
+            return rec
+
+    @contextmanager
+    def _locked(self, job_id: str) -> Iterator[Path | None]:
+        """Holds the job's file lock; yields its directory, None if there is no such job."""
+        while True:
+            job_dir = self.job_dir(job_id)
+            try:
+                lock = (job_dir / "job.lock").open("a")
+            except FileNotFoundError:
+                yield None
+                return
+            with lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # The lock file moves with the directory: whoever held it may have moved the job.
+                if self.job_dir(job_id) == job_dir:
+                    yield job_dir
+                    return
+
+    def move_to_shard(self, job_id: str) -> bool:
+        """
+        Moves a finished job from the flat layout into its shard, under the
+        job's lock. Jobs still queued or running stay put: their runs write
+        into the directory by path. Returns whether the job moved.
+        """
+        target = self._layout.sharded_dir(job_id)
+        if target is None:
+            return False
+        with self._locked(job_id) as job_dir:
+            if job_dir is None or job_dir == target:
+                return False
+            rec = self.get(job_id)
+            if rec is None or rec.status not in {"succeeded", "failed"}:
+                return False
+            target.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.rename(job_dir, target)
+            except OSError as exc:
+                if exc.errno in (errno.EEXIST, errno.ENOTEMPTY):
+                    return False  # both layouts hold the id; left for an operator to look at
+                raise
+            return True
+
+    def iter_records(self) -> Iterator[JobRecord]:
+        for p in self._layout.iter_dirs():
             rec = self.get(p.name)
             if rec is not None:
-                recs.append(rec)
-        recs.sort(key=lambda r: r.created_at, reverse=True)
+                yield rec
+
+    def iter_raw(self) -> Iterator[dict[str, Any]]:
+        """
+        `job.json` contents as stored, in job id order (creation second, then
+        random suffix). Skips model validation and the record cache; for bulk readers.
+        """
+        for p in self._layout.iter_dirs():
+            try:
+                data = _read_bytes(p / "job.json")
+            except FileNotFoundError:
+                try:  # moved into its shard since the listing
+                    data = _read_bytes(self.job_dir(p.name) / "job.json")
+                except FileNotFoundError:
+                    continue
+            yield json.loads(data)
+
+    def list(self, *, limit: int, offset: int) -> list[JobRecord]:
+        """Newest first. Reads day by day, newest day first, and stops once the page is covered."""
+        recs: list[JobRecord] = []
+        for group in self._layout.iter_days():
+            day = [r for r in (self.get(p.name) for p in group) if r is not None]
+            day.sort(key=lambda r: r.created_at, reverse=True)
+            recs += day
+            if len(recs) >= offset + limit:
+                break
         return recs[offset : offset + limit]
 
+    def list_unfinished(self) -> list[JobRecord]:
+        """Queued and running jobs, oldest first (the order they were submitted in)."""
+        recs = [r for r in self.iter_records() if r.status in {"queued", "running"}]
+        recs.sort(key=lambda r: r.created_at)
+        return recs
+
     def count(self) -> int:
-        n = 0
-        for p in self._jobs_dir.iterdir():
-            if p.is_dir():
-                n += 1
-        return n
+        return self._layout.count()
 
     def write_result(self, job_id: str, result: dict[str, Any]) -> None:
-        p = self._result_json_path(job_id)
-        p.write_text(json.dumps(result, indent=2, default=str) + "\n", encoding="utf-8")
+        text = json.dumps(result, indent=2, default=str) + "\n"
+        self._in_job_dir(job_id, "result.json", lambda p: _write_text_atomic(p, text))
 
     def read_result(self, job_id: str) -> dict[str, Any] | None:
-        p = self._result_json_path(job_id)
-        if not p.exists():
+        try:
+            return json.loads(self._in_job_dir(job_id, "result.json", _read_bytes))
+        except FileNotFoundError:
             return None
-        return json.loads(p.read_text(encoding="utf-8"))
 
     def _write_job(self, rec: JobRecord) -> None:
-        p = self._job_json_path(rec.job_id)
-        p.write_text(json.dumps(rec.model_dump(mode="json"), indent=2) + "\n", encoding="utf-8")
+        text = json.dumps(rec.model_dump(mode="json"), indent=2) + "\n"
+        with JOB_WRITE_SECONDS.time():
+            stamp = self._in_job_dir(rec.job_id, "job.json", lambda p: _write_text_atomic(p, text))
+        self._cache.put(rec.job_id, stamp, rec)
+
+
+@dataclass
+class _Finishing:
+    """A job whose GPU stage ended, waiting for its post-processing future."""
+
+    rec: JobRecord
+    cascade: dict[str, Any]
+    outputs: RunOutputs
+    future: Future[AlphaFoldMultimerRunResult]
+    handed_off_at: float  # time.monotonic()
 
 
 class JobManager:
-    def __init__(self, *, store: JobStore, runner: AlphaFoldMultimerRunner) -> None:
+    def __init__(
+        self,
+        *,
+        store: JobStore,
+        runner: AlphaFoldMultimerRunner,
+        uniprot: UniProtClient | None = None,
+        prefetch_depth: int = 8,
+        sequence_prefetch_jobs: int = 50,
+        cascade_threshold: float = 0.5,
+        cascade_metric: str = "ranking_confidence",
+        artifact_store: ArtifactStore | None = None,
+        retention: RetentionManager | None = None,
+        partner_index: PartnerIndex | None = None,
+        webhooks: WebhookOutbox | None = None,
+        work_queue: SqliteWorkQueue | None = None,
+        worker_id: str | None = None,
+        poll_s: float = 2.0,
+        postprocess_workers: int = 2,
+    ) -> None:
         self._store = store
+        self._artifact_store = artifact_store
+        self._retention = retention
+        self._partner_index = partner_index
+        self._webhooks = webhooks
         self._runner = runner
-        self._q: "queue.Queue[str]" = queue.Queue()
+        self._uniprot = uniprot
+        self._prefetch_depth = prefetch_depth
+        self._sequence_prefetch_jobs = sequence_prefetch_jobs
+        self._cascade_threshold = cascade_threshold
+        self._cascade_metric = cascade_metric
+        self._queue = work_queue or SqliteWorkQueue(store.data_dir / "queue.sqlite3")
+        self._worker_id = worker_id or default_worker_id()
+        self._poll_s = poll_s
+        self._wakeup = threading.Event()
+        self._lease_mutex = threading.Lock()
+        # job_id -> lease, held from claim until post-processing is done
+        self._leases: dict[str, Lease] = {}
+        self._postprocess_workers = postprocess_workers
+        self._pool: Executor | None = None
+        self._pool_mutex = threading.Lock()
+        # Bounded: when post-processing falls behind, the GPU worker waits instead of piling up jobs.
+        self._finishing: "queue.Queue[_Finishing]" = queue.Queue(maxsize=max(postprocess_workers, 1) * 2)
         self._worker = threading.Thread(target=self._loop, name="job-worker", daemon=True)
+        self._finisher = threading.Thread(target=self._finish_loop, name="job-finish", daemon=True)
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        self._prefetcher = threading.Thread(target=self._prefetch_loop, name="job-prefetch", daemon=True)
+        self._prefetch_wakeup = threading.Event()
+        self._prefetch_mutex = threading.Lock()
+        self._prepared: set[str] = set()
+        self._inflight: dict[str, threading.Event] = {}
+        self._claimed: set[str] = set()
+        # When the last GPU stage gave the GPU back (worker thread only; see `_loop`).
+        self._gpu_released_at: float | None = None
         self._started = False
 
-    def start(self) -> None:
+    def start(self, *, worker: bool = True) -> None:
+        """
+        `worker=False` leaves running jobs to separate worker processes
+        (`python -m alphafold_multimer_service.worker`) sharing the data dir.
+        """
         if self._started:
             return
         self._started = True
+        if not worker:
+            self._requeue_unfinished()
+            return
+        # Leases a previous incarnation of this worker held are void: take them back now rather than at expiry.
+        self._queue.release_owner(self._worker_id)
+        self._requeue_unfinished()
         self._worker.start()
+        self._finisher.start()
+        self._heartbeat.start()
+        if self._prefetch_depth > 0:
+            self._prefetcher.start()
+
+    def shutdown(self) -> None:
+        """Hands held jobs back to the queue so another worker resumes them without waiting for expiry."""
+        with self._lease_mutex:
+            leases, self._leases = list(self._leases.values()), {}
+        for lease in leases:
+            self._queue.release(lease)
+        with self._pool_mutex:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def queue(self) -> SqliteWorkQueue:
+        return self._queue
 
     @property
     def store(self) -> JobStore:
         return self._store
 
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
     def submit_alphafold_multimer(
         self,
         *,
-        protein_a_ref: str,
-        protein_b_ref: str,
+        proteins: list[dict[str, Any]],
         preset: str,
         options: dict[str, Any] | None,
+        screen: str | None = None,
+        callback: dict[str, Any] | None = None,
     ) -> JobRecord:
-        rec = self._store.create_job(
-            service="alphafold-multimer",
-            request={
-                "protein_a": {"uniprot": protein_a_ref},
-                "protein_b": {"uniprot": protein_b_ref},
-                "preset": preset,
-                "options": options or {},
-            },
-        )
-        self._q.put(rec.job_id)
+        """Protein refs are expected in normalized form (see `sequences.normalize_protein_ref`)."""
+        request: dict[str, Any]
+        if len(proteins) == 2 and not any(p.get("copies") for p in proteins):
+            request = {"protein_a": proteins[0], "protein_b": proteins[1]}
+        else:
+            request = {"proteins": proteins}
+        request.update({"preset": preset, "options": options or {}})
+        if screen:
+            request["screen"] = screen
+        if callback:
+            request["callback"] = callback
+        rec = self._store.create_job(service="alphafold-multimer", request=request)
+        self._queue.put(rec.job_id)
+        JOBS_SUBMITTED.inc()
+        self._wakeup.set()
+        self._prefetch_wakeup.set()
         return rec
 
+    def _requeue_unfinished(self) -> None:
+        """
+        Puts unfinished jobs that are missing from the work queue (data dirs
+        from before it existed, or a lost queue file) back on it. A job that
+        was running resumes from its work dir: the runner keeps the MSA and
+        any models that finished before the restart.
+        """
+        for rec in self._store.list_unfinished():
+            if rec.job_id in self._queue:
+                # waiting, or leased: its worker runs it, or the lease expires and another one does
+                continue
+            if rec.status == "running":
+                rec = rec.model_copy(
+                    update={
+                        "status": "queued",
+                        "progress": {"stage": "requeued", "message": "Requeued after restart", "percent": 0},
+                        "trace": open_span(close_spans(rec.trace), "queued", cat="stage", attempt=rec.attempts + 1),
+                    }
+                )
+                self._store.update(rec)
+            self._queue.put(rec.job_id)
+        self._wakeup.set()
+        self._prefetch_wakeup.set()
+
     def _loop(self) -> None:
+        idle_since = time.monotonic()
         while True:
-            job_id = self._q.get()
+            lease = self._queue.claim(self._worker_id)
+            if lease is None:
+                # Submissions in this process wake us up; other processes' are seen on the next poll.
+                self._wakeup.wait(timeout=self._poll_s)
+                self._wakeup.clear()
+                continue
+            busy_since = time.monotonic()
+            WORKER_IDLE_SECONDS.observe(busy_since - idle_since)
+            JOBS_IN_STAGE.inc(stage="gpu")
+            job_id = lease.job_id
+            with self._lease_mutex:
+                self._leases[job_id] = lease
+            self._prefetch_wakeup.set()
+            handed_off = False
             try:
-                self._run_one(job_id)
+                self._wait_for_prefetch(job_id)
+                handed_off = self._run_one(job_id)
             except Exception as e:
-                rec = self._store.get(job_id)
-                if rec is not None:
-                    rec = rec.model_copy(
-                        update={
-                            "status": "failed",
-                            "finished_at": utc_now(),
-                            "error": f"{type(e).__name__}: {e}",
-                            "progress": {"stage": "failed", "message": "Failed", "percent": 100},
-                        }
+                self._mark_failed(job_id, e)
+            finally:
+                with self._prefetch_mutex:
+                    self._claimed.discard(job_id)
+                if not handed_off:
+                    self._ack(job_id)
+                # Waiting for a post-processing slot counts as idle: the GPU is free by then.
+                idle_since = self._gpu_released_at or time.monotonic()
+                self._gpu_released_at = None
+                WORKER_BUSY_SECONDS.inc(max(idle_since - busy_since, 0.0))
+                JOBS_IN_STAGE.dec(stage="gpu")
+
+    def _ack(self, job_id: str) -> None:
+        with self._lease_mutex:
+            lease = self._leases.pop(job_id, None)
+        if lease is not None:
+            # no-op when the job was re-queued meanwhile (cascade escalation)
+            self._queue.ack(lease)
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            time.sleep(self._queue.lease_s / 3)
+            with self._lease_mutex:
+                leases = list(self._leases.values())
+            for lease in leases:
+                try:
+                    renewed = self._queue.heartbeat(lease)
+                except Exception:
+                    continue  # e.g. database busy; the lease has slack for a missed beat
+                with self._lease_mutex:
+                    if self._leases.get(lease.job_id) is not lease:
+                        continue
+                    if renewed is None:
+                        del self._leases[lease.job_id]
+                    else:
+                        self._leases[lease.job_id] = renewed
+
+    def _postprocess_pool(self) -> Executor:
+        with self._pool_mutex:
+            if self._pool is None:
+                if self._postprocess_workers > 0:
+                    # spawn, not fork: this process has threads (and SQLite connections) a fork would copy mid-use
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self._postprocess_workers, mp_context=multiprocessing.get_context("spawn")
                     )
-                    self._store.update(rec)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-postprocess")
+            return self._pool
+
+    def _finish_loop(self) -> None:
+        while True:
+            item = self._finishing.get()
+            job_id = item.rec.job_id
+            try:
+                try:
+                    result = item.future.result()
+                except BrokenProcessPool:
+                    # A pool process died (e.g. OOM-killed): later jobs get a fresh pool, this one is redone here.
+                    with self._pool_mutex:
+                        self._pool = None
+                    result = postprocess_outputs(item.outputs)
+                STAGE_SECONDS.observe(time.monotonic() - item.handed_off_at, stage="postprocessing")
+                self._finish(item.rec, item.cascade, result)
+            except Exception as e:
+                self._mark_failed(job_id, e, stage="postprocessing")
             finally:
-                self._q.task_done()
+                JOBS_IN_STAGE.dec(stage="postprocessing")
+                self._ack(job_id)
+
+    def _mark_failed(
+        self, job_id: str, exc: Exception, *, stage: str = "failed", statuses: set[str] | None = None
+    ) -> None:
+        """Fails the job; with `statuses`, only if it still has one of them (see `JobStore.update_if`)."""
+        update = {
+            "status": "failed",
+            "finished_at": utc_now(),
+            "error": f"{type(exc).__name__}: {exc}",
+            "progress": {"stage": stage, "message": "Failed", "percent": 100},
+        }
+
+        def fail(rec: JobRecord) -> JobRecord:
+            return rec.model_copy(update={**update, "trace": close_spans(rec.trace)})
 
-    def _run_one(self, job_id: str) -> None:
+        if statuses is not None:
+            failed = self._store.update_if(job_id, statuses, fail)
+            if failed is not None:
+                JOBS_FINISHED.inc(status="failed")
+                self._notify(failed)
+            return
         rec = self._store.get(job_id)
         if rec is None:
             return
+        failed = fail(rec)
+        self._store.update(failed)
+        JOBS_FINISHED.inc(status="failed")
+        self._notify(failed)
+
+    def _notify(self, rec: JobRecord, *, primary_score: dict[str, Any] | None = None) -> None:
+        """Queues the completion webhook of a job submitted with a callback (after its terminal write)."""
+        callback = (rec.request or {}).get("callback")
+        if self._webhooks is None or not callback:
+            return
+        event = job_event(
+            job_id=rec.job_id,
+            status=rec.status,
+            finished_at=rec.finished_at.isoformat() if rec.finished_at else None,
+            screen=rec.request.get("screen"),
+            primary_score=primary_score,
+            error=rec.error,
+        )
+        try:
+            self._webhooks.enqueue(callback["url"], event, batch=bool(callback.get("batch")))
+        except Exception:
+            pass  # the job's outcome stands; a lost notification must not fail it
+
+    def _pending_job_ids(self) -> list[str]:
+        # Snapshot of queued ids without consuming them.
+        return self._queue.pending(limit=self._sequence_prefetch_jobs)
+
+    def _wait_for_prefetch(self, job_id: str) -> None:
+        # Claim the job so the prefetcher leaves it alone from now on; if it is
+        # being prepared right now, let that finish instead of fetching twice.
+        with self._prefetch_mutex:
+            self._claimed.add(job_id)
+            ev = self._inflight.get(job_id)
+            self._prepared.discard(job_id)
+        if ev is not None:
+            ev.wait()
+
+    def _prefetch_loop(self) -> None:
+        while True:
+            self._prefetch_wakeup.wait()
+            self._prefetch_wakeup.clear()
+            try:
+                self._prefetch_pending()
+            except Exception:
+                # Prefetch is an optimization; the worker prepares inline on miss.
+                pass
+
+    def _prefetch_pending(self) -> None:
+        """
+        Prepares inputs (UniProt fetch, validation, input FASTA) for the next
+        `prefetch_depth` queued jobs while the worker keeps the GPU busy.
+        Invalid inputs fail the job here instead of at the head of the queue.
+        """
+        pending = self._pending_job_ids()
+        recs = [r for r in (self._store.get(jid) for jid in pending[: self._sequence_prefetch_jobs]) if r is not None]
+        recs = [r for r in recs if r.status == "queued"]
+        for job_id, exc in self._fetch_sequences_bulk(recs).items():
+            self._prefetch_guarded(
+                job_id, lambda jid=job_id, e=exc: self._mark_failed(jid, e, stage="prefetch", statuses={"queued"})
+            )
+        for rec in recs[: self._prefetch_depth]:
+            self._prefetch_guarded(rec.job_id, lambda jid=rec.job_id: self._prepare_one(jid))
+
+    def _prefetch_guarded(self, job_id: str, fn: Callable[[], None]) -> None:
+        # Never touch a job the worker has claimed; the worker waits for us
+        # if it claims the job while we are in the middle of it.
+        with self._prefetch_mutex:
+            if job_id in self._prepared or job_id in self._inflight or job_id in self._claimed:
+                return
+            done = threading.Event()
+            self._inflight[job_id] = done
+        JOBS_IN_STAGE.inc(stage="prefetch")
+        try:
+            fn()
+        finally:
+            JOBS_IN_STAGE.dec(stage="prefetch")
+            with self._prefetch_mutex:
+                self._inflight.pop(job_id, None)
+            done.set()
+
+    def _prepare_one(self, job_id: str) -> None:
+        rec = self._store.get(job_id)
+        if rec is None or rec.status != "queued":
+            return
+        if rec.chains:
+            # already resolved (e.g. cascade job re-queued for its full stage)
+            with self._prefetch_mutex:
+                self._prepared.add(job_id)
+            return
+        try:
+            with STAGE_SECONDS.time(stage="fetch"):
+                prepared = self._prepare_inputs(rec)
+        except ValueError as e:
+            self._mark_failed(job_id, e, stage="prefetch", statuses={"queued"})
+            return
+        except Exception:
+            # Transient (network etc.): leave it to the worker.
+            return
+        with self._prefetch_mutex:
+            self._prepared.add(job_id)
+        if prepared is not None:
+            # A worker elsewhere may have claimed the job meanwhile: only a still-queued record is updated.
+            progress = {"stage": "queued", "message": "Queued (inputs ready)", "percent": 0}
+            self._store.update_if(
+                job_id,
+                {"queued"},
+                lambda cur: self._with_chains(cur, prepared).model_copy(update={"progress": progress}),
+            )
+
+    def _prepare_inputs(self, rec: JobRecord) -> PreparedInputs | None:
+        req = rec.request
+        return self._runner.prepare_inputs(
+            job_id=rec.job_id,
+            job_dir=self._store.job_dir(rec.job_id),
+            proteins=request_proteins(req),
+        )
+
+    @staticmethod
+    def _with_chains(rec: JobRecord, prepared: PreparedInputs) -> JobRecord:
+        chains = [{"chain_id": chain_id(i), **c.to_record()} for i, c in enumerate(prepared.chains)]
+        return rec.model_copy(
+            update={"chains": chains, "input_sha256": complex_sha256([c["sha256"] for c in chains])}
+        )
+
+    def _fetch_sequences_bulk(self, recs: list[JobRecord]) -> dict[str, Exception]:
+        """
+        Resolves UniProt sequences for a window of queued jobs with batched
+        UniProt queries, so `prepare_inputs` hits a warm cache. Returns the
+        jobs that reference accessions UniProt does not know.
+        """
+        if self._uniprot is None or not recs:
+            return {}
+        by_uniprot_id: dict[str, list[str]] = {}
+        for rec in recs:
+            for protein in request_proteins(rec.request):
+                ref = protein.get("uniprot")
+                if not ref:
+                    continue
+                try:
+                    by_uniprot_id.setdefault(extract_uniprot_id(ref), []).append(rec.job_id)
+                except ValueError:
+                    continue
+        if not by_uniprot_id:
+            return {}
+        res = self._uniprot.fetch_many(by_uniprot_id)
+        failed: dict[str, Exception] = {}
+        for uid in sorted(res.not_found):
+            for jid in by_uniprot_id.get(uid, []):
+                failed.setdefault(jid, ValueError(f"UniProt accession not found: {uid}"))
+        return failed
+
+    def _run_one(self, job_id: str) -> bool:
+        """
+        Runs the GPU stage of a job. Returns True when the job was handed to
+        post-processing, which finishes it (and acks its lease) later.
+        """
+        # Under the job's file lock, so a prefetcher in another process cannot write back its
+        # stale "queued" copy over this. Not queued/running: e.g. already failed at prefetch
+        # time; "running" means a lease expired and we take over.
+        rec = self._store.update_if(
+            job_id,
+            {"queued", "running"},
+            lambda cur: cur.model_copy(
+                update={
+                    "status": "running",
+                    "started_at": cur.started_at or utc_now(),
+                    "attempts": cur.attempts + 1,
+                    "worker": self._worker_id,
+                    # ends the wait in the queue, and the spans of an attempt whose worker went away
+                    "trace": close_spans(cur.trace),
+                }
+            ),
+        )
+        if rec is None:
+            return False
+
+        stage_started = time.monotonic()
+        # Progress stages reported by the runner are spans inside the enclosing "run" span.
+        span_cat = "stage"
+        open_spans: dict[str, str | None] = {"stage": None, "runner": None}
 
         def progress_cb(stage: str, message: str, percent: float | None) -> None:
-            nonlocal rec
+            nonlocal rec, stage_started
+            if stage != rec.progress.get("stage"):
+                now = time.monotonic()
+                STAGE_SECONDS.observe(now - stage_started, stage=rec.progress.get("stage") or "queued")
+                stage_started = now
+            trace = rec.trace
+            if open_spans[span_cat] != stage:
+                open_spans[span_cat] = stage
+                trace = open_span(close_spans(trace, cat=span_cat), stage, cat=span_cat, attempt=rec.attempts)
             prog = {"stage": stage, "message": message}
             if percent is not None:
                 prog["percent"] = float(percent)
-            rec = rec.model_copy(update={"progress": prog})
+            rec = rec.model_copy(update={"progress": prog, "trace": trace})
             self._store.update(rec)
 
-        rec = rec.model_copy(update={"status": "running", "started_at": utc_now()})
-        self._store.update(rec)
         progress_cb("start", "Starting job", 0)
 
+        if not rec.chains:
+            # Not prefetched: resolve inputs inline.
+            progress_cb("fetch", "Resolving input sequences", 1)
+            prepared = self._prepare_inputs(rec)
+            if prepared is not None:
+                rec = self._with_chains(rec, prepared)
+                self._store.update(rec)
+
         req = rec.request
         options = req.get("options") or {}
         num_recycles_override = options.get("num_recycles")
+        preset = req.get("preset") or "fast"
 
         job_dir = self._store.job_dir(job_id)
-        result = self._runner.run_pair(
+        msa_path: Path | None = None
+        cascade = dict(rec.cascade or {})
+        if preset == "cascade":
+            cascade.setdefault("stage", "screen")
+            cascade.setdefault("metric", options.get("cascade_metric") or self._cascade_metric)
+            threshold = options.get("cascade_threshold")
+            cascade.setdefault("threshold", float(threshold if threshold is not None else self._cascade_threshold))
+            if cascade["stage"] == "screen":
+                preset = "screen"
+                # the screen pass has a fixed cheap configuration
+                num_recycles_override = None
+            else:
+                preset = "full"
+                if cascade.get("msa_path"):
+                    msa_path = Path(cascade["msa_path"])
+
+        run_trace = close_spans(rec.trace, cat="stage")
+        run_trace = open_span(run_trace, "run", cat="stage", attempt=rec.attempts, preset=preset, worker=self._worker_id)
+        open_spans["stage"] = "run"
+        rec = rec.model_copy(update={"trace": run_trace})
+        span_cat = "runner"
+        outputs = self._runner.run_inference(
             job_id=job_id,
             job_dir=job_dir,
-            protein_a_ref=req["protein_a"]["uniprot"],
-            protein_b_ref=req["protein_b"]["uniprot"],
-            preset=req.get("preset") or "fast",
+            proteins=request_proteins(req),
+            preset=preset,
             num_recycles_override=num_recycles_override,
+            msa_path=msa_path,
             progress_cb=progress_cb,
         )
+        self._gpu_released_at = time.monotonic()
+        span_cat = "stage"
+        rec = rec.model_copy(update={"trace": close_spans(rec.trace)})
+        if isinstance(outputs, AlphaFoldMultimerRunResult):
+            self._store.update(rec)
+            STAGE_SECONDS.observe(self._gpu_released_at - stage_started, stage=rec.progress.get("stage") or "run")
+            self._finish(rec, cascade, outputs)
+            return False
+
+        # The container is done with the GPU: parse and promote elsewhere and take the next job.
+        progress_cb("postprocessing", "Parsing outputs and verifying chain lengths", 90)
+        future = self._postprocess_pool().submit(postprocess_outputs, outputs)
+        JOBS_IN_STAGE.inc(stage="postprocessing")
+        self._finishing.put(
+            _Finishing(rec=rec, cascade=cascade, outputs=outputs, future=future, handed_off_at=time.monotonic())
+        )
+        return True
+
+    def _finish(self, rec: JobRecord, cascade: dict[str, Any], result: AlphaFoldMultimerRunResult) -> None:
+        job_id = rec.job_id
+        if cascade.get("stage") == "screen":
+            value = float(result.metrics[cascade["metric"]])
+            cascade["screen"] = {"metrics": result.metrics, "verification": result.verification}
+            cascade["escalated"] = value >= cascade["threshold"]
+            if cascade["escalated"]:
+                self._escalate(rec, cascade, value)
+                return
+        elif cascade.get("stage") == "full":
+            cascade["full"] = {"metrics": result.metrics, "verification": result.verification}
+
+        artifacts = result.artifacts
+        if self._artifact_store is not None:
+            artifacts = self._artifact_store.ingest(job_id, artifacts)
 
         # Convert runner artifacts into API-facing artifact descriptors.
         api_artifacts: list[dict[str, Any]] = []
-        for a in result.artifacts:
+        for a in artifacts:
             name = a["name"]
             api_artifacts.append(
                 {
@@ -215,6 +908,7 @@ class JobManager:
                     "url": f"/api/v1/jobs/{job_id}/artifacts/{name}",
                     "media_type": a.get("media_type"),
                     "size_bytes": a.get("size_bytes"),
+                    "sha256": a.get("sha256"),
                 }
             )
 
@@ -227,6 +921,10 @@ class JobManager:
             "verification": result.verification,
             "artifacts": api_artifacts,
         }
+        if cascade:
+            api_result["cascade"] = self._cascade_summary(cascade)
+        trace = close_spans(rec.trace)
+        api_result["timings"] = stage_seconds(trace)
         self._store.write_result(job_id, api_result)
 
         rec = rec.model_copy(
@@ -234,6 +932,67 @@ class JobManager:
                 "status": "succeeded",
                 "finished_at": utc_now(),
                 "progress": {"stage": "done", "message": "Succeeded", "percent": 100},
+                "cascade": cascade or None,
+                "resume": result.resume,
+                "trace": trace,
             }
         )
         self._store.update(rec)
+        JOBS_FINISHED.inc(status="succeeded")
+        self._notify(rec, primary_score=api_result["primary_score"])
+        if self._partner_index is not None:
+            self._partner_index.add(
+                job_id=job_id, created_at=rec.created_at.isoformat(), chains=rec.chains, result=api_result
+            )
+        if self._retention is not None:
+            self._retention.notify_succeeded(job_id)
+
+    def _escalate(self, rec: JobRecord, cascade: dict[str, Any], value: float) -> None:
+        """
+        Screen pass cleared the threshold: keep its outputs aside and put the
+        job back at the end of the queue for the full run, which reuses the
+        screen MSA instead of querying the MSA server again.
+        """
+        job_dir = self._store.job_dir(rec.job_id)
+        screen_work = job_dir / "work" / "screen"
+        if (job_dir / "work" / "out").exists():
+            (job_dir / "work" / "out").replace(screen_work)
+        if (job_dir / "work" / "resume").exists():
+            # Screen models taken over from an interrupted screen attempt: the full
+            # run must not count them as its own finished models.
+            screen_work.mkdir(parents=True, exist_ok=True)
+            (job_dir / "work" / "resume").replace(screen_work / "resume")
+        if (job_dir / "artifacts").exists():
+            (job_dir / "artifacts").replace(job_dir / "screen_artifacts")
+        a3m = (
+            sorted(screen_work.glob("*.a3m"))
+            + sorted((screen_work / "resume").glob("*.a3m"))
+            + sorted((job_dir / "screen_artifacts").glob("*.a3m"))
+        )
+        cascade.update({"stage": "full", "msa_path": str(a3m[0]) if a3m else None})
+
+        msg = f"Queued for full run ({cascade['metric']}={value:.3f} >= {cascade['threshold']})"
+        rec = rec.model_copy(
+            update={
+                "status": "queued",
+                "cascade": cascade,
+                "progress": {"stage": "cascade", "message": msg, "percent": 0},
+                "trace": open_span(close_spans(rec.trace), "queued", cat="stage", attempt=rec.attempts + 1),
+            }
+        )
+        self._store.update(rec)
+        self._queue.put(rec.job_id)
+        self._wakeup.set()
+        self._prefetch_wakeup.set()
+
+    @staticmethod
+    def _cascade_summary(cascade: dict[str, Any]) -> dict[str, Any]:
+        stages = [{"stage": "screen", **cascade["screen"]}]
+        if "full" in cascade:
+            stages.append({"stage": "full", **cascade["full"]})
+        return {
+            "metric": cascade["metric"],
+            "threshold": cascade["threshold"],
+            "escalated": bool(cascade.get("escalated")),
+            "stages": stages,
+        }
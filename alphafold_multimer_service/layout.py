@@ -0,0 +1,183 @@
+"""
+Where job directories live under `<data_dir>/jobs/`.
+
+Job ids start with their creation date (`job_YYYYMMDD_HHMMSS_<hex>`). The
+sharded layout files each job under one directory per day,
+`jobs/YYYYMMDD/<job_id>/`, so no directory grows beyond a day of jobs; the
+flat layout, `jobs/<job_id>/`, is what data dirs written before it hold.
+Lookups accept both: a job is wherever it is found, shard first, and new jobs
+go where the configured layout puts them. `python -m
+alphafold_multimer_service.migrate_layout` moves flat jobs into their shards
+with the service running.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import re
+import threading
+import time
+from typing import Iterator
+
+LAYOUTS = ("sharded", "flat")
+
+_JOB_ID_RE = re.compile(r"^job_(\d{8})_\d{6}_[0-9a-f]+$")
+_SHARD_RE = re.compile(r"^\d{8}$")
+# Directory mtimes this recent may not have ticked yet for a change that just happened (coarse
+# filesystem timestamps), so counts cached against them are not trusted.
+_RACY_S = 2.0
+
+
+def shard_of(job_id: str) -> str | None:
+    """Shard directory name of a job id (its creation day), None for ids without a date."""
+    m = _JOB_ID_RE.match(job_id)
+    return m.group(1) if m else None
+
+
+class JobLayout:
+    """
+    Resolves job ids to directories under `jobs_dir`, in either layout.
+    Every answer comes from the filesystem, so processes with different
+    `sharded` settings (e.g. during a rolling upgrade) agree on where
+    existing jobs are; the only state is a cache of per-shard job counts,
+    valid while the shard's mtime is unchanged.
+    """
+
+    def __init__(self, jobs_dir: Path, *, sharded: bool = True) -> None:
+        self._jobs_dir = jobs_dir
+        self._sharded = sharded
+        self._counts_lock = threading.Lock()
+        self._counts: dict[str, tuple[int, int]] = {}  # shard -> (mtime_ns, jobs)
+
+    @property
+    def jobs_dir(self) -> Path:
+        return self._jobs_dir
+
+    def sharded_dir(self, job_id: str) -> Path | None:
+        shard = shard_of(job_id)
+        return self._jobs_dir / shard / job_id if shard is not None else None
+
+    def flat_dir(self, job_id: str) -> Path:
+        return self._jobs_dir / job_id
+
+    def candidates(self, job_id: str) -> list[Path]:
+        """Places the job may be, in lookup order (a flat job only ever moves into its shard)."""
+        sharded = self.sharded_dir(job_id)
+        return [sharded, self.flat_dir(job_id)] if sharded is not None else [self.flat_dir(job_id)]
+
+    def new_dir(self, job_id: str) -> Path:
+        """Where a job created now goes."""
+        sharded = self.sharded_dir(job_id) if self._sharded else None
+        return sharded or self.flat_dir(job_id)
+
+    def job_dir(self, job_id: str) -> Path:
+        """The job's directory if it exists in either layout, else where a new one would go."""
+        for d in self.candidates(job_id):
+            if d.is_dir():
+                return d
+        return self.new_dir(job_id)
+
+    def iter_dirs(self) -> Iterator[Path]:
+        """
+        Every job directory in both layouts, in job id order. A job moved into
+        its shard while the scan runs is yielded once, possibly at its old path.
+        """
+        found: dict[str, str] = {}
+        try:
+            root = list(os.scandir(self._jobs_dir))
+        except FileNotFoundError:
+            return
+        # scandir's entry types come with the listing: no stat per job, and a job
+        # moved after the listing is still counted at the path it was seen at.
+        for entry in root:
+            if not entry.is_dir():
+                continue
+            if not _SHARD_RE.match(entry.name):
+                found.setdefault(entry.name, entry.path)
+                continue
+            with os.scandir(entry.path) as shard:
+                for job in shard:
+                    if job.is_dir():
+                        found[job.name] = job.path
+        for job_id in sorted(found):
+            yield Path(found[job_id])
+
+    def iter_days(self) -> Iterator[list[Path]]:
+        """
+        Job directories grouped by creation day, newest day first, then ids
+        without a date. A reader wanting the newest jobs lists only the shards
+        it gets to; a job is in the group of its day in either layout.
+        """
+        try:
+            root = list(os.scandir(self._jobs_dir))
+        except FileNotFoundError:
+            return
+        shards: set[str] = set()
+        flat: dict[str, list[str]] = {}
+        undated: list[Path] = []
+        for entry in root:
+            if not entry.is_dir():
+                continue
+            if _SHARD_RE.match(entry.name):
+                shards.add(entry.name)
+            elif (day := shard_of(entry.name)) is not None:
+                flat.setdefault(day, []).append(entry.path)
+            else:
+                undated.append(Path(entry.path))
+        for day in sorted(shards | flat.keys(), reverse=True):
+            found = {os.path.basename(p): p for p in flat.get(day, [])}
+            if day in shards:
+                try:
+                    with os.scandir(os.path.join(self._jobs_dir, day)) as shard:
+                        found.update((job.name, job.path) for job in shard if job.is_dir())
+                except FileNotFoundError:
+                    pass
+            yield [Path(p) for p in found.values()]
+        if undated:
+            yield undated
+
+    def count(self) -> int:
+        """
+        Job directories in both layouts. A shard is listed only when its
+        mtime moved since it was last counted (a job created or moved in), so
+        this costs a stat per day plus the listing of today's shard. A job
+        moved into its shard while this runs may be counted twice.
+        """
+        try:
+            root = list(os.scandir(self._jobs_dir))
+        except FileNotFoundError:
+            return 0
+        n = 0
+        for entry in root:
+            if not entry.is_dir():
+                continue
+            if not _SHARD_RE.match(entry.name):
+                n += 1
+                continue
+            try:
+                mtime_ns = entry.stat().st_mtime_ns
+                with self._counts_lock:
+                    cached = self._counts.get(entry.name)
+                if cached is not None and cached[0] == mtime_ns:
+                    n += cached[1]
+                    continue
+                with os.scandir(entry.path) as shard:
+                    jobs = sum(1 for job in shard if job.is_dir())
+            except FileNotFoundError:
+                continue
+            n += jobs
+            if time.time_ns() - mtime_ns > _RACY_S * 1e9:
+                with self._counts_lock:
+                    self._counts[entry.name] = (mtime_ns, jobs)
+        return n
+
+    def iter_flat(self) -> Iterator[str]:
+        """Ids of jobs still in the flat layout that have a shard to move to."""
+        try:
+            names = sorted(os.listdir(self._jobs_dir))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if shard_of(name) is not None and (self._jobs_dir / name).is_dir():
+                yield name
@@ -0,0 +1,194 @@
+"""
+Live container logs.
+
+The runner writes `artifacts/docker.log.txt` through a `LogWriter`: file
+writes are buffered (flushed at most `flush_s` after they were written, also
+when no more output follows, or before the ring would drop unflushed bytes),
+and the most recent bytes stay in an in-memory ring buffer that readers in
+the same process serve from without waiting for a flush.
+Byte offsets are those of the file, so a client resumes where it stopped
+whether the bytes come from the ring or from disk.
+"""
+
+from __future__ import annotations
+
+import gzip
+from pathlib import Path
+import threading
+import time
+from typing import BinaryIO
+
+
+DOCKER_LOG = "docker.log.txt"
+
+
+class LogBuffer:
+    """The last `capacity` bytes written, addressed by absolute offset."""
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._data = bytearray()
+        self._start = 0  # offset of _data[0]
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def start(self) -> int:
+        return self._start
+
+    @property
+    def end(self) -> int:
+        return self._start + len(self._data)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def append(self, data: bytes) -> None:
+        with self._cond:
+            self._data += data
+            drop = len(self._data) - self._capacity
+            if drop > 0:
+                del self._data[:drop]
+                self._start += drop
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read(self, offset: int, limit: int) -> bytes | None:
+        """Bytes from `offset` (empty at the end); None when they already left the ring."""
+        with self._cond:
+            if offset < self._start:
+                return None
+            i = offset - self._start
+            return bytes(self._data[i : i + limit])
+
+    def wait(self, offset: int, timeout: float) -> None:
+        """Blocks until there are bytes past `offset`, the writer is done, or `timeout` passes."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.end > offset or self._closed, timeout=timeout)
+
+
+_LIVE_LOCK = threading.Lock()
+_LIVE: dict[Path, LogBuffer] = {}
+
+
+def live_buffer(path: Path) -> LogBuffer | None:
+    """Ring buffer of a log this process is writing right now."""
+    with _LIVE_LOCK:
+        return _LIVE.get(path.resolve())
+
+
+class LogWriter:
+    def __init__(self, path: Path, *, capacity: int = 1 << 20, flush_s: float = 1.0) -> None:
+        self._path = path.resolve()
+        self._buffer = LogBuffer(capacity)
+        self._flush_s = flush_s
+        self._f: BinaryIO | None = None
+        self._unflushed = 0
+        self._flushed_at = 0.0
+        # write vs the timer flushing output that was followed by silence (e.g. a long compile step)
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def __enter__(self) -> "LogWriter":
+        self._f = self._path.open("wb", buffering=1 << 16)
+        self._flushed_at = time.monotonic()
+        with _LIVE_LOCK:
+            _LIVE[self._path] = self._buffer
+        return self
+
+    def write(self, data: bytes) -> None:
+        with self._lock:
+            assert self._f is not None
+            self._f.write(data)
+            self._unflushed += len(data)
+            self._buffer.append(data)
+            # Readers fall back to the file for offsets the ring has dropped: those must be on disk.
+            if self._unflushed * 2 >= self._buffer.capacity or time.monotonic() - self._flushed_at >= self._flush_s:
+                self._flush()
+            elif self._timer is None:
+                # Readers in other processes only see the file: flush even if nothing else is written.
+                self._timer = threading.Timer(self._flush_s, self._flush_pending)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self) -> None:
+        assert self._f is not None
+        self._f.flush()
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+
+    def _flush_pending(self) -> None:
+        with self._lock:
+            self._timer = None
+            if self._f is not None and self._unflushed:
+                self._flush()
+
+    def __exit__(self, *exc: object) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            assert self._f is not None
+            self._f.close()
+            self._f = None
+        with _LIVE_LOCK:
+            if _LIVE.get(self._path) is self._buffer:
+                del _LIVE[self._path]
+        self._buffer.close()
+
+
+def read_log(path: Path, offset: int, limit: int, *, encoding: str | None = None) -> tuple[int, bytes]:
+    """
+    Up to `limit` bytes of the log at `path` from `offset`, from the ring
+    buffer while this process writes it. Returns (offset read from, bytes);
+    an offset past the end means the log was started over (e.g. by a new
+    attempt) and reading restarts at 0. `encoding="gzip"` reads a compacted
+    copy of a finished log.
+    """
+    buf = live_buffer(path)
+    if buf is not None:
+        if offset > buf.end:
+            offset = 0
+        data = buf.read(offset, limit)
+        if data is not None:
+            return offset, data
+        # Dropped from the ring, but flushed to the file before that.
+        limit = min(limit, buf.start - offset)
+    if encoding == "gzip":
+        with gzip.open(path, "rb") as f:
+            skipped = _skip(f, offset)
+            if skipped < offset:
+                return 0, _reread_gzip(path, limit)
+            return offset, f.read(limit)
+    try:
+        with path.open("rb") as f:
+            if offset > f.seek(0, 2):
+                offset = 0
+            f.seek(offset)
+            return offset, f.read(limit)
+    except FileNotFoundError:
+        return 0, b""
+
+
+def _skip(f: BinaryIO, n: int, chunk_size: int = 1 << 16) -> int:
+    done = 0
+    while done < n:
+        chunk = f.read(min(chunk_size, n - done))
+        if not chunk:
+            break
+        done += len(chunk)
+    return done
+
+
+def _reread_gzip(path: Path, limit: int) -> bytes:
+    with gzip.open(path, "rb") as f:
+        return f.read(limit)
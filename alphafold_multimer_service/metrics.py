@@ -0,0 +1,306 @@
+"""
+Process-local metrics in the Prometheus text exposition format (0.0.4).
+
+Instruments live in the module-level `REGISTRY` so any module records into
+them without plumbing; recording is a dict update under a per-metric lock.
+Processes that serve no HTTP (standalone workers) periodically write a JSON
+snapshot under `<data_dir>/metrics/`; the API's `/metrics` renders its own
+registry plus every fresh snapshot, labelled with the writing process.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+import json
+import math
+import os
+from pathlib import Path
+import re
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds. Job stages run from sub-second (parse) to hours (inference of large complexes).
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0, 7200.0)
+# Seconds. Single I/O operations and HTTP round trips.
+IO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _label_str(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[Labels, Any] = {}
+
+    def _key(self, labels: dict[str, str]) -> Labels:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> list[tuple[Labels, Any]]:
+        with self._lock:
+            return [(k, v.copy() if isinstance(v, dict) else v) for k, v in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def replace(self, values: dict[Labels, float]) -> None:
+        """Sets the whole label set at once (collectors computing a snapshot)."""
+        with self._lock:
+            self._values = {k: float(v) for k, v in values.items()}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Labels = (), *, buckets: tuple[float, ...]) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            h = self._values.get(key)
+            if h is None:
+                h = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            h["counts"][i] += 1
+            h["sum"] += value
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict[str, str]) -> None:
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._t0 = time.monotonic()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._histogram.observe(time.monotonic() - self._t0, **self._labels)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Labels = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Labels = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Labels = (), *, buckets: tuple[float, ...]) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets=buckets))
+
+    def add_collector(self, fn: Callable[[], None]) -> None:
+        """`fn` refreshes gauges that are cheaper to compute on scrape than to maintain."""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def remove_collector(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if fn in self._collectors:
+                self._collectors.remove(fn)
+
+    def snapshot(self) -> dict[str, Any]:
+        """JSON-compatible state of every metric, after running the collectors."""
+        with self._lock:
+            collectors, metrics = list(self._collectors), list(self._metrics.values())
+        for fn in collectors:
+            try:
+                fn()
+            except Exception:
+                pass  # a failing collector must not take the endpoint down
+        out: dict[str, Any] = {}
+        for m in metrics:
+            entry: dict[str, Any] = {"type": m.kind, "help": m.help, "labels": list(m.labelnames)}
+            if isinstance(m, Histogram):
+                entry["buckets"] = list(m.buckets)
+            entry["samples"] = [[list(k), v] for k, v in m.samples()]
+            out[m.name] = entry
+        return out
+
+
+def render(snapshots: Iterable[tuple[dict[str, Any], dict[str, str]]]) -> str:
+    """Text exposition of several snapshots, each with extra labels (e.g. the process it came from)."""
+    families: dict[str, dict[str, Any]] = {}
+    lines_by_name: dict[str, list[str]] = {}
+    for snap, extra in snapshots:
+        for name, entry in snap.items():
+            families.setdefault(name, entry)
+            lines = lines_by_name.setdefault(name, [])
+            names = [*entry["labels"], *extra]
+            for values, value in entry["samples"]:
+                values = [*values, *extra.values()]
+                if entry["type"] != "histogram":
+                    lines.append(f"{name}{_label_str(names, values)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for le, n in zip([*entry["buckets"], math.inf], value["counts"]):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_label_str([*names, 'le'], [*values, _format_value(le)])} {cumulative}")
+                lines.append(f"{name}_sum{_label_str(names, values)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_label_str(names, values)} {cumulative}")
+    out: list[str] = []
+    for name, entry in families.items():
+        out.append(f"# HELP {name} {_escape(entry['help'])}")
+        out.append(f"# TYPE {name} {entry['type']}")
+        out.extend(lines_by_name[name])
+    return "\n".join(out) + "\n"
+
+
+_SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class SnapshotExporter:
+    """
+    Writes this process' registry to `<dir>/<process>.json` every `interval_s`
+    and reads the other processes' files back for `/metrics`.
+    """
+
+    def __init__(self, directory: Path, process: str, *, registry: Registry | None = None, interval_s: float = 15.0):
+        self._dir = directory
+        self._process = process
+        self._registry = registry or REGISTRY
+        self._interval_s = interval_s
+        self._path = directory / f"{_SAFE_NAME_RE.sub('_', process)}.json"
+        self._thread = threading.Thread(target=self._loop, name="metrics-snapshot", daemon=True)
+
+    @property
+    def process(self) -> str:
+        return self._process
+
+    def start(self) -> None:
+        if self._interval_s > 0 and self._thread.ident is None:
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.write()
+            except OSError:
+                pass
+            time.sleep(self._interval_s)
+
+    def write(self) -> None:
+        self._dir.mkdir(parents=True, exist_ok=True)
+        body = json.dumps({"process": self._process, "written_at": time.time(), "metrics": self._registry.snapshot()})
+        tmp = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+        tmp.write_text(body, encoding="utf-8")
+        os.replace(tmp, self._path)
+
+    def others(self, *, max_age_s: float) -> list[tuple[dict[str, Any], str]]:
+        """Fresh snapshots of other processes; a process gone for `max_age_s` drops out."""
+        out: list[tuple[dict[str, Any], str]] = []
+        cutoff = time.time() - max_age_s
+        for p in sorted(self._dir.glob("*.json")) if self._dir.is_dir() else []:
+            if p == self._path:
+                continue
+            try:
+                obj = json.loads(p.read_bytes())
+            except (OSError, ValueError):
+                continue
+            if obj.get("written_at", 0) >= cutoff:
+                out.append((obj["metrics"], obj["process"]))
+        return out
+
+    def render(self) -> str:
+        own = self._registry.snapshot()
+        snaps = [(own, {"process": self._process})]
+        snaps += [(m, {"process": p}) for m, p in self.others(max_age_s=max(4 * self._interval_s, 60.0))]
+        return render(snaps)
+
+
+REGISTRY = Registry()
+
+JOBS_SUBMITTED = REGISTRY.counter("afm_jobs_submitted_total", "Jobs accepted by the API")
+JOBS_FINISHED = REGISTRY.counter("afm_jobs_finished_total", "Jobs that reached a terminal status", ("status",))
+JOBS_IN_STAGE = REGISTRY.gauge(
+    "afm_jobs_in_stage", "Jobs this process is working on, by stage (prefetch, gpu, postprocessing)", ("stage",)
+)
+QUEUE_JOBS = REGISTRY.gauge("afm_queue_jobs", "Work queue entries: waiting (queued) or held by a worker (leased)", ("state",))
+STAGE_SECONDS = REGISTRY.histogram(
+    "afm_stage_duration_seconds", "Time jobs spent per progress stage", ("stage",), buckets=STAGE_BUCKETS
+)
+WORKER_IDLE_SECONDS = REGISTRY.histogram(
+    "afm_worker_idle_seconds", "Gaps between two GPU stages of a worker (waiting for work)", buckets=STAGE_BUCKETS
+)
+WORKER_BUSY_SECONDS = REGISTRY.counter("afm_worker_busy_seconds_total", "Time a worker spent in GPU stages")
+UNIPROT_SECONDS = REGISTRY.histogram(
+    "afm_uniprot_request_duration_seconds", "UniProt REST round trips", ("kind",), buckets=IO_BUCKETS
+)
+UNIPROT_ERRORS = REGISTRY.counter("afm_uniprot_errors_total", "Failed UniProt REST requests", ("kind",))
+JOB_WRITE_SECONDS = REGISTRY.histogram(
+    "afm_job_write_duration_seconds", "Atomic job.json rewrites", buckets=IO_BUCKETS
+)
+ARTIFACT_BYTES = REGISTRY.counter(
+    "afm_artifact_bytes_served_total", "Artifact bytes sent, by content encoding", ("encoding",)
+)
+CACHE_LOOKUPS = REGISTRY.counter("afm_cache_lookups_total", "Cache lookups by cache and outcome", ("cache", "result"))
+WEBHOOK_DELIVERIES = REGISTRY.counter(
+    "afm_webhook_deliveries_total", "Webhook delivery attempts by outcome (delivered, retry, failed)", ("result",)
+)
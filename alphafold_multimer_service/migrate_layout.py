@@ -0,0 +1,86 @@
+"""
+Moves job dirs from the flat layout into day shards (see `layout`).
+
+    SHENLAB_DATA_DIR=/srv/af/data python -m alphafold_multimer_service.migrate_layout [--rate 200]
+
+Safe with the API and workers running: each finished job is renamed into its
+shard under the job's lock, and lookups find a job in either place meanwhile.
+Queued and running jobs stay where they are; run it again after they finished.
+Interrupting it loses nothing, the next run picks up the jobs still flat.
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+import time
+
+from alphafold_multimer_service.config import load_settings
+from alphafold_multimer_service.jobs import JobStore
+
+
+@dataclass
+class MigrationReport:
+    moved: int = 0
+    unfinished: int = 0  # queued/running: left flat for a later run
+    skipped: int = 0  # vanished, requeued since, or its shard already has the id
+
+
+def migrate(
+    store: JobStore,
+    *,
+    rate: float | None = None,
+    limit: int | None = None,
+    dry_run: bool = False,
+    progress: bool = False,
+) -> MigrationReport:
+    """Moves up to `limit` flat jobs into their shards, at most `rate` per second."""
+    report = MigrationReport()
+    interval = 1.0 / rate if rate else 0.0
+    next_at = time.monotonic()
+    for job_id in store.layout.iter_flat():
+        if limit is not None and report.moved >= limit:
+            break
+        rec = store.get(job_id)
+        if rec is None:
+            report.skipped += 1
+            continue
+        if rec.status not in {"succeeded", "failed"}:
+            report.unfinished += 1
+            continue
+        if dry_run:
+            report.moved += 1
+            continue
+        if interval:
+            time.sleep(max(0.0, next_at - time.monotonic()))
+            next_at = max(next_at, time.monotonic()) + interval
+        if store.move_to_shard(job_id):
+            report.moved += 1
+            if progress and report.moved % 1000 == 0:
+                print(f"moved {report.moved} jobs", flush=True)
+        else:
+            report.skipped += 1
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Move flat job dirs into day shards (jobs/YYYYMMDD/<id>).")
+    parser.add_argument("--data-dir", type=Path, help="Default: SHENLAB_DATA_DIR")
+    parser.add_argument("--rate", type=float, default=200.0, help="Jobs moved per second at most (0: unthrottled)")
+    parser.add_argument("--limit", type=int, help="Stop after moving this many jobs")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the jobs that would move")
+    args = parser.parse_args(argv)
+
+    store = JobStore(args.data_dir or load_settings().data_dir)
+    report = migrate(store, rate=args.rate, limit=args.limit, dry_run=args.dry_run, progress=True)
+    verb = "would move" if args.dry_run else "moved"
+    print(
+        f"{verb} {report.moved} jobs; {report.unfinished} queued or running left flat (run again later); "
+        f"{report.skipped} skipped"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
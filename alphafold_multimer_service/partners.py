@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+import fcntl
+import heapq
+import json
+import os
+from pathlib import Path
+import re
+import threading
+from typing import Any, Iterator
+
+from alphafold_multimer_service.jobs import JobStore
+from alphafold_multimer_service.uniprot import extract_uniprot_id
+
+
+# metric -> whether higher is better
+PARTNER_METRICS: dict[str, bool] = {
+    "ranking_confidence": True,
+    "iptm": True,
+    "interface_pae_mean": False,
+}
+
+_SHA256_RE = re.compile(r"^[0-9a-fA-F]{64}$")
+
+
+@dataclass(frozen=True)
+class _Chain:
+    sha256: str
+    uniprot: str | None
+
+
+@dataclass(frozen=True)
+class _Entry:
+    job_id: str
+    created_at: str | None
+    chains: tuple[_Chain, ...]
+    scores: dict[str, float | None]
+
+
+def protein_key(ref: str) -> str:
+    """Index key for a UniProt accession/URL or a sequence sha256 (see JobRecord.chains)."""
+    ref = ref.strip()
+    if _SHA256_RE.match(ref):
+        return f"sha256:{ref.lower()}"
+    return f"uniprot:{extract_uniprot_id(ref).upper()}"
+
+
+def _chain_keys(chain: _Chain) -> list[str]:
+    keys = [f"sha256:{chain.sha256}"]
+    if chain.uniprot:
+        keys.append(f"uniprot:{chain.uniprot.upper()}")
+    return keys
+
+
+class PartnerIndex:
+    """
+    Inverted index protein -> succeeded jobs involving it, with their scores.
+
+    Proteins are keyed by UniProt accession and by sequence sha256. Entries
+    are appended to a JSONL file as results land and replayed on startup; the
+    file is rebuilt from the job store when missing (delete it to force a
+    rebuild). Queries first read lines appended since (by any process), then
+    only look at the jobs of the queried protein. Appends and the rebuild
+    hold a file lock, so a worker's entry is never written to a file a
+    rebuild is about to replace.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._by_key: dict[str, set[str]] = {}
+        # Bytes of the JSONL file replayed so far; lines other processes append are picked up lazily.
+        self._offset = 0
+        self._inode: int | None = None
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Serializes appends and the rebuild with every process sharing the file."""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._path.with_suffix(".lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def load(self, store: JobStore) -> None:
+        with self._exclusive():
+            self._entries.clear()
+            self._by_key.clear()
+            self._offset, self._inode = 0, None
+            if self._path.exists():
+                self._catch_up()
+                return
+            rows = []
+            for job in store.iter_raw():
+                if job.get("status") != "succeeded" or not job.get("chains"):
+                    continue
+                result = store.read_result(job["job_id"])
+                if result is not None:
+                    rows.append(self._row(job["job_id"], job.get("created_at"), job["chains"], result))
+            tmp = self._path.with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, separators=(",", ":")) + "\n")
+                    self._insert(row)
+            tmp.replace(self._path)
+            st = self._path.stat()
+            self._offset, self._inode = st.st_size, st.st_ino
+
+    def _catch_up(self) -> None:
+        # Caller holds the lock. Only whole lines: a concurrent append may be mid-write.
+        try:
+            with self._path.open("rb") as f:
+                ino = os.fstat(f.fileno()).st_ino
+                if ino != self._inode:
+                    # first read, or another process rebuilt the file
+                    self._entries.clear()
+                    self._by_key.clear()
+                    self._offset, self._inode = 0, ino
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._insert(json.loads(line))
+        self._offset += end
+
+    @staticmethod
+    def _row(job_id: str, created_at: str | None, chains: list[dict[str, Any]], result: dict[str, Any]) -> dict[str, Any]:
+        metrics = result.get("metrics") or {}
+        return {
+            "job_id": job_id,
+            "created_at": created_at,
+            "chains": [{"sha256": c["sha256"], "uniprot": c.get("uniprot")} for c in chains],
+            "scores": {m: metrics.get(m) for m in PARTNER_METRICS},
+        }
+
+    def _insert(self, row: dict[str, Any]) -> None:
+        entry = _Entry(
+            job_id=row["job_id"],
+            created_at=row.get("created_at"),
+            chains=tuple(_Chain(sha256=c["sha256"], uniprot=c.get("uniprot")) for c in row["chains"]),
+            scores=row["scores"],
+        )
+        self._entries[entry.job_id] = entry
+        for chain in entry.chains:
+            for key in _chain_keys(chain):
+                self._by_key.setdefault(key, set()).add(entry.job_id)
+
+    def add(self, *, job_id: str, created_at: str | None, chains: list[dict[str, Any]], result: dict[str, Any]) -> None:
+        """Indexes a job whose result just landed (replaces an earlier entry for the same job)."""
+        if not chains:
+            return
+        row = self._row(job_id, created_at, chains, result)
+        line = json.dumps(row, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._exclusive():
+            try:
+                fd = os.open(self._path, os.O_WRONLY | os.O_APPEND)
+            except FileNotFoundError:
+                # Nothing to append to: the rebuild that recreates the file reads this job from the
+                # store (its result and status are written before it is indexed).
+                return
+            with open(fd, "ab") as f:
+                f.write(line)
+        # Picked up by the next query, here or in any other process reading the file.
+
+    def top_partners(self, key: str, *, metric: str, k: int) -> list[dict[str, Any]]:
+        """Best job per distinct partner sequence, top `k` by `metric`."""
+        higher_is_better = PARTNER_METRICS[metric]
+        with self._lock:
+            self._catch_up()
+            entries = [self._entries[j] for j in self._by_key.get(key, ())]
+        best: dict[str, tuple[float, _Entry, _Chain]] = {}
+        counts: dict[str, int] = {}
+        for entry in entries:
+            score = entry.scores.get(metric)
+            if score is None:
+                continue
+            own = {c.sha256 for c in entry.chains if key in _chain_keys(c)}
+            # homo-oligomers partner with themselves
+            partners = {c.sha256: c for c in entry.chains if c.sha256 not in own} or {
+                c.sha256: c for c in entry.chains
+            }
+            for sha, chain in partners.items():
+                counts[sha] = counts.get(sha, 0) + 1
+                cur = best.get(sha)
+                if cur is None or (score > cur[0] if higher_is_better else score < cur[0]):
+                    best[sha] = (score, entry, chain)
+        pick = heapq.nlargest if higher_is_better else heapq.nsmallest
+        top = pick(k, best.values(), key=lambda t: t[0])
+        return [
+            {
+                "sha256": chain.sha256,
+                "uniprot": chain.uniprot,
+                "job_id": entry.job_id,
+                "created_at": entry.created_at,
+                "score": score,
+                "scores": dict(entry.scores),
+                "jobs": counts[chain.sha256],
+            }
+            for score, entry, chain in top
+        ]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+from typing import Any
+
+from alphafold_multimer_service.metrics import CACHE_LOOKUPS
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same JSON, slower
+    orjson = None
+
+
+def json_bytes(obj: Any) -> bytes:
+    """Compact JSON; `obj` must already be JSON-compatible (e.g. `model_dump(mode="json")`)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# (mtime_ns, size) of the file a response is derived from; a rewrite changes it.
+Stamp = tuple[int, int]
+
+
+def file_stamp(path: Path) -> Stamp | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    stamp: Stamp
+    etag: str
+    last_modified: str
+
+    @classmethod
+    def build(cls, body: bytes, stamp: Stamp) -> "CachedResponse":
+        return cls(
+            body=body,
+            stamp=stamp,
+            # The body hash, not the stamp: a rewrite with identical content keeps the ETag.
+            etag='"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+            last_modified=formatdate(stamp[0] / 1e9, usegmt=True),
+        )
+
+
+class ResponseCache:
+    """
+    Serialized JSON responses of finished jobs, keyed by (job_id, kind).
+
+    Entries remember the stamp of the file they were rendered from and only
+    count as hits while it is unchanged, so a rewrite (e.g. retention evicting
+    artifacts) is picked up by every process. A bounded LRU sits in front of
+    copies under `<job_dir>/responses/` that survive restarts.
+    """
+
+    def __init__(self, *, max_entries: int = 2048) -> None:
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._mem: OrderedDict[tuple[str, str], CachedResponse] = OrderedDict()
+
+    @staticmethod
+    def _disk_path(job_dir: Path, kind: str, stamp: Stamp) -> Path:
+        return job_dir / "responses" / f"{kind}.{stamp[0]}-{stamp[1]}.json"
+
+    def get(self, job_dir: Path, kind: str, stamp: Stamp) -> CachedResponse | None:
+        key = (job_dir.name, kind)
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None and entry.stamp == stamp:
+                self._mem.move_to_end(key)
+                CACHE_LOOKUPS.inc(cache="response", result="hit")
+                return entry
+        try:
+            body = self._disk_path(job_dir, kind, stamp).read_bytes()
+        except FileNotFoundError:
+            CACHE_LOOKUPS.inc(cache="response", result="miss")
+            return None
+        CACHE_LOOKUPS.inc(cache="response", result="disk")
+        entry = CachedResponse.build(body, stamp)
+        self._remember(key, entry)
+        return entry
+
+    def put(self, job_dir: Path, kind: str, stamp: Stamp, body: bytes) -> CachedResponse:
+        """`stamp` must be taken before reading the source, so a concurrent rewrite is never masked."""
+        entry = CachedResponse.build(body, stamp)
+        self._remember((job_dir.name, kind), entry)
+        path = self._disk_path(job_dir, kind, stamp)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            for old in path.parent.glob(f"{kind}.*.json"):
+                if old != path:
+                    old.unlink(missing_ok=True)
+            tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+        except FileNotFoundError:
+            pass  # job dir removed meanwhile; the memory copy is still valid for this stamp
+        return entry
+
+    def _remember(self, key: tuple[str, str], entry: CachedResponse) -> None:
+        with self._lock:
+            self._mem[key] = entry
+            self._mem.move_to_end(key)
+            while len(self._mem) > self._max_entries:
+                self._mem.popitem(last=False)
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any
+
+from alphafold_multimer_service.artifacts import ArtifactStore
+from alphafold_multimer_service.jobs import JobRecord, JobStore, utc_now
+
+
+# Job subdirectories that can go once a job has finished; job.json and
+# result.json (status, metrics, verification) always stay.
+_EVICTABLE_DIRS = ("work", "artifacts", "screen_artifacts")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    # Total bytes under jobs/ + blobs/ to stay within (None: no budget).
+    disk_budget_bytes: int | None = None
+    # Evict finished jobs older than this regardless of the budget.
+    max_age_s: float | None = None
+    # gzip blobs nobody produced or downloaded for this long.
+    compress_after_s: float | None = 7 * 86400.0
+    # Drop work/ (MSA intermediates, all models, pickles) once a job succeeded.
+    prune_work: bool = True
+    # Read/delete throughput cap for compaction, so it does not starve the GPU job's I/O.
+    io_bytes_per_s: float | None = 50 * 1024 * 1024
+    interval_s: float = 3600.0
+
+
+@dataclass
+class RetentionReport:
+    started_at: str
+    finished_at: str | None = None
+    usage_bytes_before: int = 0
+    usage_bytes_after: int = 0
+    work_pruned_bytes: int = 0
+    compressed_bytes_saved: int = 0
+    jobs_evicted: int = 0
+    blobs_removed: int = 0
+    bytes_reclaimed: int = 0
+
+
+class _Throttle:
+    def __init__(self, bytes_per_s: float | None) -> None:
+        self._rate = bytes_per_s
+        self._t0 = time.monotonic()
+        self._total = 0
+
+    def __call__(self, n: int) -> None:
+        if not self._rate:
+            return
+        self._total += n
+        ahead = self._total / self._rate - (time.monotonic() - self._t0)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def _lower_thread_priority() -> None:
+    # On Linux every thread has its own nice value; keep the API and worker at normal priority.
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+def disk_usage(*roots: Path) -> int:
+    """Apparent size of all files under `roots`, counting hardlinked inodes once."""
+    seen: set[tuple[int, int]] = set()
+    total = 0
+    for root in roots:
+        if not root.exists():
+            continue
+        for dirpath, _dirnames, filenames in os.walk(root):
+            for name in filenames:
+                try:
+                    st = os.lstat(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                key = (st.st_dev, st.st_ino)
+                if key in seen:
+                    continue
+                seen.add(key)
+                total += st.st_size
+    return total
+
+
+def remove_tree(path: Path, *, throttle: _Throttle | None = None) -> int:
+    """Deletes a directory bottom-up; returns bytes actually freed (last links only)."""
+    if not path.exists():
+        return 0
+    freed = 0
+    for dirpath, dirnames, filenames in os.walk(path, topdown=False):
+        for name in filenames:
+            p = os.path.join(dirpath, name)
+            st = os.lstat(p)
+            os.unlink(p)
+            if st.st_nlink <= 1:
+                freed += st.st_size
+                if throttle is not None:
+                    throttle(st.st_size)
+        for name in dirnames:
+            os.rmdir(os.path.join(dirpath, name))
+    os.rmdir(path)
+    return freed
+
+
+class RetentionManager:
+    """
+    Keeps `SHENLAB_DATA_DIR` within a disk budget without losing results:
+    prunes `work/` right after a job succeeds, gzips cold artifact blobs and
+    evicts the bulky parts of whole jobs (least recently produced/downloaded
+    first, or past `max_age_s`) while `job.json` / `result.json` stay.
+    Runs on a low-priority background thread with throttled I/O.
+    """
+
+    def __init__(self, *, store: JobStore, artifacts: ArtifactStore, policy: RetentionPolicy, report_path: Path) -> None:
+        self._store = store
+        self._artifacts = artifacts
+        self._policy = policy
+        self._report_path = report_path
+        self._wakeup = threading.Event()
+        self._mutex = threading.Lock()
+        self._prune_queue: list[str] = []
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._started = False
+
+    @property
+    def policy(self) -> RetentionPolicy:
+        return self._policy
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        self._thread.start()
+
+    def notify_succeeded(self, job_id: str) -> None:
+        if not self._policy.prune_work:
+            return
+        with self._mutex:
+            self._prune_queue.append(job_id)
+        self._wakeup.set()
+
+    def last_report(self) -> dict[str, Any] | None:
+        if not self._report_path.exists():
+            return None
+        return json.loads(self._report_path.read_text(encoding="utf-8"))
+
+    def _loop(self) -> None:
+        _lower_thread_priority()
+        next_pass = time.monotonic()
+        while True:
+            self._wakeup.wait(timeout=max(0.0, next_pass - time.monotonic()))
+            self._wakeup.clear()
+            try:
+                self._drain_prune_queue()
+                if time.monotonic() >= next_pass:
+                    self.run_pass()
+                    next_pass = time.monotonic() + self._policy.interval_s
+            except Exception:
+                # Housekeeping must never take the service down; retry next interval.
+                next_pass = time.monotonic() + self._policy.interval_s
+
+    def _drain_prune_queue(self) -> int:
+        with self._mutex:
+            job_ids, self._prune_queue = self._prune_queue, []
+        throttle = _Throttle(self._policy.io_bytes_per_s)
+        return sum(remove_tree(self._store.job_dir(jid) / "work", throttle=throttle) for jid in job_ids)
+
+    def run_pass(self) -> RetentionReport:
+        policy = self._policy
+        throttle = _Throttle(policy.io_bytes_per_s)
+        report = RetentionReport(started_at=utc_now().isoformat())
+        roots = (self._store.jobs_dir, self._artifacts.blobs_dir)
+        report.usage_bytes_before = disk_usage(*roots)
+
+        finished = [r for r in self._store.iter_records() if r.status in {"succeeded", "failed"}]
+
+        if policy.prune_work:
+            # Catch-up for jobs that succeeded while the service was down.
+            report.work_pruned_bytes += self._drain_prune_queue()
+            for rec in finished:
+                if rec.status == "succeeded":
+                    report.work_pruned_bytes += remove_tree(self._store.job_dir(rec.job_id) / "work", throttle=throttle)
+
+        if policy.compress_after_s is not None:
+            report.compressed_bytes_saved = self._compress_cold_blobs(policy.compress_after_s, throttle)
+
+        victims: dict[str, JobRecord] = {}
+        candidates = sorted((r for r in finished if r.artifacts_evicted_at is None), key=self._last_used)
+        if policy.max_age_s is not None:
+            cutoff = utc_now() - timedelta(seconds=policy.max_age_s)
+            victims.update((r.job_id, r) for r in candidates if (r.finished_at or r.created_at) < cutoff)
+        if policy.disk_budget_bytes is not None:
+            usage = disk_usage(*roots)
+            refcounts = self._artifacts.refcounts()
+            for rec in victims.values():
+                usage -= self._eviction_gain(rec, refcounts)
+            for rec in candidates:
+                if usage <= policy.disk_budget_bytes:
+                    break
+                if rec.job_id not in victims:
+                    victims[rec.job_id] = rec
+                    usage -= self._eviction_gain(rec, refcounts)
+
+        # Only blobs the evicted jobs referenced skip the grace period: one a worker ingests right
+        # now is not in any manifest yet either.
+        released = {
+            entry["sha256"]
+            for rec in victims.values()
+            for entry in (self._artifacts.read_manifest(rec.job_id) or {}).values()
+        }
+        for rec in victims.values():
+            self._evict(rec, throttle)
+        report.jobs_evicted = len(victims)
+
+        gc = self._artifacts.gc(released=released)
+        report.blobs_removed = gc.blobs_removed
+        report.usage_bytes_after = disk_usage(*roots)
+        report.bytes_reclaimed = max(0, report.usage_bytes_before - report.usage_bytes_after)
+        report.finished_at = utc_now().isoformat()
+
+        tmp = self._report_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(report), indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, self._report_path)
+        return report
+
+    def _last_used(self, rec: JobRecord) -> datetime:
+        # manifest.json mtime moves on every artifact download (see ArtifactStore.touch)
+        last = rec.finished_at or rec.created_at
+        manifest = self._store.job_dir(rec.job_id) / "manifest.json"
+        try:
+            touched = datetime.fromtimestamp(manifest.stat().st_mtime, tz=last.tzinfo)
+        except FileNotFoundError:
+            return last
+        return max(last, touched)
+
+    def _eviction_gain(self, rec: JobRecord, refcounts: dict[str, int]) -> int:
+        """Bytes evicting `rec` frees: its own files plus blobs only it references."""
+        job_dir = self._store.job_dir(rec.job_id)
+        gain = 0
+        for name in _EVICTABLE_DIRS:
+            for dirpath, _dirnames, filenames in os.walk(job_dir / name):
+                for f in filenames:
+                    st = os.lstat(os.path.join(dirpath, f))
+                    if st.st_nlink <= 1:
+                        gain += st.st_size
+        for entry in (self._artifacts.read_manifest(rec.job_id) or {}).values():
+            sha = entry["sha256"]
+            refcounts[sha] = refcounts.get(sha, 1) - 1
+            if refcounts[sha] == 0:
+                gain += int(entry.get("size_bytes") or 0)
+        return gain
+
+    def _evict(self, rec: JobRecord, throttle: _Throttle) -> None:
+        job_dir = self._store.job_dir(rec.job_id)
+        evicted_at = utc_now()
+        for name in _EVICTABLE_DIRS:
+            remove_tree(job_dir / name, throttle=throttle)
+        (job_dir / "manifest.json").unlink(missing_ok=True)
+        result = self._store.read_result(rec.job_id)
+        if result is not None:
+            result.update({"artifacts": [], "artifacts_evicted_at": evicted_at.isoformat()})
+            self._store.write_result(rec.job_id, result)
+        self._store.update(rec.model_copy(update={"artifacts_evicted_at": evicted_at}))
+
+    def _compress_cold_blobs(self, older_than_s: float, throttle: _Throttle) -> int:
+        cutoff = time.time() - older_than_s
+        # Job dirs hold hardlinks to blobs; they must go too or no space comes back. A blob is
+        # as warm as the most recently used job referencing it: downloads only touch the
+        # manifest (see _last_used), never the blob.
+        links: dict[str, list[Path]] = {}
+        last_used: dict[str, float] = {}
+        for listed in self._store.layout.iter_dirs():
+            job_dir = self._store.job_dir(listed.name)  # where it is now, should it have moved into its shard
+            manifest = self._artifacts.read_manifest(job_dir.name)
+            if not manifest:
+                continue
+            try:
+                used = (job_dir / "manifest.json").stat().st_mtime
+            except FileNotFoundError:
+                continue
+            for name, entry in manifest.items():
+                links.setdefault(entry["sha256"], []).append(job_dir / "artifacts" / name)
+                last_used[entry["sha256"]] = max(last_used.get(entry["sha256"], 0.0), used)
+        cold = [
+            b
+            for b in self._artifacts.blobs_dir.glob("*/*")
+            if "." not in b.name and max(b.stat().st_mtime, last_used.get(b.name, 0.0)) < cutoff
+        ]
+        saved = 0
+        for blob in cold:
+            ino = blob.stat().st_ino
+            for link in links.get(blob.name, []):
+                try:
+                    if link.stat().st_ino == ino:
+                        link.unlink()
+                except FileNotFoundError:
+                    pass
+            saved += self._artifacts.compress_blob(blob.name, on_bytes=throttle)
+        return saved
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from datetime import datetime
+import re
 from typing import Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class ErrorResponse(BaseModel):
@@ -28,26 +29,85 @@ class ServiceListResponse(BaseModel):
     services: list[ServiceInfo]
 
 
+MAX_COMPLEX_CHAINS = 20
+
+
 class ProteinRef(BaseModel):
-    uniprot: str = Field(..., description="UniProt accession or UniProt URL (entry or FASTA).")
+    uniprot: str | None = Field(default=None, description="UniProt accession or UniProt URL (entry or FASTA).")
+    sequence: str | None = Field(default=None, description="Raw amino-acid sequence (one-letter codes).")
+    fasta: str | None = Field(default=None, description="Single-record FASTA text.")
+    copies: int = Field(default=1, ge=1, le=MAX_COMPLEX_CHAINS, description="Copies of this chain (stoichiometry).")
+
+    @model_validator(mode="after")
+    def _exactly_one_source(self) -> "ProteinRef":
+        given = [k for k in ("uniprot", "sequence", "fasta") if getattr(self, k)]
+        if len(given) != 1:
+            raise ValueError("Provide exactly one of: uniprot, sequence, fasta")
+        return self
 
 
-AlphaFoldMultimerPreset = Literal["fast", "full"]
+AlphaFoldMultimerPreset = Literal["fast", "full", "cascade"]
+
+CascadeMetric = Literal["iptm", "ranking_confidence"]
 
 
 class AlphaFoldMultimerJobOptions(BaseModel):
     num_recycles: int | None = Field(default=None, ge=0, le=30)
+    cascade_metric: CascadeMetric | None = Field(
+        default=None, description="`cascade` preset: metric compared against the threshold (server default if unset)."
+    )
+    cascade_threshold: float | None = Field(
+        default=None, ge=0, le=1, description="`cascade` preset: escalate to `full` when the screen metric >= this."
+    )
 
 
 class AlphaFoldMultimerJobCreateRequest(BaseModel):
-    protein_a: ProteinRef
-    protein_b: ProteinRef
+    protein_a: ProteinRef | None = None
+    protein_b: ProteinRef | None = None
+    proteins: list[ProteinRef] | None = Field(
+        default=None,
+        min_length=1,
+        description="Complex of N chains (alternative to protein_a/protein_b); use `copies` for stoichiometry.",
+    )
     preset: AlphaFoldMultimerPreset = "fast"
     options: AlphaFoldMultimerJobOptions | None = None
+    screen: str | None = Field(
+        default=None, max_length=128, description="Free-form label grouping the jobs of one screen (export filter)."
+    )
+    callback_url: str | None = Field(
+        default=None, max_length=2048, description="http(s) URL to POST a signed completion event to."
+    )
+    callback_batch: bool = Field(
+        default=False, description="Collect this job's event with others for the same URL (screens) instead of one POST."
+    )
+
+    @model_validator(mode="after")
+    def _pair_or_complex(self) -> "AlphaFoldMultimerJobCreateRequest":
+        if self.proteins is not None and (self.protein_a is not None or self.protein_b is not None):
+            raise ValueError("Use either protein_a/protein_b or proteins, not both")
+        if self.proteins is None and (self.protein_a is None or self.protein_b is None):
+            raise ValueError("protein_a and protein_b are required (or pass proteins)")
+        n_chains = sum(p.copies for p in self.protein_refs())
+        if n_chains < 2:
+            raise ValueError("A complex needs at least two chains (use copies=2 for a homodimer)")
+        if n_chains > MAX_COMPLEX_CHAINS:
+            raise ValueError(f"Too many chains: {n_chains} (max {MAX_COMPLEX_CHAINS})")
+        if self.callback_url is not None and not re.match(r"https?://[^/?#\s]+", self.callback_url):
+            raise ValueError("callback_url must be an http:// or https:// URL")
+        return self
+
+    def protein_refs(self) -> list[ProteinRef]:
+        if self.proteins is not None:
+            return list(self.proteins)
+        return [p for p in (self.protein_a, self.protein_b) if p is not None]
 
 
 JobStatus = Literal["queued", "running", "succeeded", "failed"]
 
+BundleFormat = Literal["zip", "tar", "tar.gz"]
+
+ExportFormat = Literal["ndjson", "csv", "parquet"]
+
 
 class JobCreateResponse(BaseModel):
     job_id: str
@@ -106,6 +166,7 @@ class Artifact(BaseModel):
     url: str
     media_type: str | None = None
     size_bytes: int | None = None
+    sha256: str | None = None
 
 
 class AlphaFoldMultimerMetrics(BaseModel):
@@ -116,6 +177,11 @@ class AlphaFoldMultimerMetrics(BaseModel):
     interface_pae_mean: float | None = None
     interface_pae_mean_ab: float | None = None
     interface_pae_mean_ba: float | None = None
+    chain_ids: list[str] | None = None
+    # [i][j] over chain_ids: mean PAE of chain i aligned on chain j (diagonal = intra-chain).
+    interface_pae_matrix: list[list[float]] | None = None
+    # [i][j]: PAE-derived ipTM estimate of chain j relative to chain i (diagonal null).
+    chain_pair_iptm: list[list[float | None]] | None = None
 
 
 class AlphaFoldMultimerVerification(BaseModel):
@@ -124,6 +190,23 @@ class AlphaFoldMultimerVerification(BaseModel):
     chain_b_length_a3m: int | None = None
     chain_a_length_pdb: int | None = None
     chain_b_length_pdb: int | None = None
+    chain_lengths_a3m: list[int] | None = None
+    chain_lengths_pdb: list[int | None] | None = None
+    # Length-bucket edge the run was padded to (null: no bucketing).
+    padded_length: int | None = None
+
+
+class CascadeStage(BaseModel):
+    stage: Literal["screen", "full"]
+    metrics: AlphaFoldMultimerMetrics
+    verification: AlphaFoldMultimerVerification
+
+
+class CascadeSummary(BaseModel):
+    metric: CascadeMetric
+    threshold: float
+    escalated: bool
+    stages: list[CascadeStage]
 
 
 class AlphaFoldMultimerResultResponse(BaseModel):
@@ -134,3 +217,86 @@ class AlphaFoldMultimerResultResponse(BaseModel):
     metrics: AlphaFoldMultimerMetrics
     verification: AlphaFoldMultimerVerification
     artifacts: list[Artifact]
+    cascade: CascadeSummary | None = None
+    # Set when retention dropped the artifacts (artifacts is then empty).
+    artifacts_evicted_at: datetime | None = None
+    # Seconds per stage name over all attempts (see `trace.stage_seconds`).
+    timings: dict[str, float] | None = None
+
+
+PartnerMetric = Literal["ranking_confidence", "iptm", "interface_pae_mean"]
+
+
+class PartnerScores(BaseModel):
+    ranking_confidence: float | None = None
+    iptm: float | None = None
+    interface_pae_mean: float | None = None
+
+
+class Partner(BaseModel):
+    sha256: str
+    uniprot: str | None = None
+    # Best-scoring job with this partner, and how many jobs paired the two.
+    job_id: str
+    created_at: datetime | None = None
+    score: float
+    scores: PartnerScores
+    jobs: int
+
+
+class PartnerListResponse(BaseModel):
+    protein: str
+    metric: PartnerMetric
+    partners: list[Partner]
+
+
+class LengthBucket(BaseModel):
+    edge: int
+    configured: bool
+    jobs: int
+    hits: int
+    hit_rate: float | None = None
+    padding_fraction: float | None = None
+
+
+class LengthBucketStatsResponse(BaseModel):
+    edges: list[int]
+    buckets: list[LengthBucket]
+    overflow: int
+
+
+class RetentionPolicyInfo(BaseModel):
+    disk_budget_bytes: int | None = None
+    max_age_s: float | None = None
+    compress_after_s: float | None = None
+    prune_work: bool
+    io_bytes_per_s: float | None = None
+    interval_s: float
+
+
+class RetentionReport(BaseModel):
+    started_at: datetime
+    finished_at: datetime | None = None
+    usage_bytes_before: int
+    usage_bytes_after: int
+    work_pruned_bytes: int
+    compressed_bytes_saved: int
+    jobs_evicted: int
+    blobs_removed: int
+    bytes_reclaimed: int
+
+
+class RetentionStatsResponse(BaseModel):
+    policy: RetentionPolicyInfo
+    last_report: RetentionReport | None = None
+
+
+class QueueLease(BaseModel):
+    job_id: str
+    worker: str
+    lease_expires_in_s: float
+
+
+class QueueStatsResponse(BaseModel):
+    queued: int
+    leased: list[QueueLease]
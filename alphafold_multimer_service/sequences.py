@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hashlib
+import string
+from typing import Any, Callable
+
+from alphafold_multimer_service.uniprot import extract_uniprot_id, iter_fasta_records
+
+
+# 20 standard residues plus X (unknown), B/Z (ambiguous), U (Sec) and O (Pyl).
+_VALID_RESIDUES = b"ACDEFGHIKLMNPQRSTVWYXBZUO"
+_STRIP_WHITESPACE = str.maketrans("", "", string.whitespace)
+
+
+def canonicalize_sequence(raw: str) -> str:
+    """
+    Whitespace-free, upper-case, validated protein sequence.
+
+    Validation runs as two C-level passes (`str.translate` + `bytes.translate`)
+    instead of a per-residue Python loop, so long inputs stay cheap.
+    """
+    seq = (raw or "").translate(_STRIP_WHITESPACE).upper()
+    if seq.endswith("*"):
+        # tolerate a trailing stop codon marker from translated ORFs
+        seq = seq[:-1]
+    if not seq:
+        raise ValueError("Empty protein sequence")
+    try:
+        data = seq.encode("ascii")
+    except UnicodeEncodeError:
+        raise ValueError("Protein sequence must be ASCII") from None
+    bad = data.translate(None, _VALID_RESIDUES)
+    if bad:
+        raise ValueError(f"Invalid residue(s) in protein sequence: {''.join(sorted(set(bad.decode('ascii'))))}")
+    return seq
+
+
+def sequence_sha256(seq: str) -> str:
+    """Content identity of a canonical sequence (see `canonicalize_sequence`)."""
+    return hashlib.sha256(seq.encode("ascii")).hexdigest()
+
+
+def complex_sha256(chain_hashes: list[str]) -> str:
+    """Order-sensitive identity of a complex built from per-chain hashes."""
+    return hashlib.sha256(":".join(chain_hashes).encode("ascii")).hexdigest()
+
+
+def sequence_from_fasta(fasta_text: str) -> tuple[str, str]:
+    """Returns (header, canonical sequence) of a single-record FASTA."""
+    records = list(iter_fasta_records((fasta_text or "").splitlines()))
+    if not records:
+        raise ValueError("No FASTA record found")
+    if len(records) > 1:
+        raise ValueError(f"Expected one FASTA record per protein, got {len(records)}")
+    header, seq = records[0]
+    return header, canonicalize_sequence(seq)
+
+
+def normalize_protein_ref(ref: dict[str, Any]) -> dict[str, Any]:
+    """
+    Validates a submitted protein reference and returns the form stored in the
+    job request: `{"uniprot": ...}` or `{"sequence": ..., ["fasta_header": ...]}`,
+    plus `copies` when it is not 1.
+    """
+    out: dict[str, Any]
+    uniprot = ref.get("uniprot")
+    if uniprot:
+        uniprot = uniprot.strip()
+        extract_uniprot_id(uniprot)
+        out = {"uniprot": uniprot}
+    elif ref.get("sequence"):
+        out = {"sequence": canonicalize_sequence(ref["sequence"])}
+    elif ref.get("fasta"):
+        header, seq = sequence_from_fasta(ref["fasta"])
+        out = {"sequence": seq, "fasta_header": header}
+    else:
+        raise ValueError("Protein reference needs one of: uniprot, sequence, fasta")
+    copies = int(ref.get("copies") or 1)
+    if copies != 1:
+        out["copies"] = copies
+    return out
+
+
+@dataclass(frozen=True)
+class ResolvedChain:
+    source: str  # "uniprot" | "sequence" | "fasta"
+    sequence: str
+    sha256: str
+    uniprot: str | None = None
+
+    def to_record(self) -> dict[str, Any]:
+        # What goes into JobRecord.chains: identity, not the sequence itself.
+        out: dict[str, Any] = {"source": self.source, "length": len(self.sequence), "sha256": self.sha256}
+        if self.uniprot is not None:
+            out["uniprot"] = self.uniprot
+        return out
+
+
+def chain_id(index: int) -> str:
+    """PDB chain letter ColabFold assigns to the index-th chain (A, B, ...)."""
+    if not 0 <= index < 26:
+        raise ValueError(f"Chain index out of range: {index}")
+    return chr(ord("A") + index)
+
+
+def resolve_protein(ref: dict[str, Any], *, fetch_uniprot: Callable[[str], str]) -> ResolvedChain:
+    """Turns a stored protein reference into a validated, hashed sequence."""
+    if ref.get("uniprot"):
+        uniprot_id = extract_uniprot_id(ref["uniprot"])
+        try:
+            seq = canonicalize_sequence(fetch_uniprot(uniprot_id))
+        except ValueError as e:
+            raise ValueError(f"{uniprot_id}: {e}") from e
+        return ResolvedChain(source="uniprot", sequence=seq, sha256=sequence_sha256(seq), uniprot=uniprot_id)
+    if ref.get("sequence"):
+        seq = canonicalize_sequence(ref["sequence"])
+        source = "fasta" if ref.get("fasta_header") is not None else "sequence"
+        return ResolvedChain(source=source, sequence=seq, sha256=sequence_sha256(seq))
+    if ref.get("fasta"):
+        _header, seq = sequence_from_fasta(ref["fasta"])
+        return ResolvedChain(source="fasta", sequence=seq, sha256=sequence_sha256(seq))
+    raise ValueError("Protein reference needs one of: uniprot, sequence, fasta")
+
+
+def expand_chains(proteins: list[dict[str, Any]], *, fetch_uniprot: Callable[[str], str]) -> list[ResolvedChain]:
+    """
+    Resolves each protein once and expands `copies` into the chain order
+    ColabFold will use: it deduplicates identical sequences and lays their
+    copies out contiguously in order of first appearance, so we do the same
+    up front and chain A, B, ... line up with the a3m header and the PDB.
+    """
+    groups: dict[str, list[ResolvedChain]] = {}
+    for ref in proteins:
+        chain = resolve_protein(ref, fetch_uniprot=fetch_uniprot)
+        groups.setdefault(chain.sha256, []).extend([chain] * int(ref.get("copies") or 1))
+    out = [c for group in groups.values() for c in group]
+    if len(out) > 26:
+        raise ValueError(f"Too many chains: {len(out)} (max 26)")
+    return out
@@ -0,0 +1,79 @@
+"""
+Per-job span traces.
+
+A job record keeps `trace`: a flat list of spans `{"name", "cat", "attempt",
+"start", "end"}` with Unix-epoch seconds (`end` is None while open). Spans of
+category "stage" follow the job (queued, start, fetch, run, postprocessing);
+a "run" span encloses the runner's own progress stages (category "runner":
+fetch, ColabFold phases). A wait in the queue belongs to the attempt it
+precedes. Helpers return new lists: records are shared with the record cache
+and must not be mutated in place.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+
+Span = dict[str, Any]
+
+
+def open_span(
+    trace: list[Span], name: str, *, cat: str, attempt: int, start: float | None = None, **args: Any
+) -> list[Span]:
+    span: Span = {"name": name, "cat": cat, "attempt": attempt, "start": start or time.time(), "end": None}
+    if args:
+        span["args"] = args
+    return [*trace, span]
+
+
+def close_spans(trace: list[Span], *, cat: str | None = None, end: float | None = None) -> list[Span]:
+    """Ends the open spans (of category `cat`, else all of them)."""
+    end = end or time.time()
+    return [
+        {**s, "end": max(end, s["start"])} if s["end"] is None and (cat is None or s["cat"] == cat) else s
+        for s in trace
+    ]
+
+
+def stage_seconds(trace: list[Span]) -> dict[str, float]:
+    """Seconds per span name over all attempts, closed spans only, in first-seen order."""
+    out: dict[str, float] = {}
+    for s in trace:
+        if s["end"] is not None:
+            out[s["name"]] = round(out.get(s["name"], 0.0) + s["end"] - s["start"], 3)
+    return out
+
+
+def chrome_trace(job_id: str, trace: list[Span], *, now: float | None = None) -> dict[str, Any]:
+    """
+    Chrome trace event format (chrome://tracing, Perfetto): one complete
+    ("X") event per span, one row per attempt. Open spans run up to `now`.
+    """
+    now = now or time.time()
+    events: list[dict[str, Any]] = [
+        {"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": job_id}},
+    ]
+    for a in sorted({s["attempt"] for s in trace}):
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": a, "args": {"name": f"attempt {a}"}})
+        events.append({"name": "thread_sort_index", "ph": "M", "pid": 1, "tid": a, "args": {"sort_index": a}})
+    for s in trace:
+        end = s["end"] if s["end"] is not None else max(now, s["start"])
+        args = dict(s.get("args") or {})
+        if s["end"] is None:
+            args["open"] = True
+        events.append(
+            {
+                "name": s["name"],
+                "cat": s["cat"],
+                "ph": "X",
+                "pid": 1,
+                "tid": s["attempt"],
+                "ts": round(s["start"] * 1e6),
+                # difference of rounded ends, so a span closed with its parent never sticks out of it
+                "dur": round(end * 1e6) - round(s["start"] * 1e6),
+                "args": args,
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"job_id": job_id}}
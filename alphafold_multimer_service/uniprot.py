@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from dataclasses import dataclass, field
 import re
+import threading
+from typing import Iterable, Iterator
 from urllib.parse import urlparse
 
 import requests
 
+from alphafold_multimer_service.metrics import CACHE_LOOKUPS, UNIPROT_ERRORS, UNIPROT_SECONDS
+
+
+UNIPROT_REST_BASE = "https://rest.uniprot.org"
+_USER_AGENT = "alphafold-multimer-service/alphafold-multimer"
 
 _ACCESSION_LIKE_RE = re.compile(r"^[A-Za-z0-9]{3,15}(?:-[0-9]{1,3})?$")
 
@@ -53,10 +62,15 @@ def extract_uniprot_id(uniprot_ref: str) -> str:
     return s
 
 
-def fetch_fasta(uniprot_id: str, *, timeout_s: float = 30.0) -> str:
-    url = f"https://rest.uniprot.org/uniprotkb/{uniprot_id}.fasta"
-    r = requests.get(url, timeout=timeout_s, headers={"User-Agent": "alphafold-multimer-service/alphafold-multimer"})
-    r.raise_for_status()
+def fetch_fasta(uniprot_id: str, *, timeout_s: float = 30.0, base_url: str = UNIPROT_REST_BASE) -> str:
+    url = f"{base_url.rstrip('/')}/uniprotkb/{uniprot_id}.fasta"
+    try:
+        with UNIPROT_SECONDS.time(kind="single"):
+            r = requests.get(url, timeout=timeout_s, headers={"User-Agent": _USER_AGENT})
+            r.raise_for_status()
+    except requests.RequestException:
+        UNIPROT_ERRORS.inc(kind="single")
+        raise
     return r.text
 
 
@@ -71,3 +85,207 @@ def fasta_to_sequence(fasta_text: str) -> str:
     if not seq:
         raise ValueError("No sequence found in FASTA")
     return seq
+
+
+def iter_fasta_records(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Streams (header, sequence) pairs out of multi-record FASTA text.
+
+    The header is returned without the leading '>'. Sequences are normalized the
+    same way as `fasta_to_sequence` (whitespace removed, upper-cased).
+    """
+    header: str | None = None
+    chunks: list[str] = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(">"):
+            if header is not None:
+                yield header, "".join(chunks).replace(" ", "").upper()
+            header = line[1:].strip()
+            chunks = []
+            continue
+        if header is not None:
+            chunks.append(line)
+    if header is not None:
+        yield header, "".join(chunks).replace(" ", "").upper()
+
+
+def fasta_header_accession(header: str) -> str | None:
+    """
+    Returns the accession from a UniProt FASTA header, e.g.
+      sp|Q13424-2|SNTA1_HUMAN Isoform 2 of Alpha-1-syntrophin ...
+    """
+    first = header.split(None, 1)[0] if header.strip() else ""
+    parts = first.split("|")
+    if len(parts) >= 2 and _ACCESSION_LIKE_RE.match(parts[1]):
+        return parts[1]
+    if _ACCESSION_LIKE_RE.match(first):
+        return first
+    return None
+
+
+def _canonical_isoform_base(uniprot_id: str) -> str | None:
+    # UniProt answers requests for the canonical isoform ("-1") with the
+    # unsuffixed entry header, so Q13424-1 comes back as sp|Q13424|...
+    base, sep, iso = uniprot_id.partition("-")
+    if sep and iso == "1":
+        return base
+    return None
+
+
+class SequenceCache:
+    """
+    Thread-safe, bounded (LRU) map of UniProt id -> sequence.
+
+    Shared between the bulk prefetcher and the runner so a sequence fetched as
+    part of a batch never costs a second round trip.
+    """
+
+    def __init__(self, *, max_entries: int = 10000) -> None:
+        self._max_entries = max_entries
+        self._items: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, uniprot_id: str) -> str | None:
+        with self._lock:
+            seq = self._items.get(uniprot_id)
+            if seq is not None:
+                self._items.move_to_end(uniprot_id)
+        CACHE_LOOKUPS.inc(cache="sequence", result="miss" if seq is None else "hit")
+        return seq
+
+    def put(self, uniprot_id: str, sequence: str) -> None:
+        with self._lock:
+            self._items[uniprot_id] = sequence
+            self._items.move_to_end(uniprot_id)
+            while len(self._items) > self._max_entries:
+                self._items.popitem(last=False)
+
+    def __contains__(self, uniprot_id: object) -> bool:
+        with self._lock:
+            return uniprot_id in self._items
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+
+@dataclass
+class BulkFetchResult:
+    sequences: dict[str, str] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+    # Subset of `errors`: UniProt answered but did not know the accession.
+    not_found: set[str] = field(default_factory=set)
+
+
+class UniProtClient:
+    """
+    UniProt REST access with a shared sequence cache.
+
+    `fetch_sequence` serves single lookups (cache first), `fetch_many` groups
+    accessions into `/uniprotkb/accessions` batch queries that return one
+    multi-record FASTA per batch.
+    """
+
+    def __init__(
+        self,
+        *,
+        base_url: str = UNIPROT_REST_BASE,
+        batch_size: int = 100,
+        timeout_s: float = 30.0,
+        cache: SequenceCache | None = None,
+    ) -> None:
+        self._base_url = base_url.rstrip("/")
+        self._batch_size = max(1, batch_size)
+        self._timeout_s = timeout_s
+        self._cache = cache if cache is not None else SequenceCache()
+
+    @property
+    def cache(self) -> SequenceCache:
+        return self._cache
+
+    def fetch_sequence(self, uniprot_id: str) -> str:
+        seq = self._cache.get(uniprot_id)
+        if seq is not None:
+            return seq
+        seq = fasta_to_sequence(fetch_fasta(uniprot_id, timeout_s=self._timeout_s, base_url=self._base_url))
+        self._cache.put(uniprot_id, seq)
+        return seq
+
+    def fetch_many(self, uniprot_ids: Iterable[str]) -> BulkFetchResult:
+        """
+        Fetches every id not already cached, populating the cache.
+
+        Failures are per accession: ids missing from the response or rejected
+        by UniProt end up in `errors`, everything else in `sequences`.
+        """
+        out = BulkFetchResult()
+        missing: list[str] = []
+        seen: set[str] = set()
+        for uid in uniprot_ids:
+            if uid in seen:
+                continue
+            seen.add(uid)
+            seq = self._cache.get(uid)
+            if seq is not None:
+                out.sequences[uid] = seq
+            else:
+                missing.append(uid)
+
+        for i in range(0, len(missing), self._batch_size):
+            self._fetch_batch(missing[i : i + self._batch_size], out)
+        return out
+
+    def _fetch_batch(self, batch: list[str], out: BulkFetchResult) -> None:
+        try:
+            got = self._query_accessions(batch)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            # UniProt rejects the whole batch (400) if a single accession is
+            # malformed; bisect so the valid ones still get through.
+            if status is not None and 400 <= status < 500 and len(batch) > 1:
+                mid = len(batch) // 2
+                self._fetch_batch(batch[:mid], out)
+                self._fetch_batch(batch[mid:], out)
+                return
+            for uid in batch:
+                out.errors[uid] = f"HTTP {status}: {e}"
+            return
+        except requests.RequestException as e:
+            for uid in batch:
+                out.errors[uid] = f"{type(e).__name__}: {e}"
+            return
+
+        for uid in batch:
+            seq = got.get(uid)
+            if seq is None:
+                base = _canonical_isoform_base(uid)
+                if base is not None:
+                    seq = got.get(base)
+            if not seq:
+                out.errors[uid] = "Not returned by UniProt"
+                out.not_found.add(uid)
+                continue
+            self._cache.put(uid, seq)
+            out.sequences[uid] = seq
+
+    def _query_accessions(self, batch: list[str]) -> dict[str, str]:
+        url = f"{self._base_url}/uniprotkb/accessions"
+        params = {"accessions": ",".join(batch), "format": "fasta"}
+        got: dict[str, str] = {}
+        try:
+            with UNIPROT_SECONDS.time(kind="batch"), requests.get(
+                url, params=params, timeout=self._timeout_s, headers={"User-Agent": _USER_AGENT}, stream=True
+            ) as r:
+                r.raise_for_status()
+                r.encoding = r.encoding or "utf-8"
+                for header, seq in iter_fasta_records(r.iter_lines(decode_unicode=True)):
+                    acc = fasta_header_accession(header)
+                    if acc is not None and seq:
+                        got[acc] = seq
+        except requests.RequestException:
+            UNIPROT_ERRORS.inc(kind="batch")
+            raise
+        return got
@@ -0,0 +1,377 @@
+"""
+Completion webhooks.
+
+Jobs submitted with a `callback_url` get a POST when they reach a terminal
+status. Events go through a durable outbox (`webhooks.sqlite3` under the
+data dir) written by whichever process finished the job; the dispatcher
+thread in the API process delivers them with exponential backoff, at most
+`concurrency` requests in flight per endpoint (scheme, host and port).
+Events of jobs submitted with `callback_batch` wait up to `batch_s` and go
+out together with the other batched events for the same URL.
+
+Every delivery is `{"delivery_id": ..., "events": [...]}`. With a secret,
+`X-Webhook-Signature: sha256=<hex>` is the HMAC-SHA256 of
+`<X-Webhook-Timestamp>.<body>`; receivers should reject stale timestamps
+and deduplicate by `delivery_id` (a delivery is retried until a 2xx).
+
+Any API client picks the URL, so the server would otherwise POST wherever it
+can reach: URLs whose host resolves to a loopback, link-local, private or
+other non-public address are refused at submission and again before every
+attempt (DNS may change in between), unless an `allow_networks` entry
+covers the address.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import hmac
+import ipaddress
+import json
+import random
+import socket
+import threading
+import time
+from typing import Any, Callable, Sequence
+from urllib.parse import urlsplit
+
+import requests
+
+from alphafold_multimer_service.metrics import WEBHOOK_DELIVERIES
+from alphafold_multimer_service.work_queue import SqliteFile, default_worker_id
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    batch INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    last_error TEXT,
+    finished_at REAL
+)
+"""
+_INDEX = "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (state, next_attempt_at)"
+
+_USER_AGENT = "alphafold-multimer-service/webhooks"
+# Permanent failures: retrying the same request cannot succeed.
+_RETRYABLE_4XX = {408, 409, 425, 429}
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    mac = hmac.new(secret.encode("utf-8"), timestamp.encode("ascii") + b"." + body, hashlib.sha256)
+    return f"sha256={mac.hexdigest()}"
+
+
+def endpoint_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+
+def parse_networks(raw: str) -> tuple[Network, ...]:
+    """Comma-separated addresses or CIDR networks, e.g. `10.1.0.0/16,127.0.0.1`."""
+    return tuple(ipaddress.ip_network(s.strip(), strict=False) for s in raw.split(",") if s.strip())
+
+
+def blocked_reason(url: str, allow: Sequence[Network] = ()) -> str | None:
+    """
+    Why `url` must not be called: its host resolves to a non-public address
+    outside `allow`. None when it may (also when the name does not resolve
+    now; delivery then fails and is retried like any network error).
+    """
+    parts = urlsplit(url)
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or 443, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError, ValueError):
+        return None
+    for info in infos:
+        ip = ipaddress.ip_address(str(info[4][0]).split("%", 1)[0])
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        if not ip.is_global and not any(ip in net for net in allow):
+            return f"{parts.hostname} resolves to non-public address {ip}"
+    return None
+
+
+@dataclass(frozen=True)
+class Delivery:
+    ids: tuple[int, ...]
+    url: str
+    events: tuple[dict[str, Any], ...]
+    attempts: int  # before this one
+
+    @property
+    def delivery_id(self) -> str:
+        # Stable across retries: a failed batch is retried as the same rows.
+        return f"dlv_{self.ids[0]}"
+
+
+class WebhookOutbox(SqliteFile):
+    """Pending, delivered and failed webhook events; claimed under a lease like work queue jobs."""
+
+    _schema = (_SCHEMA, _INDEX)
+
+    def enqueue(self, url: str, event: dict[str, Any], *, batch: bool = False) -> None:
+        now = time.time()
+        with self._tx() as db:
+            db.execute(
+                "INSERT INTO outbox (url, batch, event, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+                (url, int(batch), json.dumps(event, separators=(",", ":")), now, now),
+            )
+
+    def claim(
+        self,
+        owner: str,
+        *,
+        batch_s: float,
+        max_batch: int,
+        lease_s: float,
+        slots: Callable[[str], int] | None = None,
+    ) -> list[Delivery]:
+        """
+        Due deliveries, leased to `owner`: every unbatched event on its own,
+        batched events per URL once the oldest waited `batch_s` (or
+        `max_batch` are waiting); retries go out as the rows that failed.
+        `slots(endpoint)` caps the deliveries leased per endpoint (oldest
+        first); the rest stay unleased for the next claim.
+        """
+        now = time.time()
+        with self._tx() as db:
+            rows = db.execute(
+                "SELECT id, url, batch, event, created_at, attempts FROM outbox WHERE state = 'pending' "
+                "AND next_attempt_at <= ? AND (lease_expires IS NULL OR lease_expires < ?) ORDER BY id LIMIT 5000",
+                (now, now),
+            ).fetchall()
+            groups: dict[tuple[str, int], list[tuple]] = {}
+            out: list[Delivery] = []
+            for row in rows:
+                if row[2]:
+                    groups.setdefault((row[1], row[5]), []).append(row)
+                else:
+                    out.append(Delivery((row[0],), row[1], (json.loads(row[3]),), row[5]))
+            for (url, attempts), group in groups.items():
+                if attempts == 0 and len(group) < max_batch and group[0][4] > now - batch_s:
+                    continue  # still collecting
+                for i in range(0, len(group), max_batch):
+                    chunk = group[i : i + max_batch]
+                    out.append(Delivery(tuple(r[0] for r in chunk), url, tuple(json.loads(r[3]) for r in chunk), attempts))
+            if slots is not None:
+                free: dict[str, int] = {}
+                kept: list[Delivery] = []
+                for d in sorted(out, key=lambda d: d.ids[0]):
+                    endpoint = endpoint_of(d.url)
+                    if endpoint not in free:
+                        free[endpoint] = slots(endpoint)
+                    if free[endpoint] > 0:
+                        free[endpoint] -= 1
+                        kept.append(d)
+                out = kept
+            ids = [i for d in out for i in d.ids]
+            db.executemany(
+                "UPDATE outbox SET lease_owner = ?, lease_expires = ? WHERE id = ?",
+                [(owner, now + lease_s, i) for i in ids],
+            )
+        return out
+
+    def _finish(self, d: Delivery, owner: str, sql: str = "", params: tuple = ()) -> None:
+        """Ends `owner`'s lease on the delivery's rows, applying `sql` assignments."""
+        with self._tx() as db:
+            db.executemany(
+                f"UPDATE outbox SET {sql}lease_owner = NULL, lease_expires = NULL WHERE id = ? AND lease_owner = ?",
+                [(*params, i, owner) for i in d.ids],
+            )
+
+    def delivered(self, d: Delivery, owner: str) -> None:
+        self._finish(d, owner, "state = 'delivered', attempts = attempts + 1, finished_at = ?, ", (time.time(),))
+
+    def retry(self, d: Delivery, owner: str, *, error: str, at: float) -> None:
+        self._finish(d, owner, "attempts = attempts + 1, next_attempt_at = ?, last_error = ?, ", (at, error))
+
+    def failed(self, d: Delivery, owner: str, *, error: str) -> None:
+        self._finish(
+            d, owner, "state = 'failed', attempts = attempts + 1, last_error = ?, finished_at = ?, ", (error, time.time())
+        )
+
+    def prune(self, *, older_than_s: float) -> int:
+        """Drops delivered events; failed ones stay for inspection."""
+        with self._tx() as db:
+            cur = db.execute(
+                "DELETE FROM outbox WHERE state = 'delivered' AND finished_at < ?", (time.time() - older_than_s,)
+            )
+        return cur.rowcount
+
+    def stats(self) -> dict[str, int]:
+        rows = self._db().execute("SELECT state, COUNT(*) FROM outbox GROUP BY state").fetchall()
+        return {"pending": 0, "delivered": 0, "failed": 0, **dict(rows)}
+
+    def events(self, state: str | None = None) -> list[dict[str, Any]]:
+        """Rows with their delivery state, oldest first (for inspection and tests)."""
+        rows = self._db().execute(
+            "SELECT id, url, event, attempts, state, last_error FROM outbox "
+            "WHERE ? IS NULL OR state = ? ORDER BY id",
+            (state, state),
+        ).fetchall()
+        return [
+            {"id": r[0], "url": r[1], "event": json.loads(r[2]), "attempts": r[3], "state": r[4], "last_error": r[5]}
+            for r in rows
+        ]
+
+
+class WebhookDispatcher:
+    """Delivers outbox events from a background thread; several dispatchers may share an outbox."""
+
+    def __init__(
+        self,
+        outbox: WebhookOutbox,
+        *,
+        secret: str | None = None,
+        batch_s: float = 30.0,
+        max_batch: int = 100,
+        concurrency: int = 2,
+        max_attempts: int = 12,
+        backoff_s: float = 5.0,
+        max_backoff_s: float = 3600.0,
+        timeout_s: float = 10.0,
+        poll_s: float = 1.0,
+        owner: str | None = None,
+        allow_networks: Sequence[Network] = (),
+    ) -> None:
+        self._outbox = outbox
+        self._secret = secret
+        self._batch_s = batch_s
+        self._max_batch = max_batch
+        self._concurrency = concurrency
+        self._max_attempts = max_attempts
+        self._backoff_s = backoff_s
+        self._max_backoff_s = max_backoff_s
+        self._timeout_s = timeout_s
+        self._poll_s = poll_s
+        self._allow_networks = tuple(allow_networks)
+        self._owner = owner or f"webhooks-{default_worker_id()}"
+        self._session = requests.Session()
+        self._pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="webhook")
+        self._mutex = threading.Lock()
+        self._in_flight: dict[str, int] = {}
+        # One claim at a time: each sizes its leases by the slots free when it runs.
+        self._dispatch_mutex = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="webhook-dispatch", daemon=True)
+
+    def start(self) -> None:
+        if self._thread.ident is None:
+            self._thread.start()
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def _loop(self) -> None:
+        last_prune = 0.0
+        while True:
+            try:
+                self.dispatch_due()
+                if time.monotonic() - last_prune > 3600:
+                    self._outbox.prune(older_than_s=7 * 86400)
+                    last_prune = time.monotonic()
+            except Exception:
+                pass  # e.g. database busy; the next round retries
+            self._wakeup.wait(timeout=self._poll_s)
+            self._wakeup.clear()
+
+    def dispatch_due(self) -> int:
+        """Claims due deliveries and hands them to the pool; returns how many were started."""
+        lease_s = self._timeout_s * 3 + 60
+
+        def slots(endpoint: str) -> int:
+            # In-flight counts only drop meanwhile (deliveries finishing), so this never over-commits.
+            with self._mutex:
+                return self._concurrency - self._in_flight.get(endpoint, 0)
+
+        with self._dispatch_mutex:
+            claimed = self._outbox.claim(
+                self._owner, batch_s=self._batch_s, max_batch=self._max_batch, lease_s=lease_s, slots=slots
+            )
+            for d in claimed:
+                endpoint = endpoint_of(d.url)
+                with self._mutex:
+                    self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+                self._pool.submit(self._deliver, d, endpoint)
+        return len(claimed)
+
+    def _deliver(self, d: Delivery, endpoint: str) -> None:
+        try:
+            blocked = blocked_reason(d.url, self._allow_networks)
+            error = f"Blocked: {blocked}" if blocked else self._post(d)
+            if error is None:
+                self._outbox.delivered(d, self._owner)
+                WEBHOOK_DELIVERIES.inc(result="delivered")
+            elif blocked or (error.startswith("HTTP 4") and int(error[5:8]) not in _RETRYABLE_4XX):
+                self._outbox.failed(d, self._owner, error=error)
+                WEBHOOK_DELIVERIES.inc(result="failed")
+            elif d.attempts + 1 >= self._max_attempts:
+                self._outbox.failed(d, self._owner, error=error)
+                WEBHOOK_DELIVERIES.inc(result="failed")
+            else:
+                delay = min(self._backoff_s * 2**d.attempts, self._max_backoff_s) * random.uniform(0.5, 1.0)
+                self._outbox.retry(d, self._owner, error=error, at=time.time() + delay)
+                WEBHOOK_DELIVERIES.inc(result="retry")
+        finally:
+            with self._mutex:
+                self._in_flight[endpoint] -= 1
+            self._wakeup.set()
+
+    def _post(self, d: Delivery) -> str | None:
+        """None on success, else what went wrong."""
+        body = json.dumps({"delivery_id": d.delivery_id, "events": list(d.events)}, separators=(",", ":")).encode()
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": _USER_AGENT,
+            "X-Webhook-Id": d.delivery_id,
+            "X-Webhook-Timestamp": timestamp,
+        }
+        if self._secret:
+            headers["X-Webhook-Signature"] = sign(self._secret, timestamp, body)
+        try:
+            r = self._session.post(d.url, data=body, headers=headers, timeout=self._timeout_s, allow_redirects=False)
+        except requests.RequestException as e:
+            return f"{type(e).__name__}: {e}"
+        if 200 <= r.status_code < 300:
+            return None
+        return f"HTTP {r.status_code}"
+
+
+def job_event(
+    *,
+    job_id: str,
+    status: str,
+    finished_at: str | None,
+    screen: str | None = None,
+    primary_score: dict[str, Any] | None = None,
+    error: str | None = None,
+) -> dict[str, Any]:
+    """The compact per-job event; receivers fetch the result from `result_url`."""
+    event: dict[str, Any] = {
+        "type": "job.finished",
+        "job_id": job_id,
+        "status": status,
+        "finished_at": finished_at,
+        "status_url": f"/api/v1/jobs/{job_id}",
+    }
+    if screen:
+        event["screen"] = screen
+    if status == "succeeded":
+        event["result_url"] = f"/api/v1/jobs/{job_id}/result"
+        event["primary_score"] = primary_score
+    if error:
+        event["error"] = error
+    return event
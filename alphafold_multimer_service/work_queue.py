@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Iterator
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL UNIQUE,
+    enqueued_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL
+)
+"""
+
+
+# Filesystems that can be mounted on several hosts at once. WAL keeps its index in shared
+# memory (the -shm file, mmap'd), which other hosts never see.
+_NETWORK_FS_TYPES = frozenset(
+    {"nfs", "nfs4", "cifs", "smb3", "smbfs", "ceph", "glusterfs", "lustre", "gpfs", "beegfs", "9p"}
+)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def filesystem_type(path: Path, mounts: Path = Path("/proc/self/mounts")) -> str | None:
+    """Type of the filesystem holding `path` (longest matching mount point); None when unknown."""
+    try:
+        lines = mounts.read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return None
+    path = path.resolve()
+    best: tuple[int, str] | None = None
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        mount_point = Path(fields[1].replace("\\040", " "))
+        if (path == mount_point or mount_point in path.parents) and (best is None or len(mount_point.parts) > best[0]):
+            best = (len(mount_point.parts), fields[2])
+    return best[1] if best else None
+
+
+def journal_mode_for(path: Path) -> str:
+    """`wal` on a local filesystem, the `delete` rollback journal on one other hosts may share."""
+    fs = filesystem_type(path.parent) or ""
+    return "delete" if fs in _NETWORK_FS_TYPES or fs.startswith("fuse.") else "wal"
+
+
+@dataclass(frozen=True)
+class Lease:
+    job_id: str
+    owner: str
+    expires_at: float
+
+
+class SqliteFile:
+    """
+    A SQLite database under the data dir shared by the API and worker
+    processes, one connection per thread. `journal_mode` `wal` lets readers
+    run alongside the writer but only works between processes of one host;
+    `delete` (rollback journal) also works between hosts sharing the data dir
+    with working POSIX locks. `auto` picks `delete` on network filesystems.
+    Every process opening the file must use the same mode.
+    """
+
+    _schema: tuple[str, ...] = ()
+
+    def __init__(self, path: Path, *, journal_mode: str = "auto") -> None:
+        self._path = path
+        self._journal_mode = journal_mode_for(path) if journal_mode == "auto" else journal_mode.lower()
+        if self._journal_mode not in {"wal", "delete"}:
+            raise ValueError(f"journal_mode must be auto, wal or delete, not {journal_mode!r}")
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._tx() as db:
+            for statement in self._schema:
+                db.execute(statement)
+
+    @property
+    def journal_mode(self) -> str:
+        return self._journal_mode
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # autocommit mode; transactions are explicit (BEGIN IMMEDIATE takes the write lock up front)
+            db = sqlite3.connect(self._path, timeout=30.0, isolation_level=None)
+            try:
+                (mode,) = db.execute(f"PRAGMA journal_mode={self._journal_mode}").fetchone()
+            except sqlite3.OperationalError:
+                # Leaving WAL needs exclusive access: another process still uses the queue in WAL mode.
+                (mode,) = db.execute("PRAGMA journal_mode").fetchone()
+                if mode.lower() == self._journal_mode:
+                    raise
+            if mode.lower() != self._journal_mode:
+                db.close()
+                raise RuntimeError(
+                    f"{self._path} is in {mode} mode while {self._journal_mode} was requested; "
+                    "set the same SHENLAB_QUEUE_JOURNAL_MODE for every process sharing the data dir"
+                )
+            # WAL: a commit is durable once the WAL is synced at checkpoint; rollback journal: sync every commit.
+            db.execute(f"PRAGMA synchronous={'NORMAL' if self._journal_mode == 'wal' else 'FULL'}")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+
+class SqliteWorkQueue(SqliteFile):
+    """
+    Durable FIFO of job ids shared by the API and any number of worker
+    processes (see `SqliteFile` for the journal modes).
+
+    Workers `claim` the oldest job that is not leased, keep the lease alive
+    with `heartbeat` while running it and `ack` when done. A job whose lease
+    runs out (worker crashed, host lost) becomes visible again and the next
+    claim takes it over; the runner resumes from the job's work dir.
+    """
+
+    _schema = (_SCHEMA,)
+
+    def __init__(self, path: Path, *, lease_s: float = 300.0, journal_mode: str = "auto") -> None:
+        self._lease_s = lease_s
+        super().__init__(path, journal_mode=journal_mode)
+
+    @property
+    def lease_s(self) -> float:
+        return self._lease_s
+
+    def put(self, job_id: str) -> None:
+        """Enqueues at the tail; re-putting a job (cascade escalation) moves it there and drops its lease."""
+        with self._tx() as db:
+            db.execute("DELETE FROM queue WHERE job_id = ?", (job_id,))
+            db.execute("INSERT INTO queue (job_id, enqueued_at) VALUES (?, ?)", (job_id, time.time()))
+
+    def claim(self, owner: str) -> Lease | None:
+        now = time.time()
+        with self._tx() as db:
+            row = db.execute(
+                "SELECT job_id FROM queue WHERE lease_expires IS NULL OR lease_expires < ? ORDER BY seq LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            expires = now + self._lease_s
+            db.execute(
+                "UPDATE queue SET lease_owner = ?, lease_expires = ? WHERE job_id = ?", (owner, expires, row[0])
+            )
+        return Lease(job_id=row[0], owner=owner, expires_at=expires)
+
+    def heartbeat(self, lease: Lease) -> Lease | None:
+        """Extends the lease; None when it was lost (expired and claimed by someone else, or re-put)."""
+        expires = time.time() + self._lease_s
+        with self._tx() as db:
+            cur = db.execute(
+                "UPDATE queue SET lease_expires = ? WHERE job_id = ? AND lease_owner = ?",
+                (expires, lease.job_id, lease.owner),
+            )
+        return Lease(job_id=lease.job_id, owner=lease.owner, expires_at=expires) if cur.rowcount else None
+
+    def ack(self, lease: Lease) -> bool:
+        """Removes the job if `lease` still holds it; a re-put job stays queued."""
+        with self._tx() as db:
+            cur = db.execute("DELETE FROM queue WHERE job_id = ? AND lease_owner = ?", (lease.job_id, lease.owner))
+        return bool(cur.rowcount)
+
+    def release(self, lease: Lease) -> None:
+        """Gives the job back right away (e.g. worker shutting down) instead of waiting for expiry."""
+        with self._tx() as db:
+            db.execute(
+                "UPDATE queue SET lease_owner = NULL, lease_expires = NULL WHERE job_id = ? AND lease_owner = ?",
+                (lease.job_id, lease.owner),
+            )
+
+    def release_owner(self, owner: str) -> int:
+        """Releases every lease held by `owner`; for a worker restarting under the same id."""
+        with self._tx() as db:
+            cur = db.execute(
+                "UPDATE queue SET lease_owner = NULL, lease_expires = NULL WHERE lease_owner = ?", (owner,)
+            )
+        return cur.rowcount
+
+    def pending(self, limit: int | None = None) -> list[str]:
+        """Job ids waiting for a worker (no live lease), oldest first."""
+        rows = self._db().execute(
+            "SELECT job_id FROM queue WHERE lease_expires IS NULL OR lease_expires < ? ORDER BY seq LIMIT ?",
+            (time.time(), -1 if limit is None else limit),
+        )
+        return [r[0] for r in rows]
+
+    def __contains__(self, job_id: str) -> bool:
+        return self._db().execute("SELECT 1 FROM queue WHERE job_id = ?", (job_id,)).fetchone() is not None
+
+    def stats(self) -> dict[str, Any]:
+        now = time.time()
+        rows = self._db().execute("SELECT job_id, lease_owner, lease_expires FROM queue ORDER BY seq").fetchall()
+        leases = [
+            {"job_id": job_id, "worker": owner, "lease_expires_in_s": round(expires - now, 1)}
+            for job_id, owner, expires in rows
+            if expires is not None and expires >= now
+        ]
+        return {"queued": len(rows) - len(leases), "leased": leases}
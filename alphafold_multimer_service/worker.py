@@ -0,0 +1,133 @@
+"""
+Standalone job worker.
+
+    SHENLAB_DATA_DIR=/srv/af/data python -m alphafold_multimer_service.worker
+
+Claims jobs from the work queue under the data dir and runs them; start one
+per GPU (`--gpus 0`, `--gpus 1`, ...), on any host that mounts the data dir.
+The API process then only needs `SHENLAB_EMBEDDED_WORKER=0`.
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import replace
+import signal
+import threading
+
+from alphafold_multimer_service.alphafold_multimer.buckets import LengthBucketStats
+from alphafold_multimer_service.alphafold_multimer.runner import (
+    AlphaFoldMultimerRunner,
+    ColabFoldDockerRunner,
+    MockAlphaFoldMultimerRunner,
+)
+from alphafold_multimer_service.artifacts import ArtifactStore
+from alphafold_multimer_service.config import Settings, load_settings
+from alphafold_multimer_service.jobs import JobManager, JobStore
+from alphafold_multimer_service.metrics import SnapshotExporter
+from alphafold_multimer_service.partners import PartnerIndex
+from alphafold_multimer_service.retention import RetentionManager
+from alphafold_multimer_service.uniprot import UniProtClient
+from alphafold_multimer_service.webhooks import WebhookOutbox
+from alphafold_multimer_service.work_queue import SqliteWorkQueue
+
+
+def build_runner(
+    settings: Settings, *, bucket_stats: LengthBucketStats
+) -> tuple[AlphaFoldMultimerRunner, UniProtClient | None]:
+    if settings.mock_mode:
+        return MockAlphaFoldMultimerRunner(), None
+    uniprot = UniProtClient(base_url=settings.uniprot_base_url, batch_size=settings.uniprot_batch_size)
+    runner = ColabFoldDockerRunner(
+        colabfold_image=settings.colabfold_image,
+        colabfold_cache_dir=settings.colabfold_cache_dir,
+        host_ptxas_path=settings.host_ptxas_path,
+        uniprot=uniprot,
+        length_buckets=settings.length_buckets,
+        jax_cache_dir=settings.jax_cache_dir,
+        bucket_stats=bucket_stats,
+        gpus=settings.worker_gpus,
+    )
+    return runner, uniprot
+
+
+def build_outbox(settings: Settings) -> WebhookOutbox:
+    return WebhookOutbox(settings.data_dir / "webhooks.sqlite3", journal_mode=settings.queue_journal_mode)
+
+
+def build_manager(
+    settings: Settings,
+    *,
+    store: JobStore,
+    artifact_store: ArtifactStore,
+    partner_index: PartnerIndex,
+    bucket_stats: LengthBucketStats,
+    webhooks: WebhookOutbox,
+    retention: RetentionManager | None = None,
+) -> JobManager:
+    runner, uniprot = build_runner(settings, bucket_stats=bucket_stats)
+    return JobManager(
+        store=store,
+        runner=runner,
+        uniprot=uniprot,
+        prefetch_depth=settings.prefetch_depth,
+        cascade_threshold=settings.cascade_threshold,
+        cascade_metric=settings.cascade_metric,
+        artifact_store=artifact_store,
+        retention=retention,
+        partner_index=partner_index,
+        webhooks=webhooks,
+        work_queue=SqliteWorkQueue(
+            settings.data_dir / "queue.sqlite3",
+            lease_s=settings.worker_lease_s,
+            journal_mode=settings.queue_journal_mode,
+        ),
+        worker_id=settings.worker_id,
+        poll_s=settings.worker_poll_s,
+        postprocess_workers=settings.postprocess_workers,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run AlphaFold-Multimer jobs from the shared work queue.")
+    parser.add_argument("--worker-id", help="Lease owner name, unique per worker (default: SHENLAB_WORKER_ID or host:pid)")
+    parser.add_argument("--poll-s", type=float, help="Seconds between queue polls when idle")
+    parser.add_argument("--gpus", help='GPUs for this worker\'s containers: "all" or device ids like "0" or "0,1"')
+    args = parser.parse_args(argv)
+
+    settings = load_settings()
+    if args.worker_id:
+        settings = replace(settings, worker_id=args.worker_id)
+    if args.poll_s is not None:
+        settings = replace(settings, worker_poll_s=args.poll_s)
+    if args.gpus:
+        settings = replace(settings, worker_gpus=args.gpus)
+
+    store = JobStore(settings.data_dir, cache_entries=settings.record_cache_entries, layout=settings.job_layout)
+    # No retention here: the API process runs it, and its periodic pass prunes work dirs of jobs finished here.
+    manager = build_manager(
+        settings,
+        store=store,
+        artifact_store=ArtifactStore(settings.data_dir),
+        partner_index=PartnerIndex(settings.data_dir / "partner_index.jsonl"),
+        bucket_stats=LengthBucketStats(settings.data_dir / "length_buckets.json"),
+        # Events of jobs finished here wait in the outbox for the API's dispatcher.
+        webhooks=build_outbox(settings),
+    )
+
+    # This process serves no HTTP: the API's /metrics reads its snapshots.
+    SnapshotExporter(
+        settings.data_dir / "metrics", f"worker-{manager.worker_id}", interval_s=settings.metrics_snapshot_s
+    ).start()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    manager.start(worker=True)
+    stop.wait()
+    manager.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,316 @@
+"""
+Stand-in for `docker run ... colabfold_batch` on machines without a GPU.
+
+    python -m benchmarks.colabfold_emulator --install BIN_DIR
+
+writes `docker` and `colabfold_batch` shims into BIN_DIR; with BIN_DIR first
+on PATH, `ColabFoldDockerRunner` runs this module instead of ColabFold. It
+maps the container paths back through the `-v` mounts, reads the query
+(FASTA or a3m), streams a ColabFold-like log (MSA server progress, `Setting
+max_seq`, one line per recycle, the ranking) and writes the files ColabFold
+would, sized to the real chain lengths: the a3m with `AFM_EMU_MSA_DEPTH`
+rows, a full-atom PDB and a scores JSON with the LxL PAE per model, and the
+rank 1 PAE JSON. Runtimes follow ColabFold's shape, scaled by
+`AFM_EMU_TIME_SCALE`:
+
+- `AFM_EMU_MSA_S` (default 60): MSA server round trip, skipped for a3m input
+- `AFM_EMU_COMPILE_S` (default 90): XLA compile, once per padded length and
+  JAX cache dir (`JAX_COMPILATION_CACHE_DIR`), like the persistent cache
+- `AFM_EMU_RECYCLE_S` (default 4): one recycle at 512 residues; grows with
+  the square of the padded length
+- `AFM_EMU_FAIL_RATE` (default 0): fraction of runs exiting 1 mid-inference
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+import random
+import stat
+import sys
+import time
+from typing import Iterator, TextIO
+
+# Heavy atoms per residue, so PDB sizes match real models.
+_HEAVY_ATOMS = {
+    "G": 4, "A": 5, "S": 6, "C": 6, "V": 7, "T": 7, "P": 7, "I": 8, "L": 8, "D": 8, "N": 8,
+    "M": 8, "E": 9, "Q": 9, "K": 9, "H": 10, "F": 11, "R": 11, "Y": 12, "W": 14,
+}  # fmt: skip
+_THREE = {
+    "A": "ALA", "R": "ARG", "N": "ASN", "D": "ASP", "C": "CYS", "Q": "GLN", "E": "GLU", "G": "GLY", "H": "HIS",
+    "I": "ILE", "L": "LEU", "K": "LYS", "M": "MET", "F": "PHE", "P": "PRO", "S": "SER", "T": "THR", "W": "TRP",
+    "Y": "TYR", "V": "VAL",
+}  # fmt: skip
+_ATOM_NAMES = ("N", "CA", "C", "O", "CB", "CG", "CD", "CE", "NZ", "OG", "OD1", "ND2", "CZ", "OH")
+_MODEL_TAG = "alphafold2_multimer_v3_model_{}_seed_000"
+
+# Options of `docker run` that take a separate value.
+_DOCKER_VALUE_OPTS = {"-v", "--volume", "-w", "--workdir", "-e", "--env", "--gpus", "--name", "-u", "--user",
+                      "--entrypoint", "--network", "--shm-size"}  # fmt: skip
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+class _Log:
+    """ColabFold's logging format, to stdout (the runner's pipe) and `out/log.txt`."""
+
+    def __init__(self, path: Path) -> None:
+        self._file: TextIO = path.open("a", encoding="utf-8")
+
+    def __call__(self, message: str) -> None:
+        now = datetime.now()
+        line = f"{now:%Y-%m-%d %H:%M:%S},{now.microsecond // 1000:03d} {message}\n"
+        sys.stdout.write(line)
+        sys.stdout.flush()
+        self._file.write(line)
+        self._file.flush()
+
+
+def _read_query(path: Path) -> tuple[str, list[str], bool]:
+    """(job name, chain sequences, query is an a3m) the way colabfold_batch reads a single-query input."""
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".a3m":
+        lines = text.splitlines()
+        lens_part, _, card_part = lines[0][1:].partition("\t")
+        lengths = [int(x) for x in lens_part.split(",")]
+        cards = [int(x) for x in card_part.split(",")] if card_part else [1] * len(lengths)
+        seq = next(line for line in lines[1:] if line and not line.startswith(">"))
+        chains, i = [], 0
+        for n, c in zip(lengths, cards):
+            chains += [seq[i : i + n]] * c
+            i += n
+        return path.stem, chains, True
+    header, *body = [line.strip() for line in text.splitlines() if line.strip()]
+    return header[1:].split()[0], "".join(body).split(":"), False
+
+
+def _sleep(seconds: float) -> None:
+    time.sleep(max(seconds * _env_float("AFM_EMU_TIME_SCALE", 1.0), 0.0))
+
+
+def _pae_rows(lengths: list[int], rng: random.Random) -> Iterator[str]:
+    """JSON rows of an LxL PAE matrix: low within chains, higher across; 2 decimals like ColabFold."""
+    bounds = [(sum(lengths[:k]), sum(lengths[: k + 1])) for k in range(len(lengths))]
+    total = sum(lengths)
+    intra, inter = [f"{rng.uniform(0.5, 4):.2f}" for _ in range(8)], [f"{rng.uniform(8, 28):.2f}" for _ in range(8)]
+    for i in range(total):
+        own = next((k for k, (lo, hi) in enumerate(bounds) if lo <= i < hi), -1)
+        parts = []
+        for k, (lo, hi) in enumerate(bounds):
+            token = (intra if k == own else inter)[(i + k) % 8]
+            parts.append(",".join([token] * (hi - lo)))
+        yield "[" + ",".join(parts) + "]"
+
+
+def _write_scores(path: Path, lengths: list[int], rng: random.Random, *, plddt: float, ptm: float, iptm: float) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        plddts = ",".join(f"{min(max(rng.gauss(plddt, 8), 20), 98):.2f}" for _ in range(sum(lengths)))
+        f.write('{"max_pae":31.75,"pae":[')
+        for i, row in enumerate(_pae_rows(lengths, rng)):
+            f.write(("," if i else "") + row)
+        f.write(f'],"plddt":[{plddts}],"ptm":{ptm},"iptm":{iptm}}}')
+
+
+def _write_pdb(path: Path, chains: list[str], rng: random.Random, *, plddt: float) -> None:
+    serial = 1
+    with path.open("w", encoding="utf-8") as f:
+        f.write("MODEL     1\n")
+        for k, seq in enumerate(chains):
+            chain = chr(ord("A") + k)
+            for resseq, aa in enumerate(seq, start=1):
+                b = min(max(rng.gauss(plddt, 8), 20), 98)
+                for name in _ATOM_NAMES[: _HEAVY_ATOMS.get(aa, 8)]:
+                    x, y, z = resseq * 3.8 % 97, serial * 0.37 % 53, k * 11.0 + serial * 0.11 % 29
+                    f.write(
+                        f"ATOM  {serial % 100000:5d}  {name:<3s} {_THREE.get(aa, 'UNK')} {chain}{resseq:4d}    "
+                        f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00{b:6.2f}           {name[0]}\n"
+                    )
+                    serial += 1
+            f.write(f"TER   {serial % 100000:5d}      {_THREE.get(seq[-1], 'UNK')} {chain}{len(seq):4d}\n")
+            serial += 1
+        f.write("ENDMDL\nEND\n")
+
+
+def _write_a3m(path: Path, chains: list[str], rng: random.Random, depth: int) -> None:
+    unique: dict[str, int] = {}
+    for c in chains:
+        unique[c] = unique.get(c, 0) + 1
+    query = "".join(unique)
+    alphabet = "ACDEFGHIKLMNPQRSTVWY-"
+    with path.open("w", encoding="utf-8") as f:
+        f.write(f"#{','.join(str(len(s)) for s in unique)}\t{','.join(map(str, unique.values()))}\n")
+        f.write(f">101\n{query}\n")
+        for i in range(depth):
+            # homologs: the query with ~30% substitutions/gaps, in one shot per row
+            row = "".join(c if rng.random() > 0.3 else rng.choice(alphabet) for c in query)
+            f.write(f">UniRef100_{i:06d}\t{rng.randint(40, 900)}\t0.{rng.randint(100, 999)}\n{row}\n")
+
+
+def colabfold_batch(argv: list[str], *, jax_cache: Path | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="colabfold_batch")
+    parser.add_argument("query", type=Path)
+    parser.add_argument("out", type=Path)
+    parser.add_argument("--model-type", default="alphafold2_multimer_v3")
+    parser.add_argument("--rank", default="multimer")
+    parser.add_argument("--num-recycle", type=int, default=3)
+    parser.add_argument("--num-models", type=int, default=5)
+    parser.add_argument("--model-order", default=None)
+    parser.add_argument("--recompile-padding", type=int, default=0)
+    parser.add_argument("--recycle-early-stop-tolerance", type=float, default=None)
+    args, _unknown = parser.parse_known_args(argv)
+
+    name, chains, is_a3m = _read_query(args.query)
+    lengths = [len(c) for c in chains]
+    total = sum(lengths)
+    padded = total + args.recompile_padding
+    seed = int.from_bytes(hashlib.sha256(":".join(chains).encode()).digest()[:8], "big")
+    rng = random.Random(seed)  # same query, same scores
+    args.out.mkdir(parents=True, exist_ok=True)
+    log = _Log(args.out / "log.txt")
+
+    log("Running colabfold 1.5.5 (emulated)")
+    log("Found 1 citations for tools or databases")
+    log(f"Query 1/1: {name} (length {total})")
+    a3m = args.out / f"{name}.a3m"
+    if is_a3m:
+        a3m.write_text(args.query.read_text(encoding="utf-8"), encoding="utf-8")
+    else:
+        msa_s = _env_float("AFM_EMU_MSA_S", 60.0) * (1 + total / 1000)
+        for status in ("PENDING", "RUNNING"):
+            print(f"{status}: 0%|          | 0/{150 * len(set(chains))} [elapsed: 00:00 remaining: ?]", flush=True)
+            _sleep(msa_s / 2)
+        print(f"COMPLETE: 100%|##########| {150 * len(set(chains))}/{150 * len(set(chains))}", flush=True)
+        _write_a3m(a3m, chains, rng, int(_env_float("AFM_EMU_MSA_DEPTH", 512)))
+    log("Setting max_seq=508, max_extra_seq=2048")
+
+    marker = jax_cache / f"emulated_{padded}" if jax_cache is not None else None
+    if marker is None or not marker.exists():
+        _sleep(_env_float("AFM_EMU_COMPILE_S", 90.0) * (padded / 512))
+        if marker is not None:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+
+    models = [int(m) for m in args.model_order.split(",")] if args.model_order else list(range(1, 6))
+    models = models[: args.num_models]
+    recycle_s = _env_float("AFM_EMU_RECYCLE_S", 4.0) * (padded / 512) ** 2
+    # not from `rng`: a retried job must not fail the same way every time
+    fail_at = random.choice(models) if random.random() < _env_float("AFM_EMU_FAIL_RATE", 0.0) else None
+    base = rng.uniform(0.2, 0.9)
+    scores: dict[int, tuple[float, float, float]] = {}
+    for m in models:
+        tag = _MODEL_TAG.format(m)
+        iptm = ptm = plddt = 0.0
+        recycles = 0
+        for r in range(args.num_recycle + 1):
+            _sleep(recycle_s)
+            iptm = round(min(base + rng.uniform(-0.1, 0.1) + r * 0.01, 0.97), 3)
+            ptm = round(min(iptm + rng.uniform(0.0, 0.1), 0.98), 3)
+            plddt = round(40 + 50 * iptm, 1)
+            log(f"{tag} recycle={r} pLDDT={plddt:.3g} pTM={ptm:.3g} ipTM={iptm:.3g}")
+            recycles = r
+            if fail_at == m:
+                log("jax.errors.JaxRuntimeError: RESOURCE_EXHAUSTED: Out of memory (emulated)")
+                return 1
+            tol = args.recycle_early_stop_tolerance
+            if tol is not None and r >= 1 and rng.random() < tol:
+                break
+        log(f"{tag} took {recycle_s * (recycles + 1):.1f}s ({recycles} recycles)")
+        _write_pdb(args.out / f"{name}_unrelaxed_{tag}.pdb", chains, rng, plddt=plddt)
+        _write_scores(args.out / f"{name}_scores_{tag}.json", lengths, rng, plddt=plddt, ptm=ptm, iptm=iptm)
+        scores[m] = (plddt, ptm, iptm)
+
+    log("reranking models by 'multimer' metric")
+    ranked = sorted(scores, key=lambda m: 0.8 * scores[m][2] + 0.2 * scores[m][1], reverse=True)
+    for rank, m in enumerate(ranked, start=1):
+        tag = _MODEL_TAG.format(m)
+        plddt, ptm, iptm = scores[m]
+        for kind, ext in (("unrelaxed", "pdb"), ("scores", "json")):
+            os.replace(args.out / f"{name}_{kind}_{tag}.{ext}", args.out / f"{name}_{kind}_rank_{rank:03d}_{tag}.{ext}")
+        log(f"rank_{rank:03d}_{tag} pLDDT={plddt:.3g} pTM={ptm:.3g} ipTM={iptm:.3g}")
+    best = json.loads((args.out / f"{name}_scores_rank_001_{_MODEL_TAG.format(ranked[0])}.json").read_text())
+    (args.out / f"{name}_predicted_aligned_error_v1.json").write_text(
+        json.dumps({"predicted_aligned_error": best["pae"], "max_predicted_aligned_error": 31.75}, separators=(",", ":"))
+    )
+    (args.out / "config.json").write_text(json.dumps({"num_recycles": args.num_recycle, "model_order": models}))
+    (args.out / f"{name}.done.txt").touch()
+    log("Done")
+    return 0
+
+
+def docker(argv: list[str]) -> int:
+    """`docker run [opts] IMAGE colabfold_batch ARGS`, with container paths mapped back through `-v`."""
+    if not argv or argv[0] != "run":
+        print(f"docker (emulated): only `run` is supported, got {argv[:1]}", file=sys.stderr)
+        return 125
+    mounts: dict[str, Path] = {}
+    workdir = "/"
+    env: dict[str, str] = {}
+    i = 1
+    while i < len(argv) and argv[i].startswith("-"):
+        opt = argv[i]
+        if "=" in opt or opt not in _DOCKER_VALUE_OPTS:
+            i += 1
+            continue
+        value = argv[i + 1]
+        if opt in ("-v", "--volume"):
+            host, container = value.split(":")[:2]
+            mounts[container.rstrip("/")] = Path(host)
+        elif opt in ("-w", "--workdir"):
+            workdir = value
+        elif opt in ("-e", "--env"):
+            k, _, v = value.partition("=")
+            env[k] = v
+        i += 2
+    command = argv[i + 1 :]  # past the image
+
+    def host_path(p: str) -> Path:
+        p = p if p.startswith("/") else f"{workdir.rstrip('/')}/{p}"
+        for container in sorted(mounts, key=len, reverse=True):
+            if p == container or p.startswith(container + "/"):
+                return mounts[container] / p[len(container) :].lstrip("/")
+        raise SystemExit(f"docker (emulated): {p} is not under a mounted volume")
+
+    if not command or command[0] != "colabfold_batch":
+        print(f"docker (emulated): only colabfold_batch is supported, got {command[:1]}", file=sys.stderr)
+        return 127
+    args = list(command[1:])
+    positional = [k for k, a in enumerate(args) if not a.startswith("-") and (k == 0 or not args[k - 1].startswith("-"))]
+    for k in positional[-2:]:
+        args[k] = str(host_path(args[k]))
+    cache = env.get("JAX_COMPILATION_CACHE_DIR")
+    return colabfold_batch(args, jax_cache=host_path(cache) if cache else None)
+
+
+def install(bin_dir: Path) -> None:
+    """Writes `docker` and `colabfold_batch` shims running this module with the current interpreter."""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    root = Path(__file__).resolve().parent.parent
+    for name in ("docker", "colabfold_batch"):
+        shim = bin_dir / name
+        shim.write_text(
+            "#!/bin/sh\n"
+            f'PYTHONPATH="{root}${{PYTHONPATH:+:$PYTHONPATH}}" '
+            f'exec "{sys.executable}" -m benchmarks.colabfold_emulator --as {name} "$@"\n',
+            encoding="utf-8",
+        )
+        shim.chmod(shim.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["--install"]:
+        install(Path(argv[1]))
+        return 0
+    if argv[:1] == ["--as"]:
+        return docker(argv[2:]) if argv[1] == "docker" else colabfold_batch(argv[2:])
+    return colabfold_batch(argv)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
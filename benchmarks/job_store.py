@@ -0,0 +1,328 @@
+"""
+JobStore at 1k / 10k / 100k jobs.
+
+    python -m benchmarks.job_store [--sizes 1000,10000,100000] [--data-root DIR] [--json out.json]
+    python -m benchmarks.job_store --compare before.json after.json
+
+Generates a data dir per size (under `--data-root`, reused when it already
+holds one of that size and seed, so two versions of the code can be timed on
+the same files): jobs spread over 90 days in mixed statuses, with result.json
+for the succeeded ones. Then times `count`, `list` (first and last page),
+`get`, `create_job`, `update` and `GET /api/v1/jobs` pages, with a cold
+record cache (a new JobStore) and a warm one, and measures the peak Python
+allocation of each operation with tracemalloc in a separate untimed pass.
+The page cache is warm throughout.
+
+`--json` writes the results with the git commit they were measured at;
+`--compare` prints the ratio of two such files per operation.
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import os
+from pathlib import Path
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+import uuid
+
+from alphafold_multimer_service.jobs import JobRecord, JobStore
+from benchmarks.throughput import percentiles
+
+_STATUSES = (("succeeded", 0.70), ("failed", 0.10), ("running", 0.05), ("queued", 0.15))
+_AMINO = "ACDEFGHIKLMNPQRSTVWY"
+_MARKER = "benchmark.json"
+
+
+def _record(rng: random.Random, created: datetime, status: str) -> tuple[dict[str, Any], dict[str, Any] | None]:
+    """job.json contents (as JobStore writes them) and, for succeeded jobs, result.json."""
+    job_id = f"job_{created:%Y%m%d_%H%M%S}_{uuid.UUID(int=rng.getrandbits(128)).hex[:8]}"
+    chains = []
+    proteins = []
+    for _ in range(2):
+        n = rng.randint(80, 900)
+        seq = "".join(rng.choice(_AMINO) for _ in range(16))  # digest input only; lengths are what matter
+        sha = hashlib.sha256(f"{seq}{n}".encode()).hexdigest()
+        accession = f"P{rng.randint(10000, 99999)}"
+        proteins.append({"uniprot": accession})
+        chains.append({"source": "uniprot", "uniprot": accession, "length": n, "sha256": sha})
+    start = created.timestamp()
+    started = created + timedelta(seconds=rng.uniform(1, 3600))
+    finished = started + timedelta(seconds=rng.uniform(300, 5400))
+    trace = [{"name": "queued", "cat": "stage", "attempt": 1, "start": start, "end": None}]
+    rec: dict[str, Any] = {
+        "job_id": job_id,
+        "service": "alphafold-multimer",
+        "status": status,
+        "created_at": created.isoformat(),
+        "request": {"protein_a": proteins[0], "protein_b": proteins[1], "preset": "fast", "options": {}},
+        "chains": chains,
+        "input_sha256": hashlib.sha256("".join(c["sha256"] for c in chains).encode()).hexdigest(),
+        "attempts": 0,
+        "trace": trace,
+    }
+    result = None
+    if status != "queued":
+        trace[0]["end"] = started.timestamp()
+        rec.update(started_at=started.isoformat(), attempts=1, worker="bench:1")
+        trace.append({"name": "run", "cat": "stage", "attempt": 1, "start": started.timestamp(), "end": None})
+        message = "alphafold2_multimer_v3_model_2_seed_000 recycle=1 pLDDT=71.2 pTM=0.6 ipTM=0.4"
+        rec["progress"] = {"stage": "inference", "message": message, "percent": 40}
+    if status in {"succeeded", "failed"}:
+        trace[-1]["end"] = finished.timestamp()
+        rec["finished_at"] = finished.isoformat()
+    if status == "succeeded":
+        rec["progress"] = {"stage": "done", "message": "Succeeded", "percent": 100}
+        score = round(rng.uniform(0.2, 0.9), 4)
+        result = {
+            "job_id": job_id,
+            "service": "alphafold-multimer",
+            "status": "succeeded",
+            "primary_score": {"name": "ranking_confidence", "value": score},
+            "metrics": {"iptm": score, "ptm": score, "ranking_confidence": score, "plddt": 70.1},
+            "artifacts": [
+                {"name": n, "url": f"/api/v1/jobs/{job_id}/artifacts/{n}", "media_type": None, "size_bytes": 1}
+                for n in ("rank_001.pdb", "pae.json", "log.txt")
+            ],
+        }
+    elif status == "failed":
+        rec["progress"] = {"stage": "failed", "message": "Failed", "percent": 100}
+        rec["error"] = "RuntimeError: ColabFold docker run failed (exit=1). See artifacts/docker.log.txt"
+    return rec, result
+
+
+def generate(data_dir: Path, n: int, *, seed: int) -> None:
+    """A data dir of `n` jobs, reused if an earlier run left one of the same size and seed."""
+    marker = data_dir / _MARKER
+    if marker.exists() and json.loads(marker.read_text()) == {"jobs": n, "seed": seed}:
+        return
+    shutil.rmtree(data_dir, ignore_errors=True)
+    jobs_dir = data_dir / "jobs"
+    jobs_dir.mkdir(parents=True)
+    rng = random.Random(seed)
+    end = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    names, weights = zip(*_STATUSES)
+    for i in range(n):
+        created = end - timedelta(seconds=rng.uniform(0, 90 * 86400))
+        rec, result = _record(rng, created, rng.choices(names, weights)[0])
+        if i == 0:
+            JobRecord.model_validate(rec)  # the generator keeps up with the record schema
+        job_dir = jobs_dir / rec["job_id"]
+        job_dir.mkdir()
+        (job_dir / "job.json").write_text(json.dumps(rec, indent=2) + "\n", encoding="utf-8")
+        if result is not None:
+            (job_dir / "result.json").write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+    marker.write_text(json.dumps({"jobs": n, "seed": seed}))
+
+
+def _time(fn: Callable[[], object], repeat: int, setup: Callable[[], None] | None = None) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def _peak_kib(fn: Callable[[], object], setup: Callable[[], None] | None = None) -> int:
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _job_ids(jobs_dir: Path) -> list[str]:
+    """Job ids in the flat layout and in day shards (`migrate_layout`), without the store's help."""
+    ids: list[str] = []
+    for name in os.listdir(jobs_dir):
+        if name.isdigit():
+            ids += os.listdir(jobs_dir / name)
+        elif name.startswith("job_"):
+            ids.append(name)
+    return sorted(ids)
+
+
+def bench_size(data_dir: Path, n: int, *, repeat: int, bulk_repeat: int, seed: int) -> list[dict[str, Any]]:
+    from fastapi.testclient import TestClient
+
+    from alphafold_multimer_service.api import create_app
+    from alphafold_multimer_service.config import Settings
+
+    rows: list[dict[str, Any]] = []
+    rng = random.Random(seed + 1)
+    ids = _job_ids(data_dir / "jobs")
+    sample = [rng.choice(ids) for _ in range(repeat)]
+    holder: dict[str, JobStore] = {}
+
+    def fresh() -> None:
+        holder["store"] = JobStore(data_dir)
+
+    def store() -> JobStore:
+        return holder["store"]
+
+    def record(op: str, variant: str, fn: Callable[[], object], times: int, setup: Callable[[], None] | None) -> None:
+        seconds = _time(fn, times, setup)
+        rows.append(
+            {
+                "jobs": n,
+                "op": op,
+                "variant": variant,
+                "n": len(seconds),
+                "mean_ms": round(sum(seconds) / len(seconds) * 1e3, 3),
+                **percentiles(seconds),
+                "peak_alloc_kib": _peak_kib(fn, setup),
+            }
+        )
+        row = rows[-1]
+        print(f"{n:>7d} {op:<16s} {variant:<26s} p50 {row['p50_ms']:>10} ms  peak {row['peak_alloc_kib']} KiB")
+
+    fresh()
+    store().get(ids[0])  # warm up imports and the page cache of the jobs dir
+    record("count", "", lambda: store().count(), bulk_repeat, None)
+    for variant, offset in (("first page", 0), ("last page", max(n - 20, 0))):
+        record("list", f"{variant} cold", lambda o=offset: store().list(limit=20, offset=o), bulk_repeat, fresh)
+    fresh()
+    store().list(limit=20, offset=0)
+    record("list", "first page warm", lambda: store().list(limit=20, offset=0), bulk_repeat, None)
+
+    it = iter(sample * 3)
+    record("get", "cold", lambda: store().get(next(it)), repeat, fresh)
+    fresh()
+    for job_id in sample:
+        store().get(job_id)
+    it = iter(sample * 3)
+    record("get", "warm", lambda: store().get(next(it)), repeat, None)
+
+    recs = iter([store().get(j) for j in sample] * 3)
+    record("update", "rewrite job.json", lambda: store().update(next(recs)), repeat, None)  # type: ignore[arg-type]
+
+    created: list[str] = []
+    request = {"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}, "preset": "fast"}
+    def create() -> None:
+        created.append(store().create_job(service="alphafold-multimer", request=request).job_id)
+
+    record("create_job", "", create, repeat, None)
+    for job_id in created:  # leave the data set as generated
+        job_dir = store().job_dir(job_id)
+        shutil.rmtree(job_dir)
+        if job_dir.parent != data_dir / "jobs" and not any(job_dir.parent.iterdir()):
+            job_dir.parent.rmdir()  # the day shard create_job made
+
+    settings = Settings(
+        data_dir=data_dir,
+        api_token=None,
+        mock_mode=True,
+        cors_allow_origins=[],
+        colabfold_image="none",
+        colabfold_cache_dir=data_dir / "cache",
+        host_ptxas_path=None,
+        default_preset="fast",
+        embedded_worker=False,
+        metrics_snapshot_s=0,
+    )
+    # No `with`: startup would requeue the running jobs and start background threads.
+    client = TestClient(create_app(settings))
+    for limit, offset in ((20, 0), (200, 0), (20, n // 2), (20, max(n - 20, 0))):
+
+        def page(limit: int = limit, offset: int = offset) -> None:
+            r = client.get("/api/v1/jobs", params={"limit": limit, "offset": offset})
+            assert r.status_code == 200, r.text
+
+        record("GET /api/v1/jobs", f"limit={limit} offset={offset}", page, bulk_repeat, None)
+    return rows
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path: Path, new_path: Path) -> None:
+    old, new = (json.loads(p.read_text()) for p in (old_path, new_path))
+    before = {(r["jobs"], r["op"], r["variant"]): r for r in old["results"]}
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')} (p50 ms, peak KiB; ratio new/old)")
+    for r in new["results"]:
+        o = before.get((r["jobs"], r["op"], r["variant"]))
+        if o is None:
+            continue
+        ratio = r["p50_ms"] / o["p50_ms"] if o["p50_ms"] else float("nan")
+        print(
+            f"{r['jobs']:>7d} {r['op']:<16s} {r['variant']:<26s} {o['p50_ms']:>10} -> {r['p50_ms']:>10}  "
+            f"{ratio:6.2f}x  {o['peak_alloc_kib']} -> {r['peak_alloc_kib']} KiB"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated job counts")
+    parser.add_argument("--repeat", type=int, default=200, help="Runs of get, update and create_job")
+    parser.add_argument("--bulk-repeat", type=int, default=3, help="Runs of list, count and pages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-root", type=Path, help="Keep generated data dirs here (default: a temp dir)")
+    parser.add_argument("--json", type=Path, help="Write the results here")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"), help="Compare two --json files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    tmp = None
+    root = args.data_root
+    if root is None:
+        tmp = tempfile.TemporaryDirectory()
+        root = Path(tmp.name)
+    results: list[dict[str, Any]] = []
+    generated: dict[int, float] = {}
+    try:
+        for n in (int(s) for s in args.sizes.split(",")):
+            t0 = time.perf_counter()
+            generate(root / f"jobs_{n}", n, seed=args.seed)
+            generated[n] = round(time.perf_counter() - t0, 1)
+            results += bench_size(
+                root / f"jobs_{n}", n, repeat=args.repeat, bulk_repeat=args.bulk_repeat, seed=args.seed
+            )
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    meta = {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "measured_at": datetime.now(tz=timezone.utc).isoformat(),
+        "args": {k: str(v) for k, v in vars(args).items() if k not in {"json", "compare"}},
+        "generate_s": generated,
+        # KiB on Linux
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if args.json:
+        args.json.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
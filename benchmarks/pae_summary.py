@@ -0,0 +1,72 @@
+"""
+Chain-pair PAE summary with and without numpy.
+
+    python -m benchmarks.pae_summary [--residues 1500,500,500] [--repeat 5]
+
+Builds a random PAE matrix for a complex with the given chain lengths and
+times `compute_chain_pair_summary` on its numpy block-slice path (skipped
+when numpy is not installed) and on the pure-Python row reduction, plus
+`load_pae` of the same matrix written as a ColabFold scores JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import random
+import tempfile
+import time
+from typing import Callable
+
+from alphafold_multimer_service.alphafold_multimer import parser as pae_parser
+from alphafold_multimer_service.alphafold_multimer.parser import compute_chain_pair_summary, load_pae
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _pure_python(pae: list[list[float]], lengths: list[int]) -> object:
+    numpy, pae_parser.numpy = pae_parser.numpy, None
+    try:
+        return compute_chain_pair_summary(pae, lengths)
+    finally:
+        pae_parser.numpy = numpy
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--residues", default="1500,500,500", help="Comma-separated chain lengths")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    lengths = [int(n) for n in args.residues.split(",")]
+    n = sum(lengths)
+    rng = random.Random(0)
+    pae = [[round(rng.uniform(0.0, 31.75), 2) for _ in range(n)] for _ in range(n)]
+    with tempfile.TemporaryDirectory() as tmp:
+        scores = Path(tmp) / "scores.json"
+        scores.write_text(json.dumps({"pae": pae}), encoding="utf-8")
+        print(f"{len(lengths)} chains, {n}x{n} PAE, {scores.stat().st_size / 1e6:.1f} MB JSON")
+        rows = [("pure Python", lambda: _pure_python(pae, lengths))]
+        if pae_parser.numpy is not None:
+            rows.append(("numpy block slices", lambda: compute_chain_pair_summary(pae, lengths)))
+        else:
+            print("numpy not installed: vectorized path skipped")
+        rows.append(("load_pae (for scale)", lambda: load_pae(scores)))
+        baseline = None
+        for label, fn in rows:
+            t = _best_of(fn, args.repeat)
+            baseline = baseline or t
+            print(f"{label:<24s} {t * 1e3:9.2f} ms  {baseline / t:6.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+"""
+Structure reader vs. the line-by-line residue counter.
+
+    python -m benchmarks.structure_reader [--residues 3000] [--repeat 5]
+
+Writes a synthetic two-chain complex (4 atoms per residue) as PDB and as
+mmCIF into a temp dir and times `count_residues_per_chain_pdb` against
+`read_structure(...).residue_counts()` on both, plus a full read that also
+converts coordinates and B-factors (which the old counter never parsed).
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+from typing import Callable
+
+from alphafold_multimer_service.alphafold_multimer.parser import count_residues_per_chain_pdb
+from alphafold_multimer_service.alphafold_multimer.structure import AtomSite, read_structure
+
+_ATOMS = ("N", "CA", "C", "O")
+
+
+def _write_pdb(path: Path, chains: dict[str, int]) -> None:
+    lines = []
+    serial = 1
+    for chain, n in chains.items():
+        for resseq in range(1, n + 1):
+            for name in _ATOMS:
+                x, y, z = resseq * 0.38, serial * 0.01, -serial * 0.02
+                lines.append(
+                    f"ATOM  {serial % 100000:5d}  {name:<3s} ALA {chain}{resseq:4d}    "
+                    f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00{50 + resseq % 50:6.2f}           {name[0]}\n"
+                )
+                serial += 1
+    lines.append("END\n")
+    path.write_text("".join(lines), encoding="utf-8")
+
+
+def _write_mmcif(path: Path, chains: dict[str, int]) -> None:
+    cols = ["group_PDB", "id", "type_symbol", "label_atom_id", "label_comp_id", "label_asym_id", "label_seq_id",
+            "pdbx_PDB_ins_code", "Cartn_x", "Cartn_y", "Cartn_z", "occupancy", "B_iso_or_equiv", "auth_seq_id",
+            "auth_asym_id"]  # fmt: skip
+    lines = ["data_bench\n#\nloop_\n", *(f"_atom_site.{c}\n" for c in cols)]
+    serial = 1
+    for chain, n in chains.items():
+        for resseq in range(1, n + 1):
+            for name in _ATOMS:
+                lines.append(
+                    f"ATOM {serial} {name[0]} {name} ALA {chain} {resseq} ? {resseq * 0.38:.3f} {serial * 0.01:.3f} "
+                    f"{-serial * 0.02:.3f} 1.00 {50 + resseq % 50:.2f} {resseq} {chain}\n"
+                )
+                serial += 1
+    lines.append("#\n")
+    path.write_text("".join(lines), encoding="utf-8")
+
+
+def _all_columns(s: AtomSite) -> object:
+    return s.residue_counts(), s.chain, s.resseq, s.x, s.y, s.z, s.b_factor
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--residues", type=int, default=3000, help="Residues per chain (two chains)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    chains = {"A": args.residues, "B": args.residues // 2}
+    with tempfile.TemporaryDirectory() as tmp:
+        pdb, cif = Path(tmp) / "model.pdb", Path(tmp) / "model.cif"
+        _write_pdb(pdb, chains)
+        _write_mmcif(cif, chains)
+        expected = count_residues_per_chain_pdb(pdb)
+        assert read_structure(pdb).residue_counts() == expected == read_structure(cif).residue_counts()
+
+        atoms = sum(chains.values()) * len(_ATOMS)
+        print(f"{atoms} atoms, {pdb.stat().st_size / 1e6:.1f} MB PDB, {cif.stat().st_size / 1e6:.1f} MB mmCIF")
+        rows = [
+            ("count_residues_per_chain_pdb (pdb)", lambda: count_residues_per_chain_pdb(pdb)),
+            ("read_structure + residue_counts (pdb)", lambda: read_structure(pdb).residue_counts()),
+            ("read_structure + residue_counts (mmcif)", lambda: read_structure(cif).residue_counts()),
+            ("read_structure + all columns (pdb)", lambda: _all_columns(read_structure(pdb))),
+        ]
+        baseline = None
+        for label, fn in rows:
+            t = _best_of(fn, args.repeat)
+            baseline = baseline or t
+            print(f"{label:<42s} {t * 1e3:8.2f} ms  {baseline / t:5.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,281 @@
+"""
+End-to-end throughput of the service with ColabFold emulated.
+
+    python -m benchmarks.throughput [--jobs 24] [--submitters 4] [--pollers 8] [--time-scale 0.005]
+
+Starts the API in-process on a temp data dir, with the real Docker runner
+and `benchmarks.colabfold_emulator` shims first on PATH, then submits
+`--jobs` two-chain jobs of random sequences from `--submitters` threads
+while `--pollers` threads poll their status until every job finished.
+Prints submit and status latency percentiles, worker idle and busy time
+(from `/metrics`) and jobs per hour over the wall time; `--json` writes the
+same numbers for comparing runs.
+
+`--url` drives a running deployment instead; its workers need the shims
+(`python -m benchmarks.colabfold_emulator --install DIR`) first on PATH and
+the `AFM_EMU_*` variables in their environment.
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass, field
+import json
+import os
+from pathlib import Path
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+from typing import Any
+
+import requests
+
+from benchmarks.colabfold_emulator import install
+
+_AMINO = "ACDEFGHIKLMNPQRSTVWY"
+_TERMINAL = {"succeeded", "failed"}
+
+
+@dataclass
+class _Run:
+    submit_s: list[float] = field(default_factory=list)
+    status_s: list[float] = field(default_factory=list)
+    submitted_at: dict[str, float] = field(default_factory=dict)
+    finished_at: dict[str, float] = field(default_factory=dict)
+    statuses: dict[str, str] = field(default_factory=dict)
+    errors: list[str] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def percentiles(seconds: list[float], *, unit: str = "ms") -> dict[str, float | None]:
+    """p50/p90/p99/max (nearest rank) in `unit` (ms or s)."""
+    factor = {"ms": 1e3, "s": 1.0}[unit]
+    s = sorted(seconds)
+
+    def at(q: float) -> float | None:
+        return round(s[min(int(q * len(s)), len(s) - 1)] * factor, 2) if s else None
+
+    return {f"p50_{unit}": at(0.5), f"p90_{unit}": at(0.9), f"p99_{unit}": at(0.99), f"max_{unit}": at(1.0)}
+
+
+def _metric_sum(text: str, name: str) -> float:
+    """Sum of a metric's samples over all label sets (all processes)."""
+    pattern = re.compile(rf"^{re.escape(name)}(?:\{{[^}}]*\}})? (\S+)$", re.MULTILINE)
+    return sum(float(v) for v in pattern.findall(text))
+
+
+def _jobs(n: int, lengths: tuple[int, int], seed: int) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+
+    def seq() -> str:
+        return "M" + "".join(rng.choice(_AMINO) for _ in range(rng.randint(*lengths) - 1))
+
+    return [{"protein_a": {"sequence": seq()}, "protein_b": {"sequence": seq()}} for _ in range(n)]
+
+
+def _submitter(client: Any, todo: "queue.Queue[dict[str, Any]]", open_jobs: "queue.Queue[str]", run: _Run) -> None:
+    while True:
+        try:
+            body = todo.get_nowait()
+        except queue.Empty:
+            return
+        t0 = time.perf_counter()
+        r = client.post("/api/v1/services/alphafold-multimer/jobs", json=body)
+        elapsed = time.perf_counter() - t0
+        with run.lock:
+            run.submit_s.append(elapsed)
+            if r.status_code != 201:
+                run.errors.append(f"submit: HTTP {r.status_code}")
+                continue
+            job_id = r.json()["job_id"]
+            run.submitted_at[job_id] = time.time()
+        open_jobs.put(job_id)
+
+
+def _poller(client: Any, open_jobs: "queue.Queue[str]", run: _Run, done: threading.Event, interval_s: float) -> None:
+    while not done.is_set():
+        try:
+            job_id = open_jobs.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        t0 = time.perf_counter()
+        r = client.get(f"/api/v1/jobs/{job_id}")
+        elapsed = time.perf_counter() - t0
+        status = r.json().get("status") if r.status_code == 200 else None
+        with run.lock:
+            run.status_s.append(elapsed)
+            if status in _TERMINAL:
+                run.statuses[job_id] = status
+                run.finished_at[job_id] = time.time()
+                continue
+        open_jobs.put(job_id)
+        time.sleep(interval_s)
+
+
+class _Remote:
+    def __init__(self, base_url: str, token: str | None) -> None:
+        self._base = base_url.rstrip("/")
+        self._session = requests.Session()
+        if token:
+            self._session.headers["Authorization"] = f"Bearer {token}"
+
+    def post(self, path: str, **kwargs: Any) -> requests.Response:
+        return self._session.post(self._base + path, timeout=60, **kwargs)
+
+    def get(self, path: str, **kwargs: Any) -> requests.Response:
+        return self._session.get(self._base + path, timeout=60, **kwargs)
+
+
+def drive(client: Any, args: argparse.Namespace) -> dict[str, Any]:
+    run = _Run()
+    todo: "queue.Queue[dict[str, Any]]" = queue.Queue()
+    for body in _jobs(args.jobs, (args.min_length, args.max_length), args.seed):
+        todo.put({**body, "preset": args.preset})
+    open_jobs: "queue.Queue[str]" = queue.Queue()
+    done = threading.Event()
+
+    before = client.get("/metrics").text
+    started = time.time()
+    submitters = [
+        threading.Thread(target=_submitter, args=(client, todo, open_jobs, run)) for _ in range(args.submitters)
+    ]
+    pollers = [
+        threading.Thread(target=_poller, args=(client, open_jobs, run, done, args.poll_interval))
+        for _ in range(args.pollers)
+    ]
+    for t in submitters + pollers:
+        t.start()
+    for t in submitters:
+        t.join()
+    deadline = started + args.timeout
+    while time.time() < deadline:
+        with run.lock:
+            if len(run.finished_at) + len(run.errors) >= args.jobs:
+                break
+        time.sleep(0.1)
+    done.set()
+    for t in pollers:
+        t.join()
+    wall = (max(run.finished_at.values()) if run.finished_at else time.time()) - started
+    after = client.get("/metrics").text
+
+    def delta(name: str) -> float:
+        return round(_metric_sum(after, name) - _metric_sum(before, name), 3)
+
+    e2e = [run.finished_at[j] - run.submitted_at[j] for j in run.finished_at]
+    succeeded = sum(1 for s in run.statuses.values() if s == "succeeded")
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in {"json", "token"}},
+        "jobs": {
+            "submitted": len(run.submitted_at),
+            "succeeded": succeeded,
+            "failed": len(run.statuses) - succeeded,
+            "unfinished": len(run.submitted_at) - len(run.statuses),
+            "errors": run.errors[:20],
+        },
+        "wall_s": round(wall, 3),
+        "jobs_per_hour": round(len(run.finished_at) / wall * 3600, 1) if wall > 0 else None,
+        "submit_latency": {"n": len(run.submit_s), **percentiles(run.submit_s)},
+        "status_latency": {"n": len(run.status_s), **percentiles(run.status_s)},
+        "end_to_end": {"n": len(e2e), **percentiles(e2e, unit="s")},
+        "worker": {
+            "idle_s": delta("afm_worker_idle_seconds_sum"),
+            "busy_s": delta("afm_worker_busy_seconds_total"),
+            "idle_fraction": round(delta("afm_worker_idle_seconds_sum") / wall, 3) if wall > 0 else None,
+        },
+    }
+
+
+def _print(report: dict[str, Any]) -> None:
+    jobs = report["jobs"]
+    print(
+        f"{jobs['submitted']} jobs: {jobs['succeeded']} succeeded, {jobs['failed']} failed, "
+        f"{jobs['unfinished']} unfinished in {report['wall_s']:.1f} s -> {report['jobs_per_hour']} jobs/hour"
+    )
+    for key in ("submit_latency", "status_latency"):
+        lat = report[key]
+        print(
+            f"{key:<16s} n={lat['n']:<6d} p50 {lat['p50_ms']} ms  p90 {lat['p90_ms']} ms  "
+            f"p99 {lat['p99_ms']} ms  max {lat['max_ms']} ms"
+        )
+    e2e = report["end_to_end"]
+    print(f"{'end_to_end':<16s} n={e2e['n']:<6d} p50 {e2e['p50_s']} s  p90 {e2e['p90_s']} s  max {e2e['max_s']} s")
+    w = report["worker"]
+    print(f"worker           idle {w['idle_s']} s ({w['idle_fraction']} of wall), busy {w['busy_s']} s")
+    for err in jobs["errors"]:
+        print(f"error: {err}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=24)
+    parser.add_argument("--submitters", type=int, default=4)
+    parser.add_argument("--pollers", type=int, default=8)
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="Seconds a poller waits between requests")
+    parser.add_argument("--min-length", type=int, default=150, help="Residues per chain, lower bound")
+    parser.add_argument("--max-length", type=int, default=450, help="Residues per chain, upper bound")
+    parser.add_argument("--preset", default="fast", choices=("fast", "full", "cascade"))
+    parser.add_argument("--time-scale", type=float, default=0.005, help="Emulated ColabFold runtime factor")
+    parser.add_argument("--msa-s", type=float, default=60.0, help="Emulated MSA server time (before scaling)")
+    parser.add_argument("--compile-s", type=float, default=90.0, help="Emulated XLA compile time (before scaling)")
+    parser.add_argument("--recycle-s", type=float, default=4.0, help="Emulated recycle time at 512 residues")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of emulated runs that crash")
+    parser.add_argument("--msa-depth", type=int, default=512, help="Sequences per emulated a3m")
+    parser.add_argument("--postprocess-workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=1800.0, help="Give up on unfinished jobs after this")
+    parser.add_argument("--url", help="Benchmark a running deployment instead of an in-process API")
+    parser.add_argument("--token", default=os.environ.get("SHENLAB_API_TOKEN"))
+    parser.add_argument("--json", type=Path, help="Also write the report here")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        report = drive(_Remote(args.url, args.token), args)
+    else:
+        from fastapi.testclient import TestClient
+
+        from alphafold_multimer_service.api import create_app
+        from alphafold_multimer_service.config import Settings
+
+        with tempfile.TemporaryDirectory() as tmp:
+            install(Path(tmp) / "bin")
+            os.environ["PATH"] = f"{Path(tmp) / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}"
+            os.environ.update(
+                {
+                    "AFM_EMU_TIME_SCALE": str(args.time_scale),
+                    "AFM_EMU_MSA_S": str(args.msa_s),
+                    "AFM_EMU_COMPILE_S": str(args.compile_s),
+                    "AFM_EMU_RECYCLE_S": str(args.recycle_s),
+                    "AFM_EMU_FAIL_RATE": str(args.fail_rate),
+                    "AFM_EMU_MSA_DEPTH": str(args.msa_depth),
+                }
+            )
+            settings = Settings(
+                data_dir=Path(tmp) / "data",
+                api_token=None,
+                mock_mode=False,
+                cors_allow_origins=[],
+                colabfold_image="colabfold-emulator",
+                colabfold_cache_dir=Path(tmp) / "cache",
+                host_ptxas_path=None,
+                default_preset=args.preset,
+                length_buckets=(256, 384, 512, 768, 1024, 1280, 1536, 2048),
+                jax_cache_dir=Path(tmp) / "jax_cache",
+                postprocess_workers=args.postprocess_workers,
+                worker_poll_s=0.2,
+                metrics_snapshot_s=0,
+            )
+            with TestClient(create_app(settings)) as client:
+                report = drive(client, args)
+
+    _print(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -19,6 +19,8 @@ def app(tmp_path: Path):
         colabfold_cache_dir=tmp_path / "cache",
         host_ptxas_path=None,
         default_preset="fast",
+        # a thread instead of spawning a process pool per test app
+        postprocess_workers=0,
     )
     return create_app(settings)
 
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import hashlib
+import threading
 import time
 
 from fastapi.testclient import TestClient
+import pytest
 
+from alphafold_multimer_service import jobs
 from alphafold_multimer_service.alphafold_multimer.runner import AlphaFoldMultimerRunner
+from alphafold_multimer_service.api import _negotiate_encoding
+from alphafold_multimer_service.logs import DOCKER_LOG, LogWriter
 
 
 def test_health(app) -> None:
@@ -57,6 +63,7 @@ def test_submit_and_get_result(app) -> None:
         first_art = obj["artifacts"][0]["name"]
         art = client.get(f"/api/v1/jobs/{job_id}/artifacts/{first_art}")
         assert art.status_code == 200
+        assert hashlib.sha256(art.content).hexdigest() == obj["artifacts"][0]["sha256"]
 
 
 def test_unknown_job(app) -> None:
@@ -139,3 +146,468 @@ def test_list_jobs_history_includes_input_and_score(app) -> None:
             assert isinstance(row["primary_score_value"], (int, float))
             assert row["status_url"].endswith(f"/api/v1/jobs/{jid}")
             assert row["result_url"].endswith(f"/api/v1/jobs/{jid}/result")
+
+
+def test_prefetch_fails_invalid_inputs_before_they_reach_the_worker(app) -> None:
+    import threading
+
+    orig_runner = app.state.jobs._runner  # type: ignore[attr-defined]
+    release = threading.Event()
+    prepared: list[str] = []
+
+    class GatedRunner(AlphaFoldMultimerRunner):
+        def prepare_inputs(self, *, job_id, job_dir, proteins):
+            if proteins[1].get("uniprot") == "Q00000":
+                raise ValueError("UniProt accession not found: Q00000")
+            prepared.append(job_id)
+            return None
+
+        def run_pair(self, **kwargs):
+            release.wait(5)
+            return orig_runner.run_pair(**kwargs)
+
+    app.state.jobs._runner = GatedRunner()  # type: ignore[attr-defined]
+
+    def submit(protein_b: str) -> str:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": protein_b}, "preset": "fast"},
+        )
+        assert r.status_code == 201
+        return r.json()["job_id"]
+
+    with TestClient(app) as client:
+        head = submit("A0A2R8Y7G1")
+        bad = submit("Q00000")
+        good = submit("A0A2R8Y7G1")
+
+        # The head job is blocked on the "GPU"; the bad one must fail anyway.
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if client.get(f"/api/v1/jobs/{bad}").json()["status"] == "failed" and good in prepared:
+                break
+            time.sleep(0.02)
+        bad_status = client.get(f"/api/v1/jobs/{bad}").json()
+        assert bad_status["status"] == "failed"
+        assert bad_status["progress"]["stage"] == "prefetch"
+        assert "Q00000" in bad_status["error"]
+        assert client.get(f"/api/v1/jobs/{head}").json()["status"] == "running"
+        assert good in prepared
+
+        release.set()
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if client.get(f"/api/v1/jobs/{good}").json()["status"] == "succeeded":
+                break
+            time.sleep(0.02)
+        assert client.get(f"/api/v1/jobs/{good}").json()["status"] == "succeeded"
+
+
+def test_sequence_and_fasta_inputs_record_content_hashes(app) -> None:
+    import hashlib
+    import json
+
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={
+                "protein_a": {"sequence": "mtpwlg livllg"},
+                "protein_b": {"fasta": ">design_7\nMSEQNNTEMT\n"},
+                "preset": "fast",
+            },
+        )
+        assert r.status_code == 201
+        job_id = r.json()["job_id"]
+
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if client.get(f"/api/v1/jobs/{job_id}").json()["status"] == "succeeded":
+                break
+            time.sleep(0.05)
+        assert client.get(f"/api/v1/jobs/{job_id}").json()["status"] == "succeeded"
+
+        job_json = app.state.jobs.store.job_dir(job_id) / "job.json"  # type: ignore[attr-defined]
+        rec = json.loads(job_json.read_text(encoding="utf-8"))
+        assert rec["request"]["protein_a"] == {"sequence": "MTPWLGLIVLLG"}
+        assert [c["source"] for c in rec["chains"]] == ["sequence", "fasta"]
+        assert rec["chains"][0]["sha256"] == hashlib.sha256(b"MTPWLGLIVLLG").hexdigest()
+        assert rec["chains"][1]["length"] == 10
+        assert rec["input_sha256"]
+
+        hist = client.get("/api/v1/jobs").json()
+        row = next(j for j in hist["jobs"] if j["job_id"] == job_id)
+        assert row["protein_a_uniprot"] is None
+
+
+def test_n_chain_complex_with_stoichiometry(app) -> None:
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={
+                "proteins": [{"uniprot": "P35625", "copies": 2}, {"uniprot": "A0A2R8Y7G1"}],
+                "preset": "fast",
+            },
+        )
+        assert r.status_code == 201
+        job_id = r.json()["job_id"]
+
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if client.get(f"/api/v1/jobs/{job_id}").json()["status"] == "succeeded":
+                break
+            time.sleep(0.05)
+
+        res = client.get(f"/api/v1/jobs/{job_id}/result")
+        assert res.status_code == 200
+        obj = res.json()
+        assert obj["metrics"]["chain_ids"] == ["A", "B", "C"]
+        assert obj["verification"]["chain_lengths_a3m"] == [36, 36, 24]
+        assert obj["verification"]["chain_lengths_pdb"] == [36, 36, 24]
+        assert obj["verification"]["chain_lengths_match"] is True
+        matrix = obj["metrics"]["interface_pae_matrix"]
+        assert len(matrix) == 3 and all(len(row) == 3 for row in matrix)
+        iptm = obj["metrics"]["chain_pair_iptm"]
+        assert iptm[0][0] is None and isinstance(iptm[0][2], float)
+
+
+def _wait_for_status(client: TestClient, job_id: str, status: str, timeout_s: float = 5) -> dict:
+    deadline = time.time() + timeout_s
+    obj: dict = {}
+    while time.time() < deadline:
+        obj = client.get(f"/api/v1/jobs/{job_id}").json()
+        if obj["status"] == status:
+            break
+        time.sleep(0.02)
+    return obj
+
+
+def test_prefetch_leaves_jobs_claimed_by_another_worker_alone(app) -> None:
+    manager = app.state.jobs  # type: ignore[attr-defined]
+    orig_runner = manager._runner
+    other_worker = jobs.JobStore(manager.store.data_dir)
+
+    class ClaimedMeanwhileRunner(AlphaFoldMultimerRunner):
+        fail = False
+
+        def prepare_inputs(self, *, job_id, job_dir, proteins):
+            prepared = orig_runner.prepare_inputs(job_id=job_id, job_dir=job_dir, proteins=proteins)
+            # another worker process claims the job while this one is still preparing it
+            rec = other_worker.get(job_id)
+            other_worker.update(rec.model_copy(update={"status": "running", "worker": "w2", "attempts": 1}))
+            if self.fail:
+                raise ValueError("UniProt accession not found: Q00000")
+            return prepared
+
+    runner = ClaimedMeanwhileRunner()
+    manager._runner = runner
+    request = {"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}}
+    for fail in (False, True):
+        runner.fail = fail
+        rec = manager.store.create_job(service="alphafold-multimer", request=request)
+        manager._prepare_one(rec.job_id)
+        after = manager.store.get(rec.job_id)
+        assert (after.status, after.worker, after.error) == ("running", "w2", None)
+    assert not list(manager.store.job_dir(rec.job_id).glob("work/*.tmp"))
+
+
+def test_cascade_preset_escalates_only_above_threshold(app) -> None:
+    orig_runner = app.state.jobs._runner  # type: ignore[attr-defined]
+    calls: list[tuple[str, object]] = []
+
+    class RecordingRunner(AlphaFoldMultimerRunner):
+        def prepare_inputs(self, **kwargs):
+            return orig_runner.prepare_inputs(**kwargs)
+
+        def run_pair(self, **kwargs):
+            calls.append((kwargs["preset"], kwargs.get("msa_path")))
+            return orig_runner.run_pair(**kwargs)
+
+    app.state.jobs._runner = RecordingRunner()  # type: ignore[attr-defined]
+
+    def submit(threshold: float) -> str:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={
+                "protein_a": {"uniprot": "P35625"},
+                "protein_b": {"uniprot": "A0A2R8Y7G1"},
+                "preset": "cascade",
+                "options": {"cascade_threshold": threshold},
+            },
+        )
+        assert r.status_code == 201
+        return r.json()["job_id"]
+
+    with TestClient(app) as client:
+        # mock ranking_confidence is 0.3
+        low = submit(0.9)
+        assert _wait_for_status(client, low, "succeeded")["status"] == "succeeded"
+        res = client.get(f"/api/v1/jobs/{low}/result").json()
+        assert res["cascade"]["escalated"] is False
+        assert [s["stage"] for s in res["cascade"]["stages"]] == ["screen"]
+        assert calls == [("screen", None)]
+
+        calls.clear()
+        high = submit(0.2)
+        assert _wait_for_status(client, high, "succeeded")["status"] == "succeeded"
+        res = client.get(f"/api/v1/jobs/{high}/result").json()
+        assert res["cascade"]["escalated"] is True
+        assert res["cascade"]["metric"] == "ranking_confidence"
+        assert [s["stage"] for s in res["cascade"]["stages"]] == ["screen", "full"]
+        assert [p for p, _ in calls] == ["screen", "full"]
+        # full stage reuses the screen MSA
+        assert calls[1][1] is not None and str(calls[1][1]).endswith(".a3m")
+        assert res["metrics"] == res["cascade"]["stages"][1]["metrics"]
+
+
+def test_unfinished_jobs_are_requeued_on_startup(app) -> None:
+    store = app.state.jobs.store  # type: ignore[attr-defined]
+    request = {
+        "protein_a": {"uniprot": "P35625"},
+        "protein_b": {"uniprot": "A0A2R8Y7G1"},
+        "preset": "fast",
+        "options": {},
+    }
+    # left behind by a previous process: one mid-run, one still waiting
+    running = store.create_job(service="alphafold-multimer", request=request)
+    store.update(running.model_copy(update={"status": "running", "attempts": 1}))
+    queued = store.create_job(service="alphafold-multimer", request=request)
+
+    with TestClient(app) as client:
+        for job_id in (running.job_id, queued.job_id):
+            assert _wait_for_status(client, job_id, "succeeded")["status"] == "succeeded"
+    assert store.get(running.job_id).attempts == 2
+    assert store.get(queued.job_id).attempts == 1
+
+
+def test_worker_runs_next_job_while_previous_one_is_postprocessed(app, monkeypatch) -> None:
+    release = threading.Event()
+    orig_postprocess = jobs.postprocess_outputs
+
+    def gated_postprocess(outputs):
+        release.wait(5)
+        return orig_postprocess(outputs)
+
+    monkeypatch.setattr(jobs, "postprocess_outputs", gated_postprocess)
+
+    def submit(client: TestClient) -> str:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}},
+        )
+        return r.json()["job_id"]
+
+    with TestClient(app) as client:
+        first, second = submit(client), submit(client)
+        deadline = time.time() + 5
+        stages: list[str] = []
+        while time.time() < deadline:
+            stages = [client.get(f"/api/v1/jobs/{j}").json()["progress"]["stage"] for j in (first, second)]
+            if stages == ["postprocessing", "postprocessing"]:
+                break
+            time.sleep(0.02)
+        # both GPU stages ran although the first job's post-processing has not finished
+        assert stages == ["postprocessing", "postprocessing"]
+        assert client.get(f"/api/v1/jobs/{first}").json()["status"] == "running"
+
+        release.set()
+        for job_id in (first, second):
+            assert _wait_for_status(client, job_id, "succeeded")["status"] == "succeeded"
+        names = {a["name"] for a in client.get(f"/api/v1/jobs/{first}/result").json()["artifacts"]}
+        assert {"input.fasta", "rank_001.pdb", "pae.json", "log.txt"} <= names
+
+
+def test_postprocessing_in_process_pool(app) -> None:
+    app.state.jobs._postprocess_workers = 1  # type: ignore[attr-defined]
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}},
+        )
+        job_id = r.json()["job_id"]
+        assert _wait_for_status(client, job_id, "succeeded", timeout_s=30)["status"] == "succeeded"
+        result = client.get(f"/api/v1/jobs/{job_id}/result").json()
+        assert result["verification"]["chain_lengths_match"] is True
+    app.state.jobs.shutdown()  # type: ignore[attr-defined]
+
+
+def test_artifact_download_negotiates_encoding_and_supports_caching(app) -> None:
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}},
+        )
+        job_id = r.json()["job_id"]
+        assert _wait_for_status(client, job_id, "succeeded")["status"] == "succeeded"
+        sha = {a["name"]: a["sha256"] for a in client.get(f"/api/v1/jobs/{job_id}/result").json()["artifacts"]}
+        url = f"/api/v1/jobs/{job_id}/artifacts/pae.json"
+
+        plain = client.get(url, headers={"Accept-Encoding": "identity"})
+        assert plain.headers["etag"] == f'"{sha["pae.json"]}"'
+        assert "immutable" in plain.headers["cache-control"]
+        assert "content-encoding" not in plain.headers
+
+        gz = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+        assert gz.headers["content-encoding"] == "gzip"
+        assert gz.headers["etag"] == f'"{sha["pae.json"]}-gzip"'
+        assert gz.content == plain.content  # httpx decodes the transfer
+        assert int(gz.headers["content-length"]) < len(plain.content)
+
+        r = client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": plain.headers["etag"]})
+        assert r.status_code == 304
+
+        # Range requests get identity bytes even when gzip is acceptable.
+        r = client.get(url, headers={"Accept-Encoding": "gzip", "Range": "bytes=10-19"})
+        assert r.status_code == 206
+        assert r.content == plain.content[10:20]
+        assert r.headers["etag"] == plain.headers["etag"]
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        (None, None),
+        ("gzip", "gzip"),
+        ("gzip, zstd", "zstd"),
+        ("zstd;q=0.5, gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("identity, gzip;q=0.5", None),
+        ("*", "zstd"),
+        ("br", None),
+    ],
+)
+def test_negotiate_encoding(accept: str | None, expected: str | None) -> None:
+    assert _negotiate_encoding(accept, ["gzip", "zstd"], prefer_identity=False) == expected
+
+
+def test_status_rewritten_between_read_and_stamp_is_not_cached_stale(app, monkeypatch) -> None:
+    store = app.state.jobs.store  # type: ignore[attr-defined]
+    rec = store.create_job(service="alphafold-multimer", request={})
+    store.update(rec.model_copy(update={"status": "failed", "error": "RuntimeError: first"}))
+    orig_get = store.get
+    rewritten = False
+
+    def get_then_rewrite(job_id: str):
+        # another process rewrites job.json right after this request read it
+        nonlocal rewritten
+        got = orig_get(job_id)
+        if not rewritten:
+            rewritten = True
+            store.update(got.model_copy(update={"error": "RuntimeError: second"}))
+        return got
+
+    with TestClient(app) as client:
+        monkeypatch.setattr(store, "get", get_then_rewrite)
+        assert client.get(f"/api/v1/jobs/{rec.job_id}").json()["error"] == "RuntimeError: second"
+        assert client.get(f"/api/v1/jobs/{rec.job_id}").json()["error"] == "RuntimeError: second"
+
+
+def test_finished_job_responses_are_cached_and_revalidated(app) -> None:
+    store = app.state.jobs.store  # type: ignore[attr-defined]
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}},
+        )
+        job_id = r.json()["job_id"]
+        assert _wait_for_status(client, job_id, "succeeded")["status"] == "succeeded"
+
+        res = client.get(f"/api/v1/jobs/{job_id}/result")
+        assert res.headers["cache-control"] == "no-cache"
+        etag, last_modified = res.headers["etag"], res.headers["last-modified"]
+        assert list(store.job_dir(job_id).glob("responses/result.*.json"))
+
+        assert client.get(f"/api/v1/jobs/{job_id}/result", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get(f"/api/v1/jobs/{job_id}/result", headers={"If-Modified-Since": last_modified}).status_code == 304
+        status_etag = client.get(f"/api/v1/jobs/{job_id}").headers["etag"]
+        assert client.get(f"/api/v1/jobs/{job_id}", headers={"If-None-Match": status_etag}).status_code == 304
+
+        # A rewrite of result.json (e.g. retention evicting artifacts) invalidates the cached bytes.
+        obj = store.read_result(job_id)
+        obj["artifacts"] = []
+        store.write_result(job_id, obj)
+        res = client.get(f"/api/v1/jobs/{job_id}/result", headers={"If-None-Match": etag})
+        assert res.status_code == 200
+        assert res.json()["artifacts"] == []
+        assert res.headers["etag"] != etag
+        assert len(list(store.job_dir(job_id).glob("responses/result.*.json"))) == 1
+
+
+def test_job_trace_and_timings(app) -> None:
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"sequence": "MKV"}, "protein_b": {"sequence": "MAL"}, "preset": "fast"},
+        )
+        job_id = r.json()["job_id"]
+        assert _wait_for_status(client, job_id, "succeeded")["status"] == "succeeded"
+        trace = client.get(f"/api/v1/jobs/{job_id}/trace")
+        result = client.get(f"/api/v1/jobs/{job_id}/result").json()
+        assert client.get("/api/v1/jobs/job_missing/trace").status_code == 404
+
+    assert trace.status_code == 200
+    # "fetch" only when the worker got to the job before the prefetcher did
+    spans = [e for e in trace.json()["traceEvents"] if e["ph"] == "X" and e["name"] != "fetch"]
+    assert [(e["cat"], e["name"]) for e in spans] == [
+        ("stage", "queued"),
+        ("stage", "start"),
+        ("stage", "run"),
+        ("runner", "mock"),
+        ("stage", "postprocessing"),
+    ]
+    assert {e["tid"] for e in spans} == {1}
+    assert not any(e["args"].get("open") for e in spans)
+    run, mock = spans[2], spans[3]
+    assert run["ts"] <= mock["ts"] and mock["ts"] + mock["dur"] <= run["ts"] + run["dur"]
+    assert set(result["timings"]) - {"fetch"} == {"queued", "start", "run", "mock", "postprocessing"}
+
+
+def test_job_logs_tail_and_follow(app) -> None:
+    orig_runner = app.state.jobs._runner  # type: ignore[attr-defined]
+    started, release = threading.Event(), threading.Event()
+
+    class LoggingRunner(AlphaFoldMultimerRunner):
+        def run_pair(self, **kwargs):
+            (kwargs["job_dir"] / "artifacts").mkdir(parents=True, exist_ok=True)
+            with LogWriter(kwargs["job_dir"] / "artifacts" / DOCKER_LOG, flush_s=3600) as log:
+                log.write(b"line 1\n")
+                started.set()
+                release.wait(5)
+                log.write(b"line 2\n")
+                time.sleep(0.05)
+                log.write(b"line 3\n")
+            return orig_runner.run_pair(**kwargs)
+
+    app.state.jobs._runner = LoggingRunner()  # type: ignore[attr-defined]
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"sequence": "MKV"}, "protein_b": {"sequence": "MAL"}, "preset": "fast"},
+        )
+        job_id = r.json()["job_id"]
+        assert started.wait(5)
+
+        # not flushed to disk yet: served from the ring buffer
+        r = client.get(f"/api/v1/jobs/{job_id}/logs")
+        assert r.text == "line 1\n"
+        assert r.headers["x-log-offset"] == "0" and r.headers["x-log-next-offset"] == "7"
+        assert r.headers["x-log-complete"] == "false"
+
+        followed: list[bytes] = []
+
+        def follow() -> None:
+            with client.stream("GET", f"/api/v1/jobs/{job_id}/logs", params={"offset": 7, "follow": "true"}) as s:
+                followed.extend(s.iter_bytes())
+
+        t = threading.Thread(target=follow)
+        t.start()
+        release.set()
+        t.join(10)
+        assert not t.is_alive()  # the stream ends with the job
+        assert b"".join(followed) == b"line 2\nline 3\n"
+
+        assert _wait_for_status(client, job_id, "succeeded")["status"] == "succeeded"
+        r = client.get(f"/api/v1/jobs/{job_id}/logs", params={"offset": 7})
+        assert r.text == "line 2\nline 3\n" and r.headers["x-log-complete"] == "true"
+        r = client.get(f"/api/v1/jobs/{job_id}/logs", params={"offset": 100, "limit": 7})
+        assert r.headers["x-log-offset"] == "0" and r.text == "line 1\n"
+        assert client.get("/api/v1/jobs/job_missing/logs").status_code == 404
@@ -58,3 +58,40 @@ def test_create_job_requires_token_when_configured(tmp_path: Path) -> None:
         )
         assert r2.status_code == 201
 
+
+
+def test_create_job_rejects_multiple_or_invalid_sequence_sources(app) -> None:
+    with TestClient(app) as client:
+        both = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625", "sequence": "MKV"}, "protein_b": {"uniprot": "P35625"}},
+        )
+        assert both.status_code == 422
+
+        bad = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"sequence": "MKV123"}, "protein_b": {"uniprot": "P35625"}},
+        )
+        assert bad.status_code == 422
+        assert "Invalid residue" in bad.json()["error"]
+
+
+def test_create_job_rejects_ambiguous_or_single_chain_requests(app) -> None:
+    with TestClient(app) as client:
+        mixed = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625"}, "proteins": [{"uniprot": "P35625", "copies": 2}]},
+        )
+        assert mixed.status_code == 422
+
+        monomer = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"proteins": [{"uniprot": "P35625"}]},
+        )
+        assert monomer.status_code == 422
+
+        homodimer = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"proteins": [{"uniprot": "P35625", "copies": 2}]},
+        )
+        assert homodimer.status_code == 201
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import gzip
+import os
+from pathlib import Path
+import threading
+import time
+
+from alphafold_multimer_service.artifacts import ArtifactStore, file_sha256, link_or_copy
+
+
+def _job_artifacts(data_dir: Path, job_id: str, files: dict[str, str]) -> list[dict]:
+    artifacts_dir = data_dir / "jobs" / job_id / "artifacts"
+    artifacts_dir.mkdir(parents=True)
+    out = []
+    for name, text in files.items():
+        (artifacts_dir / name).write_text(text, encoding="utf-8")
+        out.append({"name": name, "path": str(artifacts_dir / name), "media_type": "text/plain"})
+    return out
+
+
+def test_link_or_copy_prefers_hardlink(tmp_path: Path) -> None:
+    src = tmp_path / "a.txt"
+    src.write_text("x", encoding="utf-8")
+    dst = tmp_path / "b.txt"
+    dst.write_text("stale", encoding="utf-8")
+    assert link_or_copy(src, dst) == "hardlink"
+    assert dst.read_text(encoding="utf-8") == "x"
+    assert os.stat(src).st_ino == os.stat(dst).st_ino
+
+
+def test_ingest_dedupes_across_jobs_and_writes_manifest(tmp_path: Path) -> None:
+    store = ArtifactStore(tmp_path)
+    a = store.ingest("job_a", _job_artifacts(tmp_path, "job_a", {"pae.json": "[1]", "log.txt": "a"}))
+    b = store.ingest("job_b", _job_artifacts(tmp_path, "job_b", {"pae.json": "[1]", "log.txt": "b"}))
+
+    assert a[0]["sha256"] == b[0]["sha256"]
+    blob = store.blob_path(a[0]["sha256"])
+    assert a[0]["path"] == str(blob) and a[0]["size_bytes"] == 3
+    assert len(list(store.blobs_dir.glob("*/*"))) == 3
+    # both jobs see the same bytes under the artifact name, backed by one inode
+    assert store.artifact_path("job_b", "pae.json") == blob
+    assert os.stat(tmp_path / "jobs" / "job_a" / "artifacts" / "pae.json").st_ino == os.stat(blob).st_ino
+    assert store.read_manifest("job_a")["log.txt"]["sha256"] == a[1]["sha256"] == file_sha256(Path(a[1]["path"]))
+    assert store.artifact_path("job_a", "missing.txt") is None
+    assert store.refcounts()[a[0]["sha256"]] == 2
+
+
+def test_gc_removes_only_unreferenced_blobs(tmp_path: Path) -> None:
+    store = ArtifactStore(tmp_path, gc_min_age_s=0)
+    a = store.ingest("job_a", _job_artifacts(tmp_path, "job_a", {"pae.json": "[1]", "log.txt": "a"}))
+    store.ingest("job_b", _job_artifacts(tmp_path, "job_b", {"pae.json": "[1]"}))
+
+    # drop job_a entirely, as retention would
+    for p in sorted((tmp_path / "jobs" / "job_a").rglob("*"), reverse=True):
+        p.unlink() if p.is_file() else p.rmdir()
+    (tmp_path / "jobs" / "job_a").rmdir()
+
+    report = store.gc()
+    assert report.blobs_removed == 1
+    assert report.bytes_reclaimed == 1
+    assert not store.blob_path(a[1]["sha256"]).exists()
+    assert store.blob_path(a[0]["sha256"]).exists()  # still referenced by job_b
+
+
+def test_artifact_path_without_manifest_stays_inside_job_dir(tmp_path: Path) -> None:
+    store = ArtifactStore(tmp_path)
+    _job_artifacts(tmp_path, "job_old", {"log.txt": "legacy"})
+    (tmp_path / "jobs" / "job_old" / "job.json").write_text("{}", encoding="utf-8")
+    assert store.artifact_path("job_old", "log.txt") == (tmp_path / "jobs" / "job_old" / "artifacts" / "log.txt").resolve()
+    assert store.artifact_path("job_old", "../job.json") is None
+
+
+def test_precompressed_variants_only_for_compressible_artifacts(tmp_path: Path) -> None:
+    store = ArtifactStore(tmp_path)
+    out = store.ingest(
+        "job_a",
+        _job_artifacts(tmp_path, "job_a", {"pae.json": "[" + "10.0, " * 1000 + "]", "tiny.json": "[]", "x.bin": "0" * 5000}),
+    )
+    pae, tiny, binary = (store.variants("job_a", a["name"]) for a in out)
+    assert set(pae.paths) >= {None, "gzip"}
+    assert gzip.decompress(pae.paths["gzip"].read_bytes()) == pae.paths[None].read_bytes()
+    assert set(tiny.paths) == {None}
+    assert set(binary.paths) == {None}
+
+
+def test_gc_in_another_process_waits_for_an_ingest_in_progress(tmp_path: Path, monkeypatch) -> None:
+    # worker (ingest) and API (retention gc) are separate processes: only the file lock is shared
+    worker, api = ArtifactStore(tmp_path), ArtifactStore(tmp_path, gc_min_age_s=3600)
+    artifacts = _job_artifacts(tmp_path, "job_a", {"log.txt": "a" * 100})
+    hours_ago = time.time() - 7200
+    os.utime(artifacts[0]["path"], (hours_ago, hours_ago))  # runner output written long before ingest
+    collector = threading.Thread(target=api.gc, kwargs={"min_age_s": 0})
+    write_variants = worker._write_variants
+
+    def placed_but_not_in_manifest(sha256: str) -> None:
+        collector.start()
+        time.sleep(0.2)
+        assert collector.is_alive()  # blocked on the lock, not deleting the unreferenced blob
+        write_variants(sha256)
+
+    monkeypatch.setattr(worker, "_write_variants", placed_but_not_in_manifest)
+    (a,) = worker.ingest("job_a", artifacts)
+    collector.join(5)
+
+    blob = worker.blob_path(a["sha256"])
+    assert blob.is_file() and api.artifact_path("job_a", "log.txt") == blob
+    assert time.time() - blob.stat().st_mtime < 60
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from alphafold_multimer_service.alphafold_multimer.buckets import (
+    LengthBucketStats,
+    bucket_for_length,
+    parse_bucket_edges,
+)
+from alphafold_multimer_service.alphafold_multimer.runner import (
+    COLABFOLD_PRESETS,
+    ColabFoldDockerRunner,
+    summarize_outputs,
+)
+
+
+def test_parse_bucket_edges() -> None:
+    assert parse_bucket_edges("512, 256,,1024,256") == (256, 512, 1024)
+    assert parse_bucket_edges("") == ()
+    with pytest.raises(ValueError):
+        parse_bucket_edges("0,256")
+
+
+@pytest.mark.parametrize(
+    ("total", "expected"),
+    [(1, 256), (256, 256), (257, 512), (1024, 1024), (1025, None)],
+)
+def test_bucket_for_length(total: int, expected: int | None) -> None:
+    assert bucket_for_length(total, (256, 512, 1024)) == expected
+
+
+def test_length_bucket_stats_hits_and_padding(tmp_path: Path) -> None:
+    stats = LengthBucketStats(tmp_path / "length_buckets.json")
+    assert stats.record(total_length=200, bucket=256) is False
+    assert stats.record(total_length=240, bucket=256) is True
+    assert stats.record(total_length=2000, bucket=None) is False
+
+    # persisted: a fresh instance sees the same tallies
+    snap = LengthBucketStats(tmp_path / "length_buckets.json").snapshot((256, 512))
+    assert snap["edges"] == [256, 512]
+    assert snap["overflow"] == 1
+    b256, b512 = snap["buckets"]
+    assert (b256["jobs"], b256["hits"], b256["hit_rate"]) == (2, 1, 0.5)
+    assert b256["padding_fraction"] == pytest.approx((56 + 16) / 512)
+    assert b512["jobs"] == 0 and b512["hit_rate"] is None
+
+
+def test_summarize_outputs_strips_padding(tmp_path: Path) -> None:
+    a3m = tmp_path / "x.a3m"
+    a3m.write_text("#2,1\t1,1\n>101\tx\nAAB\n", encoding="utf-8")
+    pdb = tmp_path / "x.pdb"
+    rows = [("A", 1), ("A", 2), ("B", 1), ("B", 2), ("B", 3)]  # chain B carries 2 padding residues
+    pdb.write_text(
+        "".join(
+            f"ATOM  {i:5d}  CA  ALA {c}{r:4d}    0.000   0.000   0.000  1.00  0.00           C\n"
+            for i, (c, r) in enumerate(rows, start=1)
+        )
+        + "END\n",
+        encoding="utf-8",
+    )
+    # 3 real residues padded to 5; padded rows/cols hold junk that must not leak into metrics
+    pae = [
+        [0.0, 1.0, 10.0, 99.0, 99.0],
+        [2.0, 3.0, 20.0, 99.0, 99.0],
+        [30.0, 40.0, 0.0, 99.0, 99.0],
+        [99.0, 99.0, 99.0, 99.0, 99.0],
+        [99.0, 99.0, 99.0, 99.0, 99.0],
+    ]
+    pae_path = tmp_path / "pae.json"
+    pae_path.write_text(json.dumps({"predicted_aligned_error": pae}), encoding="utf-8")
+    log = "rank_001_alphafold2_multimer_v3_model_1_seed_000 pLDDT=50 pTM=0.5 ipTM=0.25\n"
+
+    metrics, verification = summarize_outputs(
+        log_text=log, a3m_path=a3m, pdb_path=pdb, pae_path=pae_path, padded_length=5
+    )
+    assert verification["chain_lengths_pdb"] == [2, 1]
+    assert verification["chain_lengths_match"] is True
+    assert verification["padded_length"] == 5
+    assert metrics["interface_pae_mean_ab"] == pytest.approx(15.0)
+    assert metrics["interface_pae_mean_ba"] == pytest.approx(35.0)
+
+
+def test_docker_command_pads_and_mounts_jax_cache(tmp_path: Path) -> None:
+    runner = ColabFoldDockerRunner(
+        colabfold_image="img",
+        colabfold_cache_dir=tmp_path / "cf",
+        host_ptxas_path=None,
+        length_buckets=(256, 512),
+        jax_cache_dir=tmp_path / "jax",
+    )
+    cmd = runner._docker_command(
+        work_dir=tmp_path,
+        query_name="input.fasta",
+        out_name="out",
+        cfg=COLABFOLD_PRESETS["fast"],
+        num_recycles=3,
+        padding=56,
+    )
+    assert f"{tmp_path / 'jax'}:/cache/jax" in cmd
+    assert "JAX_COMPILATION_CACHE_DIR=/cache/jax" in cmd
+    assert cmd[cmd.index("--recompile-padding") + 1] == "56"
+    assert cmd[-2:] == ["input.fasta", "out"]
+    # env/volume flags belong to `docker run`, i.e. before the image name
+    assert cmd.index("-e") < cmd.index("img")
+    assert (tmp_path / "jax").is_dir()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import gzip
+import io
+from pathlib import Path
+import tarfile
+import time
+import zipfile
+
+from fastapi.testclient import TestClient
+import pytest
+
+from alphafold_multimer_service.bundles import artifact_selector, bytes_entry, file_entry, iter_archive
+
+
+def _entries(tmp_path: Path) -> list:
+    big = tmp_path / "rank_001.pdb"
+    big.write_bytes(b"ATOM  " * 40_000)  # spans several read chunks
+    gz = tmp_path / "pae.json.gz"
+    with gzip.open(gz, "wb") as f:
+        f.write(b'{"pae": [[0.0]]}')
+    return [
+        file_entry("job/rank_001.pdb", big),
+        file_entry("job/pae.json", gz, gzipped=True, size=16),
+        bytes_entry("job/result.json", b"{}"),
+    ]
+
+
+def test_artifact_selector() -> None:
+    everything = artifact_selector(None)
+    assert everything("anything.bin")
+    select = artifact_selector("structure, scores,*.a3m")
+    assert select("rank_001.pdb")
+    assert not select("rank_002.pdb")
+    assert select("scores_rank_001.json")
+    assert select("input.a3m")
+    assert not select("pae.json")
+
+
+@pytest.mark.parametrize("fmt", ["zip", "tar", "tar.gz"])
+def test_iter_archive_round_trip(tmp_path: Path, fmt: str) -> None:
+    entries = _entries(tmp_path)
+    data = b"".join(iter_archive(entries, fmt=fmt))
+    if fmt == "zip":
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            assert zf.testzip() is None
+            got = {n: zf.read(n) for n in zf.namelist()}
+    else:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz" if fmt == "tar.gz" else "r:") as tf:
+            got = {m.name: tf.extractfile(m).read() for m in tf.getmembers()}
+    assert list(got) == ["job/rank_001.pdb", "job/pae.json", "job/result.json"]
+    assert got["job/rank_001.pdb"] == (tmp_path / "rank_001.pdb").read_bytes()
+    assert got["job/pae.json"] == b'{"pae": [[0.0]]}'
+
+
+def test_bundle_endpoints(app) -> None:
+    with TestClient(app) as client:
+        job_ids = []
+        for _ in range(2):
+            r = client.post(
+                "/api/v1/services/alphafold-multimer/jobs",
+                json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}},
+            )
+            job_ids.append(r.json()["job_id"])
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if all(client.get(f"/api/v1/jobs/{j}").json()["status"] == "succeeded" for j in job_ids):
+                break
+            time.sleep(0.02)
+
+        r = client.get(f"/api/v1/jobs/{job_ids[0]}/bundle", params={"artifacts": "structure,pae"})
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "application/zip"
+        assert f'filename="{job_ids[0]}.zip"' in r.headers["content-disposition"]
+        with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+            assert sorted(zf.namelist()) == [f"{job_ids[0]}/pae.json", f"{job_ids[0]}/rank_001.pdb"]
+            pdb = zf.read(f"{job_ids[0]}/rank_001.pdb")
+        assert pdb == client.get(f"/api/v1/jobs/{job_ids[0]}/artifacts/rank_001.pdb").content
+
+        r = client.get("/api/v1/bundle", params={"format": "tar.gz", "artifacts": "result"})
+        assert r.status_code == 200
+        with tarfile.open(fileobj=io.BytesIO(r.content), mode="r:gz") as tf:
+            assert sorted(tf.getnames()) == sorted(f"{j}/result.json" for j in job_ids)
+
+        r = client.get("/api/v1/bundle", params={"job_ids": job_ids[1], "format": "tar"})
+        with tarfile.open(fileobj=io.BytesIO(r.content), mode="r:") as tf:
+            assert {n.split("/")[0] for n in tf.getnames()} == {job_ids[1]}
+
+        assert client.get(f"/api/v1/jobs/{job_ids[0]}/bundle", params={"format": "rar"}).status_code == 422
+        assert client.get("/api/v1/jobs/nope/bundle").status_code == 404
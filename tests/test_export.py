@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import csv
+from datetime import datetime, timezone
+import io
+import json
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+import pytest
+
+from alphafold_multimer_service.export import FLAT_COLUMNS, ExportFilter, iter_csv, iter_export_rows, parquet_available
+from alphafold_multimer_service.jobs import JobStore
+
+
+def _store_with_jobs(tmp_path: Path) -> tuple[JobStore, list[str]]:
+    store = JobStore(tmp_path)
+    job_ids = []
+    for accession, screen, score in [("P35625", "kinases", 0.8), ("Q13424", "kinases", 0.3), ("P35625", None, 0.9)]:
+        request = {"protein_a": {"uniprot": accession}, "protein_b": {"uniprot": "A0A2R8Y7G1"}, "preset": "fast"}
+        if screen:
+            request["screen"] = screen
+        rec = store.create_job(service="alphafold-multimer", request=request)
+        store.write_result(
+            rec.job_id,
+            {
+                "primary_score": {"name": "ranking_confidence", "value": score},
+                "metrics": {"ranking_confidence": score, "iptm": score - 0.1, "chain_ids": ["A", "B"]},
+                "verification": {"chain_lengths_match": True, "chain_lengths_pdb": [10, 12]},
+            },
+        )
+        store.update(rec.model_copy(update={"status": "succeeded"}))
+        job_ids.append(rec.job_id)
+    failed = store.create_job(service="alphafold-multimer", request={"protein_a": {"uniprot": "P35625"}})
+    store.update(failed.model_copy(update={"status": "failed", "error": "boom"}))
+    return store, job_ids + [failed.job_id]
+
+
+@pytest.mark.parametrize(
+    ("flt", "expected"),
+    [
+        (ExportFilter(), [0, 1, 2, 3]),
+        (ExportFilter(status="succeeded"), [0, 1, 2]),
+        (ExportFilter(accession="p35625"), [0, 2, 3]),
+        (ExportFilter(screen="kinases"), [0, 1]),
+        (ExportFilter(min_score=0.5), [0, 2]),
+        (ExportFilter(min_score=0.75, score_metric="iptm"), [2]),
+        (ExportFilter(created_after=datetime(2000, 1, 1), created_before=datetime(2000, 1, 2)), []),
+        (ExportFilter(created_after=datetime(2000, 1, 1, tzinfo=timezone.utc)), [0, 1, 2, 3]),
+    ],
+)
+def test_export_filters(tmp_path: Path, flt: ExportFilter, expected: list[int]) -> None:
+    store, job_ids = _store_with_jobs(tmp_path)
+    # job ids order by creation second only; jobs created within one second come in any order
+    assert sorted(r["job_id"] for r in iter_export_rows(store, flt)) == sorted(job_ids[i] for i in expected)
+
+
+def test_export_csv_flattens_rows(tmp_path: Path) -> None:
+    store, job_ids = _store_with_jobs(tmp_path)
+    text = b"".join(iter_csv(iter_export_rows(store, ExportFilter()))).decode("utf-8")
+    rows = {row["job_id"]: row for row in csv.DictReader(io.StringIO(text))}
+    first, failed = rows[job_ids[0]], rows[job_ids[3]]
+    assert list(first) == [name for name, _type in FLAT_COLUMNS]
+    assert first["accessions"] == "P35625;A0A2R8Y7G1"
+    assert float(first["iptm"]) == pytest.approx(0.7)
+    assert json.loads(first["chain_lengths_pdb"]) == [10, 12]
+    assert failed["status"] == "failed" and failed["error"] == "boom" and failed["primary_score"] == ""
+
+
+def test_export_endpoint(app) -> None:
+    store = app.state.jobs.store  # type: ignore[attr-defined]
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}, "screen": "s1"},
+        )
+        job_id = r.json()["job_id"]
+        assert store.get(job_id).request["screen"] == "s1"
+
+        r = client.get("/api/v1/export", params={"screen": "s1"})
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in r.text.splitlines()]
+        assert [row["job_id"] for row in lines] == [job_id]
+        assert lines[0]["accessions"] == ["P35625", "A0A2R8Y7G1"]
+
+        r = client.get("/api/v1/export", params={"format": "csv", "screen": "other"})
+        assert r.text.strip() == ",".join(name for name, _type in FLAT_COLUMNS)
+
+        r = client.get("/api/v1/export", params={"format": "parquet"})
+        assert r.status_code == (200 if parquet_available() else 400)
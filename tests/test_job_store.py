@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+import fcntl
+import os
+from pathlib import Path
+import threading
+import time
+
+from alphafold_multimer_service.artifacts import ArtifactStore
+from alphafold_multimer_service import jobs
+from alphafold_multimer_service.jobs import JobStore
+from alphafold_multimer_service.migrate_layout import MigrationReport, migrate
+
+
+def test_stores_sharing_a_data_dir_see_each_others_updates(tmp_path: Path) -> None:
+    # Two API processes (e.g. uvicorn workers) over one data dir.
+    worker, api = JobStore(tmp_path), JobStore(tmp_path)
+    rec = worker.create_job(service="alphafold-multimer", request={})
+    assert api.get(rec.job_id).status == "queued"
+
+    worker.update(rec.model_copy(update={"status": "running"}))
+    assert api.get(rec.job_id).status == "running"
+    # same size and, on coarse-mtime filesystems, possibly the same mtime: the inode still differs
+    worker.update(rec.model_copy(update={"status": "running", "progress": {"stage": "msa"}}))
+    assert api.get(rec.job_id).progress == {"stage": "msa"}
+
+    assert api.get("job_missing") is None
+
+
+def test_record_cache_is_bounded(tmp_path: Path) -> None:
+    store = JobStore(tmp_path, cache_entries=3)
+    job_ids = [store.create_job(service="alphafold-multimer", request={}).job_id for _ in range(10)]
+    assert len(store._cache) == 3
+    # evicted records are reread from disk
+    assert [store.get(j).job_id for j in job_ids] == job_ids
+    assert len(store._cache) == 3
+
+
+def test_update_if_checks_status_of_current_record(tmp_path: Path) -> None:
+    prefetcher, worker = JobStore(tmp_path), JobStore(tmp_path)
+    rec = prefetcher.create_job(service="alphafold-multimer", request={})
+    stale = prefetcher.get(rec.job_id)
+    worker.update(rec.model_copy(update={"status": "running", "worker": "w2"}))
+
+    # the prefetcher's copy still says queued; the check runs against job.json
+    assert prefetcher.update_if(rec.job_id, {"queued"}, lambda cur: stale.model_copy(update={"chains": []})) is None
+    assert prefetcher.get(rec.job_id).worker == "w2"
+
+    updated = prefetcher.update_if(rec.job_id, {"running"}, lambda cur: cur.model_copy(update={"attempts": 2}))
+    assert updated is not None and updated.worker == "w2" and worker.get(rec.job_id).attempts == 2
+    assert prefetcher.update_if("job_missing", {"queued"}, lambda cur: cur) is None
+
+
+def _finish(store: JobStore, job_id: str, status: str = "succeeded") -> None:
+    store.write_result(job_id, {"job_id": job_id})
+    store.update(store.get(job_id).model_copy(update={"status": status}))
+
+
+def test_new_jobs_go_into_day_shards_and_flat_jobs_stay_readable(tmp_path: Path) -> None:
+    old = JobStore(tmp_path, layout="flat")
+    flat = old.create_job(service="alphafold-multimer", request={}).job_id
+    store = JobStore(tmp_path)
+    sharded = store.create_job(service="alphafold-multimer", request={}).job_id
+
+    assert old.job_dir(flat) == tmp_path / "jobs" / flat
+    assert store.job_dir(sharded) == tmp_path / "jobs" / sharded.split("_")[1] / sharded
+    # either process finds both, whichever layout it writes
+    for s in (old, store):
+        assert s.count() == 2
+        assert [r["job_id"] for r in s.iter_raw()] == sorted([flat, sharded])
+        assert {r.job_id for r in s.list(limit=10, offset=0)} == {flat, sharded}
+        assert s.get(flat) is not None and s.get(sharded) is not None
+    _finish(old, sharded)
+    assert store.read_result(sharded) == {"job_id": sharded}
+
+
+def test_migration_moves_finished_jobs_and_resumes(tmp_path: Path) -> None:
+    old = JobStore(tmp_path, layout="flat")
+    ids = [old.create_job(service="alphafold-multimer", request={}).job_id for _ in range(3)]
+    artifacts = ArtifactStore(tmp_path)
+    for job_id in ids[:2]:
+        (old.job_dir(job_id) / "artifacts").mkdir()
+        (old.job_dir(job_id) / "artifacts" / "pae.json").write_bytes(b"{}")
+        artifacts.ingest(job_id, [{"name": "pae.json", "path": str(old.job_dir(job_id) / "artifacts" / "pae.json")}])
+        _finish(old, job_id)
+    store = JobStore(tmp_path)
+    cached = store.get(ids[0])
+
+    # interrupted after one job, then resumed; the running job stays where its run writes
+    assert migrate(store, limit=1).moved == 1
+    assert migrate(store) == MigrationReport(moved=1, unfinished=1)
+    assert [store.job_dir(i) == store.layout.sharded_dir(i) for i in ids] == [True, True, False]
+
+    assert store.get(ids[0]) is cached  # rename keeps the stamp: still a cache hit
+    assert old.read_result(ids[1]) == {"job_id": ids[1]}
+    assert artifacts.read_manifest(ids[1]).keys() == {"pae.json"}
+    assert set(artifacts.refcounts().values()) == {2}
+
+    _finish(old, ids[2], "failed")
+    assert migrate(store) == MigrationReport(moved=1)
+    assert not list(store.layout.iter_flat()) and store.count() == 3
+
+
+def test_update_racing_a_move_is_not_lost(tmp_path: Path) -> None:
+    old = JobStore(tmp_path, layout="flat")
+    job_id = old.create_job(service="alphafold-multimer", request={}).job_id
+    _finish(old, job_id)
+    store, other = JobStore(tmp_path), JobStore(tmp_path)
+
+    with (old.job_dir(job_id) / "job.lock").open("a") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        threads = [
+            threading.Thread(target=store.move_to_shard, args=(job_id,)),
+            threading.Thread(
+                target=other.update_if,
+                args=(job_id, {"succeeded"}, lambda cur: cur.model_copy(update={"worker": "w2"})),
+            ),
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+    for t in threads:
+        t.join(5)
+
+    assert store.job_dir(job_id) == store.layout.sharded_dir(job_id)
+    assert not (tmp_path / "jobs" / job_id).exists()
+    assert JobStore(tmp_path).get(job_id).worker == "w2"
+
+
+def test_list_reads_only_the_newest_days_a_page_needs(tmp_path: Path, monkeypatch) -> None:
+    old, store = JobStore(tmp_path, layout="flat"), JobStore(tmp_path)
+    ids: list[str] = []
+    for day, s in [(1, old), (1, store), (2, old), (3, store), (3, store)]:
+        for minute in range(2):
+            at = datetime(2026, 3, day, 12, minute, tzinfo=timezone.utc)
+            monkeypatch.setattr(jobs, "utc_now", lambda at=at: at)
+            ids.append(s.create_job(service="alphafold-multimer", request={}).job_id)
+
+    read: list[str] = []
+    get = store.get
+    monkeypatch.setattr(store, "get", lambda job_id: read.append(job_id) or get(job_id))
+    page = store.list(limit=3, offset=0)
+    assert [(r.created_at.day, r.created_at.minute) for r in page] == [(3, 1), (3, 1), (3, 0)]
+    assert set(read) == set(ids[6:])  # day 3 only: the older days were not even listed
+
+    everything = [(r.created_at.day, r.created_at.minute) for r in store.list(limit=20, offset=0)]
+    assert everything == [(3, 1), (3, 1), (3, 0), (3, 0), (2, 1), (2, 0), (1, 1), (1, 1), (1, 0), (1, 0)]
+    assert {r.job_id for r in store.list(limit=20, offset=0)} == set(ids)
+    assert [r.created_at.day for r in store.list(limit=3, offset=3)] == [3, 2, 2]
+
+
+def test_count_is_cached_per_shard_and_follows_changes(tmp_path: Path) -> None:
+    old = JobStore(tmp_path, layout="flat")
+    flat = old.create_job(service="alphafold-multimer", request={}).job_id
+    _finish(old, flat)
+    store = JobStore(tmp_path)
+    store.create_job(service="alphafold-multimer", request={})
+    shard = store.layout.sharded_dir(flat).parent
+    long_ago = (datetime.now(timezone.utc) - timedelta(hours=1)).timestamp()
+    os.utime(shard, (long_ago, long_ago))
+
+    assert store.count() == 2
+    assert store.layout._counts == {shard.name: (shard.stat().st_mtime_ns, 1)}
+    assert store.move_to_shard(flat)  # the shard changes: counted again, not from the cache
+    assert store.count() == 2
+    (shard / "job_20260101_000000_0000000a").mkdir()
+    assert store.count() == 3
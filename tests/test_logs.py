@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import gzip
+from pathlib import Path
+import time
+
+from alphafold_multimer_service.logs import LogBuffer, LogWriter, live_buffer, read_log
+
+
+def test_ring_buffer_keeps_absolute_offsets() -> None:
+    buf = LogBuffer(8)
+    buf.append(b"abcdef")
+    buf.append(b"ghij")
+    assert (buf.start, buf.end) == (2, 10)
+    assert buf.read(4, 3) == b"efg"
+    assert buf.read(10, 3) == b""
+    assert buf.read(1, 3) is None  # dropped
+
+
+def test_writer_serves_unflushed_bytes_from_the_ring(tmp_path: Path) -> None:
+    path = tmp_path / "docker.log.txt"
+    with LogWriter(path, capacity=64, flush_s=3600) as log:
+        log.write(b"line 1\n")
+        assert live_buffer(path) is not None
+        assert path.read_bytes() == b""  # buffered, not flushed per line
+        assert read_log(path, 0, 100) == (0, b"line 1\n")
+        for i in range(2, 12):
+            log.write(f"line {i}\n".encode())
+        # the head left the ring (64 bytes), so it was flushed before that
+        assert read_log(path, 0, 14) == (0, b"line 1\nline 2\n")
+        assert read_log(path, 7, 1000)[1].startswith(b"line 2\n")
+    assert live_buffer(path) is None
+    text = path.read_bytes()
+    assert text.endswith(b"line 11\n")
+    assert read_log(path, 70, 1000) == (70, text[70:])
+    # past the end: the log was started over, read from the beginning
+    assert read_log(path, len(text) + 5, 7) == (0, b"line 1\n")
+
+
+def test_writer_flushes_output_followed_by_silence(tmp_path: Path) -> None:
+    path = tmp_path / "docker.log.txt"
+    with LogWriter(path, capacity=1 << 16, flush_s=0.1) as log:
+        log.write(b"Compiling...\n")
+        assert path.read_bytes() == b""
+        # nothing else is written (a long step): readers in other processes still see the line
+        deadline = time.time() + 5
+        while not path.read_bytes() and time.time() < deadline:
+            time.sleep(0.02)
+        assert path.read_bytes() == b"Compiling...\n"
+
+
+def test_read_compacted_log(tmp_path: Path) -> None:
+    path = tmp_path / "log.gz"
+    with gzip.open(path, "wb") as f:
+        f.write(b"0123456789")
+    assert read_log(path, 4, 3, encoding="gzip") == (4, b"456")
+    assert read_log(path, 20, 3, encoding="gzip") == (0, b"012")
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+import re
+import time
+
+from fastapi.testclient import TestClient
+
+from alphafold_multimer_service.metrics import Registry, SnapshotExporter, render
+
+
+def _sample(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_text_format_of_counters_and_histograms() -> None:
+    reg = Registry()
+    c = reg.counter("x_total", "Things", ("kind",))
+    c.inc(kind='a"b')
+    c.inc(2, kind='a"b')
+    assert reg.counter("x_total", "Things", ("kind",)) is c  # get-or-create
+    h = reg.histogram("d_seconds", "Durations", buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(v)
+    text = render([(reg.snapshot(), {"process": "api"})])
+    assert "# TYPE x_total counter" in text
+    assert 'x_total{kind="a\\"b",process="api"} 3' in text
+    assert 'd_seconds_bucket{process="api",le="0.1"} 1' in text
+    assert 'd_seconds_bucket{process="api",le="1"} 3' in text
+    assert 'd_seconds_bucket{process="api",le="+Inf"} 4' in text
+    assert 'd_seconds_count{process="api"} 4' in text
+    assert 'd_seconds_sum{process="api"} 4.05' in text
+
+
+def test_snapshots_of_other_processes_are_merged(tmp_path: Path) -> None:
+    worker_reg, api_reg = Registry(), Registry()
+    worker_reg.counter("jobs_total", "Jobs").inc(5)
+    api_reg.counter("jobs_total", "Jobs").inc(1)
+    SnapshotExporter(tmp_path, "worker-gpu0:1", registry=worker_reg).write()
+    gone = SnapshotExporter(tmp_path, "worker-gone:2", registry=worker_reg)
+    gone.write()
+    old = time.time() - 3600
+    path = tmp_path / "worker-gone_2.json"
+    path.write_text(json.dumps({**json.loads(path.read_text()), "written_at": old}))
+
+    text = SnapshotExporter(tmp_path, "api", registry=api_reg).render()
+    assert 'jobs_total{process="api"} 1' in text
+    assert 'jobs_total{process="worker-gpu0:1"} 5' in text
+    assert "worker-gone" not in text  # stale: the process went away
+    assert text.count("# TYPE jobs_total counter") == 1
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
+
+
+def test_metrics_endpoint_after_a_job(app) -> None:
+    with TestClient(app) as client:
+        before = client.get("/metrics")
+        assert before.status_code == 200
+        assert before.headers["content-type"].startswith("text/plain; version=0.0.4")
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"sequence": "MKV"}, "protein_b": {"sequence": "MAL"}, "preset": "fast"},
+        )
+        job_id = r.json()["job_id"]
+        deadline = time.time() + 5
+        while time.time() < deadline and client.get(f"/api/v1/jobs/{job_id}").json()["status"] != "succeeded":
+            time.sleep(0.02)
+        res = client.get(f"/api/v1/jobs/{job_id}/result").json()
+        art = client.get(res["artifacts"][0]["url"], headers={"Accept-Encoding": "identity"})
+        after = client.get("/metrics").text
+
+    process = re.search(r'process="([^"]+)"', after).group(1)  # type: ignore[union-attr]
+
+    def delta(name: str, labels: str = "") -> float:
+        prefix = f"{name}{{{labels}{',' if labels else ''}process=\"{process}\"}}"
+        return _sample(after, prefix) - _sample(before.text, prefix)
+
+    assert delta("afm_jobs_submitted_total") == 1
+    assert delta("afm_jobs_finished_total", 'status="succeeded"') == 1
+    assert delta("afm_stage_duration_seconds_count", 'stage="mock"') == 1
+    assert delta("afm_stage_duration_seconds_count", 'stage="postprocessing"') == 1
+    assert delta("afm_job_write_duration_seconds_count") >= 3
+    assert delta("afm_artifact_bytes_served_total", 'encoding="identity"') == len(art.content)
+    assert _sample(after, f'afm_queue_jobs{{state="queued",process="{process}"}}') == 0
+    assert f'afm_jobs_in_stage{{stage="gpu",process="{process}"}} 0' in after
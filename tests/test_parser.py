@@ -2,10 +2,13 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
+import random
 
 import pytest
 
+from alphafold_multimer_service.alphafold_multimer import parser
 from alphafold_multimer_service.alphafold_multimer.parser import (
+    compute_chain_pair_summary,
     compute_interface_pae_means,
     count_residues_per_chain_pdb,
     parse_a3m_chain_lengths,
@@ -35,6 +38,20 @@ def test_parse_a3m_chain_lengths(tmp_path: Path) -> None:
     assert (a, b) == (833, 211)
 
 
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        ("#833,211\t1,1", [833, 211]),
+        ("#120\t2", [120, 120]),
+        ("#300,150\t2,1", [300, 300, 150]),
+    ],
+)
+def test_parse_a3m_chain_lengths_expands_cardinality(tmp_path: Path, header: str, expected: list[int]) -> None:
+    p = tmp_path / "x.a3m"
+    p.write_text(f"{header}\n>101\nAAA\n", encoding="utf-8")
+    assert parse_a3m_chain_lengths(p) == expected
+
+
 def test_count_residues_per_chain_pdb(tmp_path: Path) -> None:
     p = tmp_path / "x.pdb"
     p.write_text(
@@ -70,3 +87,46 @@ def test_compute_interface_pae_means(tmp_path: Path) -> None:
     assert ba == pytest.approx(35.0)
     assert iface == pytest.approx(25.0)
 
+
+
+def test_compute_chain_pair_summary_three_chains() -> None:
+    # chains of length 1, 2, 1 => L=4
+    pae = [
+        [0.0, 2.0, 4.0, 6.0],
+        [1.0, 0.0, 0.0, 8.0],
+        [3.0, 0.0, 0.0, 10.0],
+        [5.0, 7.0, 9.0, 0.0],
+    ]
+    s = compute_chain_pair_summary(pae, [1, 2, 1])
+    assert s.pae_mean[0][1] == pytest.approx(3.0)  # row 0, cols 1..2
+    assert s.pae_mean[1][0] == pytest.approx(2.0)  # rows 1..2, col 0
+    assert s.pae_mean[1][2] == pytest.approx(9.0)
+    assert s.pae_mean[2][1] == pytest.approx(8.0)
+    assert s.pae_mean[1][1] == pytest.approx(0.0)
+    # mean of the six off-diagonal block means
+    assert s.interface_pae_mean == pytest.approx((3 + 6 + 2 + 9 + 8 + 5) / 6)
+
+    # pairwise ipTM estimate: diagonal undefined, perfect (PAE 0) pairs score 1,
+    # larger PAE scores lower.
+    assert s.iptm[0][0] is None
+    assert s.iptm[1][2] is not None and s.iptm[2][1] is not None
+    assert s.iptm[0][1] > s.iptm[0][2]
+    assert all(0.0 < v <= 1.0 for row in s.iptm for v in row if v is not None)
+
+    with pytest.raises(ValueError):
+        compute_chain_pair_summary(pae, [2, 1])
+
+
+def test_chain_pair_summary_is_the_same_with_and_without_numpy(monkeypatch) -> None:
+    pytest.importorskip("numpy")
+    rng = random.Random(0)
+    lengths = [37, 5, 60]
+    pae = [[round(rng.uniform(0, 31.75), 2) for _ in range(sum(lengths))] for _ in range(sum(lengths))]
+    vectorized = compute_chain_pair_summary(pae, lengths)
+    monkeypatch.setattr(parser, "numpy", None)
+    pure = compute_chain_pair_summary(pae, lengths)
+    for got, want in ((vectorized.pae_mean, pure.pae_mean), (vectorized.iptm, pure.iptm)):
+        assert [[v is None for v in row] for row in got] == [[v is None for v in row] for row in want]
+        assert [v for row in got for v in row if v is not None] == pytest.approx(
+            [v for row in want for v in row if v is not None]
+        )
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+import threading
+import time
+
+from fastapi.testclient import TestClient
+import pytest
+
+from alphafold_multimer_service.jobs import JobStore
+from alphafold_multimer_service.partners import PartnerIndex, protein_key
+
+
+def _chain(name: str) -> dict:
+    return {"sha256": hashlib.sha256(name.encode()).hexdigest(), "uniprot": name}
+
+
+def _add_job(store: JobStore, index: PartnerIndex | None, chains: list[str], rc: float, pae: float) -> str:
+    rec = store.create_job(service="alphafold-multimer", request={})
+    result = {"metrics": {"ranking_confidence": rc, "iptm": rc - 0.1, "interface_pae_mean": pae}}
+    store.write_result(rec.job_id, result)
+    rec = rec.model_copy(update={"status": "succeeded", "chains": [_chain(c) for c in chains]})
+    store.update(rec)
+    if index is not None:
+        index.add(job_id=rec.job_id, created_at=rec.created_at.isoformat(), chains=rec.chains, result=result)
+    return rec.job_id
+
+
+def test_top_partners_by_metric(tmp_path: Path) -> None:
+    store = JobStore(tmp_path)
+    index = PartnerIndex(tmp_path / "partner_index.jsonl")
+    index.load(store)
+    _add_job(store, index, ["P11111", "Q22222"], rc=0.4, pae=12.0)
+    best_q = _add_job(store, index, ["P11111", "Q22222"], rc=0.7, pae=20.0)
+    _add_job(store, index, ["P11111", "Q33333"], rc=0.6, pae=5.0)
+    homo = _add_job(store, index, ["P11111", "P11111"], rc=0.5, pae=8.0)
+    _add_job(store, index, ["Q44444", "Q33333"], rc=0.9, pae=1.0)  # does not involve P11111
+
+    top = index.top_partners(protein_key("P11111"), metric="ranking_confidence", k=2)
+    assert [(p["uniprot"], p["jobs"]) for p in top] == [("Q22222", 2), ("Q33333", 1)]
+    assert top[0]["job_id"] == best_q and top[0]["score"] == 0.7
+
+    by_pae = index.top_partners(protein_key("P11111"), metric="interface_pae_mean", k=10)
+    assert [p["uniprot"] for p in by_pae] == ["Q33333", "P11111", "Q22222"]
+    assert by_pae[1]["job_id"] == homo
+    assert by_pae[2]["score"] == 12.0  # lowest PAE across the Q22222 jobs
+
+    sha_key = protein_key(_chain("P11111")["sha256"])
+    assert [p["uniprot"] for p in index.top_partners(sha_key, metric="iptm", k=1)] == ["Q22222"]
+
+
+def test_index_is_replayed_or_rebuilt_on_load(tmp_path: Path) -> None:
+    store = JobStore(tmp_path)
+    index = PartnerIndex(tmp_path / "partner_index.jsonl")
+    index.load(store)
+    _add_job(store, index, ["P11111", "Q22222"], rc=0.4, pae=12.0)
+    # landed while the index file was unavailable: only a rebuild sees it
+    _add_job(store, None, ["P11111", "Q33333"], rc=0.6, pae=5.0)
+
+    replayed = PartnerIndex(tmp_path / "partner_index.jsonl")
+    replayed.load(store)
+    assert [p["uniprot"] for p in replayed.top_partners("uniprot:P11111", metric="iptm", k=5)] == ["Q22222"]
+
+    (tmp_path / "partner_index.jsonl").unlink()
+    rebuilt = PartnerIndex(tmp_path / "partner_index.jsonl")
+    rebuilt.load(store)
+    assert [p["uniprot"] for p in rebuilt.top_partners("uniprot:P11111", metric="iptm", k=5)] == ["Q33333", "Q22222"]
+    assert (tmp_path / "partner_index.jsonl").exists()
+
+
+def test_partners_endpoint(app) -> None:
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}},
+        )
+        job_id = r.json()["job_id"]
+        deadline = time.time() + 5
+        while time.time() < deadline and client.get(f"/api/v1/jobs/{job_id}").json()["status"] != "succeeded":
+            time.sleep(0.02)
+
+        r = client.get("/api/v1/proteins/P35625/partners", params={"metric": "iptm", "k": 5})
+        assert r.status_code == 200
+        body = r.json()
+        assert body["protein"] == "P35625" and body["metric"] == "iptm"
+        assert [(p["uniprot"], p["job_id"]) for p in body["partners"]] == [("A0A2R8Y7G1", job_id)]
+
+        assert client.get("/api/v1/proteins/not a protein/partners").status_code == 422
+        assert client.get("/api/v1/proteins/P35625/partners", params={"metric": "plddt"}).status_code == 422
+
+
+@pytest.mark.parametrize(
+    ("ref", "key"),
+    [
+        ("p35625", "uniprot:P35625"),
+        ("https://www.uniprot.org/uniprotkb/P35625/entry", "uniprot:P35625"),
+        ("A" * 64, "sha256:" + "a" * 64),
+    ],
+)
+def test_protein_key(ref: str, key: str) -> None:
+    assert protein_key(ref) == key
+
+
+def test_index_picks_up_entries_appended_by_another_process(tmp_path: Path) -> None:
+    store = JobStore(tmp_path)
+    worker = PartnerIndex(tmp_path / "partner_index.jsonl")
+    api = PartnerIndex(tmp_path / "partner_index.jsonl")
+    worker.load(store)
+    api.load(store)
+    _add_job(store, worker, ["P11111", "Q22222"], rc=0.4, pae=12.0)
+    assert [p["uniprot"] for p in api.top_partners("uniprot:P11111", metric="iptm", k=5)] == ["Q22222"]
+
+
+def test_rebuild_does_not_lose_an_entry_another_process_appends_meanwhile(tmp_path: Path, monkeypatch) -> None:
+    store = JobStore(tmp_path)
+    worker = PartnerIndex(tmp_path / "partner_index.jsonl")
+    api = PartnerIndex(tmp_path / "partner_index.jsonl")
+    worker.load(store)
+    _add_job(store, worker, ["P11111", "Q22222"], rc=0.4, pae=12.0)
+    (tmp_path / "partner_index.jsonl").unlink()
+    iter_raw = store.iter_raw
+    appender = threading.Thread(target=_add_job, args=(store, worker, ["P11111", "Q33333"], 0.6, 5.0))
+
+    def job_lands_mid_rebuild():
+        rows = list(iter_raw())
+        appender.start()
+        time.sleep(0.2)
+        assert appender.is_alive()  # blocked on the lock, not appending to the file about to be replaced
+        return iter(rows)
+
+    monkeypatch.setattr(store, "iter_raw", job_lands_mid_rebuild)
+    api.load(store)
+    appender.join(5)
+
+    assert [p["uniprot"] for p in api.top_partners("uniprot:P11111", metric="iptm", k=5)] == ["Q33333", "Q22222"]
+    replayed = PartnerIndex(tmp_path / "partner_index.jsonl")
+    replayed.load(store)
+    assert len(replayed.top_partners("uniprot:P11111", metric="iptm", k=5)) == 2
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from datetime import timedelta
+import gzip
+import os
+from pathlib import Path
+import time
+
+from fastapi.testclient import TestClient
+
+from alphafold_multimer_service.artifacts import ArtifactStore
+from alphafold_multimer_service.jobs import JobStore, utc_now
+from alphafold_multimer_service.retention import RetentionManager, RetentionPolicy, disk_usage
+
+
+def _finished_job(store: JobStore, artifacts: ArtifactStore, *, pae: bytes, age_s: float = 0.0) -> str:
+    rec = store.create_job(service="alphafold-multimer", request={"protein_a": {}, "protein_b": {}})
+    job_dir = store.job_dir(rec.job_id)
+    (job_dir / "work" / "out").mkdir(parents=True)
+    (job_dir / "work" / "out" / "model.pickle").write_bytes(b"\0" * 5000)
+    (job_dir / "artifacts").mkdir()
+    (job_dir / "artifacts" / "pae.json").write_bytes(pae)
+    ingested = artifacts.ingest(rec.job_id, [{"name": "pae.json", "path": str(job_dir / "artifacts" / "pae.json")}])
+    finished_at = utc_now() - timedelta(seconds=age_s)
+    store.write_result(
+        rec.job_id,
+        {"job_id": rec.job_id, "metrics": {"iptm": 0.5}, "artifacts": [{"name": "pae.json", "sha256": ingested[0]["sha256"]}]},
+    )
+    store.update(rec.model_copy(update={"status": "succeeded", "finished_at": finished_at}))
+    old = time.time() - age_s
+    os.utime(job_dir / "manifest.json", (old, old))
+    return rec.job_id
+
+
+def _retention(tmp_path: Path, store: JobStore, artifacts: ArtifactStore, **policy) -> RetentionManager:
+    return RetentionManager(
+        store=store,
+        artifacts=artifacts,
+        policy=RetentionPolicy(io_bytes_per_s=None, **policy),
+        report_path=tmp_path / "retention.json",
+    )
+
+
+def test_prunes_work_and_evicts_lru_jobs_within_budget(tmp_path: Path) -> None:
+    store, artifacts = JobStore(tmp_path), ArtifactStore(tmp_path)
+    oldest = _finished_job(store, artifacts, pae=b"a" * 3000, age_s=300)
+    newest = _finished_job(store, artifacts, pae=b"b" * 3000, age_s=10)
+    # room for everything but both work dirs and one job's artifacts
+    mgr = _retention(tmp_path, store, artifacts, compress_after_s=None, disk_budget_bytes=disk_usage(tmp_path) - 13000)
+
+    report = mgr.run_pass()
+    assert report.work_pruned_bytes == 10000
+    assert report.jobs_evicted == 1
+    assert report.blobs_removed == 2  # raw blob + its precompressed gzip variant
+    assert report.bytes_reclaimed >= 13000
+    assert mgr.last_report()["jobs_evicted"] == 1
+
+    # the least recently used job lost its artifacts but kept its result
+    assert not (store.job_dir(oldest) / "artifacts").exists()
+    assert store.read_result(oldest)["metrics"] == {"iptm": 0.5}
+    assert store.read_result(oldest)["artifacts"] == []
+    assert store.get(oldest).artifacts_evicted_at is not None
+    assert artifacts.artifact_path(newest, "pae.json") is not None
+    assert not (store.job_dir(newest) / "work").exists()
+
+
+def test_eviction_keeps_the_grace_period_for_blobs_it_did_not_release(tmp_path: Path) -> None:
+    store, artifacts = JobStore(tmp_path), ArtifactStore(tmp_path)
+    mgr = _retention(tmp_path, store, artifacts, compress_after_s=None, max_age_s=3600)
+    old = _finished_job(store, artifacts, pae=b"a", age_s=7200)
+    old_blob = artifacts.blob_path(artifacts.read_manifest(old)["pae.json"]["sha256"])
+    # placed by a worker whose ingest has not written the manifest yet
+    pending = artifacts.blob_path("ab" * 32)
+    pending.parent.mkdir(parents=True, exist_ok=True)
+    pending.write_bytes(b"pending")
+
+    assert mgr.run_pass().jobs_evicted == 1
+    assert not old_blob.exists()
+    assert pending.exists()
+
+
+def test_max_age_evicts_regardless_of_budget(tmp_path: Path) -> None:
+    store, artifacts = JobStore(tmp_path), ArtifactStore(tmp_path)
+    mgr = _retention(tmp_path, store, artifacts, compress_after_s=None, max_age_s=3600)
+    old = _finished_job(store, artifacts, pae=b"a", age_s=7200)
+    fresh = _finished_job(store, artifacts, pae=b"b")
+    assert mgr.run_pass().jobs_evicted == 1
+    assert store.get(old).artifacts_evicted_at is not None
+    assert store.get(fresh).artifacts_evicted_at is None
+
+
+def test_compresses_cold_blobs(tmp_path: Path) -> None:
+    store, artifacts = JobStore(tmp_path), ArtifactStore(tmp_path)
+    mgr = _retention(tmp_path, store, artifacts, compress_after_s=60)
+    job_id = _finished_job(store, artifacts, pae=b"[" + b"12.5, " * 2000 + b"]", age_s=120)
+    sha = artifacts.read_manifest(job_id)["pae.json"]["sha256"]
+    old = time.time() - 120
+    os.utime(artifacts.blob_path(sha), (old, old))
+
+    report = mgr.run_pass()
+    assert report.compressed_bytes_saved > 10000
+    assert not artifacts.blob_path(sha).exists()
+    assert gzip.decompress(artifacts.gzip_blob_path(sha).read_bytes()).startswith(b"[12.5, ")
+    assert artifacts.locate(job_id, "pae.json") == (artifacts.gzip_blob_path(sha), "gzip")
+
+
+def test_recently_downloaded_blobs_stay_uncompressed(tmp_path: Path) -> None:
+    store, artifacts = JobStore(tmp_path), ArtifactStore(tmp_path)
+    mgr = _retention(tmp_path, store, artifacts, compress_after_s=60)
+    pae = b"[" + b"12.5, " * 2000 + b"]"
+    idle = _finished_job(store, artifacts, pae=pae, age_s=120)
+    downloaded = _finished_job(store, artifacts, pae=pae + b" ", age_s=120)
+    # another old job sharing the downloaded job's blob
+    other = _finished_job(store, artifacts, pae=pae + b" ", age_s=120)
+    old = time.time() - 120
+    for job_id in (idle, downloaded):
+        os.utime(artifacts.blob_path(artifacts.read_manifest(job_id)["pae.json"]["sha256"]), (old, old))
+    artifacts.touch(downloaded, min_interval_s=0)  # an artifact download; only the manifest moves
+
+    mgr.run_pass()
+    assert artifacts.locate(idle, "pae.json")[1] == "gzip"
+    # stays a plain blob, so Range requests keep working for every job referencing it
+    assert artifacts.locate(downloaded, "pae.json")[1] is None
+    assert artifacts.locate(other, "pae.json")[1] is None
+
+
+def test_api_serves_compressed_artifacts(app) -> None:
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": "A0A2R8Y7G1"}},
+        )
+        job_id = r.json()["job_id"]
+        deadline = time.time() + 5
+        while client.get(f"/api/v1/jobs/{job_id}").json()["status"] != "succeeded" and time.time() < deadline:
+            time.sleep(0.02)
+        plain = client.get(f"/api/v1/jobs/{job_id}/artifacts/pae.json").content
+
+        artifacts: ArtifactStore = app.state.jobs._artifact_store  # type: ignore[attr-defined]
+        sha = artifacts.read_manifest(job_id)["pae.json"]["sha256"]
+        assert artifacts.compress_blob(sha) > 0
+
+        # httpx decodes Content-Encoding: gzip transparently; identity gets gunzipped server-side
+        assert client.get(f"/api/v1/jobs/{job_id}/artifacts/pae.json").content == plain
+        r = client.get(f"/api/v1/jobs/{job_id}/artifacts/pae.json", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in r.headers
+        assert r.content == plain
+
+        stats = client.get("/api/v1/stats/retention").json()
+        assert stats["policy"]["prune_work"] is True
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+from alphafold_multimer_service.alphafold_multimer.runner import (
+    COLABFOLD_PRESETS,
+    ColabFoldDockerRunner,
+    _stash_previous_attempt,
+    colabfold_phase,
+    find_finished_models,
+)
+
+_JOB = "job_x"
+_TAG = "alphafold2_multimer_v3_model_{}_seed_000"
+
+
+def _write_model(out_dir: Path, model: int, *, iptm: float, rank: int | None = None, scores: bool = True) -> None:
+    rank_part = f"rank_{rank:03d}_" if rank is not None else ""
+    pdb_lines = [
+        f"ATOM  {i:5d}  CA  ALA {c}{r:4d}    0.000   0.000   0.000  1.00  0.00           C\n"
+        for i, (c, r) in enumerate([("A", 1), ("A", 2), ("B", 1)], start=1)
+    ]
+    (out_dir / f"{_JOB}_unrelaxed_{rank_part}{_TAG.format(model)}.pdb").write_text(
+        "".join(pdb_lines) + "END\n", encoding="utf-8"
+    )
+    if scores:
+        pae = [[float(model)] * 3 for _ in range(3)]
+        (out_dir / f"{_JOB}_scores_{rank_part}{_TAG.format(model)}.json").write_text(
+            json.dumps({"plddt": [70.0, 80.0, 90.0], "ptm": 0.5, "iptm": iptm, "pae": pae}), encoding="utf-8"
+        )
+
+
+def test_find_finished_models_requires_pdb_and_scores(tmp_path: Path) -> None:
+    _write_model(tmp_path, 1, iptm=0.3, rank=2)
+    _write_model(tmp_path, 2, iptm=0.6)
+    _write_model(tmp_path, 3, iptm=0.9, scores=False)  # cut off before its scores were written
+    (tmp_path / f"{_JOB}_scores_{_TAG.format(4)}.json").write_text("{", encoding="utf-8")
+    _write_model(tmp_path, 4, iptm=0.9, scores=False)
+
+    finished = find_finished_models(tmp_path)
+    assert sorted(finished) == [1, 2]
+    assert abs(finished[2].ranking_confidence - (0.8 * 0.6 + 0.2 * 0.5)) < 1e-9
+
+
+def test_stash_previous_attempt_keeps_msa_and_models(tmp_path: Path) -> None:
+    out_dir, resume_dir = tmp_path / "out", tmp_path / "resume"
+    out_dir.mkdir()
+    _write_model(out_dir, 1, iptm=0.3)
+    (out_dir / f"{_JOB}.a3m").write_text("#2,1\t1,1\n>101\nAAB\n", encoding="utf-8")
+    (out_dir / f"{_JOB}.done.txt").write_text("", encoding="utf-8")
+
+    msa = _stash_previous_attempt(job_id=_JOB, out_dir=out_dir, resume_dir=resume_dir)
+    assert msa == resume_dir / f"{_JOB}.a3m"
+    assert not out_dir.exists()
+    assert sorted(find_finished_models(resume_dir)) == [1]
+    # idempotent across further restarts
+    assert _stash_previous_attempt(job_id=_JOB, out_dir=out_dir, resume_dir=resume_dir) == msa
+
+
+def test_docker_command_model_order(tmp_path: Path) -> None:
+    runner = ColabFoldDockerRunner(colabfold_image="img", colabfold_cache_dir=tmp_path, host_ptxas_path=None)
+    cmd = runner._docker_command(
+        work_dir=tmp_path,
+        query_name="input.a3m",
+        out_name="out",
+        cfg=COLABFOLD_PRESETS["screen"],
+        num_recycles=3,
+        padding=0,
+        model_order=[2],
+    )
+    assert cmd[cmd.index("--num-models") + 1] == "1"
+    assert cmd[cmd.index("--model-order") + 1] == "2"
+    assert cmd.count("--num-models") == 1
+
+
+def test_run_pair_reuses_all_finished_models_without_docker(tmp_path: Path) -> None:
+    job_dir = tmp_path / _JOB
+    out_dir = job_dir / "work" / "out"
+    out_dir.mkdir(parents=True)
+    (job_dir / "work" / "input.fasta").write_text(f">{_JOB}\nAA:B\n", encoding="utf-8")
+    (out_dir / f"{_JOB}.a3m").write_text("#2,1\t1,1\n>101\nAAB\n", encoding="utf-8")
+    _write_model(out_dir, 1, iptm=0.3, rank=2)
+    _write_model(out_dir, 2, iptm=0.6, rank=1)
+
+    runner = ColabFoldDockerRunner(colabfold_image="img", colabfold_cache_dir=tmp_path, host_ptxas_path=None)
+    stages: list[str] = []
+    result = runner.run_pair(
+        job_id=_JOB,
+        job_dir=job_dir,
+        proteins=[{"sequence": "AA"}, {"sequence": "B"}],
+        preset="screen",
+        num_recycles_override=None,
+        progress_cb=lambda stage, _msg, _pct: stages.append(stage),
+    )
+    assert result.resume == {"msa_reused": True, "models_reused": [1, 2], "models_computed": []}
+    assert result.metrics["iptm"] == 0.6
+    assert result.metrics["plddt"] == 80.0
+    assert result.metrics["interface_pae_mean_ab"] == 2.0  # PAE of model 2
+    assert result.verification["chain_lengths_match"] is True
+    names = {a["name"] for a in result.artifacts}
+    assert {"rank_001.pdb", "pae.json", "scores_rank_001.json", f"{_JOB}.a3m"} <= names
+    assert "run" in stages and stages[-1] == "done"
+
+
+# Stands in for `docker run ... colabfold_batch`: writes finished models into the out dir.
+_FAKE_COLABFOLD = """
+import json, sys
+from pathlib import Path
+out, models = Path(sys.argv[1]), [int(m) for m in sys.argv[2].split(",")]
+out.mkdir(parents=True, exist_ok=True)
+(out / "log.txt").write_text(f"rank_001_alphafold2_multimer_v3_model_{models[0]}_seed_000 pLDDT=80 pTM=0.5 ipTM=0.9\\n")
+for m in models:
+    tag = f"job_unrelaxed_alphafold2_multimer_v3_model_{m}_seed_000"
+    atoms = [("A", 1), ("A", 2), ("B", 1)]
+    (out / f"{tag}.pdb").write_text("".join(
+        f"ATOM  {i:5d}  CA  ALA {c}{r:4d}    0.000   0.000   0.000  1.00  0.00           C\\n"
+        for i, (c, r) in enumerate(atoms, start=1)))
+    (out / f"{tag}.json".replace("_unrelaxed_", "_scores_")).write_text(json.dumps(
+        {"plddt": [70.0, 80.0, 90.0], "ptm": 0.5, "iptm": 0.9, "pae": [[1.0] * 3] * 3}))
+"""
+
+
+def test_cascade_screen_resume_is_not_reused_by_full_run(app, tmp_path: Path) -> None:
+    model_orders: list[list[int] | None] = []
+
+    class FakeColabFoldRunner(ColabFoldDockerRunner):
+        def _docker_command(self, *, work_dir, out_name, cfg, model_order=None, **_kwargs):
+            model_orders.append(model_order)
+            models = model_order or list(range(1, (cfg.num_models or 5) + 1))
+            return [sys.executable, "-c", _FAKE_COLABFOLD, out_name, ",".join(map(str, models))]
+
+    manager = app.state.jobs  # type: ignore[attr-defined]
+    manager._runner = FakeColabFoldRunner(colabfold_image="img", colabfold_cache_dir=tmp_path, host_ptxas_path=None)
+    store = manager.store
+    rec = store.create_job(
+        service="alphafold-multimer",
+        request={
+            "protein_a": {"sequence": "AA"},
+            "protein_b": {"sequence": "B"},
+            "preset": "cascade",
+            "options": {"cascade_threshold": 0.2},
+        },
+    )
+    # a screen attempt that finished both of its models before the process went away
+    store.update(rec.model_copy(update={"status": "running", "attempts": 1}))
+    out_dir = store.job_dir(rec.job_id) / "work" / "out"
+    out_dir.mkdir(parents=True)
+    (out_dir / f"{rec.job_id}.a3m").write_text("#2,1\t1,1\n>101\nAAB\n", encoding="utf-8")
+    _write_model(out_dir, 1, iptm=0.3)
+    _write_model(out_dir, 2, iptm=0.4)
+
+    with TestClient(app) as client:
+        deadline = time.time() + 10
+        while time.time() < deadline and client.get(f"/api/v1/jobs/{rec.job_id}").json()["status"] != "succeeded":
+            time.sleep(0.02)
+        res = client.get(f"/api/v1/jobs/{rec.job_id}/result").json()
+
+    assert res["cascade"]["escalated"] is True
+    # screen reused both models without running; the full stage computed all five itself
+    assert model_orders == [None]
+    final = store.get(rec.job_id)
+    assert final.resume is None
+    assert final.cascade["msa_path"].endswith(f"{rec.job_id}.a3m")
+    assert res["metrics"]["iptm"] == 0.9
+
+
+def test_docker_command_gpus(tmp_path: Path) -> None:
+    def gpus_of(gpus: str) -> str:
+        runner = ColabFoldDockerRunner(
+            colabfold_image="img", colabfold_cache_dir=tmp_path, host_ptxas_path=None, gpus=gpus
+        )
+        cmd = runner._docker_command(
+            work_dir=tmp_path,
+            query_name="q.fasta",
+            out_name="out",
+            cfg=COLABFOLD_PRESETS["fast"],
+            num_recycles=3,
+            padding=0,
+        )
+        return cmd[cmd.index("--gpus") + 1]
+
+    assert gpus_of("all") == "all"
+    assert gpus_of("1") == "device=1"
+    assert gpus_of("0, 1") == '"device=0,1"'
+
+
+def test_colabfold_phase_follows_log() -> None:
+    lines = [
+        "2024-05-01 10:00:00,000 Running colabfold 1.5.5",
+        "2024-05-01 10:00:01,000 Query 1/1: job_x (length 312)",
+        "COMPLETE: 100%|##########| 300/300 [elapsed: 00:02 remaining: 00:00]",
+        "2024-05-01 10:01:00,000 Setting max_seq=508, max_extra_seq=2048",
+        "2024-05-01 10:02:00,000 alphafold2_multimer_v3_model_1_seed_000 recycle=0 pLDDT=71.2 pTM=0.6 ipTM=0.4",
+        "2024-05-01 10:09:00,000 Query 1/1 (echoed by a later message)",
+    ]
+    phases = []
+    phase = "container"
+    for line in lines:
+        phase = colabfold_phase(line, phase)
+        phases.append(phase)
+    assert phases == ["container", "msa", "msa", "compile", "inference", "inference"]
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import hashlib
+
+import pytest
+
+from alphafold_multimer_service.sequences import (
+    canonicalize_sequence,
+    normalize_protein_ref,
+    resolve_protein,
+    sequence_from_fasta,
+)
+
+
+def test_canonicalize_sequence_strips_whitespace_and_uppercases() -> None:
+    assert canonicalize_sequence(" mkv\nLA t\t*") == "MKVLAT"
+
+
+@pytest.mark.parametrize("raw", ["", "  \n", "MKV1A", "MKV-A", "MKVÅ"])
+def test_canonicalize_sequence_rejects(raw: str) -> None:
+    with pytest.raises(ValueError):
+        canonicalize_sequence(raw)
+
+
+def test_sequence_from_fasta_requires_single_record() -> None:
+    assert sequence_from_fasta(">design_1 v2\nMKV\nlat\n") == ("design_1 v2", "MKVLAT")
+    with pytest.raises(ValueError):
+        sequence_from_fasta(">a\nMKV\n>b\nLAT\n")
+
+
+def test_same_sequence_same_identity_regardless_of_source() -> None:
+    from_seq = resolve_protein(normalize_protein_ref({"sequence": "mkv lat"}), fetch_uniprot=lambda _u: "")
+    from_fasta = resolve_protein(normalize_protein_ref({"fasta": ">x\nMKVLAT\n"}), fetch_uniprot=lambda _u: "")
+    from_uniprot = resolve_protein({"uniprot": "P35625"}, fetch_uniprot=lambda _u: "MKVLAT")
+
+    expected = hashlib.sha256(b"MKVLAT").hexdigest()
+    assert from_seq.sha256 == from_fasta.sha256 == from_uniprot.sha256 == expected
+    assert from_fasta.source == "fasta"
+    assert from_uniprot.to_record() == {"source": "uniprot", "length": 6, "sha256": expected, "uniprot": "P35625"}
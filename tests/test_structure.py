@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import math
+from pathlib import Path
+
+import pytest
+
+from alphafold_multimer_service.alphafold_multimer.parser import count_residues_per_chain_pdb
+from alphafold_multimer_service.alphafold_multimer.structure import read_structure
+
+
+def _atom(serial: int, chain: str, resseq: str, icode: str = " ", x: float = 1.5, b: float = 80.25) -> str:
+    return f"ATOM  {serial:5d}  CA  ALA {chain}{resseq:>4s}{icode}   {x:8.3f}{-2.0:8.3f}{3.125:8.3f}  1.00{b:6.2f}           C\n"
+
+
+def test_pdb_columns_and_residue_counts(tmp_path: Path) -> None:
+    p = tmp_path / "x.pdb"
+    p.write_text(
+        "".join(
+            [
+                "HEADER    TEST\n",
+                _atom(1, "A", "1"),
+                _atom(2, "A", "1"),  # second atom of the same residue
+                _atom(3, "A", "2", x=-10.25),
+                _atom(4, "A", "2", icode="A"),  # insertion code: a residue of its own
+                _atom(5, "B", "A000"),  # hybrid-36 for 10000
+                _atom(6, "B", "9999"),
+                "HETATM    7  O   HOH C   1       0.000   0.000   0.000  1.00  0.00           O\n",
+                "END\n",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    s = read_structure(p)
+    assert len(s) == 7
+    assert s.chain_ids == ("A", "B", "C")
+    assert [s.chain_ids[i] for i in s.chain] == ["A", "A", "A", "A", "B", "B", "C"]
+    assert list(s.resseq) == [1, 1, 2, 2, 10000, 9999, 1]
+    assert s.icode == b"   A   "
+    assert s.x[2] == -10.25 and s.y[0] == -2.0 and s.z[0] == 3.125
+    assert s.b_factor[0] == 80.25
+    assert s.residue_counts() == {"A": 3, "B": 2, "C": 1} == count_residues_per_chain_pdb(p)
+
+
+def test_pdb_bad_columns_do_not_break_residue_counts(tmp_path: Path) -> None:
+    p = tmp_path / "x.pdb"
+    p.write_text(
+        # coordinates shifted out of their columns, no B-factor, blank resSeq
+        "ATOM      1  CA  ALA A   1    0.000   0.000   0.000  1.00\n"
+        "ATOM      2  CA  ALA A   2    0.000   0.000   0.000\n"
+        "ATOM      3  CA  ALA B        1.000   1.000   1.000  1.00  0.00           C\n",
+        encoding="utf-8",
+    )
+    s = read_structure(p)
+    assert s.residue_counts() == {"A": 2, "B": 1}
+    assert math.isnan(s.z[0]) and math.isnan(s.b_factor[1])
+    assert s.resseq[2] == 0
+
+
+_CIF = """data_model
+#
+_entry.id model
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_seq_id
+_atom_site.pdbx_PDB_ins_code
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.occupancy
+_atom_site.B_iso_or_equiv
+_atom_site.auth_seq_id
+_atom_site.auth_asym_id
+ATOM 1 N N ALA A 1 ? 1.000 2.000 3.000 1.00 71.5 11 A
+ATOM 2 C CA ALA A 1 ? 1.500 2.500 3.500 1.00 72.0 11 A
+ATOM 3 C CA GLY A 2 B 4.000 5.000 6.000 1.00 . 11 A
+ATOM 4 O "O5'" DA B 1 . 7.000 8.000 9.000 1.00 60.0 1 BB
+HETATM 5 O O HOH C . ? 0.000 0.000 0.000 1.00 ? 101 C
+#
+loop_
+_atom_type.symbol
+C
+"""
+
+
+def test_mmcif_atom_site_loop(tmp_path: Path) -> None:
+    p = tmp_path / "model.cif"
+    p.write_text(_CIF, encoding="utf-8")
+    s = read_structure(p)
+    assert len(s) == 5
+    # author chain ids and residue numbers, like the PDB form of the model
+    assert s.chain_ids == ("A", "BB", "C")
+    assert list(s.resseq) == [11, 11, 11, 1, 101]
+    assert s.icode == b"  B  "
+    assert (s.x[3], s.y[3], s.z[3]) == (7.0, 8.0, 9.0)
+    assert s.b_factor[0] == 71.5
+    assert math.isnan(s.b_factor[2]) and math.isnan(s.b_factor[4])
+    assert s.residue_counts() == {"A": 2, "BB": 1, "C": 1}
+
+
+def test_format_is_sniffed_without_suffix(tmp_path: Path) -> None:
+    p = tmp_path / "model"
+    p.write_text(_CIF, encoding="utf-8")
+    assert read_structure(p).residue_counts() == {"A": 2, "BB": 1, "C": 1}
+    empty = tmp_path / "empty.pdb"
+    empty.write_bytes(b"")
+    assert len(read_structure(empty)) == 0
+
+
+def test_mmcif_ragged_loop_is_rejected(tmp_path: Path) -> None:
+    p = tmp_path / "bad.cif"
+    p.write_text(_CIF.replace("ATOM 1 N N ALA A 1 ? 1.000", "ATOM 1 N N ALA A 1 1.000"), encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_structure(p)
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import json
+
+from alphafold_multimer_service.trace import chrome_trace, close_spans, open_span, stage_seconds
+
+
+def test_spans_and_chrome_trace() -> None:
+    trace = open_span([], "queued", cat="stage", attempt=1, start=100.0)
+    trace = close_spans(trace, end=102.5)
+    trace = open_span(trace, "run", cat="stage", attempt=1, start=103.0, preset="fast")
+    inner = open_span(trace, "msa", cat="runner", attempt=1, start=103.5)
+    inner = close_spans(inner, cat="runner", end=104.0)
+    assert trace[-1]["end"] is None and len(trace) == 2  # helpers never mutate their input
+    assert inner[1]["end"] is None and inner[2]["end"] == 104.0
+
+    assert stage_seconds(inner) == {"queued": 2.5, "msa": 0.5}
+    doc = chrome_trace("job_x", inner, now=110.0)
+    json.dumps(doc)
+    events = {e["name"]: e for e in doc["traceEvents"] if e["ph"] == "X"}
+    assert events["queued"]["ts"] == 100_000_000 and events["queued"]["dur"] == 2_500_000
+    assert events["run"]["dur"] == 7_000_000 and events["run"]["args"] == {"preset": "fast", "open": True}
+    assert events["msa"]["cat"] == "runner" and events["msa"]["tid"] == 1
+    names = [e["args"]["name"] for e in doc["traceEvents"] if e["name"] == "thread_name"]
+    assert names == ["attempt 1"]
@@ -25,3 +25,97 @@ def test_extract_uniprot_id_rejects(inp: str) -> None:
     with pytest.raises(ValueError):
         extract_uniprot_id(inp)
 
+
+
+_STANDIN_DB = {
+    "P35625": "MTPWLGLIVLLGSWSLGDWGAEACTCSPSHPQDAFCNSDIVIRAKVVGKKLV",
+    "Q13424": "MASGRRAPRTGLLELRAGAGSGAGGERWQRVLLSLAEDVLTVSPADGDPGPEPGAPREQE",
+    "Q13424-2": "MASGRRAPRTGLLELRAGAGSGAGGERWQRVLLSL",
+}
+
+
+@pytest.fixture()
+def uniprot_standin():
+    """Local stand-in for rest.uniprot.org's accessions endpoint."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    calls: list[list[str]] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            parsed = urlparse(self.path)
+            if parsed.path != "/uniprotkb/accessions":
+                self.send_response(404)
+                self.end_headers()
+                return
+            accessions = parse_qs(parsed.query)["accessions"][0].split(",")
+            calls.append(accessions)
+            if any(not a.isalnum() and "-" not in a for a in accessions):
+                self.send_response(400)
+                self.end_headers()
+                return
+            body = ""
+            for acc in accessions:
+                key = acc[:-2] if acc.endswith("-1") else acc
+                seq = _STANDIN_DB.get(key)
+                if seq is None:
+                    continue
+                body += f">sp|{key}|TEST_HUMAN Test protein\n"
+                body += "\n".join(seq[i : i + 20] for i in range(0, len(seq), 20)) + "\n"
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", calls
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_iter_fasta_records_multi_record() -> None:
+    from alphafold_multimer_service.uniprot import fasta_header_accession, iter_fasta_records
+
+    text = ">sp|P12345|A_HUMAN x\nacd\nEF\n\n>tr|Q9Y2X3-3|B_HUMAN y\nGHI\n"
+    records = list(iter_fasta_records(text.splitlines()))
+    assert records == [("sp|P12345|A_HUMAN x", "ACDEF"), ("tr|Q9Y2X3-3|B_HUMAN y", "GHI")]
+    assert [fasta_header_accession(h) for h, _ in records] == ["P12345", "Q9Y2X3-3"]
+
+
+def test_bulk_fetch_handles_isoforms_and_partial_failures(uniprot_standin) -> None:
+    from alphafold_multimer_service.uniprot import UniProtClient
+
+    base_url, calls = uniprot_standin
+    client = UniProtClient(base_url=base_url, batch_size=10)
+    res = client.fetch_many(["P35625", "Q13424-1", "Q13424-2", "A0A000", "P35625"])
+
+    assert len(calls) == 1  # one round trip for the whole batch
+    assert res.sequences["P35625"] == _STANDIN_DB["P35625"]
+    assert res.sequences["Q13424-1"] == _STANDIN_DB["Q13424"]
+    assert res.sequences["Q13424-2"] == _STANDIN_DB["Q13424-2"]
+    assert set(res.errors) == {"A0A000"}
+
+    # Cached now: no further requests for single lookups.
+    assert client.fetch_sequence("Q13424-2") == _STANDIN_DB["Q13424-2"]
+    assert len(calls) == 1
+
+
+def test_bulk_fetch_bisects_rejected_batches(uniprot_standin) -> None:
+    from alphafold_multimer_service.uniprot import UniProtClient
+
+    base_url, _calls = uniprot_standin
+    client = UniProtClient(base_url=base_url, batch_size=10)
+    res = client.fetch_many(["P35625", "BAD_1", "Q13424-2"])
+    assert set(res.sequences) == {"P35625", "Q13424-2"}
+    assert set(res.errors) == {"BAD_1"}
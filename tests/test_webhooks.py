@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Any, Iterator
+
+from fastapi.testclient import TestClient
+import pytest
+
+from alphafold_multimer_service.api import create_app
+from alphafold_multimer_service.config import Settings
+from alphafold_multimer_service.webhooks import (
+    WebhookDispatcher,
+    WebhookOutbox,
+    blocked_reason,
+    job_event,
+    parse_networks,
+    sign,
+)
+
+# the test receiver listens on loopback, which callbacks may not reach by default
+LOOPBACK = parse_networks("127.0.0.0/8")
+
+
+class Receiver:
+    """Local webhook endpoint: answers with the queued status codes (then 200) and records requests."""
+
+    def __init__(self) -> None:
+        self.requests: list[tuple[dict[str, str], bytes]] = []
+        self.statuses: list[int] = []
+        self.delay_s = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with receiver._lock:
+                    receiver.in_flight += 1
+                    receiver.max_in_flight = max(receiver.max_in_flight, receiver.in_flight)
+                    status = receiver.statuses.pop(0) if receiver.statuses else 200
+                time.sleep(receiver.delay_s)
+                with receiver._lock:
+                    receiver.in_flight -= 1
+                    receiver.requests.append((dict(self.headers), body))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}/hook"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def payloads(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [json.loads(body) for _, body in self.requests]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture()
+def receiver() -> Iterator[Receiver]:
+    r = Receiver()
+    yield r
+    r.close()
+
+
+def _drain(dispatcher: WebhookDispatcher, outbox: WebhookOutbox, timeout_s: float = 5) -> dict[str, int]:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        dispatcher.dispatch_due()
+        stats = outbox.stats()
+        if stats["pending"] == 0:
+            return stats
+        time.sleep(0.02)
+    raise AssertionError(f"outbox not drained: {outbox.stats()}")
+
+
+def _event(job_id: str) -> dict[str, Any]:
+    return job_event(job_id=job_id, status="succeeded", finished_at="2026-01-01T00:00:00+00:00")
+
+
+def test_signed_delivery_is_retried_after_a_server_error(tmp_path: Path, receiver: Receiver) -> None:
+    outbox = WebhookOutbox(tmp_path / "webhooks.sqlite3")
+    dispatcher = WebhookDispatcher(outbox, allow_networks=LOOPBACK, secret="s3cret", backoff_s=0.05)
+    receiver.statuses = [500]
+    outbox.enqueue(receiver.url, _event("job_a"))
+
+    assert _drain(dispatcher, outbox)["delivered"] == 1
+    assert len(receiver.requests) == 2
+    first, second = receiver.payloads()
+    assert first == second  # same delivery id and body, so the receiver can deduplicate
+    assert second["events"][0]["job_id"] == "job_a"
+    headers, body = receiver.requests[1]
+    assert headers["X-Webhook-Id"] == second["delivery_id"]
+    assert headers["X-Webhook-Signature"] == sign("s3cret", headers["X-Webhook-Timestamp"], body)
+    assert outbox.events()[0]["attempts"] == 2
+
+
+def test_client_errors_fail_permanently_and_attempts_are_bounded(tmp_path: Path, receiver: Receiver) -> None:
+    outbox = WebhookOutbox(tmp_path / "webhooks.sqlite3")
+    # one at a time, so the receiver's statuses go to the events in order
+    dispatcher = WebhookDispatcher(outbox, allow_networks=LOOPBACK, backoff_s=0.01, max_attempts=3, concurrency=1)
+    receiver.statuses = [404, 503, 503, 503]
+    outbox.enqueue(receiver.url, _event("gone"))
+    outbox.enqueue(receiver.url, _event("flaky"))
+
+    assert _drain(dispatcher, outbox) == {"pending": 0, "delivered": 0, "failed": 2}
+    rows = {r["event"]["job_id"]: r for r in outbox.events()}
+    assert (rows["gone"]["attempts"], rows["gone"]["last_error"]) == (1, "HTTP 404")
+    assert (rows["flaky"]["attempts"], rows["flaky"]["last_error"]) == (3, "HTTP 503")
+    assert "X-Webhook-Signature" not in receiver.requests[0][0]  # no secret configured
+
+
+def test_batched_events_go_out_together(tmp_path: Path, receiver: Receiver) -> None:
+    outbox = WebhookOutbox(tmp_path / "webhooks.sqlite3")
+    dispatcher = WebhookDispatcher(outbox, allow_networks=LOOPBACK, batch_s=0.3, max_batch=3)
+    for i in range(4):
+        outbox.enqueue(receiver.url, _event(f"job_{i}"), batch=True)
+    outbox.enqueue(receiver.url, _event("single"))
+
+    assert dispatcher.dispatch_due() == 2  # a full batch of 3 and the unbatched event; job_3 waits for company
+    deadline = time.time() + 5
+    while outbox.stats()["delivered"] < 4 and time.time() < deadline:
+        time.sleep(0.02)
+    assert outbox.stats()["pending"] == 1
+    _drain(dispatcher, outbox)
+    assert sorted(len(p["events"]) for p in receiver.payloads()) == [1, 1, 3]
+    batch = next(p for p in receiver.payloads() if len(p["events"]) == 3)
+    assert [e["job_id"] for e in batch["events"]] == ["job_0", "job_1", "job_2"]
+
+
+def test_concurrency_is_limited_per_endpoint(tmp_path: Path, receiver: Receiver) -> None:
+    outbox = WebhookOutbox(tmp_path / "webhooks.sqlite3")
+    dispatcher = WebhookDispatcher(outbox, allow_networks=LOOPBACK, concurrency=2)
+    receiver.delay_s = 0.1
+    for i in range(6):
+        outbox.enqueue(receiver.url, _event(f"job_{i}"))
+
+    # only as many rows as there are free slots get leased; the rest wait unleased
+    assert dispatcher.dispatch_due() == 2
+    assert outbox._db().execute("SELECT COUNT(*) FROM outbox WHERE lease_owner IS NOT NULL").fetchone()[0] == 2
+    assert dispatcher.dispatch_due() == 0
+    assert _drain(dispatcher, outbox)["delivered"] == 6
+    assert receiver.max_in_flight == 2
+
+
+def test_pending_events_survive_a_restart(tmp_path: Path, receiver: Receiver) -> None:
+    path = tmp_path / "webhooks.sqlite3"
+    crashed = WebhookOutbox(path)
+    crashed.enqueue(receiver.url, _event("job_a"))
+    crashed.enqueue(receiver.url, _event("job_b"))
+    # claimed by a dispatcher that died before delivering: its lease runs out
+    assert len(crashed.claim("dead", batch_s=0, max_batch=10, lease_s=0.05)) == 2
+    time.sleep(0.1)
+
+    outbox = WebhookOutbox(path)
+    dispatcher = WebhookDispatcher(outbox, allow_networks=LOOPBACK)
+    dispatcher.start()
+    deadline = time.time() + 5
+    while outbox.stats()["delivered"] < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    assert sorted(p["events"][0]["job_id"] for p in receiver.payloads()) == ["job_a", "job_b"]
+
+
+def test_callbacks_to_non_public_addresses_are_refused(app, tmp_path: Path, receiver: Receiver) -> None:
+    assert blocked_reason("http://169.254.169.254/latest/meta-data") is not None
+    assert blocked_reason("http://10.0.0.7:8080/hook") is not None
+    assert blocked_reason("http://[::ffff:127.0.0.1]/hook") is not None
+    assert blocked_reason("http://10.0.0.7:8080/hook", parse_networks("10.0.0.0/24")) is None
+    assert blocked_reason("https://93.184.216.34/hook") is None
+
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"sequence": "MKV"}, "protein_b": {"sequence": "MAL"}, "callback_url": receiver.url},
+        )
+    assert r.status_code == 422 and "non-public address 127.0.0.1" in r.json()["error"]
+
+    # enqueued while allowed (or by an older version): checked again at delivery and dropped
+    outbox = WebhookOutbox(tmp_path / "webhooks.sqlite3")
+    outbox.enqueue(receiver.url, _event("job_a"))
+    assert _drain(WebhookDispatcher(outbox), outbox)["failed"] == 1
+    assert outbox.events()[0]["last_error"].startswith("Blocked: 127.0.0.1 resolves to non-public")
+    assert receiver.requests == []
+
+
+def test_job_with_callback_url_notifies_on_completion(tmp_path: Path, receiver: Receiver) -> None:
+    app = create_app(
+        Settings(
+            data_dir=tmp_path / "data",
+            api_token=None,
+            mock_mode=True,
+            cors_allow_origins=[],
+            colabfold_image="ddhmed/colabfold:1.5.5-cuda12.2.2",
+            colabfold_cache_dir=tmp_path / "cache",
+            host_ptxas_path=None,
+            default_preset="fast",
+            postprocess_workers=0,
+            webhook_allow_networks=LOOPBACK,
+        )
+    )
+    with TestClient(app) as client:
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={"protein_a": {"sequence": "MKV"}, "protein_b": {"sequence": "MAL"}, "callback_url": "ftp://x/y"},
+        )
+        assert r.status_code == 422
+        r = client.post(
+            "/api/v1/services/alphafold-multimer/jobs",
+            json={
+                "protein_a": {"sequence": "MKV"},
+                "protein_b": {"sequence": "MAL"},
+                "screen": "s1",
+                "callback_url": receiver.url,
+            },
+        )
+        job_id = r.json()["job_id"]
+        deadline = time.time() + 10
+        while not receiver.requests and time.time() < deadline:
+            time.sleep(0.05)
+        result = client.get(f"/api/v1/jobs/{job_id}/result").json()
+
+    (event,) = receiver.payloads()[0]["events"]
+    assert event["type"] == "job.finished"
+    assert (event["job_id"], event["status"], event["screen"]) == (job_id, "succeeded", "s1")
+    assert event["primary_score"] == result["primary_score"]
+    assert event["result_url"] == f"/api/v1/jobs/{job_id}/result"
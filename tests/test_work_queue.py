@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+from fastapi.testclient import TestClient
+import pytest
+
+from alphafold_multimer_service.api import create_app
+from alphafold_multimer_service.config import Settings
+from alphafold_multimer_service.work_queue import Lease, SqliteWorkQueue, filesystem_type
+
+
+def test_claims_are_exclusive_and_fifo(tmp_path: Path) -> None:
+    q = SqliteWorkQueue(tmp_path / "queue.sqlite3")
+    for job_id in ("a", "b", "c"):
+        q.put(job_id)
+    # a second handle on the same file, as another process would have
+    other = SqliteWorkQueue(tmp_path / "queue.sqlite3")
+    first, second = q.claim("w1"), other.claim("w2")
+    assert (first.job_id, second.job_id) == ("a", "b")
+    assert q.pending() == ["c"]
+    assert q.stats()["queued"] == 1 and {lease["worker"] for lease in q.stats()["leased"]} == {"w1", "w2"}
+
+    assert not other.ack(Lease(job_id="a", owner="w2", expires_at=0))  # not w2's lease
+    assert q.ack(first)
+    assert "a" not in q and "b" in q
+
+
+def test_expired_lease_is_taken_over(tmp_path: Path) -> None:
+    q = SqliteWorkQueue(tmp_path / "queue.sqlite3", lease_s=0.2)
+    q.put("a")
+    lost = q.claim("w1")
+    assert q.claim("w2") is None
+    time.sleep(0.3)
+    taken = q.claim("w2")
+    assert taken is not None and taken.job_id == "a"
+    assert q.heartbeat(lost) is None and not q.ack(lost)
+    assert q.heartbeat(taken) is not None
+    assert q.ack(taken) and q.pending() == []
+
+
+def test_reput_job_survives_ack_and_release_owner(tmp_path: Path) -> None:
+    q = SqliteWorkQueue(tmp_path / "queue.sqlite3")
+    q.put("a")
+    lease = q.claim("w1")
+    q.put("a")  # escalated while running
+    assert not q.ack(lease)
+    assert q.pending() == ["a"]
+
+    q.claim("w1")
+    assert q.pending() == []
+    assert q.release_owner("w1") == 1
+    assert q.pending() == ["a"]
+
+
+def _settings(data_dir: Path) -> Settings:
+    return Settings(
+        data_dir=data_dir,
+        api_token=None,
+        mock_mode=True,
+        cors_allow_origins=["http://localhost"],
+        colabfold_image="ddhmed/colabfold:1.5.5-cuda12.2.2",
+        colabfold_cache_dir=data_dir / "cache",
+        host_ptxas_path=None,
+        default_preset="fast",
+        embedded_worker=False,
+    )
+
+
+def test_separate_worker_processes_run_submitted_jobs(tmp_path: Path) -> None:
+    data_dir = tmp_path / "data"
+    app = create_app(_settings(data_dir))
+    env = {**os.environ, "SHENLAB_MOCK": "1", "SHENLAB_DATA_DIR": str(data_dir)}
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "alphafold_multimer_service.worker", "--worker-id", f"w{i}", "--poll-s", "0.05"],
+            env=env,
+        )
+        for i in range(3)
+    ]
+    try:
+        with TestClient(app) as client:
+            job_ids = []
+            for i in range(9):
+                r = client.post(
+                    "/api/v1/services/alphafold-multimer/jobs",
+                    json={"protein_a": {"uniprot": "P35625"}, "protein_b": {"uniprot": f"Q{i:05d}"}},
+                )
+                assert r.status_code == 201
+                job_ids.append(r.json()["job_id"])
+
+            deadline = time.time() + 30
+            while time.time() < deadline:
+                statuses = {client.get(f"/api/v1/jobs/{j}").json()["status"] for j in job_ids}
+                if statuses == {"succeeded"}:
+                    break
+                time.sleep(0.05)
+            assert statuses == {"succeeded"}
+
+            store = app.state.jobs.store
+            records = [store.get(j) for j in job_ids]
+            assert all(rec.attempts == 1 for rec in records)
+            assert {rec.worker for rec in records} <= {"w0", "w1", "w2"}
+            assert client.get("/api/v1/stats/queue").json() == {"queued": 0, "leased": []}
+    finally:
+        for p in workers:
+            p.terminate()
+        for p in workers:
+            assert p.wait(timeout=10) == 0
+
+
+def test_journal_mode_follows_filesystem(tmp_path: Path) -> None:
+    mounts = tmp_path / "mounts"
+    mounts.write_text(
+        "/dev/sda1 / ext4 rw 0 0\n"
+        "server:/export /srv/af nfs4 rw 0 0\n"
+        "/dev/sdb1 /srv/af/local xfs rw 0 0\n",
+        encoding="utf-8",
+    )
+    assert filesystem_type(Path("/srv/af/data/queue.sqlite3"), mounts) == "nfs4"
+    assert filesystem_type(Path("/srv/af/local/queue.sqlite3"), mounts) == "xfs"
+    assert filesystem_type(Path("/srv/afx"), mounts) == "ext4"
+    assert filesystem_type(Path("/x"), tmp_path / "missing") is None
+
+
+def test_rollback_journal_and_mismatched_mode(tmp_path: Path) -> None:
+    q = SqliteWorkQueue(tmp_path / "queue.sqlite3", journal_mode="delete")
+    q.put("a")
+    assert q.claim("w1") is not None
+    assert not (tmp_path / "queue.sqlite3-wal").exists()
+
+    wal = SqliteWorkQueue(tmp_path / "wal.sqlite3", journal_mode="wal")
+    wal.put("a")
+    # a second process asking for the rollback journal while the queue is open in WAL mode
+    with pytest.raises(RuntimeError, match="SHENLAB_QUEUE_JOURNAL_MODE"):
+        SqliteWorkQueue(tmp_path / "wal.sqlite3", journal_mode="delete")
+    with pytest.raises(ValueError):
+        SqliteWorkQueue(tmp_path / "x.sqlite3", journal_mode="memory")